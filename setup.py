@@ -53,6 +53,7 @@ setup(
         "console_scripts": [
             "automation-agent=src.cli.main:app",
             "automation-server=server:main",
+            "automation-worker=worker:main",
         ],
     },
     include_package_data=True,
@@ -7,16 +7,33 @@ from typing import Dict, List, Optional, Any
 from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks, Request, Header
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse
 from pydantic import BaseModel, EmailStr
 import uvicorn
 
 from ..auth.oauth2 import oauth2_manager, user_manager
-from ..core.agent import AutomationAgent
+from ..core.agent_pool import get_agent_pool
+from ..core.batch import BatchRunner
+from ..core.llm_client import llm_client_registry, close_llm_clients
+from ..core.llm_cache import get_response_cache, close_response_cache
+from ..core.concurrency import limiter_stats
+from ..core.llm_batching import get_analysis_batcher
+from ..core.classifier import get_local_classifier
+from ..core.tool_selection import get_tool_selector
+from ..core.plan_cache import get_plan_cache
 from ..database.models import User, ServiceConnection, ActionLog
+from ..integrations.base import integration_client_registry, close_integration_clients
+from ..integrations.slack_directory import get_slack_directory
+from ..integrations.webhooks import (
+    owner_in_scope, verify_github_signature, verify_shared_secret, verify_slack_signature, webhook_account
+)
 from ..database.connection import get_session
+from ..workflows import WorkflowRunner, WorkflowValidationError, get_workflow_registry
+from ..jobs import JOB_KIND_COMMAND, JOB_KIND_WORKFLOW, get_job_queue, job_to_dict
+from ..jobs.queue import TERMINAL_STATUSES
+from ..jobs.worker import Worker, WorkerRegistry
 from ..utils.logging_utils import get_logger
-from ..config import config
+from ..config import config, settings
 
 logger = get_logger(__name__)
 
@@ -50,12 +67,20 @@ class CommandRequest(BaseModel):
     command: str
     context: Optional[Dict[str, Any]] = None
 
+class BatchCommandRequest(BaseModel):
+    commands: List[str]
+    concurrency: Optional[int] = None  # Capped at BATCH_MAX_CONCURRENCY
+
 class CommandResponse(BaseModel):
     success: bool
     result: Optional[str]
     actions_taken: List[str]
     rollback_id: Optional[str]
 
+class WorkflowRunRequest(BaseModel):
+    inputs: Dict[str, Any] = {}
+    background: bool = False  # Enqueue as a job instead of waiting
+
 class WebhookPayload(BaseModel):
     service: str
     event_type: str
@@ -83,8 +108,12 @@ app.add_middleware(
 # Security
 security = HTTPBearer()
 
-# Global agent instance
-agent = AutomationAgent()
+# Warm per-user agents; each request binds one to its own DB session
+agent_pool = get_agent_pool()
+
+# Background jobs; executors run here unless dedicated workers are deployed
+job_queue = get_job_queue()
+job_worker: Optional[Worker] = None
 
 # Dependency to get current user
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> User:
@@ -330,13 +359,16 @@ async def execute_command(
 ):
     """Execute an automation command."""
     try:
-        # Execute command asynchronously
-        result = await asyncio.to_thread(
-            agent.execute_command,
-            command_request.command,
-            current_user.id,
-            command_request.context or {}
-        )
+        with get_session() as session, agent_pool.lease(current_user.id, session) as agent:
+            response = await agent.execute_command(command_request.command)
+        
+        function_results = (response.data or {}).get('function_results', [])
+        result = {
+            'success': response.success,
+            'result': response.message,
+            'actions_taken': [item.get('function') for item in function_results],
+            'rollback_id': str(response.action_id) if response.rollback_available else None
+        }
         
         # Log execution in background
         background_tasks.add_task(
@@ -360,6 +392,91 @@ async def execute_command(
         })
         raise HTTPException(status_code=500, detail=f"Execution failed: {str(e)}")
 
+@app.post("/execute/stream")
+async def execute_command_stream(
+    command_request: CommandRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """Execute an automation command, streaming progress as NDJSON."""
+    async def event_stream():
+        with get_session() as session, agent_pool.lease(current_user.id, session) as agent:
+            async for event in agent.execute_command_stream(command_request.command):
+                yield json.dumps(event, default=str) + "\n"
+    
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
+@app.post("/execute/batch")
+async def execute_command_batch(
+    batch_request: BatchCommandRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """Execute many commands concurrently, streaming each result as NDJSON, then a summary."""
+    if not batch_request.commands:
+        raise HTTPException(status_code=400, detail="No commands given")
+    if len(batch_request.commands) > settings.batch_max_items:
+        raise HTTPException(
+            status_code=400, detail=f"At most {settings.batch_max_items} commands per batch"
+        )
+    
+    concurrency = min(batch_request.concurrency or settings.batch_max_concurrency, settings.batch_max_concurrency)
+    runner = BatchRunner(agent_pool, concurrency=concurrency)
+    
+    async def event_stream():
+        async for event in runner.run(current_user.id, batch_request.commands):
+            yield json.dumps(event, default=str) + "\n"
+    
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
+@app.post("/execute/async", status_code=202)
+async def execute_command_async(
+    command_request: CommandRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """Queue an automation command and return its job id immediately."""
+    job = job_queue.enqueue(current_user.id, JOB_KIND_COMMAND, {"command": command_request.command})
+    return {"job_id": job.id, "status": job.status.value, "status_url": f"/jobs/{job.id}"}
+
+# Job endpoints
+@app.get("/jobs")
+async def list_jobs(limit: int = 50, current_user: User = Depends(get_current_user)):
+    """List the current user's most recent jobs."""
+    return [job_to_dict(job) for job in job_queue.list(current_user.id, limit=limit)]
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: int, current_user: User = Depends(get_current_user)):
+    """Poll a job's status and result."""
+    job = job_queue.get(job_id, user_id=current_user.id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_to_dict(job)
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: int, current_user: User = Depends(get_current_user)):
+    """Stream a job's status changes as NDJSON until it finishes."""
+    if job_queue.get(job_id, user_id=current_user.id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    async def event_stream():
+        last = None
+        while True:
+            job = job_queue.get(job_id, user_id=current_user.id)
+            state = (job.status, job.attempts)
+            if state != last:
+                last = state
+                yield json.dumps(job_to_dict(job), default=str) + "\n"
+            if job.status in TERMINAL_STATUSES:
+                return
+            await asyncio.sleep(settings.job_poll_interval_seconds)
+    
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: int, current_user: User = Depends(get_current_user)):
+    """Cancel a job that has not started running."""
+    if not job_queue.cancel(job_id, current_user.id):
+        raise HTTPException(status_code=409, detail="Job not found or already started")
+    return {"job_id": job_id, "status": "cancelled"}
+
 @app.post("/rollback/{rollback_id}")
 async def rollback_actions(
     rollback_id: str,
@@ -367,12 +484,13 @@ async def rollback_actions(
 ):
     """Rollback actions using rollback ID."""
     try:
-        result = await asyncio.to_thread(agent.rollback_actions, rollback_id, current_user.id)
+        with get_session() as session, agent_pool.lease(current_user.id, session) as agent:
+            response = await agent.rollback_action(int(rollback_id))
         
-        if result['success']:
-            return {"message": "Actions rolled back successfully", "details": result}
+        if response.success:
+            return {"message": "Actions rolled back successfully", "details": response.data}
         else:
-            raise HTTPException(status_code=400, detail=result.get('error', 'Rollback failed'))
+            raise HTTPException(status_code=400, detail=response.message)
             
     except Exception as e:
         logger.error(f"Rollback failed: {str(e)}", extra={
@@ -381,6 +499,68 @@ async def rollback_actions(
         })
         raise HTTPException(status_code=500, detail=f"Rollback failed: {str(e)}")
 
+# Workflow endpoints
+@app.get("/workflows")
+async def list_workflows(current_user: User = Depends(get_current_user)):
+    """List registered workflows and files that failed validation."""
+    registry = get_workflow_registry()
+    return {
+        "workflows": [registry.get(name).to_dict() for name in registry.names()],
+        "load_errors": registry.load_errors
+    }
+
+@app.post("/workflows")
+async def register_workflow(
+    definition: Dict[str, Any],
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Validate and register a workflow definition (JSON).
+    
+    Triggers run as the registering user; only superusers may name another
+    ``run_as`` or replace a workflow someone else registered.
+    """
+    try:
+        workflow = get_workflow_registry().register_data(
+            definition,
+            source=f"api:user{current_user.id}",
+            owner_id=current_user.id,
+            admin=bool(current_user.is_superuser)
+        )
+    except WorkflowValidationError as e:
+        raise HTTPException(status_code=400, detail={"message": str(e), "errors": e.errors})
+    except PermissionError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    return workflow.to_dict()
+
+@app.post("/workflows/{name}/run")
+async def run_workflow(
+    name: str,
+    run_request: WorkflowRunRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """Run a registered workflow as the current user."""
+    workflow = get_workflow_registry().get(name)
+    if workflow is None:
+        raise HTTPException(status_code=404, detail=f"Unknown workflow: {name}")
+    if run_request.background:
+        job = job_queue.enqueue(
+            current_user.id,
+            JOB_KIND_WORKFLOW,
+            # The definition travels with the job: workers have their own registries
+            {"workflow": name, "definition": workflow.document, "inputs": run_request.inputs}
+        )
+        return {"job_id": job.id, "status": job.status.value, "status_url": f"/jobs/{job.id}"}
+    with get_session() as session, agent_pool.lease(current_user.id, session) as agent:
+        result = await WorkflowRunner(agent).run(workflow, run_request.inputs)
+    return {
+        "success": result.success,
+        "message": result.message,
+        "data": result.data,
+        "action_id": result.action_id,
+        "rollback_available": result.rollback_available
+    }
+
 # Webhook endpoints
 @app.post("/webhooks/slack")
 async def slack_webhook(
@@ -389,13 +569,18 @@ async def slack_webhook(
     x_slack_signature: Optional[str] = Header(None),
     x_slack_request_timestamp: Optional[str] = Header(None)
 ):
-    """Handle Slack webhooks."""
+    """
+    Handle Slack webhooks.
+    
+    Events update the shared workspace directory, so only requests signed
+    with ``slack_signing_secret`` are accepted; without the secret every
+    request is rejected.
+    """
     body = await request.body()
     
-    # Verify Slack signature if configured
-    if config.SLACK_SIGNING_SECRET:
-        # TODO: Implement Slack signature verification
-        pass
+    if not verify_slack_signature(settings.slack_signing_secret, x_slack_request_timestamp, x_slack_signature, body):
+        logger.warning("Rejected Slack webhook with a missing or invalid signature")
+        raise HTTPException(status_code=401, detail="Invalid Slack signature")
     
     try:
         # Parse webhook data
@@ -425,13 +610,12 @@ async def github_webhook(
     x_github_event: Optional[str] = Header(None),
     x_github_signature_256: Optional[str] = Header(None)
 ):
-    """Handle GitHub webhooks."""
+    """Handle GitHub webhooks; requests must be signed with ``github_webhook_secret``."""
     body = await request.body()
     
-    # Verify GitHub signature if configured
-    if config.GITHUB_WEBHOOK_SECRET:
-        # TODO: Implement GitHub signature verification
-        pass
+    if not verify_github_signature(settings.github_webhook_secret, x_github_signature_256, body):
+        logger.warning("Rejected GitHub webhook with a missing or invalid signature")
+        raise HTTPException(status_code=401, detail="Invalid GitHub signature")
     
     try:
         data = json.loads(body)
@@ -448,9 +632,15 @@ async def github_webhook(
 @app.post("/webhooks/jira")
 async def jira_webhook(
     request: Request,
-    background_tasks: BackgroundTasks
+    background_tasks: BackgroundTasks,
+    x_webhook_secret: Optional[str] = Header(None)
 ):
-    """Handle Jira webhooks."""
+    """Handle Jira webhooks; requests must carry ``jira_webhook_secret``."""
+    provided = x_webhook_secret or request.query_params.get("secret")
+    if not verify_shared_secret(settings.jira_webhook_secret, provided):
+        logger.warning("Rejected Jira webhook with a missing or wrong secret")
+        raise HTTPException(status_code=401, detail="Invalid Jira webhook secret")
+    
     try:
         data = await request.json()
         
@@ -499,6 +689,38 @@ async def health_check():
         "version": "1.0.0"
     }
 
+@app.get("/metrics")
+async def get_metrics(current_user: User = Depends(get_current_user)):
+    """Runtime performance metrics (connection pools, reuse rates); superusers only."""
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=403, detail="Metrics are only available to administrators")
+    loop = asyncio.get_running_loop()
+    # Queue depth and live workers are database queries
+    depth = loop.run_in_executor(None, job_queue.depth)
+    workers = loop.run_in_executor(None, WorkerRegistry(job_queue.session_factory).live_workers)
+    depth, workers = await asyncio.gather(depth, workers)
+    return {
+        "timestamp": datetime.utcnow(),
+        "llm_pool": llm_client_registry.stats(),
+        "integration_http": integration_client_registry.stats(),
+        "slack_directory": get_slack_directory().stats(),
+        "llm_cache": get_response_cache().stats(),
+        "llm_router": llm_client_registry.router.stats() if llm_client_registry.router else None,
+        "llm_coalescing": llm_client_registry.coalescer.stats() if llm_client_registry.coalescer else None,
+        "llm_concurrency": limiter_stats(),
+        "llm_batching": get_analysis_batcher().stats(),
+        "local_classifier": get_local_classifier().stats(),
+        "tool_selection": get_tool_selector().stats(),
+        "plan_cache": get_plan_cache().stats(),
+        "agent_pool": agent_pool.stats(),
+        "jobs": {
+            "queue": job_queue.stats(),
+            "depth": depth,
+            "executor": job_worker.executor.stats() if job_worker else None,
+            "workers": workers
+        }
+    }
+
 # Background task functions
 async def log_command_execution(user_id: int, command: str, result: Dict[str, Any]):
     """Log command execution to database."""
@@ -530,8 +752,10 @@ async def process_slack_webhook(data: Dict[str, Any]):
                 'event_data': event
             })
             
-            # TODO: Implement specific event handling
-            # For example: message events, file shared events, etc.
+            # Keep the cached workspace directory in step with Slack
+            get_slack_directory().apply_event(data.get('team_id'), event)
+            
+            await run_triggered_workflows("slack", event_subtype, event, webhook_account("slack", data))
             
     except Exception as e:
         logger.error(f"Failed to process Slack webhook: {str(e)}")
@@ -544,8 +768,7 @@ async def process_github_webhook(event_type: str, data: Dict[str, Any]):
             'action': data.get('action')
         })
         
-        # TODO: Implement specific event handling
-        # For example: push events, pull request events, issue events, etc.
+        await run_triggered_workflows("github", event_type, data, webhook_account("github", data))
         
     except Exception as e:
         logger.error(f"Failed to process GitHub webhook: {str(e)}")
@@ -561,12 +784,38 @@ async def process_jira_webhook(data: Dict[str, Any]):
             'issue_key': data.get('issue', {}).get('key')
         })
         
-        # TODO: Implement specific event handling
-        # For example: issue created, issue updated, etc.
+        await run_triggered_workflows("jira", webhook_event, data, webhook_account("jira", data))
         
     except Exception as e:
         logger.error(f"Failed to process Jira webhook: {str(e)}")
 
+async def run_triggered_workflows(
+    service: str,
+    event: Optional[str],
+    payload: Dict[str, Any],
+    account: Optional[str]
+):
+    """
+    Run every registered workflow whose trigger matches a verified webhook.
+    
+    A trigger only fires for events from the workspace, account or site
+    its ``run_as`` user is connected to, since it runs with their tokens.
+    """
+    for workflow, trigger, context in get_workflow_registry().for_webhook(service, event, payload):
+        try:
+            inputs = trigger.render_inputs(context)
+            with get_session() as session, agent_pool.lease(trigger.run_as, session) as agent:
+                if not await owner_in_scope(agent.integrations, service, account):
+                    logger.info(
+                        f"Skipping workflow {workflow.name}: {service} {event} from {account} "
+                        f"is outside its owner's connection"
+                    )
+                    continue
+                result = await WorkflowRunner(agent).run(workflow, inputs, trigger=context)
+            logger.info(f"Workflow {workflow.name} triggered by {service} {event}: {result.message}")
+        except Exception as e:
+            logger.error(f"Workflow {workflow.name} triggered by {service} {event} failed: {str(e)}")
+
 # Startup and shutdown events
 @app.on_event("startup")
 async def startup_event():
@@ -581,6 +830,15 @@ async def startup_event():
     except Exception as e:
         logger.error(f"Database initialization failed: {str(e)}")
     
+    # Load and validate workflow definitions
+    get_workflow_registry()
+    
+    # Run queued jobs in this process unless dedicated workers do
+    global job_worker
+    if settings.job_executor_in_api:
+        job_worker = Worker(job_queue)
+        await job_worker.start()
+    
     # Clean up expired sessions periodically
     asyncio.create_task(periodic_cleanup())
 
@@ -588,12 +846,23 @@ async def startup_event():
 async def shutdown_event():
     """Clean up on application shutdown."""
     logger.info("Automation Agent API shutting down")
+    
+    # Let running jobs finish; anything left is reclaimed by other workers
+    if job_worker:
+        await job_worker.stop()
+    
+    # Close pooled LLM and integration connections
+    await close_llm_clients()
+    await close_integration_clients()
+    close_response_cache()
+    agent_pool.clear()
 
 async def periodic_cleanup():
     """Periodic cleanup of expired sessions and tokens."""
     while True:
         try:
             user_manager.cleanup_expired_sessions()
+            agent_pool.evict_idle()
             await asyncio.sleep(3600)  # Run every hour
         except Exception as e:
             logger.error(f"Periodic cleanup failed: {str(e)}")
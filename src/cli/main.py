@@ -1,6 +1,7 @@
 """Command-line interface for the AI automation agent."""
 
 import asyncio
+import json
 from datetime import datetime
 from typing import Optional, List
 import os
@@ -16,6 +17,8 @@ from sqlalchemy.orm import Session
 from ..database import get_db, create_tables
 from ..database.models import User, AutomationAction, ActionStatus, ServiceType
 from ..core.agent import AutomationAgent
+from ..core.batch import BatchRunner
+from ..workflows import WorkflowRunner, WorkflowValidationError, get_workflow_registry, load_workflow
 from ..auth.oauth2 import user_manager, oauth2_manager
 from ..config import settings
 from ..utils.logging import get_logger
@@ -164,9 +167,85 @@ def connect(
 
 
 @app.command()
-def execute(command: str = typer.Argument(help="Natural language automation command")):
-    """Execute an automation command."""
-    asyncio.run(execute_command_async(command))
+def execute(
+    command: Optional[str] = typer.Argument(None, help="Natural language automation command"),
+    from_file: Optional[str] = typer.Option(
+        None, "--from-file", "-f", help="Run every command in a file (one per line, or a JSON list)"
+    ),
+    concurrency: Optional[int] = typer.Option(None, "--concurrency", "-c", help="Commands run at once"),
+    ndjson: bool = typer.Option(False, "--ndjson", help="Print batch results as NDJSON")
+):
+    """Execute an automation command, or a batch of them with --from-file."""
+    if from_file:
+        asyncio.run(execute_batch_async(load_commands(from_file), concurrency, ndjson))
+    elif command:
+        asyncio.run(execute_command_async(command))
+    else:
+        console.print("❌ Give a command or --from-file", style="red")
+        raise typer.Exit(1)
+
+
+def load_commands(path: str) -> List[str]:
+    """Read batch commands: a JSON list, or one command per line ('#' starts a comment)."""
+    try:
+        with open(path) as f:
+            text = f.read()
+    except OSError as e:
+        console.print(f"❌ Cannot read {path}: {e}", style="red")
+        raise typer.Exit(1)
+    
+    if path.endswith(".json"):
+        try:
+            commands = json.loads(text)
+        except json.JSONDecodeError as e:
+            console.print(f"❌ {path} is not valid JSON: {e}", style="red")
+            raise typer.Exit(1)
+        if not isinstance(commands, list) or not all(isinstance(item, str) for item in commands):
+            console.print(f"❌ {path} must contain a JSON list of commands", style="red")
+            raise typer.Exit(1)
+    else:
+        commands = [line.strip() for line in text.splitlines()]
+        commands = [line for line in commands if line and not line.startswith("#")]
+    
+    if not commands:
+        console.print(f"❌ No commands in {path}", style="red")
+        raise typer.Exit(1)
+    if len(commands) > settings.batch_max_items:
+        console.print(f"❌ At most {settings.batch_max_items} commands per batch", style="red")
+        raise typer.Exit(1)
+    return commands
+
+
+async def execute_batch_async(commands: List[str], concurrency: Optional[int], ndjson: bool):
+    """Execute a batch of commands, printing each result as it finishes."""
+    user_id = get_current_user()
+    runner = BatchRunner(concurrency=concurrency)
+    if not ndjson:
+        console.print(f"🤖 Executing {len(commands)} commands ({runner.concurrency} at a time)", style="blue")
+    
+    summary = {}
+    async for event in runner.run(user_id, commands):
+        if ndjson:
+            print(json.dumps(event, default=str), flush=True)
+        elif event["type"] == "item":
+            status = "✅" if event["success"] else "❌"
+            detail = "" if event["success"] else f": {event['error']}"
+            console.print(
+                f"{status} [{event['index']}] {event['command']} ({event['duration_ms']:.0f}ms){detail}",
+                style="green" if event["success"] else "red"
+            )
+        if event["type"] == "summary":
+            summary = event
+    
+    if not ndjson:
+        columns = ("total", "succeeded", "failed", "duration_ms", "commands_per_second", "avg_ms", "p50_ms", "p95_ms")
+        table = Table(title="Batch summary")
+        for column in columns:
+            table.add_column(column, style="cyan")
+        table.add_row(*(str(summary[column]) for column in columns))
+        console.print(table)
+    if summary.get("failed"):
+        raise typer.Exit(1)
 
 
 async def execute_command_async(command: str):
@@ -253,6 +332,107 @@ async def rollback_action_async(action_id: int):
         raise typer.Exit(1)
 
 
+workflow_app = typer.Typer(help="Run and validate declarative workflows (no LLM involved)")
+app.add_typer(workflow_app, name="workflow")
+
+
+def parse_workflow_inputs(values: List[str]) -> dict:
+    """Parse ``key=value`` options; values are read as JSON when they parse."""
+    inputs = {}
+    for item in values:
+        key, separator, value = item.partition("=")
+        if not separator:
+            console.print(f"❌ Inputs must be key=value, got: {item}", style="red")
+            raise typer.Exit(1)
+        try:
+            inputs[key.strip()] = json.loads(value)
+        except json.JSONDecodeError:
+            inputs[key.strip()] = value
+    return inputs
+
+
+def resolve_workflow(name_or_path: str):
+    """A workflow file, or the name of a workflow in the workflows directory."""
+    try:
+        if os.path.isfile(name_or_path):
+            return load_workflow(name_or_path)
+    except WorkflowValidationError as e:
+        console.print(f"❌ {e.name} is invalid:", style="red")
+        for error in e.errors:
+            console.print(f"  • {error}", style="red")
+        raise typer.Exit(1)
+    workflow = get_workflow_registry().get(name_or_path)
+    if workflow is None:
+        console.print(f"❌ No workflow file or registered workflow named {name_or_path}", style="red")
+        raise typer.Exit(1)
+    return workflow
+
+
+@workflow_app.command("list")
+def workflow_list():
+    """List the workflows in the workflows directory."""
+    registry = get_workflow_registry()
+    table = Table(title="Workflows")
+    table.add_column("Name", style="cyan")
+    table.add_column("Steps", style="white")
+    table.add_column("Triggers", style="blue")
+    table.add_column("Description", style="white")
+    for name in registry.names():
+        workflow = registry.get(name)
+        triggers = ", ".join(
+            f"{trigger.webhook}:{trigger.event or '*'}" for trigger in workflow.triggers
+        )
+        table.add_row(name, str(len(workflow.steps)), triggers or "-", workflow.description)
+    console.print(table)
+    for path, errors in registry.load_errors.items():
+        console.print(f"⚠️  {path} failed validation: {'; '.join(errors)}", style="yellow")
+
+
+@workflow_app.command("validate")
+def workflow_validate(path: str = typer.Argument(help="Workflow file (.yaml, .yml or .json)")):
+    """Validate a workflow file without running it."""
+    workflow = resolve_workflow(path)
+    console.print(f"✅ {workflow.name} is valid ({len(workflow.steps)} steps)", style="green")
+
+
+@workflow_app.command("run")
+def workflow_run(
+    workflow: str = typer.Argument(help="Workflow file or registered workflow name"),
+    inputs: List[str] = typer.Option([], "--input", "-i", help="Workflow input as key=value (repeatable)")
+):
+    """Run a workflow."""
+    asyncio.run(run_workflow_async(workflow, parse_workflow_inputs(inputs)))
+
+
+async def run_workflow_async(name_or_path: str, inputs: dict):
+    """Run a workflow asynchronously."""
+    definition = resolve_workflow(name_or_path)
+    try:
+        user_id = get_current_user()
+        db = get_db_session()
+        
+        console.print(f"⚙️  Running workflow: {definition.name}", style="blue")
+        response = await WorkflowRunner(AutomationAgent(db, user_id)).run(definition, inputs)
+        
+        if response.data:
+            for result in response.data.get("function_results", []):
+                status = result.get("status", "unknown")
+                status_style = "green" if status == "success" else "yellow" if status == "skipped" else "red"
+                console.print(f"  • {result.get('function')}: ", style="white", end="")
+                console.print(status, style=status_style)
+        
+        if response.success:
+            console.print(f"✅ {response.message}", style="green")
+        else:
+            console.print(f"❌ {response.message}", style="red")
+        if response.rollback_available:
+            console.print(f"\n🔄 Rollback available (Action ID: {response.action_id})", style="yellow")
+        
+    except Exception as e:
+        console.print(f"❌ Workflow failed: {e}", style="red")
+        raise typer.Exit(1)
+
+
 @app.command()
 def history(limit: int = typer.Option(10, help="Number of recent actions to show")):
     """Show automation history."""
@@ -1,6 +1,6 @@
 """Configuration management for the AI automation agent."""
 
-from typing import Optional
+from typing import Dict, List, Optional
 from pydantic import BaseSettings, validator
 from pathlib import Path
 import os
@@ -17,6 +17,133 @@ class Settings(BaseSettings):
     llm_max_tokens: int = 2000
     llm_temperature: float = 0.1
     
+    # LLM connection pooling (shared per provider/base_url/model)
+    llm_pool_max_connections: int = 100
+    llm_pool_max_keepalive: int = 20
+    llm_pool_keepalive_expiry: float = 30.0
+    llm_request_timeout: float = 60.0
+    llm_http2: bool = True
+    
+    # Integration HTTP clients (one pooled client per service per process)
+    integration_pool_max_connections: int = 50
+    integration_pool_max_keepalive: int = 10
+    integration_pool_keepalive_expiry: float = 30.0
+    integration_request_timeout: float = 30.0
+    integration_timeouts: Dict[str, float] = {"slack": 10.0, "github": 15.0}  # Per service, e.g. {"jira": 60}
+    integration_http2: bool = True
+    
+    # LLM response cache (memory LRU with optional SQLite tier)
+    llm_cache_enabled: bool = True
+    llm_cache_max_entries: int = 1024
+    llm_cache_ttl_seconds: int = 3600
+    llm_cache_max_temperature: float = 0.3
+    llm_cache_path: Optional[str] = None  # e.g. ./.cache/llm_cache.sqlite3
+    llm_coalescing_enabled: bool = True  # Share identical in-flight requests
+    
+    # LLM failover routing (JSON list of {"provider", "model", "api_key", "base_url"})
+    llm_fallback_providers: List[Dict[str, str]] = []
+    llm_router_timeout: float = 30.0
+    llm_router_window: int = 50
+    llm_router_failure_threshold: int = 3
+    llm_router_cooldown_seconds: float = 30.0
+    llm_hedge_enabled: bool = False
+    llm_hedge_min_delay_ms: int = 500
+    
+    # Adaptive (AIMD) concurrency limit per LLM provider
+    llm_concurrency_initial: int = 8
+    llm_concurrency_min: int = 1
+    llm_concurrency_max: int = 64
+    llm_concurrency_latency_tolerance: float = 2.0  # Short-run vs long-run average latency
+    llm_concurrency_latency_floor: int = 4  # Latency alone never shrinks the limit below this
+    
+    # Prompt token budget (context window is looked up per model unless set)
+    llm_context_window: Optional[int] = None
+    llm_analysis_max_chunks: int = 8  # Longer analysis input is truncated
+    
+    # Micro-batching of analyze_text requests
+    llm_batch_enabled: bool = True
+    llm_batch_window_ms: int = 20
+    llm_batch_max_items: int = 16
+    llm_batch_max_tokens: int = 6000  # Prompt tokens of batched texts per call
+    
+    # Local lexicon classifier for urgency/sentiment (escalates below threshold)
+    local_classifier_enabled: bool = True
+    local_classifier_confidence_threshold: float = 0.75
+    
+    # Slack workspace directory (cached channel and user lookups)
+    slack_channel_ttl_seconds: float = 3600.0  # Reloaded before answering after this
+    slack_user_ttl_seconds: float = 86400.0  # Per profile; users.list reloads refresh them
+    slack_user_max_entries: int = 50000  # Profiles kept per workspace
+    slack_token_max_entries: int = 10000  # Token-to-workspace mappings kept (LRU)
+    slack_user_fetch_concurrency: int = 8  # users.info calls at once for profiles not in users.list
+    slack_directory_refresh_after_seconds: float = 600.0  # Served while reloading in the background after this
+    slack_directory_miss_reload_seconds: float = 60.0  # Unknown names reload the directory at most this often
+    
+    # Unread Slack reads (get_slack_messages with unread_only)
+    slack_unread_default_window_hours: float = 24.0  # Where channels with no read marker start
+    slack_unread_max_pages: int = 5  # History pages scanned per read; older unread messages are skipped
+    
+    # Concurrent function calls per integration within one command
+    integration_max_concurrency: int = 4
+    integration_retry_attempts: int = 2  # Extra attempts for idempotent calls after network errors
+    integration_retry_backoff_seconds: float = 0.5  # Doubles with each attempt
+    execution_graph_max_parallelism: int = 8  # Calls running at once per turn
+    execution_graph_infer_dependencies: bool = True
+    
+    # Multi-step agent loop budgets
+    agent_max_steps: int = 5
+    agent_max_tokens: int = 50000  # Prompt + completion tokens across steps
+    agent_max_seconds: float = 120.0
+    agent_tool_result_max_tokens: int = 2000  # Per result fed back to the model
+    
+    # API agent pool: warm agents reused per user
+    agent_pool_max_agents: int = 256  # Idle agents kept across all users
+    agent_pool_max_per_user: int = 4
+    agent_pool_idle_seconds: float = 900.0
+    
+    # Batch command execution (POST /execute/batch, execute --from-file)
+    batch_max_concurrency: int = 4  # Commands running at once per batch
+    batch_max_items: int = 500
+    
+    # Background job queue (POST /execute/async)
+    job_executor_in_api: bool = True  # Run executors in the API process; disable with dedicated workers
+    job_executor_concurrency: int = 4  # Jobs run at once per executor
+    job_poll_interval_seconds: float = 1.0
+    job_visibility_timeout_seconds: float = 300.0  # Lease renewed by heartbeats while a job runs
+    job_max_attempts: int = 3
+    job_retry_backoff_seconds: float = 10.0  # Doubles with each attempt
+    job_max_concurrent_per_user: int = 2
+    
+    # Dedicated job workers (worker.py)
+    worker_processes: int = 1  # Per node
+    worker_heartbeat_seconds: float = 10.0
+    worker_dead_after_seconds: float = 30.0  # Missed heartbeats before a worker's jobs are reclaimed
+    worker_drain_timeout_seconds: float = 60.0  # Wait for running jobs on SIGTERM
+    
+    # Tool subsetting: send only the functions relevant to each command
+    tool_selection_enabled: bool = True
+    tool_selection_top_k: int = 3  # Plus functions registered as core
+    tool_selection_embedding_model: Optional[str] = None  # e.g. all-MiniLM-L6-v2 (sentence-transformers)
+    tool_selection_embedding_weight: float = 0.5
+    tool_selection_min_similarity: float = 0.3
+    
+    # Plan cache: replay plans for repeated command shapes without the LLM
+    plan_cache_enabled: bool = True
+    plan_cache_max_entries: int = 1000
+    plan_cache_ttl_seconds: int = 86400
+    plan_cache_min_confidence: float = 0.75  # Two agreeing plans reach 0.75
+    plan_cache_write_min_confidence: float = 0.9  # Plans with side effects need eight agreeing plans
+    
+    # Declarative workflows (YAML/JSON, run without the LLM)
+    workflows_dir: Optional[str] = None  # Loaded at startup, e.g. ./workflows
+    workflow_max_loop_items: int = 100  # Per for_each step
+    
+    # Webhook authentication; a webhook without a configured secret is rejected
+    slack_signing_secret: Optional[str] = None  # App "Signing Secret", checks X-Slack-Signature
+    github_webhook_secret: Optional[str] = None  # Checks X-Hub-Signature-256
+    jira_webhook_secret: Optional[str] = None  # Shared secret: ?secret= on the webhook URL or X-Webhook-Secret
+    webhook_max_age_seconds: int = 300  # Older signed Slack requests are treated as replays
+    
     # Legacy OpenAI support (backwards compatibility)
     openai_api_key: Optional[str] = None
     
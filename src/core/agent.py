@@ -2,20 +2,30 @@
 
 import json
 import logging
+import time
 from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional, Callable
+from typing import AsyncIterator, Dict, List, Any, Optional, Callable, Tuple
 from dataclasses import dataclass
 import asyncio
 
 from sqlalchemy.orm import Session
 
 from ..config import settings
-from .llm_client import get_llm_client, LLMResponse
+from .concurrency import PRIORITY_INTERACTIVE
+from .classifier import get_local_classifier
+from .execution_graph import ExecutionGraph, GraphNode
+from .llm_batching import get_analysis_batcher
+from .llm_client import get_llm_client, LLMResponse, LLMStreamEvent
+from .plan_cache import CommandTemplate, get_plan_cache
+from .tokens import PromptBudget, chunk_text, count_tokens, truncate_to_tokens
+from .tool_selection import get_tool_selector
 from ..database.models import AutomationAction, FunctionCall, ActionStatus, ServiceType
 from ..integrations.slack import SlackIntegration
 from ..integrations.jira import JiraIntegration  
 from ..integrations.aws_s3 import AWSS3Integration
 from ..integrations.github import GitHubIntegration
+from ..integrations.base import is_transient_error
+from ..integrations.registry import RegisteredFunction, agent_function, function_registry
 from ..utils.logging import get_logger
 
 logger = get_logger(__name__)
@@ -31,6 +41,54 @@ class AgentResponse:
     rollback_available: bool = False
 
 
+# Integration class per service, constructed on first use by an agent
+INTEGRATION_CLASSES = {
+    ServiceType.SLACK: SlackIntegration,
+    ServiceType.JIRA: JiraIntegration,
+    ServiceType.AWS_S3: AWSS3Integration,
+    ServiceType.GITHUB: GitHubIntegration,
+}
+
+# System prompts of analyze_text, by analysis type
+ANALYSIS_PROMPTS = {
+    "sentiment": "Analyze the sentiment of this text. Return positive, negative, or neutral with confidence score.",
+    "keywords": "Extract the key topics and important keywords from this text.",
+    "urgency": "Determine if this text indicates an urgent issue. Look for words like 'outage', 'critical', 'emergency', 'down', etc.",
+    "summary": "Provide a concise summary of this text, highlighting the main points."
+}
+COMBINE_INSTRUCTION = "The text was analyzed in parts. Combine these partial analyses into one answer."
+
+
+class LazyIntegrations(dict):
+    """
+    Service integrations of one agent, created when first looked up.
+    
+    A command that only touches Slack never pays for the boto3 client.
+    ``on_create`` is told each construction and how long it took.
+    """
+    
+    def __init__(self, agent: "AutomationAgent", on_create: Optional[Callable[[ServiceType, float], None]] = None):
+        super().__init__()
+        self.agent = agent
+        self.on_create = on_create
+    
+    def __missing__(self, service: ServiceType):
+        integration_class = INTEGRATION_CLASSES.get(service)
+        if integration_class is None:
+            raise KeyError(service)
+        started = time.perf_counter()
+        integration = integration_class(self.agent.db, self.agent.user_id)
+        self[service] = integration
+        if self.on_create is not None:
+            self.on_create(service, time.perf_counter() - started)
+        return integration
+    
+    def bind_session(self, db_session: Optional[Session]):
+        """Point every created integration at a new database session."""
+        for integration in self.values():
+            integration.db = db_session
+
+
 class AutomationAgent:
     """
     Core AI automation agent that uses OpenAI function calling to interact
@@ -48,150 +106,28 @@ class AutomationAgent:
         self.db = db_session
         self.user_id = user_id
         self.llm_client = get_llm_client()
+        # Queue position for upstream LLM slots; background runners lower it
+        self.llm_priority = PRIORITY_INTERACTIVE
+        # Token estimates per in-progress action, saved on completion
+        self._llm_metrics: Dict[int, Dict[str, Any]] = {}
+        # Concurrent function calls allowed per service (None = internal functions)
+        self._service_semaphores: Dict[Optional[ServiceType], asyncio.Semaphore] = {}
         
-        # Initialize service integrations
-        self.integrations = {
-            ServiceType.SLACK: SlackIntegration(db_session, user_id),
-            ServiceType.JIRA: JiraIntegration(db_session, user_id),
-            ServiceType.AWS_S3: AWSS3Integration(db_session, user_id),
-            ServiceType.GITHUB: GitHubIntegration(db_session, user_id),
-        }
+        # Service integrations, created on first use
+        self.integrations = LazyIntegrations(self)
         
-        # Function definitions for OpenAI
-        self.functions = self._build_function_definitions()
+        # Function definitions for OpenAI, declared by the integrations
+        self.functions = function_registry.definitions()
+    
+    def bind_session(self, db_session: Optional[Session]):
+        """
+        Use a new database session, e.g. when a pooled agent serves another request.
         
-    def _build_function_definitions(self) -> List[Dict[str, Any]]:
-        """Build OpenAI function definitions from available integrations."""
-        functions = [
-            {
-                "name": "get_slack_messages",
-                "description": "Get messages from a Slack channel",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "channel_name": {
-                            "type": "string",
-                            "description": "Name of the Slack channel (with or without #)"
-                        },
-                        "limit": {
-                            "type": "integer",
-                            "description": "Number of messages to retrieve (default: 50)",
-                            "default": 50
-                        },
-                        "unread_only": {
-                            "type": "boolean",
-                            "description": "Only get unread messages",
-                            "default": False
-                        }
-                    },
-                    "required": ["channel_name"]
-                }
-            },
-            {
-                "name": "create_jira_ticket",
-                "description": "Create a new Jira ticket/issue",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "project_key": {
-                            "type": "string",
-                            "description": "Jira project key (e.g., 'PROJ')"
-                        },
-                        "summary": {
-                            "type": "string",
-                            "description": "Brief summary/title of the issue"
-                        },
-                        "description": {
-                            "type": "string",
-                            "description": "Detailed description of the issue"
-                        },
-                        "issue_type": {
-                            "type": "string",
-                            "description": "Type of issue (e.g., Bug, Task, Story)",
-                            "default": "Task"
-                        },
-                        "priority": {
-                            "type": "string",
-                            "description": "Priority level (Highest, High, Medium, Low, Lowest)",
-                            "default": "Medium"
-                        },
-                        "labels": {
-                            "type": "array",
-                            "items": {"type": "string"},
-                            "description": "Labels to add to the ticket"
-                        }
-                    },
-                    "required": ["project_key", "summary", "description"]
-                }
-            },
-            {
-                "name": "upload_to_s3",
-                "description": "Upload content to AWS S3",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "content": {
-                            "type": "string",
-                            "description": "Content to upload"
-                        },
-                        "key": {
-                            "type": "string",
-                            "description": "S3 object key/path"
-                        },
-                        "content_type": {
-                            "type": "string",
-                            "description": "MIME type of the content",
-                            "default": "text/plain"
-                        }
-                    },
-                    "required": ["content", "key"]
-                }
-            },
-            {
-                "name": "search_github_repos",
-                "description": "Search GitHub repositories",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "query": {
-                            "type": "string",
-                            "description": "Search query"
-                        },
-                        "sort": {
-                            "type": "string",
-                            "description": "Sort by: stars, forks, updated",
-                            "default": "stars"
-                        },
-                        "order": {
-                            "type": "string",
-                            "description": "Sort order: asc, desc",
-                            "default": "desc"
-                        }
-                    },
-                    "required": ["query"]
-                }
-            },
-            {
-                "name": "analyze_text",
-                "description": "Analyze text content for sentiment, keywords, or patterns",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "text": {
-                            "type": "string",
-                            "description": "Text content to analyze"
-                        },
-                        "analysis_type": {
-                            "type": "string",
-                            "description": "Type of analysis: sentiment, keywords, urgency, summary",
-                            "default": "summary"
-                        }
-                    },
-                    "required": ["text"]
-                }
-            }
-        ]
-        return functions
+        Args:
+            db_session: Session for this request (None when parking the agent)
+        """
+        self.db = db_session
+        self.integrations.bind_session(db_session)
     
     async def execute_command(self, command: str) -> AgentResponse:
         """
@@ -203,52 +139,171 @@ class AutomationAgent:
         Returns:
             AgentResponse with execution results
         """
-        # Create automation action record
-        action = AutomationAction(
-            user_id=self.user_id,
-            action_type="ai_automation",
-            command=command,
-            status=ActionStatus.IN_PROGRESS,
-            input_data={"command": command},
-            started_at=datetime.utcnow()
-        )
-        self.db.add(action)
-        self.db.commit()
+        action = self._start_action(command)
         
         try:
             logger.info(f"Executing command: {command}")
             
             # Use OpenAI to determine which functions to call
             response = await self._call_llm_with_functions(command, action.id)
+            return self._complete_action(action, response)
             
-            # Update action status
-            action.status = ActionStatus.COMPLETED
-            action.completed_at = datetime.utcnow()
-            action.duration_ms = int((action.completed_at - action.started_at).total_seconds() * 1000)
-            action.output_data = response
+        except Exception as e:
+            return self._fail_action(action, e)
+    
+    async def execute_command_stream(self, command: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Execute a command, yielding progress events as they happen.
+        
+        Events are dictionaries with a ``type`` of ``content`` (LLM text
+        delta), ``function_call`` (a call was planned and dispatched),
+        ``function_result`` (a call finished) and finally ``completed``.
+        
+        Args:
+            command: Natural language command from user
             
-            self.db.commit()
+        Yields:
+            Progress event dictionaries
+        """
+        action = self._start_action(command)
+        yield {"type": "started", "action_id": action.id}
+        
+        try:
+            logger.info(f"Executing command (streaming): {command}")
             
-            return AgentResponse(
-                success=True,
-                message="Command executed successfully",
-                data=response,
-                action_id=action.id,
-                rollback_available=action.can_rollback
-            )
+            response = None
+            async for event in self._stream_llm_with_functions(command, action.id):
+                if event["type"] == "result":
+                    response = event["data"]
+                else:
+                    yield event
             
-        except Exception as e:
-            logger.error(f"Error executing command: {e}")
-            action.status = ActionStatus.FAILED
-            action.error_message = str(e)
-            action.completed_at = datetime.utcnow()
-            self.db.commit()
+            agent_response = self._complete_action(action, response)
             
-            return AgentResponse(
-                success=False,
-                message=f"Command execution failed: {str(e)}",
-                action_id=action.id
-            )
+        except Exception as e:
+            agent_response = self._fail_action(action, e)
+        
+        yield {
+            "type": "completed",
+            "success": agent_response.success,
+            "message": agent_response.message,
+            "data": agent_response.data,
+            "action_id": agent_response.action_id,
+            "rollback_available": agent_response.rollback_available
+        }
+    
+    def _start_action(
+        self,
+        command: str,
+        action_type: str = "ai_automation",
+        input_data: Optional[Dict[str, Any]] = None
+    ) -> AutomationAction:
+        """Create the in-progress automation action record."""
+        action = AutomationAction(
+            user_id=self.user_id,
+            action_type=action_type,
+            command=command,
+            status=ActionStatus.IN_PROGRESS,
+            input_data=input_data if input_data is not None else {"command": command},
+            started_at=datetime.utcnow()
+        )
+        self.db.add(action)
+        self.db.commit()
+        return action
+    
+    def _complete_action(self, action: AutomationAction, response: Dict[str, Any]) -> AgentResponse:
+        """Mark an action completed and build the agent response."""
+        action.status = ActionStatus.COMPLETED
+        action.completed_at = datetime.utcnow()
+        action.duration_ms = int((action.completed_at - action.started_at).total_seconds() * 1000)
+        action.output_data = response
+        action.llm_metrics = self._llm_metrics.pop(action.id, None)
+        action.can_rollback = self._has_rollback_calls(action.id)
+        
+        self.db.commit()
+        
+        return AgentResponse(
+            success=True,
+            message="Command executed successfully",
+            data=response,
+            action_id=action.id,
+            rollback_available=action.can_rollback
+        )
+    
+    def _fail_action(self, action: AutomationAction, error: Exception) -> AgentResponse:
+        """Mark an action failed and build the agent response."""
+        logger.error(f"Error executing command: {error}")
+        action.status = ActionStatus.FAILED
+        action.error_message = str(error)
+        action.completed_at = datetime.utcnow()
+        action.llm_metrics = self._llm_metrics.pop(action.id, None)
+        # Calls that completed before the failure can still be undone
+        action.can_rollback = self._has_rollback_calls(action.id)
+        self.db.commit()
+        
+        return AgentResponse(
+            success=False,
+            message=f"Command execution failed: {str(error)}",
+            action_id=action.id,
+            rollback_available=action.can_rollback
+        )
+    
+    def _has_rollback_calls(self, action_id: int) -> bool:
+        """Whether any completed call of the action recorded a rollback."""
+        return self.db.query(FunctionCall.id).filter(
+            FunctionCall.automation_action_id == action_id,
+            FunctionCall.status == ActionStatus.COMPLETED,
+            FunctionCall.rollback_function.isnot(None)
+        ).first() is not None
+    
+    def _action_metrics(self, action_id: int) -> Dict[str, Any]:
+        """LLM metrics being collected for an in-progress action."""
+        return self._llm_metrics.setdefault(action_id, {
+            "model": self.llm_client.model,
+            "estimated_prompt_tokens": 0,
+            "token_estimates": []
+        })
+    
+    def _record_token_estimate(self, action_id: int, stage: str, estimate: Dict[str, Any]):
+        """Accumulate a prompt token estimate for the action record."""
+        metrics = self._action_metrics(action_id)
+        metrics["estimated_prompt_tokens"] += estimate.get("prompt_tokens", 0)
+        metrics["token_estimates"].append({"stage": stage, **estimate})
+    
+    def _fit_planning_prompt(
+        self,
+        messages: List[Dict[str, str]],
+        action_id: int,
+        functions: List[Dict[str, Any]]
+    ) -> List[Dict[str, str]]:
+        """
+        Make the planning prompt fit the model's context window.
+        
+        The function schemas and system prompt are fixed, so any overflow is
+        cut from the user command. Raises before any network call if even
+        an empty command would not fit.
+        """
+        model = self.llm_client.model
+        budget = PromptBudget(model)
+        estimate = budget.measure(messages, functions)
+        overflow = estimate["prompt_tokens"] - budget.input_tokens
+        
+        if overflow > 0:
+            command = messages[-1]["content"]
+            allowed = count_tokens(command, model) - overflow
+            if allowed <= 0:
+                raise ValueError(
+                    f"Planning prompt needs {estimate['prompt_tokens']} tokens but only "
+                    f"{budget.input_tokens} are available for {model}"
+                )
+            truncated, removed = truncate_to_tokens(command, allowed, model)
+            messages = messages[:-1] + [{**messages[-1], "content": truncated}]
+            estimate = budget.measure(messages, functions)
+            estimate["truncated_tokens"] = removed
+            logger.warning(f"Truncated command by {removed} tokens to fit the context window of {model}")
+        
+        self._record_token_estimate(action_id, "planning", estimate)
+        return messages
     
     async def _call_llm_with_functions(self, command: str, action_id: int) -> Dict[str, Any]:
         """
@@ -261,6 +316,46 @@ class AutomationAgent:
         Returns:
             Execution results
         """
+        result = {}
+        async for event in self._stream_llm_with_functions(command, action_id):
+            if event["type"] == "result":
+                result = event["data"]
+        return result
+    
+    async def _stream_llm_with_functions(self, command: str, action_id: int) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Run the agent loop, streaming progress as it goes.
+        
+        Each step streams a completion, executes the function calls it
+        returns and feeds their results back as tool messages before
+        re-querying. Only the functions relevant to the command are sent; if
+        the model calls one outside that subset or says a tool is missing,
+        the full set is sent from then on (re-asking once when the step
+        made no calls). The loop ends when the model answers without
+        calling a function, or early when ``agent_max_steps``, ``agent_max_tokens``
+        or ``agent_max_seconds`` is exhausted, when the model only repeats
+        calls it already made, or after two consecutive steps in which
+        every call failed.
+        
+        Commands whose template has a trusted plan in the plan cache are
+        replayed without calling the LLM; single-turn plans that succeed
+        are fed back into the cache.
+        
+        Args:
+            command: User command
+            action_id: Database action ID for logging
+            
+        Yields:
+            Progress events, ending with a ``result`` event
+        """
+        plan_cache = get_plan_cache() if settings.plan_cache_enabled else None
+        if plan_cache is not None:
+            template, cached_calls = plan_cache.lookup(self.user_id, self.llm_client.model, command)
+            if cached_calls:
+                async for event in self._replay_plan(template, cached_calls, action_id):
+                    yield event
+                return
+        
         messages = [
             {
                 "role": "system",
@@ -271,11 +366,17 @@ class AutomationAgent:
                 - GitHub: Search repositories and code
                 
                 When users ask you to do something, break it down into function calls.
+                Calls in one response run in parallel. To pass the output of an earlier
+                call in the same response, use "{{call_N}}" or "{{call_N.field}}" in an
+                argument, where N is that call's position in your response.
                 For example, if asked to "summarize Slack messages and create a Jira ticket if urgent":
                 1. Get Slack messages from the specified channel
                 2. Analyze the messages for urgency/sentiment
                 3. If urgent content is found, create a Jira ticket
                 
+                Function results are sent back to you, so you can chain steps across
+                turns. Reply without calling a function once the task is complete.
+                
                 Always be specific about what you're doing and why."""
             },
             {
@@ -283,46 +384,449 @@ class AutomationAgent:
                 "content": command
             }
         ]
+        selector = get_tool_selector()
+        selection = await selector.select(command, self.llm_client.model)
+        functions = selection.functions
+        self._action_metrics(action_id)["tool_selection"] = selection.to_dict()
+        messages = self._fit_planning_prompt(messages, action_id, functions)
         
-        response = await self.llm_client.chat_completion(
-            messages=messages,
-            functions=self.functions,
-            temperature=settings.llm_temperature,
-            max_tokens=settings.llm_max_tokens
-        )
+        budget = PromptBudget(self.llm_client.model)
+        started = time.monotonic()
+        executed: Dict[str, asyncio.Task] = {}
+        all_results: List[Dict[str, Any]] = []
+        step_metrics: List[Dict[str, Any]] = []
+        graphs: List[Dict[str, Any]] = []
+        graph_level = 0
+        tokens_used = 0
+        previous_step_failed = False
+        first_step_calls: List[Dict[str, Any]] = []
+        stop_reason = "max_steps"
+        content = ""
         
-        results = []
+        for step in range(1, settings.agent_max_steps + 1):
+            estimate = budget.measure(messages, functions)
+            if step > 1:
+                if estimate["prompt_tokens"] > budget.input_tokens:
+                    stop_reason = "context_budget"
+                    break
+                self._record_token_estimate(action_id, f"step_{step}", estimate)
+            
+            yield {"type": "step", "step": step}
+            step_started = time.monotonic()
+            outcome = None
+            async for event in self._run_agent_step(
+                messages, functions, action_id, step, len(all_results), executed, graph_level
+            ):
+                if event["type"] == "step_result":
+                    outcome = event
+                else:
+                    yield event
+            
+            response, calls, results = outcome["response"], outcome["calls"], outcome["results"]
+            if step == 1:
+                first_step_calls = calls
+            content = response.content if response else ""
+            all_results.extend(results)
+            graphs.append(outcome["graph"])
+            # Later turns build on this turn's results
+            graph_level = outcome["next_level"]
+            tokens_used += self._step_tokens(estimate["prompt_tokens"], response)
+            failed = sum(1 for result in results if result.get("status") == "failed")
+            step_metrics.append({
+                "step": step,
+                "llm_ms": outcome["llm_ms"],
+                "total_ms": int((time.monotonic() - step_started) * 1000),
+                "function_calls": len(calls),
+                "repeated_calls": outcome["repeated"],
+                "failed_calls": failed
+            })
+            
+            missing_tool = selector.signals_missing_tool(selection, content, calls)
+            if missing_tool:
+                functions = selector.widen(selection, missing_tool)
+                self._action_metrics(action_id)["tool_selection"] = selection.to_dict()
+                if not calls:
+                    continue
+            if not calls:
+                stop_reason = "completed"
+                break
+            if outcome["repeated"] == len(calls):
+                stop_reason = "repeated_calls"
+                break
+            step_failed = failed == len(calls)
+            if step_failed and previous_step_failed:
+                stop_reason = "failures"
+                break
+            previous_step_failed = step_failed
+            if tokens_used >= settings.agent_max_tokens:
+                stop_reason = "token_budget"
+                break
+            if time.monotonic() - started >= settings.agent_max_seconds:
+                stop_reason = "time_budget"
+                break
+            
+            messages = messages + self._feedback_messages(response, calls, results)
         
-        # Handle function calls
-        if response.has_function_calls:
-            for function_call in response.function_calls:
-                result = await self._execute_function_call(
-                    function_call, action_id
-                )
-                results.append(result)
+        self._record_agent_steps(action_id, step_metrics, stop_reason, tokens_used)
+        if stop_reason not in ("completed", "repeated_calls"):
+            logger.warning(f"Agent loop for action {action_id} stopped early: {stop_reason}")
+        
+        # Only plans made up front are replayable: later turns depend on results
+        if (
+            plan_cache is not None and stop_reason == "completed" and len(step_metrics) == 2
+            and all(result.get("status") == "success" for result in all_results)
+        ):
+            outcome = plan_cache.observe(self.user_id, self.llm_client.model, template, first_step_calls)
+            self._action_metrics(action_id)["plan_cache"] = {"template": template.template, "status": outcome}
         
         # If no function calls, just return the message
-        if not results:
-            return {"response": response.content}
+        if not all_results:
+            yield {"type": "result", "data": {"response": content}}
+            return
+        
+        yield {
+            "type": "result",
+            "data": {
+                "function_results": all_results,
+                "summary": content if content else "Functions executed successfully",
+                "steps": len(step_metrics),
+                "stop_reason": stop_reason,
+                "execution_graph": [node for graph in graphs for node in graph["nodes"]]
+            }
+        }
+    
+    async def _replay_plan(
+        self,
+        template: CommandTemplate,
+        calls: List[Dict[str, Any]],
+        action_id: int
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Execute a cached plan as a single step, without the LLM.
+        
+        Yields:
+            Progress events, ending with a ``result`` event
+        """
+        logger.info(f"Replaying cached plan for '{template.template}' ({len(calls)} calls)")
+        
+        async def planned_events() -> AsyncIterator[LLMStreamEvent]:
+            for index, call in enumerate(calls):
+                yield LLMStreamEvent(LLMStreamEvent.FUNCTION_CALL, function_call={"id": f"plan_{index + 1}", **call})
+            yield LLMStreamEvent(LLMStreamEvent.DONE, response=LLMResponse(""))
+        
+        yield {"type": "step", "step": 1}
+        started = time.monotonic()
+        outcome = None
+        async for event in self._run_agent_step(
+            [], [], action_id, 1, 0, {}, events=planned_events()
+        ):
+            if event["type"] == "step_result":
+                outcome = event
+            else:
+                yield event
+        
+        results = outcome["results"]
+        failed = sum(1 for result in results if result.get("status") != "success")
+        get_plan_cache().record_replay(self.user_id, self.llm_client.model, template, failed == 0)
+        self._action_metrics(action_id)["plan_cache"] = {"template": template.template, "status": "hit"}
+        self._record_agent_steps(action_id, [{
+            "step": 1,
+            "llm_ms": None,
+            "total_ms": int((time.monotonic() - started) * 1000),
+            "function_calls": len(calls),
+            "repeated_calls": outcome["repeated"],
+            "failed_calls": failed
+        }], "plan_cache", 0)
+        
+        yield {
+            "type": "result",
+            "data": {
+                "function_results": results,
+                "summary": f"Executed cached plan for '{template.template}'",
+                "steps": 1,
+                "stop_reason": "plan_cache",
+                "execution_graph": outcome["graph"]["nodes"]
+            }
+        }
+    
+    async def _run_agent_step(
+        self,
+        messages: List[Dict[str, Any]],
+        functions: List[Dict[str, Any]],
+        action_id: int,
+        step: int,
+        first_index: int,
+        executed: Dict[str, asyncio.Task],
+        base_level: int = 0,
+        events: Optional[AsyncIterator[LLMStreamEvent]] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream one completion and dispatch its function calls early.
+        
+        Each function call joins the turn's ``ExecutionGraph`` as soon as its
+        arguments are complete and runs once its dependencies have
+        succeeded, so integrations work while the model is still generating
+        the rest of the response. Independent calls run concurrently, bounded
+        per service by ``integration_max_concurrency``; results keep the
+        order in which the model emitted the calls. A call whose resolved
+        arguments match a call that already succeeded in this action shares
+        its result instead of running again; calls that failed are retried.
+        ``events`` replaces the completion stream when replaying a cached
+        plan.
+        
+        Yields:
+            Progress events, ending with a ``step_result`` event
+        """
+        finished: asyncio.Queue = asyncio.Queue()
+        calls: List[Dict[str, Any]] = []
+        repeated = 0
+        
+        async def run_node(node: GraphNode, arguments: Dict[str, Any]) -> Dict[str, Any]:
+            nonlocal repeated
+            # "{{call_N}}" means a different call in every turn, so match on the resolved arguments
+            signature = self._call_signature({**node.function_call, "arguments": arguments})
+            # Repeating a call that succeeded would duplicate its side effects
+            result = await self._shared_result(executed.get(signature))
+            if result is not None:
+                repeated += 1
+            else:
+                executed[signature] = node.task
+                try:
+                    async with self._service_semaphore(node.function_call["name"]):
+                        result = await self._execute_function_call(
+                            {**node.function_call, "arguments": arguments}, action_id, node, graph
+                        )
+                finally:
+                    if executed.get(signature) is node.task and (result or {}).get("status") != "success":
+                        del executed[signature]
+            await finished.put({"index": first_index + node.position, "step": step, "node_id": node.node_id, **result})
+            return result
+        
+        def skip_node(node: GraphNode, reason: str, status: str) -> Dict[str, Any]:
+            result = self._record_skipped_call(node, graph, action_id, reason, status)
+            finished.put_nowait({"index": first_index + node.position, "step": step, "node_id": node.node_id, **result})
+            return result
+        
+        graph = ExecutionGraph(
+            run_node, skip_node, consumes=function_registry.consumes, base_level=base_level, id_prefix=f"{step}."
+        )
+        
+        def drain_finished():
+            events = []
+            while not finished.empty():
+                events.append({"type": "function_result", **finished.get_nowait()})
+            return events
+        
+        response = None
+        llm_started = time.monotonic()
+        llm_ms = None
+        
+        if events is None:
+            events = self.llm_client.stream_chat_completion(
+                messages=messages,
+                functions=functions,
+                temperature=settings.llm_temperature,
+                max_tokens=settings.llm_max_tokens,
+                priority=self.llm_priority
+            )
+        
+        try:
+            async for event in events:
+                if event.type == LLMStreamEvent.CONTENT:
+                    yield {"type": "content", "delta": event.content}
+                elif event.type == LLMStreamEvent.FUNCTION_CALL:
+                    calls.append(event.function_call)
+                    node = graph.add(event.function_call)
+                    yield {
+                        "type": "function_call",
+                        "index": first_index + node.position,
+                        "step": step,
+                        "node_id": node.node_id,
+                        "depends_on": node.depends_on,
+                        "function": event.function_call["name"],
+                        "parameters": event.function_call.get("arguments", {})
+                    }
+                elif event.type == LLMStreamEvent.DONE:
+                    response = event.response
+                    llm_ms = int((time.monotonic() - llm_started) * 1000)
+                
+                for finished_event in drain_finished():
+                    yield finished_event
             
+            pending = {node.task for node in graph.nodes}
+            while pending:
+                _, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for finished_event in drain_finished():
+                    yield finished_event
+            results = [node.task.result() for node in graph.nodes]
+        finally:
+            graph.cancel()
+        
+        yield {
+            "type": "step_result",
+            "response": response,
+            "calls": calls,
+            "results": results,
+            "repeated": repeated,
+            "llm_ms": llm_ms,
+            "graph": graph.to_dict(),
+            "next_level": graph.max_level + 1
+        }
+    
+    def _feedback_messages(
+        self,
+        response: Optional[LLMResponse],
+        calls: List[Dict[str, Any]],
+        results: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Messages reporting a step's function results back to the model."""
+        model = self.llm_client.model
+        
+        def render(result: Dict[str, Any]) -> str:
+            payload = result.get("result") if result.get("status") == "success" else {"error": result.get("error")}
+            text, _ = truncate_to_tokens(
+                json.dumps(payload, default=str), settings.agent_tool_result_max_tokens, model
+            )
+            return text
+        
+        content = response.content if response else ""
+        if all(call.get("id") for call in calls):
+            assistant = {
+                "role": "assistant",
+                "content": content or None,
+                "tool_calls": [
+                    {
+                        "id": call["id"],
+                        "type": "function",
+                        "function": {"name": call["name"], "arguments": json.dumps(call.get("arguments", {}))}
+                    }
+                    for call in calls
+                ]
+            }
+            return [assistant] + [
+                {"role": "tool", "tool_call_id": call["id"], "content": render(result)}
+                for call, result in zip(calls, results)
+            ]
+        
+        # Simulated calls carry no ids, so report the results as a user turn
+        lines = [f"{call['name']}: {render(result)}" for call, result in zip(calls, results)]
+        return [
+            {"role": "assistant", "content": content or "Calling functions."},
+            {
+                "role": "user",
+                "content": "Function results:\n" + "\n".join(lines)
+                + "\n\nContinue with the task, or reply without function calls if it is complete."
+            }
+        ]
+    
+    def _step_tokens(self, prompt_tokens: int, response: Optional[LLMResponse]) -> int:
+        """Tokens spent on one step, from provider usage when reported."""
+        if response is not None and response.usage.get("total_tokens"):
+            return response.usage["total_tokens"]
+        if response is None:
+            return prompt_tokens
+        output = response.content + json.dumps(response.function_calls, default=str)
+        return prompt_tokens + count_tokens(output, self.llm_client.model)
+    
+    def _record_agent_steps(self, action_id: int, steps: List[Dict[str, Any]], stop_reason: str, tokens_used: int):
+        """Store per-step latency and the loop outcome for the action record."""
+        metrics = self._action_metrics(action_id)
+        metrics["steps"] = steps
+        metrics["stop_reason"] = stop_reason
+        metrics["tokens_used"] = tokens_used
+    
+    @staticmethod
+    def _call_signature(function_call: Dict[str, Any]) -> str:
+        return json.dumps(
+            [function_call["name"], function_call.get("arguments", {})], sort_keys=True, default=str
+        )
+    
+    @staticmethod
+    async def _shared_result(original: Optional[asyncio.Task]) -> Optional[Dict[str, Any]]:
+        """Result of an earlier identical call, or None unless it succeeded."""
+        if original is None:
+            return None
+        try:
+            result = await asyncio.shield(original)
+        except asyncio.CancelledError:
+            if original.cancelled():
+                return None
+            raise
+        return result if result.get("status") == "success" else None
+    
+    @staticmethod
+    def _set_graph_position(func_call: FunctionCall, node: GraphNode, graph: ExecutionGraph):
+        func_call.node_id = graph.qualified_id(node.node_id)
+        func_call.depends_on = [graph.qualified_id(dep) for dep in node.depends_on]
+        func_call.graph_level = node.level
+    
+    def _record_skipped_call(
+        self,
+        node: GraphNode,
+        graph: ExecutionGraph,
+        action_id: int,
+        reason: str,
+        status: str
+    ) -> Dict[str, Any]:
+        """Log a graph node that was not executed (failed or skipped dependency, bad reference)."""
+        now = datetime.utcnow()
+        func_call = FunctionCall(
+            automation_action_id=action_id,
+            function_name=node.function_call["name"],
+            service_type=self._function_service(node.function_call["name"]),
+            parameters=node.function_call.get("arguments", {}),
+            status=ActionStatus.FAILED if status == "failed" else ActionStatus.CANCELLED,
+            error_message=reason,
+            called_at=now,
+            completed_at=now,
+            duration_ms=0
+        )
+        self._set_graph_position(func_call, node, graph)
+        self.db.add(func_call)
+        self.db.commit()
+        
         return {
-            "function_results": results,
-            "summary": response.content if response.content else "Functions executed successfully"
+            "function": node.function_call["name"],
+            "parameters": node.function_call.get("arguments", {}),
+            "error": reason,
+            "status": status
         }
     
-    async def _execute_function_call(self, function_call: Dict[str, Any], action_id: int) -> Dict[str, Any]:
+    @staticmethod
+    def _function_service(function_name: str) -> Optional[ServiceType]:
+        registered = function_registry.get(function_name)
+        return registered.service if registered else None
+    
+    def _service_semaphore(self, function_name: str) -> asyncio.Semaphore:
+        """Semaphore bounding concurrent calls to the function's service."""
+        service = self._function_service(function_name)
+        semaphore = self._service_semaphores.get(service)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(settings.integration_max_concurrency)
+            self._service_semaphores[service] = semaphore
+        return semaphore
+    
+    async def _execute_function_call(
+        self,
+        function_call: Dict[str, Any],
+        action_id: int,
+        node: Optional[GraphNode] = None,
+        graph: Optional[ExecutionGraph] = None
+    ) -> Dict[str, Any]:
         """
         Execute a specific function call and log it.
         
         Args:
             function_call: Function call dictionary with 'name' and 'arguments'
             action_id: Parent action ID
+            node: Execution graph node of the call, persisted with it
+            graph: Graph the node belongs to
             
         Returns:
             Function execution result
         """
         function_name = function_call["name"]
-        parameters = function_call["arguments"]
+        parameters = function_call.get("arguments", {})
         
         # Log function call
         func_call = FunctionCall(
@@ -331,59 +835,23 @@ class AutomationAgent:
             parameters=parameters,
             called_at=datetime.utcnow()
         )
+        if node is not None:
+            self._set_graph_position(func_call, node, graph)
         
         try:
-            # Execute the function
-            if function_name == "get_slack_messages":
-                func_call.service_type = ServiceType.SLACK
-                result = await self.integrations[ServiceType.SLACK].get_messages(
-                    channel_name=parameters["channel_name"],
-                    limit=parameters.get("limit", 50),
-                    unread_only=parameters.get("unread_only", False)
-                )
-                
-            elif function_name == "create_jira_ticket":
-                func_call.service_type = ServiceType.JIRA
-                result = await self.integrations[ServiceType.JIRA].create_ticket(
-                    project_key=parameters["project_key"],
-                    summary=parameters["summary"],
-                    description=parameters["description"],
-                    issue_type=parameters.get("issue_type", "Task"),
-                    priority=parameters.get("priority", "Medium"),
-                    labels=parameters.get("labels", [])
-                )
-                # Mark as rollback-able
-                func_call.rollback_function = "delete_jira_ticket"
-                func_call.rollback_parameters = {"ticket_key": result.get("key")}
-                
-            elif function_name == "upload_to_s3":
-                func_call.service_type = ServiceType.AWS_S3
-                result = await self.integrations[ServiceType.AWS_S3].upload_content(
-                    content=parameters["content"],
-                    key=parameters["key"],
-                    content_type=parameters.get("content_type", "text/plain")
-                )
-                # Mark as rollback-able
-                func_call.rollback_function = "delete_s3_object"
-                func_call.rollback_parameters = {"key": parameters["key"]}
-                
-            elif function_name == "search_github_repos":
-                func_call.service_type = ServiceType.GITHUB
-                result = await self.integrations[ServiceType.GITHUB].search_repositories(
-                    query=parameters["query"],
-                    sort=parameters.get("sort", "stars"),
-                    order=parameters.get("order", "desc")
-                )
-                
-            elif function_name == "analyze_text":
-                func_call.service_type = None  # Internal analysis function
-                result = await self._analyze_text(
-                    text=parameters["text"],
-                    analysis_type=parameters.get("analysis_type", "summary")
-                )
-                
-            else:
+            registered = function_registry.get(function_name)
+            if registered is None:
                 raise ValueError(f"Unknown function: {function_name}")
+            arguments = registered.validate(parameters)
+            func_call.service_type = registered.service
+            
+            result = await self._invoke(registered, arguments)
+            
+            if registered.rollback:
+                func_call.rollback_function = registered.rollback
+                func_call.rollback_parameters = registered.rollback_arguments(arguments, result)
+            if isinstance(result, dict) and "token_estimate" in result:
+                self._record_token_estimate(action_id, function_name, result["token_estimate"])
             
             # Update function call record
             func_call.status = ActionStatus.COMPLETED
@@ -419,10 +887,60 @@ class AutomationAgent:
                 "status": "failed"
             }
     
+    async def _invoke(self, registered: RegisteredFunction, arguments: Dict[str, Any]) -> Any:
+        """Call a registered function, retrying idempotent ones after network errors."""
+        # Integration methods take the schema's properties as keyword arguments
+        target = self if registered.service is None else self.integrations[registered.service]
+        attempts = 1 + (max(0, settings.integration_retry_attempts) if registered.idempotent else 0)
+        for attempt in range(attempts):
+            try:
+                return await getattr(target, registered.method_name)(**arguments)
+            except Exception as e:
+                if attempt + 1 >= attempts or not is_transient_error(e):
+                    raise
+                delay = settings.integration_retry_backoff_seconds * (2 ** attempt)
+                logger.warning(f"{registered.name} failed ({e!r}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+    
+    @agent_function(
+        name="analyze_text",
+        description="Analyze text content for sentiment, keywords, or patterns",
+        parameters={
+            "type": "object",
+            "properties": {
+                "text": {
+                    "type": "string",
+                    "description": "Text content to analyze"
+                },
+                "analysis_type": {
+                    "type": "string",
+                    "description": "Type of analysis: sentiment, keywords, urgency, summary",
+                    "default": "summary"
+                }
+            },
+            "required": ["text"]
+        },
+        read_only=True,
+        idempotent=True,
+        consumes=("get_slack_messages", "search_github_repos"),
+        keywords=("analyze", "summary", "summarize", "sentiment", "urgent", "urgency", "keyword", "classify"),
+        core=True
+    )
     async def _analyze_text(self, text: str, analysis_type: str = "summary") -> Dict[str, Any]:
         """
         Analyze text using LLM for various purposes.
         
+        ``urgency`` and ``sentiment`` are first scored by the local lexicon
+        classifier; only results below its confidence threshold are
+        escalated to the LLM. The ``engine`` field of the result reports
+        which one answered.
+        
+        Text that fits the context window goes through the micro-batcher,
+        which merges concurrent requests of the same type into one call.
+        Longer text is split into chunks on line boundaries, analyzed
+        concurrently and then combined; beyond ``llm_analysis_max_chunks``
+        the input is truncated first.
+        
         Args:
             text: Text to analyze
             analysis_type: Type of analysis to perform
@@ -430,26 +948,219 @@ class AutomationAgent:
         Returns:
             Analysis results
         """
-        prompts = {
-            "sentiment": "Analyze the sentiment of this text. Return positive, negative, or neutral with confidence score.",
-            "keywords": "Extract the key topics and important keywords from this text.",
-            "urgency": "Determine if this text indicates an urgent issue. Look for words like 'outage', 'critical', 'emergency', 'down', etc.",
-            "summary": "Provide a concise summary of this text, highlighting the main points."
+        local_result = None
+        classifier = get_local_classifier()
+        if settings.local_classifier_enabled and classifier.supports(analysis_type):
+            local_result = classifier.classify(text, analysis_type)
+            escalate = classifier.should_escalate(local_result)
+            classifier.record(analysis_type, escalate)
+            if not escalate:
+                return {
+                    "analysis_type": analysis_type,
+                    "result": local_result.describe(),
+                    "engine": "lexicon",
+                    "local_result": local_result.to_dict(),
+                    "original_text_length": len(text)
+                }
+            logger.info(
+                f"Escalating {analysis_type} analysis to LLM "
+                f"(local confidence {local_result.confidence:.2f})"
+            )
+        
+        prompt = ANALYSIS_PROMPTS.get(analysis_type, ANALYSIS_PROMPTS["summary"])
+        model = self.llm_client.model
+        budget = PromptBudget(model)
+        
+        def analysis_messages(content: str) -> List[Dict[str, str]]:
+            return [{"role": "system", "content": f"{prompt}\n\nText to analyze: {content}"}]
+        
+        chunk_tokens = budget.remaining(analysis_messages(""))
+        if chunk_tokens <= 0:
+            raise ValueError(f"Analysis prompt does not fit the context window of {model}")
+        
+        max_chunks = settings.llm_analysis_max_chunks
+        limit = chunk_tokens * max_chunks
+        while True:
+            text_to_send, truncated_tokens = truncate_to_tokens(text, limit, model)
+            chunks = chunk_text(text_to_send, chunk_tokens, model) or [""]
+            if len(chunks) <= max_chunks:
+                break
+            # Packing on line boundaries leaves slack in each chunk; shrink by the overflow
+            limit -= sum(count_tokens(chunk, model) for chunk in chunks[max_chunks:])
+        estimate = budget.measure([message for chunk in chunks for message in analysis_messages(chunk)])
+        
+        async def analyze(content: str) -> str:
+            response = await self.llm_client.chat_completion(
+                messages=analysis_messages(content),
+                temperature=0.1,
+                max_tokens=settings.llm_max_tokens,
+                priority=self.llm_priority
+            )
+            return response.content
+        
+        if len(chunks) == 1 and settings.llm_batch_enabled:
+            partials = [await get_analysis_batcher().analyze(
+                self.llm_client, analysis_type, prompt, chunks[0], self.llm_priority
+            )]
+        else:
+            partials = await asyncio.gather(*(analyze(chunk) for chunk in chunks))
+        result = partials[0]
+        
+        if len(partials) > 1:
+            result, combine_tokens = await self._combine_analyses(partials, analysis_type)
+            estimate["prompt_tokens"] += combine_tokens
+        
+        estimate.update({"chunks": len(chunks), "truncated_tokens": truncated_tokens})
+        
+        analysis = {
+            "analysis_type": analysis_type,
+            "result": result,
+            "engine": "llm",
+            "original_text_length": len(text),
+            "token_estimate": estimate
         }
+        if local_result is not None:
+            analysis["local_result"] = local_result.to_dict()
+        return analysis
+    
+    async def _combine_analyses(self, partials: List[str], analysis_type: str) -> Tuple[str, int]:
+        """
+        Merge partial LLM analyses of one text with a single LLM call.
         
-        prompt = prompts.get(analysis_type, prompts["summary"])
+        The partials are already analyses, not the original text, so this
+        never goes through the local classifier or the micro-batcher.
+        
+        Returns:
+            (combined analysis, prompt tokens sent)
+        """
+        model = self.llm_client.model
+        budget = PromptBudget(model)
+        prompt = ANALYSIS_PROMPTS.get(analysis_type, ANALYSIS_PROMPTS["summary"])
+        combined = "\n\n".join(f"Part {index + 1}:\n{partial}" for index, partial in enumerate(partials))
+        messages = [
+            {"role": "system", "content": f"{prompt}\n\n{COMBINE_INSTRUCTION}"},
+            {"role": "user", "content": combined}
+        ]
+        overflow = budget.measure(messages)["prompt_tokens"] - budget.input_tokens
+        if overflow > 0:
+            combined, _ = truncate_to_tokens(combined, count_tokens(combined, model) - overflow, model)
+            messages[-1]["content"] = combined
         
         response = await self.llm_client.chat_completion(
-            messages=[
-                {"role": "system", "content": f"{prompt}\n\nText to analyze: {text}"}
-            ],
-            temperature=0.1
+            messages=messages,
+            temperature=0.1,
+            max_tokens=settings.llm_max_tokens,
+            priority=self.llm_priority
         )
+        return response.content, budget.measure(messages)["prompt_tokens"]
+    
+    @agent_function(
+        name="analyze_slack_channel",
+        description=(
+            "Analyze a Slack channel's full message history (optionally a time window), e.g. for "
+            "incident retros; use instead of get_slack_messages + analyze_text for long histories"
+        ),
+        parameters={
+            "type": "object",
+            "properties": {
+                "channel_name": {
+                    "type": "string",
+                    "description": "Name of the Slack channel (with or without #)"
+                },
+                "analysis_type": {
+                    "type": "string",
+                    "description": "Type of analysis: sentiment, keywords, urgency, summary",
+                    "default": "summary"
+                },
+                "oldest": {
+                    "type": "string",
+                    "description": "Only messages after this time (ISO 8601 or epoch seconds)"
+                },
+                "latest": {
+                    "type": "string",
+                    "description": "Only messages before this time (ISO 8601 or epoch seconds)"
+                }
+            },
+            "required": ["channel_name"]
+        },
+        read_only=True,
+        idempotent=True,
+        keywords=("analyze", "summary", "summarize", "retro", "incident", "history", "slack", "channel", "sentiment")
+    )
+    async def _analyze_slack_channel(
+        self,
+        channel_name: str,
+        analysis_type: str = "summary",
+        oldest: Optional[str] = None,
+        latest: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Analyze a channel's history while streaming it.
+        
+        Messages are packed into chunks as pages arrive and each chunk is
+        analyzed as soon as it is full, so only one chunk and the partial
+        results are held at a time. Once ``llm_analysis_max_chunks``
+        partials pile up they are combined into one, which keeps memory
+        flat however long the channel is.
+        
+        Args:
+            channel_name: Name of the channel (with or without #)
+            analysis_type: Type of analysis to perform
+            oldest: Only messages after this time
+            latest: Only messages before this time
+            
+        Returns:
+            Analysis results with the number of messages and chunks analyzed
+        """
+        model = self.llm_client.model
+        chunk_tokens = max(256, PromptBudget(model).input_tokens // 2)
+        partials: List[str] = []
+        lines: List[str] = []
+        line_tokens = 0
+        messages = 0
+        chunks = 0
+        
+        async def analyze_lines():
+            nonlocal line_tokens, chunks
+            # History arrives newest first; analyze each chunk in reading order
+            analysis = await self._analyze_text("\n".join(reversed(lines)), analysis_type)
+            partials.append(analysis["result"])
+            lines.clear()
+            line_tokens = 0
+            chunks += 1
+        
+        async def combine():
+            # Partials were appended newest first
+            result, _ = await self._combine_analyses(list(reversed(partials)), analysis_type)
+            partials[:] = [result]
+        
+        slack = self.integrations[ServiceType.SLACK]
+        async for message in slack.iter_messages(channel_name, oldest=oldest, latest=latest):
+            if not message["text"]:
+                continue
+            line = f"[{message['timestamp']}] {message['user_name']}: {message['text']}"
+            tokens = count_tokens(line, model)
+            if lines and line_tokens + tokens > chunk_tokens:
+                await analyze_lines()
+                if len(partials) >= settings.llm_analysis_max_chunks:
+                    await combine()
+            lines.append(line)
+            line_tokens += tokens
+            messages += 1
+        
+        if lines:
+            await analyze_lines()
+        if len(partials) > 1:
+            await combine()
         
         return {
+            "channel": channel_name.lstrip("#"),
             "analysis_type": analysis_type,
-            "result": response.content,
-            "original_text_length": len(text)
+            "result": partials[0] if partials else "No messages in this window.",
+            "message_count": messages,
+            "chunks": chunks,
+            "oldest": oldest,
+            "latest": latest
         }
     
     async def rollback_action(self, action_id: int, reason: str = "") -> AgentResponse:
@@ -487,11 +1198,12 @@ class AutomationAgent:
             )
         
         try:
-            # Rollback function calls in reverse order
+            # Rollback function calls in reverse dependency order: dependents
+            # (higher graph levels) before the calls they consumed
             function_calls = self.db.query(FunctionCall).filter(
                 FunctionCall.automation_action_id == action_id,
                 FunctionCall.rollback_function.isnot(None)
-            ).order_by(FunctionCall.called_at.desc()).all()
+            ).order_by(FunctionCall.graph_level.desc(), FunctionCall.called_at.desc()).all()
             
             rollback_results = []
             for func_call in function_calls:
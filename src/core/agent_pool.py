@@ -0,0 +1,188 @@
+"""Per-user pool of warm automation agents for the API server."""
+
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, List, Any, Iterator, Optional
+
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..database.models import ServiceType
+from ..utils.logging import get_logger
+from .agent import AutomationAgent
+from .concurrency import PRIORITY_INTERACTIVE
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class _IdleAgents:
+    agents: List[AutomationAgent] = field(default_factory=list)
+    last_used: float = field(default_factory=time.monotonic)
+
+
+class AgentPool:
+    """
+    Reuses ``AutomationAgent`` instances across requests of the same user.
+    
+    ``lease`` hands out an idle agent of the user (or builds one), binds
+    it to the request's database session and parks it again afterwards
+    with the session detached. Integrations are created lazily by the
+    agent and survive with it, so a user's second Slack command reuses the
+    first one's client. Concurrent requests of one user each get their own
+    agent; at most ``max_per_user`` of them are kept.
+    
+    Idle agents are bounded by ``max_agents`` overall, dropping the least
+    recently used user first, and are evicted after ``idle_seconds``.
+    """
+    
+    def __init__(
+        self,
+        max_agents: Optional[int] = None,
+        max_per_user: Optional[int] = None,
+        idle_seconds: Optional[float] = None
+    ):
+        self.max_agents = max_agents if max_agents is not None else settings.agent_pool_max_agents
+        self.max_per_user = max_per_user if max_per_user is not None else settings.agent_pool_max_per_user
+        self.idle_seconds = idle_seconds if idle_seconds is not None else settings.agent_pool_idle_seconds
+        self._idle: "OrderedDict[int, _IdleAgents]" = OrderedDict()
+        self._idle_count = 0
+        self._lock = threading.Lock()
+        
+        self.leases = 0
+        self.hits = 0
+        self.in_use = 0
+        self.agents_created = 0
+        self.agent_construction_seconds = 0.0
+        self.integrations_created: Dict[str, int] = {}
+        self.integration_construction_seconds = 0.0
+        self.lru_evictions = 0
+        self.idle_evictions = 0
+    
+    @contextmanager
+    def lease(self, user_id: int, db_session: Session) -> Iterator[AutomationAgent]:
+        """
+        Borrow an agent for one request.
+        
+        Args:
+            user_id: User the agent acts for
+            db_session: The request's database session
+        
+        Yields:
+            Agent bound to ``db_session``
+        """
+        agent = self._acquire(user_id)
+        agent.bind_session(db_session)
+        agent.llm_priority = PRIORITY_INTERACTIVE
+        try:
+            yield agent
+        finally:
+            agent.bind_session(None)
+            agent._llm_metrics.clear()
+            self._release(user_id, agent)
+    
+    def evict_idle(self) -> int:
+        """Drop agents idle for longer than ``idle_seconds``; returns how many."""
+        cutoff = time.monotonic() - self.idle_seconds
+        evicted = 0
+        with self._lock:
+            # Users are in LRU order, so the stale ones are at the front
+            while self._idle:
+                user_id, idle = next(iter(self._idle.items()))
+                if idle.last_used > cutoff:
+                    break
+                del self._idle[user_id]
+                self._idle_count -= len(idle.agents)
+                evicted += len(idle.agents)
+            self.idle_evictions += evicted
+        if evicted:
+            logger.info(f"Evicted {evicted} idle agent(s)")
+        return evicted
+    
+    def clear(self):
+        with self._lock:
+            self._idle.clear()
+            self._idle_count = 0
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "leases": self.leases,
+                "hits": self.hits,
+                "hit_rate": round(self.hits / self.leases, 4) if self.leases else 0.0,
+                "in_use": self.in_use,
+                "idle_agents": self._idle_count,
+                "idle_users": len(self._idle),
+                "agents_created": self.agents_created,
+                "avg_agent_construction_ms": round(
+                    self.agent_construction_seconds / self.agents_created * 1000, 2
+                ) if self.agents_created else 0.0,
+                "integrations_created": dict(self.integrations_created),
+                "avg_integration_construction_ms": round(
+                    self.integration_construction_seconds / sum(self.integrations_created.values()) * 1000, 2
+                ) if self.integrations_created else 0.0,
+                "lru_evictions": self.lru_evictions,
+                "idle_evictions": self.idle_evictions,
+                "max_agents": self.max_agents
+            }
+    
+    def _acquire(self, user_id: int) -> AutomationAgent:
+        self.evict_idle()
+        with self._lock:
+            self.leases += 1
+            self.in_use += 1
+            idle = self._idle.get(user_id)
+            if idle is not None and idle.agents:
+                self.hits += 1
+                self._idle_count -= 1
+                agent = idle.agents.pop()
+                if not idle.agents:
+                    del self._idle[user_id]
+                return agent
+        
+        started = time.perf_counter()
+        agent = AutomationAgent(None, user_id)
+        agent.integrations.on_create = self._record_integration
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.agents_created += 1
+            self.agent_construction_seconds += elapsed
+        logger.debug(f"Created agent for user {user_id} in {elapsed * 1000:.1f}ms")
+        return agent
+    
+    def _release(self, user_id: int, agent: AutomationAgent):
+        with self._lock:
+            self.in_use -= 1
+            idle = self._idle.setdefault(user_id, _IdleAgents())
+            idle.last_used = time.monotonic()
+            self._idle.move_to_end(user_id)
+            if len(idle.agents) >= self.max_per_user:
+                return
+            idle.agents.append(agent)
+            self._idle_count += 1
+            while self._idle_count > self.max_agents:
+                oldest, dropped = self._idle.popitem(last=False)
+                self._idle_count -= len(dropped.agents)
+                self.lru_evictions += len(dropped.agents)
+    
+    def _record_integration(self, service: ServiceType, seconds: float):
+        name = getattr(service, "value", str(service))
+        with self._lock:
+            self.integrations_created[name] = self.integrations_created.get(name, 0) + 1
+            self.integration_construction_seconds += seconds
+
+
+_agent_pool: Optional[AgentPool] = None
+_agent_pool_lock = threading.Lock()
+
+
+def get_agent_pool() -> AgentPool:
+    """Get the process-wide agent pool, creating it from settings."""
+    global _agent_pool
+    with _agent_pool_lock:
+        if _agent_pool is None:
+            _agent_pool = AgentPool()
+        return _agent_pool
@@ -0,0 +1,125 @@
+"""Run many commands of one user with bounded parallelism."""
+
+import asyncio
+import time
+from typing import Dict, List, Any, AsyncIterator, Optional
+
+from ..config import settings
+from ..database.connection import get_session
+from ..utils.logging import get_logger
+from .agent_pool import AgentPool, get_agent_pool
+from .concurrency import PRIORITY_BACKGROUND
+
+logger = get_logger(__name__)
+
+
+def _percentile(values: List[float], percentile: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(percentile * (len(ordered) - 1))))]
+
+
+class BatchRunner:
+    """
+    Executes a list of commands, at most ``concurrency`` at a time.
+    
+    Each command runs on its own pooled agent, so all of them share the
+    process-wide LLM clients and the user's warm integrations (and their
+    HTTP connection pools). Commands run at background LLM priority so a
+    large batch does not starve interactive requests.
+    
+    ``run`` yields one ``item`` event per command as soon as it finishes,
+    in completion order, and a final ``summary`` event with aggregate
+    timing and failure counts. A failing command never stops the batch.
+    """
+    
+    def __init__(self, agent_pool: Optional[AgentPool] = None, concurrency: Optional[int] = None):
+        self.agent_pool = agent_pool or get_agent_pool()
+        self.concurrency = max(1, concurrency if concurrency is not None else settings.batch_max_concurrency)
+    
+    async def run(self, user_id: int, commands: List[str]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Run ``commands`` for ``user_id``.
+        
+        Args:
+            user_id: User the commands run as
+            commands: Natural language commands; item events carry their index
+        
+        Yields:
+            ``item`` events as commands finish, then one ``summary`` event
+        """
+        started = time.perf_counter()
+        pending = iter(enumerate(commands))
+        results: asyncio.Queue = asyncio.Queue()
+        
+        async def worker():
+            for index, command in pending:
+                await results.put(await self._run_one(user_id, index, command))
+        
+        workers = [asyncio.create_task(worker()) for _ in range(min(self.concurrency, len(commands)))]
+        durations = []
+        failed = []
+        try:
+            for _ in range(len(commands)):
+                item = await results.get()
+                durations.append(item["duration_ms"])
+                if not item["success"]:
+                    failed.append(item["index"])
+                yield item
+        finally:
+            # Also reached when the consumer goes away mid-batch
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+        
+        elapsed = time.perf_counter() - started
+        p50 = _percentile(durations, 0.5)
+        p95 = _percentile(durations, 0.95)
+        logger.info(
+            f"Batch of {len(commands)} command(s) for user {user_id} finished in {elapsed:.2f}s "
+            f"({len(failed)} failed)"
+        )
+        yield {
+            "type": "summary",
+            "total": len(commands),
+            "succeeded": len(commands) - len(failed),
+            "failed": len(failed),
+            "failed_indexes": sorted(failed),
+            "concurrency": self.concurrency,
+            "duration_ms": round(elapsed * 1000, 1),
+            "commands_per_second": round(len(commands) / elapsed, 2) if elapsed else 0.0,
+            "avg_ms": round(sum(durations) / len(durations), 1) if durations else None,
+            "p50_ms": p50,
+            "p95_ms": p95,
+            "max_ms": max(durations) if durations else None
+        }
+    
+    async def _run_one(self, user_id: int, index: int, command: str) -> Dict[str, Any]:
+        started = time.perf_counter()
+        item: Dict[str, Any] = {"type": "item", "index": index, "command": command}
+        try:
+            with get_session() as session, self.agent_pool.lease(user_id, session) as agent:
+                agent.llm_priority = PRIORITY_BACKGROUND
+                response = await agent.execute_command(command)
+            function_results = (response.data or {}).get("function_results", [])
+            item.update({
+                "success": response.success,
+                "result": response.message,
+                "actions_taken": [result.get("function") for result in function_results],
+                "action_id": response.action_id,
+                "rollback_id": str(response.action_id) if response.rollback_available else None,
+                "error": None if response.success else response.message
+            })
+        except Exception as e:
+            logger.error(f"Batch command {index} failed: {e}")
+            item.update({
+                "success": False,
+                "result": None,
+                "actions_taken": [],
+                "action_id": None,
+                "rollback_id": None,
+                "error": str(e)
+            })
+        item["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        return item
@@ -0,0 +1,272 @@
+"""Local lexicon-based urgency and sentiment classification."""
+
+import math
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Any, Optional, Tuple
+
+from ..config import settings
+
+# Term weights; bigrams are matched before their individual words
+URGENCY_LEXICON: Dict[str, float] = {
+    "outage": 3.0, "emergency": 3.0, "sev1": 3.0, "sev0": 3.0, "p0": 3.0, "p1": 2.0,
+    "critical": 2.5, "urgent": 2.5, "urgently": 2.5, "incident": 2.5,
+    "asap": 2.0, "immediately": 2.0, "immediate": 2.0, "blocker": 2.0, "blocking": 1.5,
+    "down": 1.5, "crash": 2.0, "crashed": 2.0, "crashing": 2.0, "failure": 2.0,
+    "failing": 2.0, "failed": 1.5, "broken": 1.5, "alert": 1.5, "escalate": 1.5,
+    "escalated": 1.5, "degraded": 1.5, "unavailable": 2.0, "unresponsive": 2.0,
+    "error": 1.0, "errors": 1.0, "timeout": 1.0, "timeouts": 1.0, "fire": 1.0,
+    "bug": 0.7, "problem": 0.7, "issue": 0.5, "help": 0.5,
+    "resolved": -2.0, "fixed": -1.5, "fyi": -1.0, "whenever": -1.5, "eventually": -1.0,
+    "production down": 3.0, "prod down": 3.0, "site down": 3.0, "data loss": 3.0,
+    "right now": 1.0, "high priority": 2.0, "top priority": 2.0,
+    "low priority": -2.0, "no rush": -2.5, "no hurry": -2.5, "not urgent": -2.5,
+}
+
+SENTIMENT_LEXICON: Dict[str, float] = {
+    "excellent": 3.0, "amazing": 3.0, "awesome": 2.5, "fantastic": 2.5, "love": 2.5,
+    "great": 2.0, "happy": 2.0, "glad": 1.5, "thanks": 1.5, "thank": 1.5, "nice": 1.5,
+    "good": 1.0, "works": 1.0, "working": 0.5, "fixed": 1.0, "resolved": 1.0,
+    "helpful": 1.5, "appreciate": 2.0, "smooth": 1.5, "fast": 1.0, "win": 1.5,
+    "terrible": -3.0, "awful": -3.0, "horrible": -3.0, "hate": -3.0, "worst": -3.0,
+    "angry": -2.5, "furious": -3.0, "frustrated": -2.0, "frustrating": -2.0,
+    "annoying": -2.0, "bad": -2.0, "broken": -1.5, "fail": -1.5, "failed": -1.5,
+    "failure": -1.5, "crash": -1.5, "slow": -1.0, "bug": -1.0, "error": -1.0,
+    "outage": -2.0, "unhappy": -2.0, "disappointed": -2.0, "problem": -1.0, "sad": -2.0,
+    "well done": 2.5, "thank you": 2.0, "not working": -2.0, "doesn't work": -2.0,
+}
+
+NEGATIONS = frozenset({
+    "not", "no", "never", "none", "nothing", "without", "hardly", "neither", "nor",
+    "don't", "doesn't", "didn't", "isn't", "wasn't", "aren't", "weren't", "can't",
+    "cannot", "won't", "wouldn't", "shouldn't", "haven't", "hasn't",
+})
+INTENSIFIERS: Dict[str, float] = {
+    "very": 1.5, "extremely": 1.8, "really": 1.3, "super": 1.5, "completely": 1.6,
+    "totally": 1.5, "so": 1.3, "absolutely": 1.6, "incredibly": 1.7,
+}
+NEGATION_SCOPE = 2  # Words after a negation whose polarity is flipped
+NEGATION_FACTOR = -0.6
+CAPS_FACTOR = 1.3
+EXCLAMATION_BOOST = 0.3  # Urgency added per "!", capped at three
+
+URGENCY_THRESHOLD = 2.0
+URGENCY_CONFIDENCE_SCALE = 1.25
+SENTIMENT_NORMALIZER = 15.0
+SENTIMENT_NEUTRAL_BAND = 0.05
+NO_SIGNAL_CONFIDENCE = 0.0  # No lexicon term matched: always escalate to the LLM
+
+_TOKEN_PATTERN = re.compile(r"[A-Za-z0-9]+(?:'[A-Za-z]+)?|!")
+
+
+@dataclass
+class ClassificationResult:
+    """Outcome of a local classification."""
+    analysis_type: str
+    label: str
+    score: float
+    confidence: float
+    matched_terms: List[str] = field(default_factory=list)
+    flagged_lines: List[int] = field(default_factory=list)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "label": self.label,
+            "score": round(self.score, 3),
+            "confidence": round(self.confidence, 3),
+            "matched_terms": self.matched_terms,
+            "flagged_lines": self.flagged_lines
+        }
+    
+    def describe(self) -> str:
+        terms = ", ".join(self.matched_terms[:10]) or "no indicative terms"
+        return f"{self.label.capitalize()} (confidence {self.confidence:.2f}; matched: {terms})"
+
+
+class LexiconClassifier:
+    """
+    Weighted-lexicon classifier for ``urgency`` and ``sentiment``.
+    
+    Text is scored line by line (one Slack message per line) in a single
+    pass over the batch: each line is tokenized once and looked up against
+    both lexicons, with negations flipping the polarity of the next few
+    words and intensifiers, capitals and exclamation marks scaling weights.
+    Line scores are then aggregated: the most urgent line decides urgency,
+    and sentiment is the mean over lines that carried any signal.
+    
+    A confidence in [0, 1] is reported alongside each label; callers
+    escalate to the LLM when it falls below ``confidence_threshold``.
+    """
+    
+    SUPPORTED_TYPES = ("urgency", "sentiment")
+    
+    def __init__(self, confidence_threshold: Optional[float] = None):
+        self.confidence_threshold = (
+            confidence_threshold if confidence_threshold is not None
+            else settings.local_classifier_confidence_threshold
+        )
+        self.lexicons = {"urgency": URGENCY_LEXICON, "sentiment": SENTIMENT_LEXICON}
+        self._counters = {
+            analysis_type: {"requests": 0, "handled_locally": 0, "escalated": 0}
+            for analysis_type in self.SUPPORTED_TYPES
+        }
+    
+    def supports(self, analysis_type: str) -> bool:
+        return analysis_type in self.lexicons
+    
+    def classify(self, text: str, analysis_type: str) -> ClassificationResult:
+        """Classify ``text`` (one message per line) as a single document."""
+        lines = [line for line in text.splitlines() if line.strip()] or [text]
+        line_scores = self.score_batch(lines, analysis_type)
+        if analysis_type == "urgency":
+            return self._aggregate_urgency(line_scores)
+        return self._aggregate_sentiment(line_scores)
+    
+    def score_batch(self, texts: List[str], analysis_type: str) -> List[Tuple[float, List[str]]]:
+        """Raw ``(score, matched terms)`` for each text in the batch."""
+        lexicon = self.lexicons[analysis_type]
+        return [self._score(text, lexicon, analysis_type == "urgency") for text in texts]
+    
+    def should_escalate(self, result: ClassificationResult) -> bool:
+        """Whether a result is too uncertain to return without the LLM."""
+        return result.confidence < self.confidence_threshold
+    
+    def record(self, analysis_type: str, escalated: bool):
+        """Count one request for the escalation-rate metric."""
+        counters = self._counters[analysis_type]
+        counters["requests"] += 1
+        counters["escalated" if escalated else "handled_locally"] += 1
+    
+    def stats(self) -> Dict[str, Any]:
+        requests = sum(counters["requests"] for counters in self._counters.values())
+        escalated = sum(counters["escalated"] for counters in self._counters.values())
+        return {
+            "confidence_threshold": self.confidence_threshold,
+            "requests": requests,
+            "escalated": escalated,
+            "escalation_rate": round(escalated / requests, 4) if requests else 0.0,
+            "by_type": {
+                analysis_type: {
+                    **counters,
+                    "escalation_rate": (
+                        round(counters["escalated"] / counters["requests"], 4) if counters["requests"] else 0.0
+                    )
+                }
+                for analysis_type, counters in self._counters.items()
+            }
+        }
+    
+    @staticmethod
+    def _score(text: str, lexicon: Dict[str, float], count_exclamations: bool) -> Tuple[float, List[str]]:
+        raw_tokens = _TOKEN_PATTERN.findall(text)
+        tokens = [token.lower() for token in raw_tokens]
+        score = 0.0
+        matched: List[str] = []
+        negated_until = -1
+        multiplier = 1.0
+        exclamations = 0
+        index = 0
+        
+        while index < len(tokens):
+            token = tokens[index]
+            if token == "!":
+                exclamations += 1
+                index += 1
+                continue
+            
+            bigram = f"{token} {tokens[index + 1]}" if index + 1 < len(tokens) else None
+            if bigram in lexicon:
+                term, weight, width = bigram, lexicon[bigram], 2
+            elif token in lexicon:
+                term, weight, width = token, lexicon[token], 1
+            else:
+                if token in NEGATIONS:
+                    negated_until = index + NEGATION_SCOPE
+                multiplier = INTENSIFIERS.get(token, 1.0)
+                index += 1
+                continue
+            
+            weight *= multiplier
+            if raw_tokens[index].isupper() and len(raw_tokens[index]) > 1:
+                weight *= CAPS_FACTOR
+            if index <= negated_until and not _is_negated_phrase(term):
+                weight *= NEGATION_FACTOR
+                term = f"not {term}"
+            score += weight
+            matched.append(term)
+            multiplier = 1.0
+            index += width
+        
+        if count_exclamations and score > 0:
+            score += EXCLAMATION_BOOST * min(exclamations, 3)
+        return score, matched
+    
+    def _aggregate_urgency(self, line_scores: List[Tuple[float, List[str]]]) -> ClassificationResult:
+        top_score = max(score for score, _ in line_scores)
+        flagged = [index for index, (score, _) in enumerate(line_scores) if score >= URGENCY_THRESHOLD]
+        matched = _unique(term for _, terms in line_scores for term in terms)
+        margin = top_score - URGENCY_THRESHOLD
+        if matched:
+            # Confidence grows with distance from the decision boundary
+            confidence = 1.0 - math.exp(-abs(margin) / URGENCY_CONFIDENCE_SCALE)
+        else:
+            # An empty score is absence of evidence, not evidence of calm
+            confidence = NO_SIGNAL_CONFIDENCE
+        return ClassificationResult(
+            analysis_type="urgency",
+            label="urgent" if margin >= 0 else "not urgent",
+            score=top_score,
+            confidence=confidence,
+            matched_terms=matched,
+            flagged_lines=flagged
+        )
+    
+    def _aggregate_sentiment(self, line_scores: List[Tuple[float, List[str]]]) -> ClassificationResult:
+        signals = [score for score, terms in line_scores if terms]
+        matched = _unique(term for _, terms in line_scores for term in terms)
+        if not signals:
+            return ClassificationResult("sentiment", "neutral", 0.0, NO_SIGNAL_CONFIDENCE)
+        
+        compounds = [score / math.sqrt(score * score + SENTIMENT_NORMALIZER) for score in signals]
+        compound = sum(compounds) / len(compounds)
+        if compound >= SENTIMENT_NEUTRAL_BAND:
+            label = "positive"
+        elif compound <= -SENTIMENT_NEUTRAL_BAND:
+            label = "negative"
+        else:
+            label = "neutral"
+        
+        confidence = 0.5 + abs(compound) / 2
+        positive = sum(value for value in compounds if value > 0)
+        negative = -sum(value for value in compounds if value < 0)
+        if positive and negative:
+            # Mixed messages are exactly where the LLM earns its keep
+            confidence *= 1.0 - 0.5 * min(positive, negative) / max(positive, negative)
+        flagged = [
+            index for index, (score, terms) in enumerate(line_scores)
+            if terms and (score > 0) == (label == "positive") and label != "neutral"
+        ]
+        return ClassificationResult("sentiment", label, compound, confidence, matched, flagged)
+
+
+def _is_negated_phrase(term: str) -> bool:
+    """Lexicon phrases that already encode a negation ("not urgent", "no rush")."""
+    return term.split(" ", 1)[0] in NEGATIONS
+
+
+def _unique(terms) -> List[str]:
+    return list(dict.fromkeys(terms))
+
+
+_classifier: Optional[LexiconClassifier] = None
+_classifier_lock = threading.Lock()
+
+
+def get_local_classifier() -> LexiconClassifier:
+    """Get the process-wide lexicon classifier."""
+    global _classifier
+    with _classifier_lock:
+        if _classifier is None:
+            _classifier = LexiconClassifier()
+        return _classifier
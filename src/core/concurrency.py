@@ -0,0 +1,255 @@
+"""Adaptive (AIMD) concurrency limiting for upstream LLM requests."""
+
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Any, Optional, Tuple
+
+from ..config import settings
+from ..utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Waiter priorities; higher values are admitted first
+PRIORITY_BACKGROUND = 0
+PRIORITY_INTERACTIVE = 10
+
+# Successes observed before latency may shrink the limit
+LATENCY_WARMUP_SAMPLES = 20
+
+
+class Permit:
+    """A held concurrency slot; report the outcome before it is released."""
+    
+    def __init__(self, limiter: "AdaptiveConcurrencyLimiter", wait_time: float):
+        self.limiter = limiter
+        self.wait_time = wait_time
+        self.started = time.monotonic()
+        self.latency: Optional[float] = None
+        self.outcome = "success"
+        self.retry_after: Optional[float] = None
+    
+    def mark_first_byte(self):
+        """Measure latency up to now (used for streams) instead of at release."""
+        if self.latency is None:
+            self.latency = time.monotonic() - self.started
+    
+    def rate_limited(self, retry_after: Optional[float] = None):
+        self.outcome = "rate_limited"
+        self.retry_after = retry_after
+    
+    def failed(self):
+        self.outcome = "error"
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Additive-increase / multiplicative-decrease concurrency limiter.
+    
+    Each success grows the limit by roughly one slot per limit's worth of
+    requests. A 429 halves it and pauses admission for ``Retry-After``.
+    A short-run latency average rising well above the long-run average
+    shrinks it gently, but never below ``latency_floor``: only rate limits
+    take the limit down to ``min_limit``. Waiters queue by priority, then
+    arrival order.
+    """
+    
+    def __init__(
+        self,
+        name: str,
+        initial_limit: int = 8,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        latency_tolerance: float = 2.0,
+        backoff_ratio: float = 0.5,
+        latency_backoff_ratio: float = 0.9,
+        latency_floor: Optional[int] = None
+    ):
+        self.name = name
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        floor = latency_floor if latency_floor is not None else initial_limit // 2
+        self.latency_floor = max(min_limit, min(floor, initial_limit))
+        self.latency_tolerance = latency_tolerance
+        self.backoff_ratio = backoff_ratio
+        self.latency_backoff_ratio = latency_backoff_ratio
+        
+        self.in_flight = 0
+        self._queue: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._paused_until = 0.0
+        self._wake_handle: Optional[asyncio.TimerHandle] = None
+        self._last_decrease = 0.0
+        self.baseline_latency: Optional[float] = None
+        self.smoothed_latency: Optional[float] = None
+        self.latency_samples = 0
+        
+        self.acquired = 0
+        self.rate_limited = 0
+        self.latency_decreases = 0
+        self.avg_wait = 0.0
+        self.max_wait = 0.0
+    
+    @asynccontextmanager
+    async def slot(self, priority: int = PRIORITY_INTERACTIVE) -> AsyncIterator[Permit]:
+        """Hold a concurrency slot for the duration of the block."""
+        wait_time = await self.acquire(priority)
+        permit = Permit(self, wait_time)
+        try:
+            yield permit
+        except asyncio.CancelledError:
+            permit.outcome = "cancelled"
+            raise
+        except Exception:
+            if permit.outcome == "success":
+                permit.failed()
+            raise
+        finally:
+            latency = permit.latency if permit.latency is not None else time.monotonic() - permit.started
+            self.release(latency, permit.outcome, permit.retry_after)
+    
+    async def acquire(self, priority: int = PRIORITY_INTERACTIVE) -> float:
+        """Wait for a slot; returns seconds spent queued."""
+        started = time.monotonic()
+        if not self._queue and self._has_capacity():
+            self.in_flight += 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._queue, (-priority, next(self._sequence), future))
+            self._schedule_wake()
+            try:
+                await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    # The slot was granted just as we were cancelled
+                    self.in_flight -= 1
+                    self._wake()
+                else:
+                    future.cancel()
+                raise
+        
+        wait_time = time.monotonic() - started
+        self.acquired += 1
+        self.avg_wait += 0.1 * (wait_time - self.avg_wait)
+        self.max_wait = max(self.max_wait, wait_time)
+        return wait_time
+    
+    def release(self, latency: Optional[float], outcome: str = "success", retry_after: Optional[float] = None):
+        """Return a slot and adapt the limit to the observed outcome."""
+        self.in_flight -= 1
+        now = time.monotonic()
+        
+        if outcome == "rate_limited":
+            self.rate_limited += 1
+            if retry_after:
+                self._paused_until = max(self._paused_until, now + retry_after)
+            self._decrease(self.backoff_ratio, now, self.min_limit)
+            logger.warning(f"LLM limiter {self.name}: rate limited, limit now {int(self.limit)}")
+        elif outcome == "success" and latency is not None:
+            self._observe_latency(latency)
+            # Floor the baseline so near-instant responses don't make every
+            # ordinary request look like latency inflation
+            threshold = max(self.baseline_latency, 0.01) * self.latency_tolerance
+            if self.latency_samples >= LATENCY_WARMUP_SAMPLES and self.smoothed_latency > threshold:
+                if self._decrease(self.latency_backoff_ratio, now, self.latency_floor):
+                    self.latency_decreases += 1
+            else:
+                self.limit = min(self.max_limit, self.limit + 1.0 / max(self.limit, 1.0))
+        
+        self._wake()
+    
+    def stats(self) -> Dict[str, Any]:
+        paused_for = max(0.0, self._paused_until - time.monotonic())
+        return {
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "queue_depth": sum(1 for _, _, future in self._queue if not future.done()),
+            "acquired": self.acquired,
+            "avg_wait_ms": round(self.avg_wait * 1000, 1),
+            "max_wait_ms": round(self.max_wait * 1000, 1),
+            "rate_limited": self.rate_limited,
+            "latency_decreases": self.latency_decreases,
+            "baseline_latency_ms": round(self.baseline_latency * 1000, 1) if self.baseline_latency else None,
+            "smoothed_latency_ms": round(self.smoothed_latency * 1000, 1) if self.smoothed_latency else None,
+            "latency_floor": self.latency_floor,
+            "paused_for_ms": round(paused_for * 1000, 1)
+        }
+    
+    def _has_capacity(self) -> bool:
+        return self.in_flight < int(self.limit) and time.monotonic() >= self._paused_until
+    
+    def _decrease(self, ratio: float, now: float, floor: int) -> bool:
+        # One decrease per latency window (at least a second), so a burst of
+        # failures from the same overloaded moment doesn't collapse the limit
+        window = max(self.baseline_latency or 0.0, 1.0)
+        if now - self._last_decrease < window or self.limit <= floor:
+            return False
+        self._last_decrease = now
+        self.limit = max(float(floor), self.limit * ratio)
+        return True
+    
+    def _observe_latency(self, latency: float):
+        self.latency_samples += 1
+        if self.smoothed_latency is None:
+            self.smoothed_latency = latency
+            self.baseline_latency = latency
+            return
+        self.smoothed_latency += 0.2 * (latency - self.smoothed_latency)
+        # The baseline is a long-run average rather than the fastest response
+        # seen, so a normal mix of short and long completions stays under the
+        # threshold while a sustained rise still shows up in the short run
+        self.baseline_latency += 0.01 * (latency - self.baseline_latency)
+    
+    def _wake(self):
+        while self._queue and self._has_capacity():
+            _, _, future = heapq.heappop(self._queue)
+            if future.done():
+                continue
+            self.in_flight += 1
+            future.set_result(None)
+        self._schedule_wake()
+    
+    def _schedule_wake(self):
+        """Re-check the queue once a Retry-After pause expires."""
+        if not self._queue or self._wake_handle is not None:
+            return
+        delay = self._paused_until - time.monotonic()
+        if delay <= 0:
+            return
+        
+        def wake():
+            self._wake_handle = None
+            self._wake()
+        
+        self._wake_handle = asyncio.get_running_loop().call_later(delay, wake)
+
+
+_limiters: Dict[str, AdaptiveConcurrencyLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(name: str) -> AdaptiveConcurrencyLimiter:
+    """Get the process-wide limiter for a provider, creating it from settings."""
+    with _limiters_lock:
+        limiter = _limiters.get(name)
+        if limiter is None:
+            limiter = AdaptiveConcurrencyLimiter(
+                name,
+                initial_limit=settings.llm_concurrency_initial,
+                min_limit=settings.llm_concurrency_min,
+                max_limit=settings.llm_concurrency_max,
+                latency_tolerance=settings.llm_concurrency_latency_tolerance,
+                latency_floor=settings.llm_concurrency_latency_floor
+            )
+            _limiters[name] = limiter
+        return limiter
+
+
+def limiter_stats() -> Dict[str, Any]:
+    """Stats for every provider limiter."""
+    with _limiters_lock:
+        return {name: limiter.stats() for name, limiter in _limiters.items()}
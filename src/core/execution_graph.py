@@ -0,0 +1,254 @@
+"""Dependency-aware execution of the function calls in one agent turn."""
+
+import asyncio
+import json
+import re
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set
+
+from ..config import settings
+from ..utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+# "{{call_2}}" or "{{call_2.key.0.field}}" inside a string argument
+REFERENCE_PATTERN = re.compile(r"\{\{\s*(call_\d+)((?:\.[\w-]+)*)\s*\}\}")
+REF_KEY = "$ref"
+
+STATUS_SUCCESS = "success"
+STATUS_FAILED = "failed"
+STATUS_CANCELLED = "cancelled"
+STATUS_SKIPPED = "skipped"  # Deliberately not run (e.g. a workflow condition was false)
+
+
+class CallReferenceError(ValueError):
+    """A call argument refers to an unknown call or a missing field."""
+
+
+@dataclass
+class GraphNode:
+    """One function call in the execution graph."""
+    node_id: str
+    position: int
+    function_call: Dict[str, Any]
+    depends_on: List[str]
+    level: int
+    explicit: bool = False
+    result: Optional[Dict[str, Any]] = None
+    task: Optional[asyncio.Task] = field(default=None, repr=False)
+    
+    @property
+    def status(self) -> Optional[str]:
+        return self.result.get("status") if self.result else None
+
+
+NodeExecutor = Callable[[GraphNode, Dict[str, Any]], Awaitable[Dict[str, Any]]]
+NodeSkipper = Callable[[GraphNode, str, str], Dict[str, Any]]
+# Names of the functions whose output a function usually acts on
+ConsumesLookup = Callable[[str], Iterable[str]]
+
+
+class ExecutionGraph:
+    """
+    DAG of the function calls the model returned in one turn.
+    
+    Nodes are added as calls arrive from the stream and start as soon as
+    their dependencies have succeeded, with at most ``max_parallelism``
+    running at once. Dependencies come from explicit references in the
+    arguments (``"{{call_1.field}}"`` or ``{"$ref": "call_1.field"}``, where
+    ``call_N`` is the N-th call of the turn) or, when a call has none, are
+    inferred from ``consumes``: the call waits for every earlier call to a
+    function it consumes. References may only point at earlier calls, so
+    the graph is acyclic by construction.
+    
+    When a node fails, everything downstream of it is skipped and reported
+    as cancelled instead of running on missing inputs. ``skipper`` records
+    such nodes (and nodes with invalid references, reported as failed)
+    without executing them. Nodes downstream of deliberately skipped nodes
+    are skipped too, not cancelled.
+    
+    Callers that already know the graph (compiled workflows) pass
+    ``depends_on`` and ``node_id`` to ``add`` instead of relying on
+    references or inference.
+    """
+    
+    def __init__(
+        self,
+        executor: NodeExecutor,
+        skipper: NodeSkipper,
+        consumes: Optional[ConsumesLookup] = None,
+        max_parallelism: Optional[int] = None,
+        infer_dependencies: Optional[bool] = None,
+        base_level: int = 0,
+        id_prefix: str = ""
+    ):
+        self.executor = executor
+        self.skipper = skipper
+        self.consumes = consumes
+        self.infer_dependencies = (
+            infer_dependencies if infer_dependencies is not None else settings.execution_graph_infer_dependencies
+        )
+        self.base_level = base_level
+        self.id_prefix = id_prefix
+        self.nodes: List[GraphNode] = []
+        self._by_id: Dict[str, GraphNode] = {}
+        self._semaphore = asyncio.Semaphore(
+            max_parallelism if max_parallelism is not None else settings.execution_graph_max_parallelism
+        )
+    
+    def add(
+        self,
+        function_call: Dict[str, Any],
+        depends_on: Optional[List[str]] = None,
+        node_id: Optional[str] = None
+    ) -> GraphNode:
+        """Add the next call of the turn and schedule it."""
+        position = len(self.nodes)
+        local_id = node_id or f"call_{position + 1}"
+        references = sorted(find_references(function_call.get("arguments", {}))) if depends_on is None else []
+        explicit = depends_on is not None or bool(references)
+        
+        if depends_on is not None:
+            depends_on = list(depends_on)
+        elif references:
+            depends_on = references
+        elif self.infer_dependencies and self.consumes is not None:
+            consumes = set(self.consumes(function_call["name"]))
+            depends_on = [node.node_id for node in self.nodes if node.function_call["name"] in consumes]
+        else:
+            depends_on = []
+        
+        known = [self._by_id[dep] for dep in depends_on if dep in self._by_id]
+        node = GraphNode(
+            node_id=local_id,
+            position=position,
+            function_call=function_call,
+            depends_on=depends_on,
+            level=max((dep.level + 1 for dep in known), default=self.base_level),
+            explicit=explicit
+        )
+        self.nodes.append(node)
+        self._by_id[local_id] = node
+        node.task = asyncio.create_task(self._run(node))
+        return node
+    
+    def qualified_id(self, node_id: str) -> str:
+        """Node id unique within the whole action (prefixed with the turn)."""
+        return f"{self.id_prefix}{node_id}"
+    
+    @property
+    def max_level(self) -> int:
+        return max((node.level for node in self.nodes), default=self.base_level - 1)
+    
+    def cancel(self):
+        """Cancel every node that has not finished."""
+        for node in self.nodes:
+            if node.task is not None and not node.task.done():
+                node.task.cancel()
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Graph shape, as persisted for replay and rollback ordering."""
+        return {
+            "nodes": [
+                {
+                    "node_id": self.qualified_id(node.node_id),
+                    "function": node.function_call["name"],
+                    "depends_on": [self.qualified_id(dep) for dep in node.depends_on],
+                    "level": node.level,
+                    "status": node.status
+                }
+                for node in self.nodes
+            ]
+        }
+    
+    async def _run(self, node: GraphNode) -> Dict[str, Any]:
+        unknown = [dep for dep in node.depends_on if dep not in self._by_id or self._by_id[dep].position >= node.position]
+        if unknown:
+            node.result = self.skipper(
+                node, f"References unknown or later call(s): {', '.join(unknown)}", STATUS_FAILED
+            )
+            return node.result
+        
+        dependencies = [self._by_id[dep] for dep in node.depends_on]
+        if dependencies:
+            await asyncio.wait([dep.task for dep in dependencies])
+        
+        failed = [dep.node_id for dep in dependencies if dep.status not in (STATUS_SUCCESS, STATUS_SKIPPED)]
+        skipped = [dep.node_id for dep in dependencies if dep.status == STATUS_SKIPPED]
+        if skipped and not failed:
+            node.result = self.skipper(node, f"Dependency skipped: {', '.join(skipped)}", STATUS_SKIPPED)
+            return node.result
+        if failed:
+            logger.warning(f"Skipping {node.node_id} ({node.function_call['name']}): {', '.join(failed)} did not succeed")
+            node.result = self.skipper(node, f"Dependency failed: {', '.join(failed)}", STATUS_CANCELLED)
+            return node.result
+        
+        try:
+            arguments = resolve_references(
+                node.function_call.get("arguments", {}),
+                {dep.node_id: (dep.result or {}).get("result") for dep in dependencies}
+            )
+        except CallReferenceError as e:
+            node.result = self.skipper(node, str(e), STATUS_FAILED)
+            return node.result
+        
+        async with self._semaphore:
+            node.result = await self.executor(node, arguments)
+        return node.result
+
+
+def find_references(value: Any) -> Set[str]:
+    """Ids of the calls referenced anywhere inside an argument value."""
+    found: Set[str] = set()
+    if isinstance(value, str):
+        found.update(match.group(1) for match in REFERENCE_PATTERN.finditer(value))
+    elif isinstance(value, dict):
+        if isinstance(value.get(REF_KEY), str) and len(value) == 1:
+            found.add(value[REF_KEY].split(".", 1)[0])
+        else:
+            for item in value.values():
+                found |= find_references(item)
+    elif isinstance(value, list):
+        for item in value:
+            found |= find_references(item)
+    return found
+
+
+def resolve_references(value: Any, outputs: Dict[str, Any]) -> Any:
+    """
+    Substitute call outputs into an argument value.
+    
+    ``{"$ref": "call_1.path"}`` is replaced by the referenced value as is;
+    ``"{{call_1.path}}"`` inside a string is rendered as text (JSON for
+    anything that is not already a string).
+    """
+    if isinstance(value, str):
+        return REFERENCE_PATTERN.sub(
+            lambda match: _render(_lookup(outputs, match.group(1), match.group(2))), value
+        )
+    if isinstance(value, dict):
+        if isinstance(value.get(REF_KEY), str) and len(value) == 1:
+            node_id, _, path = value[REF_KEY].partition(".")
+            return _lookup(outputs, node_id, f".{path}" if path else "")
+        return {key: resolve_references(item, outputs) for key, item in value.items()}
+    if isinstance(value, list):
+        return [resolve_references(item, outputs) for item in value]
+    return value
+
+
+def _lookup(outputs: Dict[str, Any], node_id: str, path: str) -> Any:
+    if node_id not in outputs:
+        raise CallReferenceError(f"Unknown call reference: {node_id}")
+    current = outputs[node_id]
+    for part in filter(None, path.split(".")):
+        if isinstance(current, dict) and part in current:
+            current = current[part]
+        elif isinstance(current, list) and part.isdigit() and int(part) < len(current):
+            current = current[int(part)]
+        else:
+            raise CallReferenceError(f"{node_id} has no field {path.lstrip('.')}")
+    return current
+
+
+def _render(value: Any) -> str:
+    return value if isinstance(value, str) else json.dumps(value, default=str)
@@ -0,0 +1,243 @@
+"""Micro-batching of small analysis requests into single LLM calls."""
+
+import asyncio
+import json
+import threading
+from typing import Dict, List, Any, Optional, Tuple
+
+from ..config import settings
+from ..utils.logging import get_logger
+from .concurrency import PRIORITY_INTERACTIVE
+from .llm_cache import LLMResponseCache, canonical_request_key, get_response_cache
+from .llm_client import BaseLLMClient, LLMResponse, find_json_object_end
+from .tokens import PromptBudget, count_tokens
+
+logger = get_logger(__name__)
+
+BATCH_INSTRUCTIONS = (
+    "You will receive a JSON array of texts, each with an integer \"id\". "
+    "Apply the task above to each text independently and keep each result concise. "
+    "Respond with only a JSON object of the form "
+    "{\"results\": [{\"id\": <id>, \"result\": \"<result for that text>\"}]} "
+    "containing exactly one entry per id."
+)
+# JSON framing around each text in the batched prompt
+ITEM_OVERHEAD_TOKENS = 8
+ANALYSIS_TEMPERATURE = 0.1
+
+
+def item_messages(prompt: str, text: str) -> List[Dict[str, str]]:
+    """The single-text analysis request; batched items are cached under its key."""
+    return [{"role": "system", "content": f"{prompt}\n\nText to analyze: {text}"}]
+
+
+class _Batch:
+    """Analysis requests of one type collected during a batching window."""
+    
+    def __init__(self, client: BaseLLMClient, prompt: str):
+        self.client = client
+        self.prompt = prompt
+        self.items: List[Tuple[str, Optional[str], asyncio.Future]] = []
+        self.tokens = 0
+        self.priority = PRIORITY_INTERACTIVE
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class AnalysisBatcher:
+    """
+    Collects ``analyze_text`` requests of the same analysis type for a short
+    window and sends them as one structured prompt.
+    
+    A batch is flushed when the window expires, when it reaches
+    ``max_items`` or when the next text would exceed the token budget. The
+    model answers with per-item results which are fanned back out to the
+    waiting callers; items missing from (or unparseable in) the batched
+    answer are retried individually.
+    
+    Each item is looked up in the response cache under the key of its own
+    single-text request before it joins a batch, and its result is stored
+    under that key afterwards, so batched and unbatched analyses of the
+    same text share cache entries.
+    """
+    
+    def __init__(
+        self,
+        window_ms: Optional[float] = None,
+        max_items: Optional[int] = None,
+        max_tokens: Optional[int] = None,
+        cache: Optional[LLMResponseCache] = None
+    ):
+        self.window = (window_ms if window_ms is not None else settings.llm_batch_window_ms) / 1000
+        self.max_items = max_items if max_items is not None else settings.llm_batch_max_items
+        self.max_tokens = max_tokens if max_tokens is not None else settings.llm_batch_max_tokens
+        if cache is None and settings.llm_cache_enabled and ANALYSIS_TEMPERATURE <= settings.llm_cache_max_temperature:
+            cache = get_response_cache()
+        self.cache = cache
+        self._batches: Dict[Tuple[int, str], _Batch] = {}
+        self._running: set = set()
+        
+        self.requests = 0
+        self.cache_hits = 0
+        self.batches = 0
+        self.batched_requests = 0
+        self.individual_retries = 0
+        self.parse_failures = 0
+    
+    async def analyze(
+        self,
+        client: BaseLLMClient,
+        analysis_type: str,
+        prompt: str,
+        text: str,
+        priority: int = PRIORITY_INTERACTIVE
+    ) -> str:
+        """Queue ``text`` for analysis and wait for its result."""
+        self.requests += 1
+        cache_key = None
+        if self.cache is not None:
+            cache_key = canonical_request_key(
+                client.model, item_messages(prompt, text), None, ANALYSIS_TEMPERATURE, settings.llm_max_tokens
+            )
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                self.cache_hits += 1
+                return cached.content
+        
+        key = (id(client), analysis_type)
+        text_tokens = count_tokens(text, client.model) + ITEM_OVERHEAD_TOKENS
+        instructions = [{"role": "system", "content": f"{prompt}\n\n{BATCH_INSTRUCTIONS}"}]
+        token_budget = min(self.max_tokens, PromptBudget(client.model).remaining(instructions))
+        
+        batch = self._batches.get(key)
+        if batch is not None and batch.items and batch.tokens + text_tokens > token_budget:
+            self._flush(key)
+            batch = None
+        if batch is None:
+            batch = _Batch(client, prompt)
+            self._batches[key] = batch
+            batch.timer = asyncio.get_running_loop().call_later(self.window, self._flush, key)
+        
+        future = asyncio.get_running_loop().create_future()
+        batch.items.append((text, cache_key, future))
+        batch.tokens += text_tokens
+        batch.priority = max(batch.priority, priority)
+        
+        if len(batch.items) >= self.max_items or batch.tokens >= token_budget:
+            self._flush(key)
+        
+        return await future
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "cache_hits": self.cache_hits,
+            "batches": self.batches,
+            "batched_requests": self.batched_requests,
+            "avg_batch_size": round(self.batched_requests / self.batches, 2) if self.batches else 0.0,
+            "round_trips_saved": max(0, self.batched_requests - self.batches - self.individual_retries),
+            "individual_retries": self.individual_retries,
+            "parse_failures": self.parse_failures,
+            "pending": sum(len(batch.items) for batch in self._batches.values())
+        }
+    
+    def _flush(self, key: Tuple[int, str]):
+        batch = self._batches.pop(key, None)
+        if batch is None:
+            return
+        if batch.timer is not None:
+            batch.timer.cancel()
+        task = asyncio.ensure_future(self._run(batch))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+    
+    async def _run(self, batch: _Batch):
+        items = [item for item in batch.items if not item[2].done()]
+        if not items:
+            return
+        
+        try:
+            if len(items) == 1:
+                results = {0: await self._analyze_one(batch, items[0][0])}
+            else:
+                self.batches += 1
+                self.batched_requests += len(items)
+                results = await self._analyze_batch(batch, [text for text, _, _ in items])
+                missing = [index for index in range(len(items)) if index not in results]
+                if missing:
+                    self.individual_retries += len(missing)
+                    retried = await asyncio.gather(*(self._analyze_one(batch, items[index][0]) for index in missing))
+                    results.update(zip(missing, retried))
+        except Exception as e:
+            for _, _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        for index, (_, cache_key, future) in enumerate(items):
+            if cache_key is not None:
+                self.cache.set(cache_key, LLMResponse(results[index]))
+            if not future.done():
+                future.set_result(results[index])
+    
+    async def _analyze_one(self, batch: _Batch, text: str) -> str:
+        response = await batch.client.chat_completion(
+            messages=item_messages(batch.prompt, text),
+            temperature=ANALYSIS_TEMPERATURE,
+            max_tokens=settings.llm_max_tokens,
+            priority=batch.priority
+        )
+        return response.content
+    
+    async def _analyze_batch(self, batch: _Batch, texts: List[str]) -> Dict[int, str]:
+        response = await batch.client.chat_completion(
+            messages=[
+                {"role": "system", "content": f"{batch.prompt}\n\n{BATCH_INSTRUCTIONS}"},
+                {"role": "user", "content": json.dumps([{"id": index, "text": text} for index, text in enumerate(texts)])}
+            ],
+            temperature=ANALYSIS_TEMPERATURE,
+            max_tokens=settings.llm_max_tokens,
+            priority=batch.priority
+        )
+        results = self._parse_results(response.content or "", len(texts))
+        if len(results) < len(texts):
+            self.parse_failures += 1
+            logger.warning(f"Batched analysis returned {len(results)} of {len(texts)} results")
+        return results
+    
+    @staticmethod
+    def _parse_results(content: str, count: int) -> Dict[int, str]:
+        """Extract ``{id: result}`` from the model's JSON answer, ignoring junk."""
+        start = content.find("{")
+        end = find_json_object_end(content, start) if start >= 0 else -1
+        if end < 0:
+            return {}
+        try:
+            entries = json.loads(content[start:end]).get("results", [])
+        except (json.JSONDecodeError, AttributeError):
+            return {}
+        
+        results = {}
+        for entry in entries if isinstance(entries, list) else []:
+            if not isinstance(entry, dict):
+                continue
+            try:
+                index = int(entry.get("id"))
+            except (TypeError, ValueError):
+                continue
+            if 0 <= index < count and "result" in entry:
+                result = entry["result"]
+                results[index] = result if isinstance(result, str) else json.dumps(result)
+        return results
+
+
+_batcher: Optional[AnalysisBatcher] = None
+_batcher_lock = threading.Lock()
+
+
+def get_analysis_batcher() -> AnalysisBatcher:
+    """Get the process-wide analysis batcher, creating it from settings."""
+    global _batcher
+    with _batcher_lock:
+        if _batcher is None:
+            _batcher = AnalysisBatcher()
+        return _batcher
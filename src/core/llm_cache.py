@@ -0,0 +1,323 @@
+"""Response cache for LLM chat completions."""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Any, Optional, Tuple
+
+from ..config import settings
+from ..utils.logging import get_logger
+from .concurrency import PRIORITY_INTERACTIVE
+from .llm_client import BaseLLMClient, LLMResponse, LLMStreamEvent, replay_response_as_stream
+from .tokens import serialize_functions
+
+logger = get_logger(__name__)
+
+
+def canonical_request_key(
+    model: str,
+    messages: List[Dict[str, Any]],
+    functions: Optional[List[Dict]],
+    temperature: float,
+    max_tokens: int
+) -> str:
+    """
+    Build a stable hash for a chat completion request.
+    
+    Keys are serialized with sorted keys and no whitespace, so requests that
+    differ only in dict ordering map to the same entry. Function schemas
+    are hashed from their memoized serialization rather than re-encoded.
+    """
+    payload = {
+        "model": model,
+        "messages": messages,
+        "temperature": round(float(temperature), 4),
+        "max_tokens": max_tokens
+    }
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    digest = hashlib.sha256(encoded.encode("utf-8"))
+    digest.update(b"\x00")
+    digest.update(serialize_functions(functions).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class LLMResponseCache:
+    """
+    Two-tier response cache.
+    
+    The memory tier is a bounded LRU with per-entry TTL. The optional disk
+    tier is a SQLite file that survives restarts; disk hits are promoted back
+    into memory.
+    """
+    
+    def __init__(self, max_entries: int = 1024, ttl_seconds: int = 3600, path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._memory: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.bypassed = 0
+        
+        if path:
+            self._open_disk_tier(path)
+    
+    def get(self, key: str) -> Optional[LLMResponse]:
+        """Look up a cached response, checking memory before disk."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, payload = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return self._to_response(payload)
+                del self._memory[key]
+                self.expirations += 1
+            
+            payload = self._disk_get(key, now)
+            if payload is not None:
+                expires_at, payload = payload
+                self._memory_put(key, expires_at, payload)
+                self.hits += 1
+                self.disk_hits += 1
+                return self._to_response(payload)
+            
+            self.misses += 1
+            return None
+    
+    def set(self, key: str, response: LLMResponse, ttl_seconds: Optional[int] = None):
+        """Store a response in both tiers."""
+        expires_at = time.time() + (ttl_seconds if ttl_seconds is not None else self.ttl_seconds)
+        payload = response.to_dict()
+        with self._lock:
+            self._memory_put(key, expires_at, payload)
+            self._disk_set(key, expires_at, payload)
+    
+    def record_bypass(self):
+        with self._lock:
+            self.bypassed += 1
+    
+    def clear(self):
+        """Drop every cached entry."""
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM llm_response_cache")
+                self._db.commit()
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "disk_hits": self.disk_hits,
+                "bypassed": self.bypassed,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "memory_entries": len(self._memory),
+                "max_entries": self.max_entries,
+                "disk_tier": self._db is not None
+            }
+    
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+    
+    def _memory_put(self, key: str, expires_at: float, payload: Dict[str, Any]):
+        self._memory[key] = (expires_at, payload)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+    
+    def _open_disk_tier(self, path: str):
+        try:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS llm_response_cache ("
+                "key TEXT PRIMARY KEY, payload TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.execute("DELETE FROM llm_response_cache WHERE expires_at <= ?", (time.time(),))
+            self._db.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"LLM cache disk tier disabled: {e}")
+            self._db = None
+    
+    def _disk_get(self, key: str, now: float) -> Optional[Tuple[float, Dict[str, Any]]]:
+        if self._db is None:
+            return None
+        try:
+            row = self._db.execute(
+                "SELECT payload, expires_at FROM llm_response_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] <= now:
+                self._db.execute("DELETE FROM llm_response_cache WHERE key = ?", (key,))
+                self._db.commit()
+                self.expirations += 1
+                return None
+            return row[1], json.loads(row[0])
+        except (sqlite3.Error, json.JSONDecodeError) as e:
+            logger.warning(f"LLM cache disk read failed: {e}")
+            return None
+    
+    def _disk_set(self, key: str, expires_at: float, payload: Dict[str, Any]):
+        if self._db is None:
+            return
+        try:
+            self._db.execute(
+                "INSERT OR REPLACE INTO llm_response_cache (key, payload, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(payload, default=str), expires_at)
+            )
+            self._db.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"LLM cache disk write failed: {e}")
+    
+    @staticmethod
+    def _to_response(payload: Dict[str, Any]) -> LLMResponse:
+        response = LLMResponse.from_dict(json.loads(json.dumps(payload)))
+        response.cached = True
+        return response
+
+
+class CachedLLMClient(BaseLLMClient):
+    """
+    LLM client wrapper that serves repeated requests from an LLMResponseCache.
+    
+    Requests above ``settings.llm_cache_max_temperature`` are never cached,
+    since their answers are expected to vary between calls.
+    """
+    
+    def __init__(self, inner: BaseLLMClient, cache: LLMResponseCache, max_temperature: Optional[float] = None):
+        super().__init__(inner.api_key, inner.base_url, inner.model)
+        self.provider = inner.provider
+        self.inner = inner
+        self.cache = cache
+        self.max_temperature = (
+            max_temperature if max_temperature is not None else settings.llm_cache_max_temperature
+        )
+    
+    async def chat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        functions: Optional[List[Dict]] = None,
+        temperature: float = 0.1,
+        max_tokens: int = 2000,
+        use_cache: bool = True,
+        priority: int = PRIORITY_INTERACTIVE,
+        timeout: Optional[float] = None
+    ) -> LLMResponse:
+        """Return a cached response when possible, otherwise call through."""
+        key = self._cache_key(messages, functions, temperature, max_tokens, use_cache)
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+        
+        response = await self.inner.chat_completion(
+            messages=messages,
+            functions=functions,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            use_cache=use_cache,
+            priority=priority,
+            timeout=timeout
+        )
+        
+        if key is not None:
+            self.cache.set(key, response)
+        return response
+    
+    async def stream_chat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        functions: Optional[List[Dict]] = None,
+        temperature: float = 0.1,
+        max_tokens: int = 2000,
+        use_cache: bool = True,
+        priority: int = PRIORITY_INTERACTIVE,
+        timeout: Optional[float] = None
+    ) -> AsyncIterator[LLMStreamEvent]:
+        """Replay cached responses as a stream; cache completed live streams."""
+        key = self._cache_key(messages, functions, temperature, max_tokens, use_cache)
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                async for event in replay_response_as_stream(cached):
+                    yield event
+                return
+        
+        async for event in self.inner.stream_chat_completion(
+            messages=messages,
+            functions=functions,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            use_cache=use_cache,
+            priority=priority,
+            timeout=timeout
+        ):
+            if event.type == LLMStreamEvent.DONE and key is not None and event.response is not None:
+                self.cache.set(key, event.response)
+            yield event
+    
+    def supports_function_calling(self) -> bool:
+        return self.inner.supports_function_calling()
+    
+    async def aclose(self):
+        await self.inner.aclose()
+    
+    def _cache_key(
+        self,
+        messages: List[Dict[str, str]],
+        functions: Optional[List[Dict]],
+        temperature: float,
+        max_tokens: int,
+        use_cache: bool
+    ) -> Optional[str]:
+        if not use_cache or temperature > self.max_temperature:
+            self.cache.record_bypass()
+            return None
+        return canonical_request_key(self.model, messages, functions, temperature, max_tokens)
+
+
+_response_cache: Optional[LLMResponseCache] = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> LLMResponseCache:
+    """Get the process-wide response cache, creating it from settings."""
+    global _response_cache
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = LLMResponseCache(
+                max_entries=settings.llm_cache_max_entries,
+                ttl_seconds=settings.llm_cache_ttl_seconds,
+                path=settings.llm_cache_path or None
+            )
+        return _response_cache
+
+
+def close_response_cache():
+    """Close the disk tier of the process-wide cache, if any."""
+    global _response_cache
+    with _response_cache_lock:
+        if _response_cache is not None:
+            _response_cache.close()
+            _response_cache = None
@@ -1,13 +1,17 @@
 """LLM client abstraction supporting multiple providers."""
 
+import asyncio
 import json
+import threading
 from abc import ABC, abstractmethod
-from typing import Dict, List, Any, Optional
+from typing import AsyncIterator, Dict, List, Any, Optional, Tuple
 import httpx
-from openai import AsyncOpenAI
+from openai import AsyncOpenAI, RateLimitError
 
 from ..config import settings
+from ..utils.http import ConnectionPoolStats, create_pooled_client
 from ..utils.logging import get_logger
+from .concurrency import PRIORITY_INTERACTIVE, get_limiter
 
 logger = get_logger(__name__)
 
@@ -19,15 +23,232 @@ class LLMResponse:
         self.content = content
         self.function_calls = function_calls or []
         self.usage = usage or {}
+        self.cached = False
+        self.provider: Optional[str] = None
     
     @property
     def has_function_calls(self) -> bool:
         return len(self.function_calls) > 0
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize to a JSON-compatible dictionary."""
+        return {
+            "content": self.content,
+            "function_calls": self.function_calls,
+            "usage": self.usage,
+            "provider": self.provider
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "LLMResponse":
+        """Rebuild a response serialized with ``to_dict``."""
+        response = cls(data.get("content", ""), data.get("function_calls"), data.get("usage"))
+        response.provider = data.get("provider")
+        return response
+
+
+class LLMStreamEvent:
+    """Incremental event produced by a streaming chat completion."""
+    
+    CONTENT = "content"
+    FUNCTION_CALL = "function_call"
+    DONE = "done"
+    
+    def __init__(
+        self,
+        type: str,
+        content: str = "",
+        function_call: Optional[Dict[str, Any]] = None,
+        response: Optional[LLMResponse] = None
+    ):
+        self.type = type
+        self.content = content
+        self.function_call = function_call
+        self.response = response
+
+
+FUNCTION_CALL_MARKER = "FUNCTION_CALL:"
+
+
+def find_json_object_end(text: str, start: int = 0) -> int:
+    """
+    Find the end of the JSON object starting at ``text[start]``.
+    
+    Tracks brace depth while skipping over string literals, so nested
+    objects and braces inside strings are handled.
+    
+    Returns:
+        Index just past the closing brace, or -1 if the object is incomplete
+    """
+    depth = 0
+    in_string = False
+    escaped = False
+    for index in range(start, len(text)):
+        char = text[index]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                return index + 1
+    return -1
+
+
+class _StreamingCallAssembler:
+    """
+    Assemble native function/tool call fragments from stream deltas.
+    
+    A call is released as soon as its argument buffer forms a complete JSON
+    object, so callers can dispatch it while the rest of the response is
+    still streaming.
+    """
+    
+    def __init__(self):
+        self._calls: Dict[int, Dict[str, Any]] = {}
+        self.completed: List[Dict[str, Any]] = []
+    
+    def add_function_call_delta(self, delta) -> List[Dict[str, Any]]:
+        """Feed a legacy ``delta.function_call`` fragment."""
+        return self._add(0, None, delta.name, delta.arguments)
+    
+    def add_tool_call_delta(self, delta) -> List[Dict[str, Any]]:
+        """Feed a ``delta.tool_calls[i]`` fragment."""
+        function = getattr(delta, "function", None)
+        return self._add(
+            delta.index,
+            getattr(delta, "id", None),
+            getattr(function, "name", None),
+            getattr(function, "arguments", None)
+        )
+    
+    def flush(self) -> List[Dict[str, Any]]:
+        """Release calls whose arguments only became final at stream end."""
+        ready = []
+        for call in self._calls.values():
+            if call["emitted"] or not call["name"]:
+                continue
+            call["emitted"] = True
+            arguments = call["arguments"].strip() or "{}"
+            try:
+                parsed = json.loads(arguments)
+            except json.JSONDecodeError:
+                logger.warning(f"Discarding malformed streamed arguments for {call['name']}")
+                continue
+            ready.append(self._complete(call, parsed))
+        return ready
+    
+    def _add(self, index: int, call_id: Optional[str], name: Optional[str], arguments: Optional[str]) -> List[Dict[str, Any]]:
+        call = self._calls.setdefault(
+            index, {"id": None, "name": "", "arguments": "", "emitted": False}
+        )
+        if call_id:
+            call["id"] = call_id
+        if name:
+            call["name"] += name
+        if arguments:
+            call["arguments"] += arguments
+        
+        if call["emitted"] or not call["name"]:
+            return []
+        
+        buffer = call["arguments"].lstrip()
+        if not buffer.startswith("{") or find_json_object_end(buffer) != len(buffer.rstrip()):
+            return []
+        try:
+            parsed = json.loads(buffer)
+        except json.JSONDecodeError:
+            return []
+        call["emitted"] = True
+        return [self._complete(call, parsed)]
+    
+    def _complete(self, call: Dict[str, Any], arguments: Dict[str, Any]) -> Dict[str, Any]:
+        function_call = {"name": call["name"], "arguments": arguments}
+        if call["id"]:
+            function_call["id"] = call["id"]
+        self.completed.append(function_call)
+        return function_call
+
+
+class _SimulatedCallScanner:
+    """
+    Split streamed content into user-visible text and simulated
+    ``FUNCTION_CALL: {json}`` calls for models without native calling.
+    """
+    
+    def __init__(self):
+        self._buffer = ""
+        self._in_calls = False
+        self.visible = ""
+        self.completed: List[Dict[str, Any]] = []
+    
+    def feed(self, text: str) -> Tuple[str, List[Dict[str, Any]]]:
+        """Consume a content delta; return (visible text, completed calls)."""
+        self._buffer += text
+        visible = ""
+        
+        if not self._in_calls:
+            marker_at = self._buffer.find(FUNCTION_CALL_MARKER)
+            if marker_at == -1:
+                # Hold back a possible partial marker at the end of the buffer
+                safe = max(0, len(self._buffer) - len(FUNCTION_CALL_MARKER) + 1)
+                visible, self._buffer = self._buffer[:safe], self._buffer[safe:]
+                self.visible += visible
+                return visible, []
+            visible = self._buffer[:marker_at]
+            self.visible += visible
+            self._buffer = self._buffer[marker_at:]
+            self._in_calls = True
+        
+        return visible, self._scan_calls()
+    
+    def finish(self) -> str:
+        """Return any held-back visible text at end of stream."""
+        if self._in_calls:
+            return ""
+        rest, self._buffer = self._buffer, ""
+        self.visible += rest
+        return rest
+    
+    def _scan_calls(self) -> List[Dict[str, Any]]:
+        ready = []
+        while True:
+            marker_at = self._buffer.find(FUNCTION_CALL_MARKER)
+            if marker_at == -1:
+                return ready
+            body = self._buffer[marker_at + len(FUNCTION_CALL_MARKER):].lstrip()
+            if not body:
+                return ready
+            if not body.startswith("{"):
+                self._buffer = body
+                continue
+            end = find_json_object_end(body)
+            if end == -1:
+                return ready
+            self._buffer = body[end:]
+            try:
+                parsed = json.loads(body[:end])
+            except json.JSONDecodeError:
+                continue
+            if isinstance(parsed, dict) and "name" in parsed:
+                parsed.setdefault("arguments", {})
+                self.completed.append(parsed)
+                ready.append(parsed)
 
 
 class BaseLLMClient(ABC):
     """Abstract base class for LLM clients."""
     
+    provider: Optional[str] = None
+    
     def __init__(self, api_key: str, base_url: Optional[str] = None, model: str = "gpt-3.5-turbo"):
         self.api_key = api_key
         self.base_url = base_url
@@ -39,33 +260,92 @@ class BaseLLMClient(ABC):
         messages: List[Dict[str, str]],
         functions: Optional[List[Dict]] = None,
         temperature: float = 0.1,
-        max_tokens: int = 2000
+        max_tokens: int = 2000,
+        use_cache: bool = True,
+        priority: int = PRIORITY_INTERACTIVE,
+        timeout: Optional[float] = None
     ) -> LLMResponse:
-        """Generate chat completion with optional function calling."""
+        """
+        Generate chat completion with optional function calling.
+        
+        ``use_cache`` is a hint for caching layers; clients that do not cache
+        ignore it. ``timeout`` bounds the upstream call in seconds and starts
+        once a concurrency slot is held, so time spent queued for the
+        provider's limiter does not count against it.
+        """
         pass
     
+    async def stream_chat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        functions: Optional[List[Dict]] = None,
+        temperature: float = 0.1,
+        max_tokens: int = 2000,
+        use_cache: bool = True,
+        priority: int = PRIORITY_INTERACTIVE,
+        timeout: Optional[float] = None
+    ) -> AsyncIterator[LLMStreamEvent]:
+        """
+        Stream a chat completion as incremental events.
+        
+        Yields content deltas, then one FUNCTION_CALL event per call as soon as
+        its arguments are complete, and finally a DONE event carrying the
+        assembled LLMResponse. Providers without native streaming fall back to
+        replaying a blocking completion.
+        """
+        response = await self.chat_completion(
+            messages=messages,
+            functions=functions,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            use_cache=use_cache,
+            priority=priority,
+            timeout=timeout
+        )
+        async for event in replay_response_as_stream(response):
+            yield event
+    
     @abstractmethod
     def supports_function_calling(self) -> bool:
         """Return whether this provider supports function calling."""
         pass
+    
+    async def aclose(self):
+        """Release any network resources held by the client."""
+        pass
 
 
 class GenericOpenAIClient(BaseLLMClient):
     """Generic OpenAI-compatible API client (for OpenAI, DeepSeek, Qwen, etc.)."""
     
-    def __init__(self, api_key: str, base_url: str, model: str):
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str,
+        model: str,
+        http_client: Optional[httpx.AsyncClient] = None,
+        provider: Optional[str] = None
+    ):
         super().__init__(api_key, base_url, model)
+        self.provider = provider
+        self.http_client = http_client
         self.client = AsyncOpenAI(
             api_key=api_key,
-            base_url=base_url
+            base_url=base_url,
+            http_client=http_client
         )
+        # Upstream concurrency is bounded per provider endpoint
+        self.limiter = get_limiter(provider or base_url)
     
     async def chat_completion(
         self,
         messages: List[Dict[str, str]],
         functions: Optional[List[Dict]] = None,
         temperature: float = 0.1,
-        max_tokens: int = 2000
+        max_tokens: int = 2000,
+        use_cache: bool = True,
+        priority: int = PRIORITY_INTERACTIVE,
+        timeout: Optional[float] = None
     ) -> LLMResponse:
         """Generate chat completion with OpenAI-compatible API."""
         try:
@@ -76,33 +356,38 @@ class GenericOpenAIClient(BaseLLMClient):
                 "max_tokens": max_tokens
             }
             
-            # Try function calling if supported
+            # Offer functions as tools so the model can return several calls per turn
             if functions:
-                try:
-                    kwargs["functions"] = functions
-                    kwargs["function_call"] = "auto"
-                except Exception:
-                    # Fall back to prompt engineering for models without native function calling
-                    function_prompt = self._format_functions_as_prompt(functions)
-                    if messages and messages[-1]["role"] == "user":
-                        messages[-1]["content"] += f"\n\n{function_prompt}"
+                kwargs["tools"] = functions_to_tools(functions)
+                kwargs["tool_choice"] = "auto"
             
-            response = await self.client.chat.completions.create(**kwargs)
+            async with self.limiter.slot(priority) as permit:
+                try:
+                    response = await asyncio.wait_for(self.client.chat.completions.create(**kwargs), timeout)
+                except RateLimitError as e:
+                    permit.rate_limited(_retry_after_seconds(e))
+                    raise
             
             message = response.choices[0].message
             content = message.content or ""
             
             function_calls = []
-            if hasattr(message, 'function_call') and message.function_call:
-                function_calls = [{
-                    "name": message.function_call.name,
-                    "arguments": json.loads(message.function_call.arguments)
-                }]
-            elif functions and "FUNCTION_CALL:" in content:
+            if getattr(message, "tool_calls", None):
+                function_calls = [
+                    call for call in (
+                        _parse_native_call(tool_call.function.name, tool_call.function.arguments, tool_call.id)
+                        for tool_call in message.tool_calls
+                    )
+                    if call is not None
+                ]
+            elif getattr(message, "function_call", None):
+                call = _parse_native_call(message.function_call.name, message.function_call.arguments)
+                function_calls = [call] if call else []
+            elif functions and FUNCTION_CALL_MARKER in content:
                 # Parse simulated function calls
                 function_calls = self._parse_function_calls_from_content(content)
                 if function_calls:
-                    content = content.split("FUNCTION_CALL:")[0].strip()
+                    content = content.split(FUNCTION_CALL_MARKER)[0].strip()
             
             usage = {}
             if hasattr(response, 'usage') and response.usage:
@@ -112,12 +397,94 @@ class GenericOpenAIClient(BaseLLMClient):
                     "total_tokens": response.usage.total_tokens
                 }
             
-            return LLMResponse(content, function_calls, usage)
+            llm_response = LLMResponse(content, function_calls, usage)
+            llm_response.provider = self.provider
+            return llm_response
             
         except Exception as e:
             logger.error(f"LLM API error: {e}")
             raise
     
+    async def stream_chat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        functions: Optional[List[Dict]] = None,
+        temperature: float = 0.1,
+        max_tokens: int = 2000,
+        use_cache: bool = True,
+        priority: int = PRIORITY_INTERACTIVE,
+        timeout: Optional[float] = None
+    ) -> AsyncIterator[LLMStreamEvent]:
+        """Stream a chat completion with incremental function-call parsing."""
+        kwargs = {
+            "model": self.model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "stream": True
+        }
+        if functions:
+            kwargs["tools"] = functions_to_tools(functions)
+            kwargs["tool_choice"] = "auto"
+        
+        assembler = _StreamingCallAssembler()
+        scanner = _SimulatedCallScanner() if functions else None
+        content = ""
+        
+        async with self.limiter.slot(priority) as permit:
+            try:
+                stream = await asyncio.wait_for(self.client.chat.completions.create(**kwargs), timeout)
+            except RateLimitError as e:
+                permit.rate_limited(_retry_after_seconds(e))
+                logger.error(f"LLM API error: {e}")
+                raise
+            except Exception as e:
+                logger.error(f"LLM API error: {e}")
+                raise
+            
+            async for chunk in stream:
+                # Streams are judged on time to first byte, not output length
+                permit.mark_first_byte()
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta
+                
+                if getattr(delta, "content", None):
+                    if scanner:
+                        visible, calls = scanner.feed(delta.content)
+                    else:
+                        visible, calls = delta.content, []
+                    content += visible
+                    if visible:
+                        yield LLMStreamEvent(LLMStreamEvent.CONTENT, content=visible)
+                    for call in calls:
+                        yield LLMStreamEvent(LLMStreamEvent.FUNCTION_CALL, function_call=call)
+                
+                if getattr(delta, "function_call", None):
+                    for call in assembler.add_function_call_delta(delta.function_call):
+                        yield LLMStreamEvent(LLMStreamEvent.FUNCTION_CALL, function_call=call)
+                
+                for tool_delta in getattr(delta, "tool_calls", None) or []:
+                    for call in assembler.add_tool_call_delta(tool_delta):
+                        yield LLMStreamEvent(LLMStreamEvent.FUNCTION_CALL, function_call=call)
+        
+        if scanner:
+            rest = scanner.finish()
+            if rest:
+                content += rest
+                yield LLMStreamEvent(LLMStreamEvent.CONTENT, content=rest)
+        
+        for call in assembler.flush():
+            yield LLMStreamEvent(LLMStreamEvent.FUNCTION_CALL, function_call=call)
+        
+        function_calls = assembler.completed + (scanner.completed if scanner else [])
+        if scanner and scanner.completed:
+            content = content.strip()
+        
+        llm_response = LLMResponse(content, function_calls)
+        llm_response.provider = self.provider
+        yield LLMStreamEvent(LLMStreamEvent.DONE, response=llm_response)
+    
     def _format_functions_as_prompt(self, functions: List[Dict]) -> str:
         """Format functions as prompt for models without native function calling."""
         prompt = "Available functions (respond with FUNCTION_CALL: {json} to call):\n"
@@ -128,14 +495,14 @@ class GenericOpenAIClient(BaseLLMClient):
     def _parse_function_calls_from_content(self, content: str) -> List[Dict]:
         """Parse function calls from content."""
         function_calls = []
-        if "FUNCTION_CALL:" in content:
+        if FUNCTION_CALL_MARKER in content:
             try:
-                call_start = content.find("FUNCTION_CALL:")
-                call_content = content[call_start + 14:].strip()
+                call_start = content.find(FUNCTION_CALL_MARKER)
+                call_content = content[call_start + len(FUNCTION_CALL_MARKER):].strip()
                 if call_content.startswith("{"):
-                    end_brace = call_content.find("}")
+                    end_brace = find_json_object_end(call_content)
                     if end_brace != -1:
-                        call_json = call_content[:end_brace + 1]
+                        call_json = call_content[:end_brace]
                         parsed = json.loads(call_json)
                         function_calls = [parsed]
             except json.JSONDecodeError:
@@ -144,42 +511,288 @@ class GenericOpenAIClient(BaseLLMClient):
     
     def supports_function_calling(self) -> bool:
         return True
+    
+    async def aclose(self):
+        """Close the underlying connection pool."""
+        await self.client.close()
+
+
+def functions_to_tools(functions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Wrap function definitions in the ``tools`` request format."""
+    return [{"type": "function", "function": function} for function in functions]
+
+
+def _parse_native_call(name: str, arguments: Optional[str], call_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Build a function call dict from a native (tool or legacy) call."""
+    try:
+        parsed = json.loads(arguments or "{}")
+    except json.JSONDecodeError:
+        logger.warning(f"Discarding malformed arguments for {name}")
+        return None
+    function_call = {"name": name, "arguments": parsed}
+    if call_id:
+        function_call["id"] = call_id
+    return function_call
+
+
+def _retry_after_seconds(error: Exception) -> Optional[float]:
+    """Read ``Retry-After`` (or ``retry-after-ms``) from a rate limit error."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    for header, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        value = headers.get(header)
+        if value:
+            try:
+                return float(value) * scale
+            except ValueError:
+                continue
+    return None
+
+
+async def replay_response_as_stream(response: LLMResponse) -> AsyncIterator[LLMStreamEvent]:
+    """Replay a complete LLMResponse as a stream of events."""
+    if response.content:
+        yield LLMStreamEvent(LLMStreamEvent.CONTENT, content=response.content)
+    for function_call in response.function_calls:
+        yield LLMStreamEvent(LLMStreamEvent.FUNCTION_CALL, function_call=function_call)
+    yield LLMStreamEvent(LLMStreamEvent.DONE, response=response)
+
+
+# Default endpoints for known providers
+DEFAULT_BASE_URLS = {
+    "openai": "https://api.openai.com/v1",
+    "deepseek": "https://api.deepseek.com",
+    "qwen": "https://dashscope.aliyuncs.com/compatible-mode/v1",
+    "groq": "https://api.groq.com/openai/v1",
+    "together": "https://api.together.xyz/v1",
+    "perplexity": "https://api.perplexity.ai",
+    "openrouter": "https://openrouter.ai/api/v1",
+    "ollama": "http://localhost:11434/v1",
+    "anthropic": "https://api.anthropic.com/v1",
+    "local": "http://localhost:8000/v1"
+}
 
 
 class LLMClientFactory:
     """Factory for creating LLM clients based on provider."""
     
     @staticmethod
-    def create_client() -> BaseLLMClient:
+    def resolve_base_url(provider: str, base_url: Optional[str] = None) -> str:
+        """Return the explicit base URL or the provider's default endpoint."""
+        if base_url:
+            return base_url
+        return DEFAULT_BASE_URLS.get(provider.lower(), "http://localhost:8000/v1")
+    
+    @staticmethod
+    def create_client(http_client: Optional[httpx.AsyncClient] = None) -> BaseLLMClient:
         """Create LLM client based on settings."""
         provider = settings.llm_provider.lower()
-        
-        # Default endpoints for known providers
-        if not settings.llm_base_url:
-            base_urls = {
-                "openai": "https://api.openai.com/v1",
-                "deepseek": "https://api.deepseek.com",
-                "qwen": "https://dashscope.aliyuncs.com/compatible-mode/v1",
-                "groq": "https://api.groq.com/openai/v1",
-                "together": "https://api.together.xyz/v1",
-                "perplexity": "https://api.perplexity.ai",
-                "openrouter": "https://openrouter.ai/api/v1",
-                "ollama": "http://localhost:11434/v1",
-                "anthropic": "https://api.anthropic.com/v1",
-                "local": "http://localhost:8000/v1"
-            }
-            base_url = base_urls.get(provider, "http://localhost:8000/v1")
-        else:
-            base_url = settings.llm_base_url
+        base_url = LLMClientFactory.resolve_base_url(provider, settings.llm_base_url)
         
         return GenericOpenAIClient(
             api_key=settings.llm_api_key,
             base_url=base_url,
-            model=settings.llm_model
+            model=settings.llm_model,
+            http_client=http_client,
+            provider=provider
         )
 
 
-# Global LLM client instance
+class _PooledEntry:
+    """A registered client together with its transport and reuse counters."""
+    
+    def __init__(
+        self,
+        client: BaseLLMClient,
+        stats: ConnectionPoolStats,
+        loop: Optional[asyncio.AbstractEventLoop]
+    ):
+        self.client = client
+        self.stats = stats
+        self.loop = loop
+        self.checkouts = 0
+
+
+class LLMClientRegistry:
+    """
+    Process-wide registry of pooled LLM clients.
+    
+    Provider clients are keyed by (provider, base_url, model) and share one
+    keep-alive httpx connection pool each, so agents created per request
+    reuse warm TLS connections instead of opening a fresh pool every time.
+    The default client stacks the router and response cache on top.
+    """
+    
+    def __init__(self):
+        self._entries: Dict[Tuple[str, str, str], _PooledEntry] = {}
+        self._lock = threading.RLock()
+        self._default_client: Optional[BaseLLMClient] = None
+        self._default_loop: Optional[asyncio.AbstractEventLoop] = None
+        self.router = None
+        self.coalescer = None
+        self.created = 0
+    
+    def get_provider_client(
+        self,
+        provider: Optional[str] = None,
+        base_url: Optional[str] = None,
+        model: Optional[str] = None,
+        api_key: Optional[str] = None
+    ) -> BaseLLMClient:
+        """
+        Get (or lazily create) the pooled client for a provider/model.
+        
+        Args:
+            provider: Provider name, defaults to ``settings.llm_provider``
+            base_url: Endpoint, defaults to the provider's known endpoint
+            model: Model name, defaults to ``settings.llm_model``
+            api_key: API key, defaults to ``settings.llm_api_key``
+            
+        Returns:
+            Shared client instance
+        """
+        provider = (provider or settings.llm_provider).lower()
+        base_url = LLMClientFactory.resolve_base_url(
+            provider, base_url or (settings.llm_base_url if provider == settings.llm_provider else None)
+        )
+        model = model or settings.llm_model
+        key = (provider, base_url, model)
+        loop = self._current_loop()
+        
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and self._is_stale(entry.loop, loop):
+                entry = None
+            elif entry and entry.loop is None:
+                entry.loop = loop
+            
+            if entry is None:
+                stats = ConnectionPoolStats()
+                http_client = create_pooled_client(
+                    max_connections=settings.llm_pool_max_connections,
+                    max_keepalive_connections=settings.llm_pool_max_keepalive,
+                    keepalive_expiry=settings.llm_pool_keepalive_expiry,
+                    timeout=settings.llm_request_timeout,
+                    http2=settings.llm_http2,
+                    stats=stats
+                )
+                client = GenericOpenAIClient(
+                    api_key=api_key or settings.llm_api_key,
+                    base_url=base_url,
+                    model=model,
+                    http_client=http_client,
+                    provider=provider
+                )
+                entry = _PooledEntry(client, stats, loop)
+                self._entries[key] = entry
+                self.created += 1
+                logger.info(f"Created pooled LLM client for {provider}/{model} at {base_url}")
+            
+            entry.checkouts += 1
+            return entry.client
+    
+    def get_client(self) -> BaseLLMClient:
+        """
+        Get the default client stack built from settings.
+        
+        The primary provider is routed together with any
+        ``llm_fallback_providers``, identical in-flight requests are
+        coalesced, and the result is wrapped in the response cache.
+        """
+        loop = self._current_loop()
+        
+        with self._lock:
+            if self._default_client is not None and not self._is_stale(self._default_loop, loop):
+                if self._default_loop is None:
+                    self._default_loop = loop
+                return self._default_client
+            
+            client = self.get_provider_client()
+            
+            if settings.llm_fallback_providers:
+                from .llm_router import RoutedLLMClient
+                providers = [client] + [
+                    self.get_provider_client(
+                        provider=fallback.get("provider"),
+                        base_url=fallback.get("base_url"),
+                        model=fallback.get("model"),
+                        api_key=fallback.get("api_key")
+                    )
+                    for fallback in settings.llm_fallback_providers
+                ]
+                client = self.router = RoutedLLMClient(providers)
+            
+            if settings.llm_coalescing_enabled:
+                from .llm_coalescing import CoalescingLLMClient
+                client = self.coalescer = CoalescingLLMClient(client)
+            
+            if settings.llm_cache_enabled:
+                from .llm_cache import CachedLLMClient, get_response_cache
+                client = CachedLLMClient(client, get_response_cache())
+            
+            self._default_client = client
+            self._default_loop = loop
+            return client
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return per-client pool and reuse statistics."""
+        with self._lock:
+            clients = [
+                {
+                    "provider": provider,
+                    "base_url": base_url,
+                    "model": model,
+                    "checkouts": entry.checkouts,
+                    **entry.stats.to_dict()
+                }
+                for (provider, base_url, model), entry in self._entries.items()
+            ]
+        return {
+            "clients_created": self.created,
+            "active_clients": len(clients),
+            "clients": clients
+        }
+    
+    async def aclose(self):
+        """Close every pooled client; called on application shutdown."""
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+            self._default_client = None
+            self.router = None
+            self.coalescer = None
+        
+        for entry in entries:
+            try:
+                await entry.client.aclose()
+            except Exception as e:
+                logger.warning(f"Failed to close LLM client: {e}")
+    
+    @staticmethod
+    def _is_stale(
+        owner: Optional[asyncio.AbstractEventLoop],
+        current: Optional[asyncio.AbstractEventLoop]
+    ) -> bool:
+        # httpx pools are bound to the event loop that opened them; the CLI
+        # runs each command in a fresh loop, so rebuild entries whose loop closed.
+        return owner is not None and owner is not current and owner.is_closed()
+    
+    @staticmethod
+    def _current_loop() -> Optional[asyncio.AbstractEventLoop]:
+        try:
+            return asyncio.get_running_loop()
+        except RuntimeError:
+            return None
+
+
+# Global LLM client registry
+llm_client_registry = LLMClientRegistry()
+
+
 def get_llm_client() -> BaseLLMClient:
-    """Get the configured LLM client."""
-    return LLMClientFactory.create_client() 
\ No newline at end of file
+    """Get the configured, process-wide pooled LLM client."""
+    return llm_client_registry.get_client()
+
+
+async def close_llm_clients():
+    """Close all pooled LLM clients."""
+    await llm_client_registry.aclose()
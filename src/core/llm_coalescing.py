@@ -0,0 +1,147 @@
+"""Singleflight coalescing of identical in-flight LLM requests."""
+
+import asyncio
+import copy
+from typing import AsyncIterator, Dict, List, Any, Optional
+
+from ..utils.logging import get_logger
+from .concurrency import PRIORITY_INTERACTIVE
+from .llm_cache import canonical_request_key
+from .llm_client import BaseLLMClient, LLMResponse, LLMStreamEvent
+
+logger = get_logger(__name__)
+
+
+class _Flight:
+    """One shared upstream request and the callers waiting on it."""
+    
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class CoalescingLLMClient(BaseLLMClient):
+    """
+    LLM client wrapper that shares one upstream call between identical
+    concurrent requests.
+    
+    The upstream request runs as its own task. Each caller awaits it through
+    ``asyncio.shield``, so cancelling one caller never cancels the request
+    for the others; the upstream task is only cancelled once every waiting
+    caller has gone away. Errors are delivered to every waiter.
+    """
+    
+    def __init__(self, inner: BaseLLMClient):
+        super().__init__(inner.api_key, inner.base_url, inner.model)
+        self.provider = inner.provider
+        self.inner = inner
+        self._flights: Dict[str, _Flight] = {}
+        
+        self.leaders = 0
+        self.coalesced = 0
+        self.upstream_cancelled = 0
+        self.max_fanout = 0
+    
+    async def chat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        functions: Optional[List[Dict]] = None,
+        temperature: float = 0.1,
+        max_tokens: int = 2000,
+        use_cache: bool = True,
+        priority: int = PRIORITY_INTERACTIVE,
+        timeout: Optional[float] = None
+    ) -> LLMResponse:
+        """Join an identical in-flight request or start a new one."""
+        if not use_cache:
+            # Callers opting out of caching want their own fresh answer
+            return await self.inner.chat_completion(
+                messages=messages,
+                functions=functions,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                use_cache=use_cache,
+                priority=priority,
+                timeout=timeout
+            )
+        
+        key = canonical_request_key(self.model, messages, functions, temperature, max_tokens)
+        flight = self._flights.get(key)
+        is_leader = flight is None
+        
+        if is_leader:
+            task = asyncio.ensure_future(self.inner.chat_completion(
+                messages=messages,
+                functions=functions,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                use_cache=use_cache,
+                priority=priority,
+                timeout=timeout
+            ))
+            flight = _Flight(task)
+            self._flights[key] = flight
+            task.add_done_callback(lambda _, key=key, flight=flight: self._forget(key, flight))
+            self.leaders += 1
+        else:
+            self.coalesced += 1
+        
+        flight.waiters += 1
+        self.max_fanout = max(self.max_fanout, flight.waiters)
+        
+        try:
+            response = await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                self._forget(key, flight)
+                flight.task.cancel()
+                self.upstream_cancelled += 1
+            raise
+        flight.waiters -= 1
+        
+        # Followers get their own copy so callers can't mutate each other's result
+        return response if is_leader else copy.deepcopy(response)
+    
+    async def stream_chat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        functions: Optional[List[Dict]] = None,
+        temperature: float = 0.1,
+        max_tokens: int = 2000,
+        use_cache: bool = True,
+        priority: int = PRIORITY_INTERACTIVE,
+        timeout: Optional[float] = None
+    ) -> AsyncIterator[LLMStreamEvent]:
+        """Streams are passed through; each consumer needs its own event sequence."""
+        async for event in self.inner.stream_chat_completion(
+            messages=messages,
+            functions=functions,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            use_cache=use_cache,
+            priority=priority,
+            timeout=timeout
+        ):
+            yield event
+    
+    def supports_function_calling(self) -> bool:
+        return self.inner.supports_function_calling()
+    
+    async def aclose(self):
+        await self.inner.aclose()
+    
+    def stats(self) -> Dict[str, Any]:
+        total = self.leaders + self.coalesced
+        return {
+            "upstream_requests": self.leaders,
+            "coalesced_requests": self.coalesced,
+            "coalesced_ratio": round(self.coalesced / total, 4) if total else 0.0,
+            "in_flight": len(self._flights),
+            "upstream_cancelled": self.upstream_cancelled,
+            "max_fanout": self.max_fanout
+        }
+    
+    def _forget(self, key: str, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
@@ -0,0 +1,320 @@
+"""Multi-provider LLM routing with health-scored failover and hedging."""
+
+import asyncio
+import time
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, List, Any, Optional, Tuple
+
+from openai import APIConnectionError, APIStatusError, APITimeoutError, RateLimitError
+
+from ..config import settings
+from ..utils.logging import get_logger
+from .concurrency import PRIORITY_INTERACTIVE
+from .llm_client import BaseLLMClient, LLMResponse, LLMStreamEvent
+
+logger = get_logger(__name__)
+
+
+def is_retryable_error(error: BaseException) -> bool:
+    """Return whether another provider should be tried after this error."""
+    if isinstance(error, (asyncio.TimeoutError, APITimeoutError, APIConnectionError, RateLimitError)):
+        return True
+    if isinstance(error, APIStatusError):
+        status_code = getattr(error, "status_code", None)
+        return status_code == 429 or (status_code is not None and status_code >= 500)
+    return False
+
+
+class ProviderHealth:
+    """Rolling latency and error statistics for one provider."""
+    
+    def __init__(self, name: str, window: int, failure_threshold: int, cooldown_seconds: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self._samples: Deque[Tuple[float, bool]] = deque(maxlen=window)
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+        self.requests = 0
+        self.failures = 0
+    
+    def record_success(self, latency: float):
+        self.requests += 1
+        self._samples.append((latency, True))
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+    
+    def record_failure(self, latency: float):
+        self.requests += 1
+        self.failures += 1
+        self._samples.append((latency, False))
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= self.failure_threshold:
+            self.cooldown_until = time.monotonic() + self.cooldown_seconds
+            logger.warning(f"LLM provider {self.name} cooling down after {self.consecutive_failures} failures")
+    
+    @property
+    def in_cooldown(self) -> bool:
+        return time.monotonic() < self.cooldown_until
+    
+    @property
+    def error_rate(self) -> float:
+        if not self._samples:
+            return 0.0
+        return sum(1 for _, ok in self._samples if not ok) / len(self._samples)
+    
+    def latency_percentile(self, percentile: float) -> Optional[float]:
+        """Latency percentile (seconds) over successful samples in the window."""
+        latencies = sorted(latency for latency, ok in self._samples if ok)
+        if not latencies:
+            return None
+        index = min(len(latencies) - 1, int(round(percentile * (len(latencies) - 1))))
+        return latencies[index]
+    
+    @property
+    def degraded(self) -> bool:
+        """Half or more of the recent requests failed."""
+        return len(self._samples) >= 4 and self.error_rate >= 0.5
+    
+    def to_dict(self) -> Dict[str, Any]:
+        p50 = self.latency_percentile(0.5)
+        p95 = self.latency_percentile(0.95)
+        return {
+            "provider": self.name,
+            "requests": self.requests,
+            "failures": self.failures,
+            "error_rate": round(self.error_rate, 4),
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "consecutive_failures": self.consecutive_failures,
+            "in_cooldown": self.in_cooldown
+        }
+
+
+class RoutedLLMClient(BaseLLMClient):
+    """
+    LLM client that routes requests across an ordered set of providers.
+    
+    Providers are tried in configured order, skipping any that are cooling
+    down and demoting any whose recent error rate marks them degraded.
+    Retryable errors (timeouts, 429, 5xx) fail over to the next provider.
+    With hedging enabled, a second provider is raced after the primary's
+    p95 latency and the first successful answer wins.
+    """
+    
+    def __init__(
+        self,
+        providers: List[BaseLLMClient],
+        timeout: Optional[float] = None,
+        hedge_enabled: Optional[bool] = None,
+        hedge_min_delay: Optional[float] = None
+    ):
+        if not providers:
+            raise ValueError("RoutedLLMClient requires at least one provider")
+        primary = providers[0]
+        super().__init__(primary.api_key, primary.base_url, primary.model)
+        self.providers = providers
+        self.timeout = timeout if timeout is not None else settings.llm_router_timeout
+        self.hedge_enabled = hedge_enabled if hedge_enabled is not None else settings.llm_hedge_enabled
+        self.hedge_min_delay = (
+            hedge_min_delay if hedge_min_delay is not None else settings.llm_hedge_min_delay_ms / 1000
+        )
+        self.health: Dict[int, ProviderHealth] = {
+            id(client): ProviderHealth(
+                self._provider_name(client),
+                window=settings.llm_router_window,
+                failure_threshold=settings.llm_router_failure_threshold,
+                cooldown_seconds=settings.llm_router_cooldown_seconds
+            )
+            for client in providers
+        }
+        self.failovers = 0
+        self.hedges_launched = 0
+        self.hedges_won = 0
+    
+    async def chat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        functions: Optional[List[Dict]] = None,
+        temperature: float = 0.1,
+        max_tokens: int = 2000,
+        use_cache: bool = True,
+        priority: int = PRIORITY_INTERACTIVE,
+        timeout: Optional[float] = None
+    ) -> LLMResponse:
+        """Complete on the healthiest provider, failing over on retryable errors."""
+        request = {
+            "messages": messages,
+            "functions": functions,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "use_cache": use_cache,
+            "priority": priority,
+            "timeout": timeout if timeout is not None else self.timeout
+        }
+        remaining = self._ordered_candidates()
+        last_error: Optional[BaseException] = None
+        
+        while remaining:
+            primary = remaining.pop(0)
+            try:
+                if self.hedge_enabled and remaining:
+                    return await self._hedged_attempt(primary, remaining[0], request, remaining)
+                return await self._attempt(primary, request)
+            except Exception as e:
+                if not is_retryable_error(e):
+                    raise
+                last_error = e
+                if remaining:
+                    self.failovers += 1
+                    logger.warning(f"LLM provider {self._provider_name(primary)} failed ({e!r}), failing over")
+        
+        raise last_error
+    
+    async def stream_chat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        functions: Optional[List[Dict]] = None,
+        temperature: float = 0.1,
+        max_tokens: int = 2000,
+        use_cache: bool = True,
+        priority: int = PRIORITY_INTERACTIVE,
+        timeout: Optional[float] = None
+    ) -> AsyncIterator[LLMStreamEvent]:
+        """
+        Stream from the healthiest provider.
+        
+        Failover is only possible until the first event has been yielded;
+        streams are never hedged since partial output cannot be retracted.
+        """
+        last_error: Optional[BaseException] = None
+        candidates = self._ordered_candidates()
+        
+        for position, client in enumerate(candidates):
+            health = self.health[id(client)]
+            started = time.monotonic()
+            stream = client.stream_chat_completion(
+                messages=messages,
+                functions=functions,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                use_cache=use_cache,
+                priority=priority,
+                timeout=timeout if timeout is not None else self.timeout
+            )
+            try:
+                first_event = await stream.__anext__()
+            except StopAsyncIteration:
+                health.record_success(time.monotonic() - started)
+                return
+            except Exception as e:
+                health.record_failure(time.monotonic() - started)
+                await stream.aclose()
+                if not is_retryable_error(e):
+                    raise
+                last_error = e
+                if position < len(candidates) - 1:
+                    self.failovers += 1
+                    logger.warning(f"LLM provider {health.name} failed to stream ({e!r}), failing over")
+                continue
+            
+            try:
+                event = first_event
+                while True:
+                    if event.type == LLMStreamEvent.DONE and event.response is not None:
+                        event.response.provider = event.response.provider or health.name
+                    yield event
+                    event = await stream.__anext__()
+            except StopAsyncIteration:
+                health.record_success(time.monotonic() - started)
+                return
+            except Exception:
+                health.record_failure(time.monotonic() - started)
+                raise
+        
+        raise last_error
+    
+    def supports_function_calling(self) -> bool:
+        return all(client.supports_function_calling() for client in self.providers)
+    
+    async def aclose(self):
+        for client in self.providers:
+            await client.aclose()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Per-provider health plus failover and hedging counters."""
+        return {
+            "providers": [self.health[id(client)].to_dict() for client in self.providers],
+            "failovers": self.failovers,
+            "hedges_launched": self.hedges_launched,
+            "hedges_won": self.hedges_won,
+            "hedge_enabled": self.hedge_enabled
+        }
+    
+    def _ordered_candidates(self) -> List[BaseLLMClient]:
+        """Configured order, minus cooling-down providers, with degraded ones demoted."""
+        available = [client for client in self.providers if not self.health[id(client)].in_cooldown]
+        if not available:
+            # Everything is cooling down; trying in order beats failing outright
+            return list(self.providers)
+        # Stable sort keeps the configured preference within each group
+        return sorted(available, key=lambda client: self.health[id(client)].degraded)
+    
+    async def _attempt(self, client: BaseLLMClient, request: Dict[str, Any]) -> LLMResponse:
+        health = self.health[id(client)]
+        started = time.monotonic()
+        try:
+            # The provider starts the timeout once it holds a limiter slot, so
+            # queueing under load does not mark a healthy provider as slow
+            response = await client.chat_completion(**request)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            health.record_failure(time.monotonic() - started)
+            raise
+        health.record_success(time.monotonic() - started)
+        response.provider = response.provider or health.name
+        return response
+    
+    async def _hedged_attempt(
+        self,
+        primary: BaseLLMClient,
+        secondary: BaseLLMClient,
+        request: Dict[str, Any],
+        remaining: List[BaseLLMClient]
+    ) -> LLMResponse:
+        """Race ``secondary`` against a slow ``primary``; first success wins."""
+        tasks = [asyncio.ensure_future(self._attempt(primary, request))]
+        p95 = self.health[id(primary)].latency_percentile(0.95)
+        hedge_delay = max(self.hedge_min_delay, p95 or self.timeout)
+        
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+            if done:
+                # Primary finished (or failed) before the hedge was needed;
+                # on failure the caller fails over to ``secondary`` normally.
+                return tasks[0].result()
+            
+            remaining.remove(secondary)
+            self.hedges_launched += 1
+            tasks.append(asyncio.ensure_future(self._attempt(secondary, request)))
+            
+            pending = set(tasks)
+            last_error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is tasks[1]:
+                            self.hedges_won += 1
+                        return task.result()
+                    last_error = task.exception()
+            raise last_error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+    
+    @staticmethod
+    def _provider_name(client: BaseLLMClient) -> str:
+        return f"{client.provider or 'unknown'}:{client.model}"
@@ -0,0 +1,350 @@
+"""Cache of function-call plans keyed by parameterized command templates."""
+
+import copy
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Any, Optional, Tuple
+
+from ..config import settings
+from ..integrations.registry import FunctionRegistry, function_registry
+from ..utils.logging import get_logger
+from .execution_graph import REFERENCE_PATTERN
+
+logger = get_logger(__name__)
+
+# Slots extracted from commands, in priority order: (slot name, pattern).
+# The first group that matched is the slot value and is replaced by the
+# slot name in the template; the rest of the match is kept.
+SLOT_PATTERNS: List[Tuple[str, "re.Pattern"]] = [
+    ("text", re.compile(r"\"([^\"]+)\"|'([^']+)'")),
+    ("channel", re.compile(r"#([A-Za-z0-9][\w.-]*)")),
+    ("query", re.compile(
+        r"\b(?:repos|repositories|repo)\s+(?:for|about|matching|on|with)\s+"
+        r"([^,.;{}\"']+?)(?=\s+(?:and|then)\b|[,.;]|$)",
+        re.IGNORECASE
+    )),
+    ("project_key", re.compile(r"\b(?:project|to|in|into|for)\s+(?!S3\b|AWS\b|ASAP\b)([A-Z][A-Z0-9]{1,9})\b")),
+    ("path", re.compile(r"\b((?:s3://)?[\w-]+(?:/[\w.-]+)+|[\w-]+\.(?:txt|md|json|csv|log|html|pdf))\b")),
+    ("number", re.compile(r"\b(\d+)\b")),
+]
+SLOT_KEY = "$slot"
+SLOT_PLACEHOLDER = re.compile(r"\{\{slot:(\w+)\}\}")
+
+# Longer literal strings in a plan that are not worded from the command
+# usually come from data the model read; such plans are not replayed
+MAX_LITERAL_WORDS = 6
+
+_WORD_PATTERN = re.compile(r"\w+")
+
+
+@dataclass
+class CommandTemplate:
+    """A command with its variable parts replaced by named slots."""
+    template: str
+    slots: Dict[str, str]
+    
+    @classmethod
+    def from_command(cls, command: str) -> "CommandTemplate":
+        slots: Dict[str, str] = {}
+        counts: Dict[str, int] = {}
+        text = command.strip()
+        for name, pattern in SLOT_PATTERNS:
+            def extract(match, name=name):
+                group = next(index for index in range(1, len(match.groups()) + 1) if match.group(index) is not None)
+                counts[name] = counts.get(name, 0) + 1
+                slot = name if counts[name] == 1 else f"{name}_{counts[name]}"
+                slots[slot] = match.group(group).strip()
+                whole, start, end = match.group(0), match.start(group) - match.start(0), match.end(group) - match.start(0)
+                return f"{whole[:start]}{{{slot}}}{whole[end:]}"
+            text = pattern.sub(extract, text)
+        template = re.sub(r"\s+", " ", text).rstrip(" .!?").lower()
+        return cls(template, slots)
+
+
+@dataclass
+class CachedPlan:
+    """A parameterized plan and how often it has proven right."""
+    calls: List[Dict[str, Any]]
+    created_at: float = field(default_factory=time.time)
+    successes: int = 1
+    failures: int = 0
+    replays: int = 0
+    
+    @property
+    def confidence(self) -> float:
+        # Beta(1, 1) prior: a single observation is not trusted on its own
+        return (self.successes + 1) / (self.successes + self.failures + 2)
+
+
+class PlanCache:
+    """
+    Maps command templates to the function calls the model planned for them.
+    
+    Commands are normalized into templates by extracting slots (channels,
+    project keys, repository queries, quoted text, paths, numbers). When a
+    command is answered by a single planning turn whose calls all succeed,
+    the calls are stored with slot values replaced by placeholders. The
+    same plan coming back for the same template raises its confidence, a
+    different one replaces it, and a failed replay lowers it; plans are
+    replayed without the LLM only once their confidence reaches
+    ``min_confidence``, or ``write_min_confidence`` when any of their calls
+    is not read-only.
+    
+    Entries are per user and model, expire after ``ttl_seconds`` and are
+    all dropped when the function registry changes.
+    """
+    
+    def __init__(
+        self,
+        registry: FunctionRegistry = function_registry,
+        max_entries: Optional[int] = None,
+        ttl_seconds: Optional[int] = None,
+        min_confidence: Optional[float] = None,
+        write_min_confidence: Optional[float] = None
+    ):
+        self.registry = registry
+        self.max_entries = max_entries if max_entries is not None else settings.plan_cache_max_entries
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else settings.plan_cache_ttl_seconds
+        self.min_confidence = min_confidence if min_confidence is not None else settings.plan_cache_min_confidence
+        self.write_min_confidence = max(self.min_confidence, (
+            write_min_confidence if write_min_confidence is not None else settings.plan_cache_write_min_confidence
+        ))
+        self._plans: "OrderedDict[Tuple[int, str, str], CachedPlan]" = OrderedDict()
+        self._registry_version = registry.version
+        self._lock = threading.Lock()
+        
+        self.lookups = 0
+        self.hits = 0
+        self.untrusted = 0
+        self.stores = 0
+        self.replaced = 0
+        self.uncacheable = 0
+        self.replay_failures = 0
+        self.invalidations = 0
+        self.evictions = 0
+    
+    def lookup(self, user_id: int, model: str, command: str) -> Tuple[CommandTemplate, Optional[List[Dict[str, Any]]]]:
+        """
+        Find a trusted plan for ``command``.
+        
+        Returns:
+            (command template, function calls with slots filled in, or None)
+        """
+        template = CommandTemplate.from_command(command)
+        key = (user_id, model, template.template)
+        with self._lock:
+            self.lookups += 1
+            self._check_registry()
+            plan = self._plans.get(key)
+            if plan is not None and time.time() - plan.created_at > self.ttl_seconds:
+                del self._plans[key]
+                plan = None
+            if plan is None:
+                return template, None
+            if plan.confidence < self._required_confidence(plan):
+                self.untrusted += 1
+                return template, None
+            self._plans.move_to_end(key)
+            self.hits += 1
+            plan.replays += 1
+            calls = copy.deepcopy(plan.calls)
+        try:
+            return template, [
+                {"name": call["name"], "arguments": _fill_slots(call["arguments"], template.slots)} for call in calls
+            ]
+        except ValueError as e:
+            logger.info(f"Cached plan for '{template.template}' does not fit this command: {e}")
+            return template, None
+    
+    def observe(self, user_id: int, model: str, template: CommandTemplate, calls: List[Dict[str, Any]]) -> str:
+        """
+        Record the plan the model produced for a command.
+        
+        Returns:
+            "stored", "confirmed", "replaced" or "uncacheable"
+        """
+        values = list(template.slots.values())
+        ambiguous = {value for value in values if values.count(value) > 1}
+        if ambiguous and any(_mentions(call.get("arguments", {}), ambiguous) for call in calls):
+            # Two slots share the value an argument used; which one it came from is a guess
+            with self._lock:
+                self.uncacheable += 1
+            return "uncacheable"
+        
+        parameterized = [
+            {"name": call["name"], "arguments": _parameterize(call.get("arguments", {}), template.slots)}
+            for call in calls
+        ]
+        vocabulary = set(_WORD_PATTERN.findall(template.template))
+        if not parameterized or not all(_replayable(call["arguments"], vocabulary) for call in parameterized):
+            with self._lock:
+                self.uncacheable += 1
+            return "uncacheable"
+        
+        key = (user_id, model, template.template)
+        with self._lock:
+            self._check_registry()
+            plan = self._plans.get(key)
+            if plan is not None and plan.calls == parameterized:
+                plan.successes += 1
+                self._plans.move_to_end(key)
+                return "confirmed"
+            
+            self._plans[key] = CachedPlan(parameterized)
+            self._plans.move_to_end(key)
+            if plan is not None:
+                self.replaced += 1
+                return "replaced"
+            self.stores += 1
+            while len(self._plans) > self.max_entries:
+                self._plans.popitem(last=False)
+                self.evictions += 1
+            return "stored"
+    
+    def record_replay(self, user_id: int, model: str, template: CommandTemplate, succeeded: bool):
+        """Feed a replay's outcome back into the plan's confidence."""
+        with self._lock:
+            plan = self._plans.get((user_id, model, template.template))
+            if plan is None:
+                return
+            if succeeded:
+                plan.successes += 1
+            else:
+                plan.failures += 1
+                self.replay_failures += 1
+    
+    def clear(self):
+        with self._lock:
+            self._plans.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "hit_rate": round(self.hits / self.lookups, 4) if self.lookups else 0.0,
+                "untrusted": self.untrusted,
+                "stores": self.stores,
+                "replaced": self.replaced,
+                "uncacheable": self.uncacheable,
+                "replay_failures": self.replay_failures,
+                "invalidations": self.invalidations,
+                "evictions": self.evictions,
+                "entries": len(self._plans),
+                "min_confidence": self.min_confidence,
+                "write_min_confidence": self.write_min_confidence
+            }
+    
+    def _required_confidence(self, plan: CachedPlan) -> float:
+        for call in plan.calls:
+            registered = self.registry.get(call["name"])
+            if registered is None or not registered.read_only:
+                return self.write_min_confidence
+        return self.min_confidence
+    
+    def _check_registry(self):
+        # Plans may name functions or arguments that no longer exist
+        if self._registry_version != self.registry.version:
+            if self._plans:
+                logger.info(f"Function registry changed, dropping {len(self._plans)} cached plans")
+            self._plans.clear()
+            self._registry_version = self.registry.version
+            self.invalidations += 1
+
+
+def _parameterize(value: Any, slots: Dict[str, str]) -> Any:
+    """Replace slot values inside plan arguments with placeholders."""
+    if isinstance(value, str):
+        for name, slot_value in sorted(slots.items(), key=lambda item: -len(item[1])):
+            if value == slot_value or value.lstrip("#") == slot_value:
+                return f"{value[:len(value) - len(slot_value)]}{{{{slot:{name}}}}}"
+            pattern = re.compile(rf"(?<!\w){re.escape(slot_value)}(?!\w)")
+            # Leave "{{call_N.path}}" references alone; their paths may hold digits
+            value = _substitute_outside_references(value, pattern, f"{{{{slot:{name}}}}}")
+        return value
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, int):
+        for name, slot_value in slots.items():
+            if slot_value == str(value):
+                return {SLOT_KEY: name, "type": "int"}
+        return value
+    if isinstance(value, dict):
+        return {key: _parameterize(item, slots) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_parameterize(item, slots) for item in value]
+    return value
+
+
+def _substitute_outside_references(value: str, pattern: "re.Pattern", replacement: str) -> str:
+    parts, last = [], 0
+    for match in REFERENCE_PATTERN.finditer(value):
+        parts.append(pattern.sub(replacement, value[last:match.start()]))
+        parts.append(match.group(0))
+        last = match.end()
+    parts.append(pattern.sub(replacement, value[last:]))
+    return "".join(parts)
+
+
+def _mentions(value: Any, slot_values: set) -> bool:
+    """Whether plan arguments contain any of ``slot_values``, as ``_parameterize`` would match them."""
+    if isinstance(value, str):
+        return any(
+            value.lstrip("#") == slot_value or re.search(rf"(?<!\w){re.escape(slot_value)}(?!\w)", value)
+            for slot_value in slot_values
+        )
+    if isinstance(value, bool):
+        return False
+    if isinstance(value, int):
+        return str(value) in slot_values
+    if isinstance(value, dict):
+        return any(_mentions(item, slot_values) for item in value.values())
+    if isinstance(value, list):
+        return any(_mentions(item, slot_values) for item in value)
+    return False
+
+
+def _fill_slots(value: Any, slots: Dict[str, str]) -> Any:
+    """Put slot values back into plan arguments; raises ValueError when one no longer fits its type."""
+    if isinstance(value, str):
+        return SLOT_PLACEHOLDER.sub(lambda match: slots.get(match.group(1), match.group(0)), value)
+    if isinstance(value, dict):
+        if SLOT_KEY in value:
+            # Only the arguments that were integers become integers again
+            slot_value = slots.get(value[SLOT_KEY], "")
+            if value.get("type") == "int":
+                return int(slot_value)
+            return slot_value
+        return {key: _fill_slots(item, slots) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_fill_slots(item, slots) for item in value]
+    return value
+
+
+def _replayable(value: Any, vocabulary: set) -> bool:
+    """Whether every string argument is short or worded from the command, outside slots and references."""
+    if isinstance(value, str):
+        literal = REFERENCE_PATTERN.sub(" ", SLOT_PLACEHOLDER.sub(" ", value))
+        words = _WORD_PATTERN.findall(literal.lower())
+        return len(words) <= MAX_LITERAL_WORDS or all(word in vocabulary for word in words)
+    if isinstance(value, dict):
+        return all(_replayable(item, vocabulary) for item in value.values())
+    if isinstance(value, list):
+        return all(_replayable(item, vocabulary) for item in value)
+    return True
+
+
+_plan_cache: Optional[PlanCache] = None
+_plan_cache_lock = threading.Lock()
+
+
+def get_plan_cache() -> PlanCache:
+    """Get the process-wide plan cache, creating it from settings."""
+    global _plan_cache
+    with _plan_cache_lock:
+        if _plan_cache is None:
+            _plan_cache = PlanCache()
+        return _plan_cache
@@ -0,0 +1,287 @@
+"""Local token estimation and prompt budget enforcement."""
+
+import hashlib
+import json
+import math
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, List, Any, Optional, Tuple
+
+from ..config import settings
+from ..utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+try:
+    import tiktoken
+except ImportError:  # Optional: exact counts for OpenAI encodings
+    tiktoken = None
+
+
+# Model name prefix -> (tiktoken encoding, average chars per token, context window).
+# Longest matching prefix wins; chars-per-token drives the fallback estimator.
+MODEL_TOKENIZERS: Dict[str, Tuple[Optional[str], float, int]] = {
+    "gpt-4o": ("o200k_base", 4.0, 128000),
+    "gpt-4-turbo": ("cl100k_base", 4.0, 128000),
+    "gpt-4-32k": ("cl100k_base", 4.0, 32768),
+    "gpt-4": ("cl100k_base", 4.0, 8192),
+    "gpt-3.5-turbo-16k": ("cl100k_base", 4.0, 16385),
+    "gpt-3.5-turbo": ("cl100k_base", 4.0, 16385),
+    "deepseek": (None, 3.6, 64000),
+    "qwen": (None, 3.3, 32768),
+    "llama3": (None, 3.8, 8192),
+    "llama-3": (None, 3.8, 8192),
+    "llama2": (None, 3.5, 4096),
+    "llama": (None, 3.5, 4096),
+    "mixtral": (None, 3.5, 32768),
+    "mistral": (None, 3.5, 32768),
+    "gemma": (None, 3.8, 8192),
+    "claude": (None, 3.5, 200000),
+    "sonar": (None, 3.8, 127072),
+}
+DEFAULT_TOKENIZER: Tuple[Optional[str], float, int] = ("cl100k_base", 4.0, 8192)
+
+# Per-message framing overhead in the chat format
+MESSAGE_OVERHEAD_TOKENS = 4
+REPLY_PRIMING_TOKENS = 3
+
+_PRETOKEN_PATTERN = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+TRUNCATION_MARKER = "\n...[truncated {count} tokens]...\n"
+
+# Token counts, keyed by a digest of the text so no copies of large inputs are kept
+_TOKEN_COUNTS_MAX = 4096
+_token_counts: "OrderedDict[Tuple[bytes, str], int]" = OrderedDict()
+_token_counts_lock = threading.Lock()
+
+# Serialized function lists, keyed by list identity
+_SERIALIZED_FUNCTIONS_MAX = 32
+_serialized_functions: "OrderedDict[int, Tuple[List[Dict[str, Any]], str]]" = OrderedDict()
+_serialized_functions_lock = threading.Lock()
+
+
+def tokenizer_for_model(model: str) -> Tuple[Optional[str], float, int]:
+    """Look up the tokenizer entry for a model by longest matching prefix."""
+    model = (model or "").lower().split("/")[-1]
+    best = None
+    for prefix, entry in MODEL_TOKENIZERS.items():
+        if model.startswith(prefix) and (best is None or len(prefix) > len(best)):
+            best = prefix
+    return MODEL_TOKENIZERS[best] if best else DEFAULT_TOKENIZER
+
+
+def context_window_for_model(model: str) -> int:
+    """Context window size, honouring an explicit ``llm_context_window`` override."""
+    return settings.llm_context_window or tokenizer_for_model(model)[2]
+
+
+@lru_cache(maxsize=8)
+def _encoding(name: str):
+    try:
+        return tiktoken.get_encoding(name)
+    except Exception as e:
+        logger.warning(f"tiktoken encoding {name} unavailable, estimating instead: {e}")
+        return None
+
+
+def count_tokens(text: str, model: str) -> int:
+    """
+    Count (or estimate) tokens in ``text`` for ``model``.
+    
+    Uses tiktoken when installed and the model has a known encoding;
+    otherwise splits on word/punctuation boundaries and charges long words
+    by the model's average characters per token. Counts are memoized under
+    a digest of the text, which is much cheaper than tokenizing it again.
+    """
+    if not text:
+        return 0
+    key = (hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest(), model)
+    with _token_counts_lock:
+        count = _token_counts.get(key)
+        if count is not None:
+            _token_counts.move_to_end(key)
+            return count
+    
+    count = _count_tokens(text, model)
+    with _token_counts_lock:
+        _token_counts[key] = count
+        while len(_token_counts) > _TOKEN_COUNTS_MAX:
+            _token_counts.popitem(last=False)
+    return count
+
+
+def _count_tokens(text: str, model: str) -> int:
+    # Uncached: truncation probes many throwaway prefixes of large inputs
+    if not text:
+        return 0
+    encoding_name, chars_per_token, _ = tokenizer_for_model(model)
+    if tiktoken is not None and encoding_name:
+        encoding = _encoding(encoding_name)
+        if encoding is not None:
+            return len(encoding.encode(text, disallowed_special=()))
+    
+    return sum(
+        max(1, math.ceil(len(piece) / chars_per_token))
+        for piece in _PRETOKEN_PATTERN.findall(text)
+    )
+
+
+def count_message_tokens(messages: List[Dict[str, Any]], model: str) -> int:
+    """Estimate prompt tokens for a list of chat messages."""
+    total = REPLY_PRIMING_TOKENS
+    for message in messages:
+        total += MESSAGE_OVERHEAD_TOKENS
+        for key, value in message.items():
+            if value is None:
+                continue
+            if not isinstance(value, str):
+                value = json.dumps(value, sort_keys=True, default=str)
+            total += count_tokens(value, model)
+    return total
+
+
+def serialize_functions(functions: Optional[List[Dict[str, Any]]]) -> str:
+    """
+    Canonical JSON of a list of function definitions.
+    
+    Definition lists are shared rather than rebuilt per request (the
+    function registry hands out the same list until it changes), so the
+    encoding is memoized by list identity and the schemas are serialized
+    once instead of on every cache lookup and budget check.
+    """
+    if not functions:
+        return "[]"
+    key = id(functions)
+    with _serialized_functions_lock:
+        entry = _serialized_functions.get(key)
+        if entry is not None and entry[0] is functions:
+            _serialized_functions.move_to_end(key)
+            return entry[1]
+    
+    encoded = json.dumps(functions, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    with _serialized_functions_lock:
+        # Holding the list keeps its id from being reused while memoized
+        _serialized_functions[key] = (functions, encoded)
+        while len(_serialized_functions) > _SERIALIZED_FUNCTIONS_MAX:
+            _serialized_functions.popitem(last=False)
+    return encoded
+
+
+def count_function_tokens(functions: Optional[List[Dict[str, Any]]], model: str) -> int:
+    """Estimate tokens consumed by function/tool schemas."""
+    if not functions:
+        return 0
+    return count_tokens(serialize_functions(functions), model)
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: str, head_ratio: float = 0.67) -> Tuple[str, int]:
+    """
+    Deterministically shorten ``text`` to at most ``max_tokens``.
+    
+    Keeps the head and tail of the text (the tail often carries the most
+    recent messages) around a marker noting how much was cut.
+    
+    Returns:
+        (possibly truncated text, number of tokens removed)
+    """
+    total = count_tokens(text, model)
+    if total <= max_tokens:
+        return text, 0
+    
+    marker_budget = count_tokens(TRUNCATION_MARKER.format(count=total), model)
+    keep = max(0, max_tokens - marker_budget)
+    head_tokens = int(keep * head_ratio)
+    tail_tokens = keep - head_tokens
+    
+    head = _prefix_within(text, head_tokens, model)
+    tail = _suffix_within(text[len(head):], tail_tokens, model)
+    removed = total - count_tokens(head, model) - count_tokens(tail, model)
+    return head + TRUNCATION_MARKER.format(count=removed) + tail, removed
+
+
+def chunk_text(text: str, chunk_tokens: int, model: str) -> List[str]:
+    """
+    Split ``text`` into chunks of at most ``chunk_tokens``.
+    
+    Splits on line boundaries where possible so individual messages stay
+    intact; single lines longer than a chunk are truncated.
+    """
+    chunks: List[str] = []
+    current: List[str] = []
+    current_tokens = 0
+    
+    for line in text.splitlines(keepends=True):
+        line_tokens = count_tokens(line, model)
+        if line_tokens > chunk_tokens:
+            line, _ = truncate_to_tokens(line, chunk_tokens, model)
+            line_tokens = count_tokens(line, model)
+        if current and current_tokens + line_tokens > chunk_tokens:
+            chunks.append("".join(current))
+            current, current_tokens = [], 0
+        current.append(line)
+        current_tokens += line_tokens
+    
+    if current:
+        chunks.append("".join(current))
+    return chunks
+
+
+class PromptBudget:
+    """
+    Token budget for one request: the model's context window minus the
+    output tokens reserved for the completion.
+    """
+    
+    def __init__(self, model: str, reserved_output_tokens: Optional[int] = None):
+        self.model = model
+        self.context_window = context_window_for_model(model)
+        self.reserved_output_tokens = (
+            reserved_output_tokens if reserved_output_tokens is not None else settings.llm_max_tokens
+        )
+    
+    @property
+    def input_tokens(self) -> int:
+        """Tokens available for messages and function schemas."""
+        return max(0, self.context_window - self.reserved_output_tokens)
+    
+    def measure(self, messages: List[Dict[str, Any]], functions: Optional[List[Dict]] = None) -> Dict[str, int]:
+        """Token estimate for a request, as recorded on action records."""
+        message_tokens = count_message_tokens(messages, self.model)
+        function_tokens = count_function_tokens(functions, self.model)
+        return {
+            "prompt_tokens": message_tokens + function_tokens,
+            "message_tokens": message_tokens,
+            "function_schema_tokens": function_tokens,
+            "reserved_output_tokens": self.reserved_output_tokens,
+            "context_window": self.context_window
+        }
+    
+    def remaining(self, messages: List[Dict[str, Any]], functions: Optional[List[Dict]] = None) -> int:
+        """Input tokens still free after ``messages`` and ``functions``."""
+        return self.input_tokens - self.measure(messages, functions)["prompt_tokens"]
+    
+    def fits(self, messages: List[Dict[str, Any]], functions: Optional[List[Dict]] = None) -> bool:
+        return self.remaining(messages, functions) >= 0
+
+
+def _prefix_within(text: str, max_tokens: int, model: str) -> str:
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if _count_tokens(text[:middle], model) <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    return text[:low]
+
+
+def _suffix_within(text: str, max_tokens: int, model: str) -> str:
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if _count_tokens(text[len(text) - middle:], model) <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    return text[len(text) - low:] if low else ""
@@ -0,0 +1,329 @@
+"""Relevance-based selection of the functions sent with a command."""
+
+import asyncio
+import math
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Any, Optional, Tuple
+
+from ..config import settings
+from ..integrations.registry import FunctionRegistry, RegisteredFunction, function_registry
+from ..utils.logging import get_logger
+from .tokens import count_function_tokens
+
+logger = get_logger(__name__)
+
+# Index weights by where a term came from
+KEYWORD_WEIGHT = 3.0
+NAME_WEIGHT = 2.0
+DESCRIPTION_WEIGHT = 1.0
+
+STOPWORDS = frozenset({
+    "a", "an", "and", "any", "are", "as", "at", "be", "by", "can", "do", "e", "for", "from",
+    "g", "get", "if", "in", "into", "is", "it", "its", "me", "my", "of", "on", "or", "our",
+    "please", "the", "them", "then", "this", "to", "type", "us", "with", "you", "your",
+})
+
+# Model replies that say it lacks a tool for the job
+MISSING_TOOL_PATTERN = re.compile(
+    r"\b(?:no|not|don't|do not|doesn't|does not|lack|missing|unavailable|without)\b"
+    r"[^.\n]{0,60}\b(?:tools?|functions?|capability|capabilities|integration)\b",
+    re.IGNORECASE
+)
+
+_TERM_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def _normalize(word: str) -> str:
+    """Crude plural folding so "tickets" matches "ticket"."""
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def _terms(text: str) -> List[str]:
+    return [_normalize(word) for word in _TERM_PATTERN.findall(text.lower()) if word not in STOPWORDS]
+
+
+@dataclass
+class ToolSelection:
+    """Functions chosen for one command, with the schema tokens they cost."""
+    functions: List[Dict[str, Any]]
+    selected: List[str]
+    scores: Dict[str, float]
+    full_tokens: int
+    selected_tokens: int
+    reason: str  # "ranked", "no_match", "disabled" or "small_registry"
+    widened: bool = False
+    
+    @property
+    def partial(self) -> bool:
+        return self.reason == "ranked"
+    
+    @property
+    def saved_tokens(self) -> int:
+        return self.full_tokens - self.selected_tokens
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "selected": self.selected,
+            "reason": self.reason,
+            "scores": {name: round(score, 3) for name, score in self.scores.items()},
+            "full_schema_tokens": self.full_tokens,
+            "selected_schema_tokens": self.selected_tokens,
+            "saved_tokens": self.saved_tokens,
+            "widened": self.widened
+        }
+
+
+@dataclass
+class _Index:
+    version: int
+    functions: List[RegisteredFunction]
+    terms: Dict[str, Dict[str, float]]  # term -> {function name: weight}
+    idf: Dict[str, float]
+    embeddings: Optional[Dict[str, List[float]]] = None
+    subsets: Dict[Tuple[str, ...], List[Dict[str, Any]]] = field(default_factory=dict)
+
+
+class ToolSelector:
+    """
+    Ranks registered functions against a command and keeps the top ``top_k``
+    plus every function flagged ``core``.
+    
+    The ranking uses an inverted index over each function's keywords,
+    name and description, weighted by where a term came from and by its
+    inverse document frequency. When ``embedding_model`` names a
+    sentence-transformers model (and the package is installed), cosine
+    similarity between the command and each function's description is
+    blended in. Indexes are rebuilt when the registry version changes.
+    
+    Commands that match nothing get the full set, as do registries too
+    small for subsetting to save anything. Subset lists are reused per
+    selection, so their serialized schemas are memoized like the full
+    list's. Embedding work runs in the default executor so model
+    inference never blocks the event loop.
+    """
+    
+    def __init__(
+        self,
+        registry: FunctionRegistry = function_registry,
+        top_k: Optional[int] = None,
+        embedding_model: Optional[str] = None,
+        embedding_weight: Optional[float] = None,
+        min_similarity: Optional[float] = None
+    ):
+        self.registry = registry
+        self.top_k = top_k if top_k is not None else settings.tool_selection_top_k
+        self.embedding_model = embedding_model if embedding_model is not None else settings.tool_selection_embedding_model
+        self.embedding_weight = (
+            embedding_weight if embedding_weight is not None else settings.tool_selection_embedding_weight
+        )
+        self.min_similarity = (
+            min_similarity if min_similarity is not None else settings.tool_selection_min_similarity
+        )
+        self._index: Optional[_Index] = None
+        self._encoder = None
+        self._encoder_failed = False
+        self._lock = threading.Lock()
+        
+        self.selections = 0
+        self.partial_selections = 0
+        self.functions_sent = 0
+        self.tokens_saved = 0
+        self.widened = 0
+    
+    async def select(self, command: str, model: str) -> ToolSelection:
+        """Choose the functions to send with ``command``."""
+        index = self._index
+        if index is None or index.version != self.registry.version:
+            # Rebuilding embeds every function description
+            index = await self._run_blocking(self._current_index) if self.embedding_model else self._current_index()
+        full = self.registry.definitions()
+        full_tokens = count_function_tokens(full, model)
+        names = [function.name for function in index.functions]
+        
+        if not settings.tool_selection_enabled:
+            return self._record(ToolSelection(full, names, {}, full_tokens, full_tokens, "disabled"))
+        
+        core = [function.name for function in index.functions if function.core]
+        if len(names) <= self.top_k + len(core):
+            return self._record(ToolSelection(full, names, {}, full_tokens, full_tokens, "small_registry"))
+        
+        query = await self._run_blocking(self._encode, [command]) if index.embeddings else None
+        scores = self._score(index, command, query[0] if query else None)
+        ranked = sorted(
+            (name for name, score in scores.items() if score > 0 and name not in core),
+            key=lambda name: -scores[name]
+        )[:self.top_k]
+        if not ranked:
+            return self._record(ToolSelection(full, names, scores, full_tokens, full_tokens, "no_match"))
+        
+        chosen = set(ranked) | set(core)
+        # Registry order keeps the prompt stable for the response cache
+        selected = tuple(name for name in names if name in chosen)
+        functions = index.subsets.get(selected)
+        if functions is None:
+            functions = index.subsets.setdefault(selected, [
+                function.definition for function in index.functions if function.name in chosen
+            ])
+        selection = ToolSelection(
+            functions=functions,
+            selected=list(selected),
+            scores={name: scores[name] for name in selected if name in scores},
+            full_tokens=full_tokens,
+            selected_tokens=count_function_tokens(functions, model),
+            reason="ranked"
+        )
+        logger.info(
+            f"Sending {len(selected)} of {len(names)} functions ({', '.join(selected)}), "
+            f"saving {selection.saved_tokens} of {full_tokens} schema tokens"
+        )
+        return self._record(selection)
+    
+    def widen(self, selection: ToolSelection, reason: str) -> List[Dict[str, Any]]:
+        """Fall back to every function after the model signalled a missing one."""
+        selection.widened = True
+        self.widened += 1
+        logger.info(f"Retrying with all functions (selected {', '.join(selection.selected)}): {reason}")
+        return self.registry.definitions()
+    
+    @staticmethod
+    def signals_missing_tool(selection: ToolSelection, content: str, calls: List[Dict[str, Any]]) -> Optional[str]:
+        """
+        Why a step's response suggests the subset lacked a needed function.
+        
+        Returns None when it does not: the model called only selected
+        functions, or answered without calls and without saying a tool was
+        missing.
+        """
+        if not selection.partial or selection.widened:
+            return None
+        unselected = [call["name"] for call in calls if call["name"] not in selection.selected]
+        if unselected:
+            return f"called unselected function(s) {', '.join(unselected)}"
+        if not calls and content and MISSING_TOOL_PATTERN.search(content):
+            return "response reports a missing tool"
+        return None
+    
+    def stats(self) -> Dict[str, Any]:
+        index = self._index
+        return {
+            "enabled": settings.tool_selection_enabled,
+            "top_k": self.top_k,
+            "embeddings": bool(index and index.embeddings),
+            "selections": self.selections,
+            "partial_selections": self.partial_selections,
+            "avg_functions_sent": round(self.functions_sent / self.selections, 2) if self.selections else 0.0,
+            "tokens_saved": self.tokens_saved,
+            "widened": self.widened
+        }
+    
+    def _record(self, selection: ToolSelection) -> ToolSelection:
+        self.selections += 1
+        self.functions_sent += len(selection.selected)
+        if selection.partial:
+            self.partial_selections += 1
+            self.tokens_saved += selection.saved_tokens
+        return selection
+    
+    def _current_index(self) -> _Index:
+        index = self._index
+        if index is None or index.version != self.registry.version:
+            with self._lock:
+                index = self._index
+                if index is None or index.version != self.registry.version:
+                    index = self._index = self._build_index()
+        return index
+    
+    def _build_index(self) -> _Index:
+        functions = [self.registry.get(name) for name in self.registry.names()]
+        terms: Dict[str, Dict[str, float]] = {}
+        
+        def add(term: str, name: str, weight: float):
+            postings = terms.setdefault(term, {})
+            postings[name] = max(postings.get(name, 0.0), weight)
+        
+        for function in functions:
+            for keyword in function.keywords:
+                for term in _terms(keyword):
+                    add(term, function.name, KEYWORD_WEIGHT)
+            for term in _terms(function.name.replace("_", " ")):
+                add(term, function.name, NAME_WEIGHT)
+            if function.service is not None:
+                for term in _terms(str(getattr(function.service, "value", function.service))):
+                    add(term, function.name, NAME_WEIGHT)
+            for term in _terms(function.description):
+                add(term, function.name, DESCRIPTION_WEIGHT)
+        
+        count = len(functions)
+        idf = {term: math.log(1 + count / len(postings)) for term, postings in terms.items()}
+        return _Index(
+            version=self.registry.version,
+            functions=functions,
+            terms=terms,
+            idf=idf,
+            embeddings=self._embed_functions(functions)
+        )
+    
+    async def _run_blocking(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(None, function, *args)
+    
+    def _score(self, index: _Index, command: str, query: Optional[List[float]] = None) -> Dict[str, float]:
+        scores: Dict[str, float] = {}
+        for term in set(_terms(command)):
+            for name, weight in index.terms.get(term, {}).items():
+                scores[name] = scores.get(name, 0.0) + weight * index.idf[term]
+        
+        if index.embeddings and query:
+            top = max(scores.values(), default=0.0) or 1.0
+            for name, vector in index.embeddings.items():
+                similarity = _dot(query, vector)
+                keyword_score = scores.get(name, 0.0) / top
+                if keyword_score == 0 and similarity < self.min_similarity:
+                    continue
+                scores[name] = (1 - self.embedding_weight) * keyword_score + self.embedding_weight * similarity
+        return scores
+    
+    def _embed_functions(self, functions: List[RegisteredFunction]) -> Optional[Dict[str, List[float]]]:
+        if not self.embedding_model:
+            return None
+        texts = [
+            f"{function.name.replace('_', ' ')}: {function.description}. {', '.join(function.keywords)}"
+            for function in functions
+        ]
+        vectors = self._encode(texts)
+        return dict(zip((function.name for function in functions), vectors)) if vectors else None
+    
+    def _encode(self, texts: List[str]) -> Optional[List[List[float]]]:
+        """Normalized embeddings, or None when the local model is unavailable (blocking)."""
+        if self._encoder is None and not self._encoder_failed:
+            try:
+                from sentence_transformers import SentenceTransformer  # Optional dependency
+                self._encoder = SentenceTransformer(self.embedding_model)
+            except Exception as e:
+                self._encoder_failed = True
+                logger.warning(f"Embedding model {self.embedding_model} unavailable, using keywords only: {e}")
+        if self._encoder is None:
+            return None
+        return [list(map(float, vector)) for vector in self._encoder.encode(texts, normalize_embeddings=True)]
+
+
+def _dot(left: List[float], right: List[float]) -> float:
+    return sum(a * b for a, b in zip(left, right))
+
+
+_selector: Optional[ToolSelector] = None
+_selector_lock = threading.Lock()
+
+
+def get_tool_selector() -> ToolSelector:
+    """Get the process-wide tool selector, creating it from settings."""
+    global _selector
+    with _selector_lock:
+        if _selector is None:
+            _selector = ToolSelector()
+        return _selector
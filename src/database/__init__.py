@@ -1,7 +1,7 @@
 """Database package for the AI automation agent."""
 
 from .models import Base, User, OAuthToken, AutomationAction, FunctionCall, WebhookEvent
-from .connection import get_db, engine, SessionLocal
+from .connection import get_db, get_session, engine, SessionLocal
 
 __all__ = [
     "Base",
@@ -11,6 +11,7 @@ __all__ = [
     "FunctionCall", 
     "WebhookEvent",
     "get_db",
+    "get_session",
     "engine",
     "SessionLocal",
 ] 
\ No newline at end of file
@@ -4,7 +4,8 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.pool import StaticPool
 import logging
-from typing import Generator
+from contextlib import contextmanager
+from typing import Generator, Iterator
 
 from ..config import settings
 
@@ -43,6 +44,24 @@ def get_db() -> Generator[Session, None, None]:
         db.close()
 
 
+@contextmanager
+def get_session() -> Iterator[Session]:
+    """
+    Open a database session for the duration of a ``with`` block.
+    
+    Yields:
+        Database session, rolled back on error and always closed.
+    """
+    db = SessionLocal()
+    try:
+        yield db
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
 def create_tables():
     """Create all database tables."""
     from .models import Base
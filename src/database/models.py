@@ -21,9 +21,19 @@ class ActionStatus(enum.Enum):
     IN_PROGRESS = "in_progress"
     COMPLETED = "completed"
     FAILED = "failed"
+    CANCELLED = "cancelled"  # Skipped because a dependency failed
     ROLLED_BACK = "rolled_back"
 
 
+class JobStatus(enum.Enum):
+    """Status of a queued background job."""
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
 class ServiceType(enum.Enum):
     """Supported service types."""
     SLACK = "slack"
@@ -105,8 +115,11 @@ class AutomationAction(Base):
     completed_at = Column(DateTime(timezone=True), nullable=True)
     duration_ms = Column(Integer, nullable=True)  # Duration in milliseconds
     
+    # LLM usage
+    llm_metrics = Column(JSON, nullable=True)  # Prompt token estimates per LLM call
+    
     # Metadata
-    metadata = Column(JSON, nullable=True)  # Additional context
+    action_metadata = Column("metadata", JSON, nullable=True)  # Additional context
     
     # Relationships
     user = relationship("User", back_populates="automation_actions")
@@ -127,7 +140,7 @@ class FunctionCall(Base):
     id = Column(Integer, primary_key=True, index=True)
     automation_action_id = Column(Integer, ForeignKey("automation_actions.id"), nullable=False)
     function_name = Column(String(100), nullable=False)
-    service_type = Column(SQLEnum(ServiceType), nullable=False)
+    service_type = Column(SQLEnum(ServiceType), nullable=True)  # None for internal functions
     
     # Function call details
     parameters = Column(JSON, nullable=True)
@@ -144,6 +157,11 @@ class FunctionCall(Base):
     rollback_function = Column(String(100), nullable=True)  # Function to call for rollback
     rollback_parameters = Column(JSON, nullable=True)
     
+    # Execution graph (for replay and rollback ordering)
+    node_id = Column(String(50), nullable=True)  # e.g. "1.call_2": step 1, second call
+    depends_on = Column(JSON, nullable=True)  # Node ids this call waited for
+    graph_level = Column(Integer, nullable=True)  # Topological depth across the action
+    
     # Relationships
     automation_action = relationship("AutomationAction", back_populates="function_calls")
     
@@ -183,4 +201,83 @@ class WebhookEvent(Base):
     __table_args__ = (
         Index("idx_webhook_service_processed", "service_type", "processed"),
         Index("idx_webhook_received_at", "received_at"),
-    ) 
\ No newline at end of file
+    ) 
+
+
+class Job(Base):
+    """Command or workflow queued for asynchronous execution by a worker."""
+    __tablename__ = "jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    kind = Column(String(50), nullable=False)  # "command" or "workflow"
+    payload = Column(JSON, nullable=False)  # Command text or workflow name and inputs
+    status = Column(SQLEnum(JobStatus), default=JobStatus.QUEUED, nullable=False)
+    
+    # Retries
+    attempts = Column(Integer, default=0, nullable=False)  # Claims so far
+    max_attempts = Column(Integer, default=3, nullable=False)
+    available_at = Column(DateTime(timezone=True), nullable=False)  # Not claimed before this (retry backoff)
+    
+    # Lease held by the worker running the job; expired leases are reclaimed
+    locked_by = Column(String(100), nullable=True)
+    locked_until = Column(DateTime(timezone=True), nullable=True)
+    
+    # Outcome
+    automation_action_id = Column(Integer, ForeignKey("automation_actions.id"), nullable=True)
+    result = Column(JSON, nullable=True)
+    error_message = Column(Text, nullable=True)
+    
+    # Timing
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    started_at = Column(DateTime(timezone=True), nullable=True)  # Latest claim
+    completed_at = Column(DateTime(timezone=True), nullable=True)
+    
+    # Indexes
+    __table_args__ = (
+        Index("idx_job_claim", "status", "available_at"),
+        Index("idx_job_user_status", "user_id", "status"),
+        Index("idx_job_locked_until", "status", "locked_until"),
+    )
+
+
+class WorkerNode(Base):
+    """Job worker process, kept alive by periodic heartbeats."""
+    __tablename__ = "job_workers"
+    
+    id = Column(String(100), primary_key=True)  # host:pid:suffix, as in Job.locked_by
+    hostname = Column(String(255), nullable=False)
+    pid = Column(Integer, nullable=False)
+    concurrency = Column(Integer, nullable=False)
+    status = Column(String(20), nullable=False)  # running, draining, stopped or dead
+    
+    # Progress reported with each heartbeat
+    in_flight = Column(Integer, default=0)
+    jobs_run = Column(Integer, default=0)
+    jobs_failed = Column(Integer, default=0)
+    
+    # Timing
+    started_at = Column(DateTime(timezone=True), nullable=False)
+    last_heartbeat = Column(DateTime(timezone=True), nullable=False)
+    stopped_at = Column(DateTime(timezone=True), nullable=True)
+    
+    # Indexes
+    __table_args__ = (
+        Index("idx_worker_status_heartbeat", "status", "last_heartbeat"),
+    )
+
+
+class SlackReadWatermark(Base):
+    """Newest Slack message a user has fetched as unread, per channel."""
+    __tablename__ = "slack_read_watermarks"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    channel_id = Column(String(50), nullable=False)
+    last_ts = Column(String(32), nullable=False)  # Slack message ts, e.g. 1700000000.000100
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    # Indexes
+    __table_args__ = (
+        Index("idx_slack_watermark_user_channel", "user_id", "channel_id", unique=True),
+    )
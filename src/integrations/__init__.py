@@ -4,5 +4,9 @@ from .slack import SlackIntegration
 from .jira import JiraIntegration
 from .aws_s3 import AWSS3Integration
 from .github import GitHubIntegration
+from .registry import agent_function, function_registry
 
-__all__ = ["SlackIntegration", "JiraIntegration", "AWSS3Integration", "GitHubIntegration"] 
\ No newline at end of file
+__all__ = [
+    "SlackIntegration", "JiraIntegration", "AWSS3Integration", "GitHubIntegration",
+    "agent_function", "function_registry",
+] 
\ No newline at end of file
@@ -1,16 +1,25 @@
 """AWS S3 integration for file operations."""
 
+import asyncio
+import json
+from functools import partial
+
 import boto3
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, AsyncIterable, Optional
 from sqlalchemy.orm import Session
 
 from ..database.models import ServiceType
 from ..utils.logging import get_logger
 from .base import BaseIntegration
+from .registry import agent_function
+from .slack import SlackIntegration
 
 logger = get_logger(__name__)
 
+# S3 parts must be at least 5 MiB (except the last one)
+MULTIPART_PART_SIZE = 8 * 1024 * 1024
+
 
 class AWSS3Integration(BaseIntegration):
     """AWS S3 integration for automation workflows."""
@@ -26,6 +35,35 @@ class AWSS3Integration(BaseIntegration):
             region_name=settings.aws_region
         )
     
+    @agent_function(
+        name="upload_to_s3",
+        description="Upload content to AWS S3",
+        parameters={
+            "type": "object",
+            "properties": {
+                "content": {
+                    "type": "string",
+                    "description": "Content to upload"
+                },
+                "key": {
+                    "type": "string",
+                    "description": "S3 object key/path"
+                },
+                "content_type": {
+                    "type": "string",
+                    "description": "MIME type of the content",
+                    "default": "text/plain"
+                }
+            },
+            "required": ["content", "key"]
+        },
+        service=ServiceType.AWS_S3,
+        rollback="delete_s3_object",
+        rollback_arguments=lambda arguments, result: {"key": arguments["key"]},
+        idempotent=True,
+        consumes=("get_slack_messages", "search_github_repos", "analyze_text"),
+        keywords=("s3", "aws", "bucket", "upload", "file", "store", "save", "backup", "archive", "export")
+    )
     async def upload_content(
         self,
         content: str,
@@ -62,6 +100,138 @@ class AWSS3Integration(BaseIntegration):
             logger.error(f"Failed to upload to S3: {e}")
             raise
     
+    @agent_function(
+        name="export_slack_messages_to_s3",
+        description="Export a Slack channel's full message history (optionally a time window) to S3 as NDJSON",
+        parameters={
+            "type": "object",
+            "properties": {
+                "channel_name": {
+                    "type": "string",
+                    "description": "Name of the Slack channel (with or without #)"
+                },
+                "key": {
+                    "type": "string",
+                    "description": "S3 object key/path"
+                },
+                "oldest": {
+                    "type": "string",
+                    "description": "Only messages after this time (ISO 8601 or epoch seconds)"
+                },
+                "latest": {
+                    "type": "string",
+                    "description": "Only messages before this time (ISO 8601 or epoch seconds)"
+                }
+            },
+            "required": ["channel_name", "key"]
+        },
+        service=ServiceType.AWS_S3,
+        rollback="delete_s3_object",
+        rollback_arguments=lambda arguments, result: {"key": arguments["key"]},
+        idempotent=True,
+        keywords=("s3", "export", "archive", "backup", "history", "retro", "slack", "channel", "messages")
+    )
+    async def export_slack_messages(
+        self,
+        channel_name: str,
+        key: str,
+        oldest: Optional[str] = None,
+        latest: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Stream a channel's history into an S3 object, one message per line (newest first)."""
+        slack = SlackIntegration(self.db, self.user_id)
+        count = 0
+        
+        async def lines():
+            nonlocal count
+            async for message in slack.iter_messages(channel_name, oldest=oldest, latest=latest):
+                count += 1
+                yield (json.dumps(message, default=str) + "\n").encode("utf-8")
+        
+        result = await self.upload_stream(lines(), key, content_type="application/x-ndjson")
+        result.update({"channel": channel_name.lstrip("#"), "message_count": count})
+        return result
+    
+    async def upload_stream(
+        self,
+        chunks: AsyncIterable[bytes],
+        key: str,
+        content_type: str = "application/octet-stream"
+    ) -> Dict[str, Any]:
+        """
+        Upload a stream of bytes without holding it in memory.
+        
+        Data is sent as a multipart upload in ``MULTIPART_PART_SIZE`` parts;
+        a stream smaller than one part is uploaded with a single put. boto3
+        calls run in the default executor so they do not block the loop.
+        
+        Args:
+            chunks: Byte chunks, in order
+            key: S3 object key/path
+            content_type: MIME type of the object
+            
+        Returns:
+            Upload information, as for ``upload_content``
+        """
+        loop = asyncio.get_running_loop()
+        
+        def call(method, **kwargs):
+            return loop.run_in_executor(None, partial(method, Bucket=self.bucket_name, Key=key, **kwargs))
+        
+        metadata = {
+            'uploaded_by': f'user_{self.user_id}',
+            'upload_time': datetime.utcnow().isoformat()
+        }
+        buffer = bytearray()
+        size = 0
+        parts = []
+        upload_id = None
+        
+        async def flush():
+            part = await call(
+                self.s3_client.upload_part, UploadId=upload_id, PartNumber=len(parts) + 1, Body=bytes(buffer)
+            )
+            parts.append({"ETag": part["ETag"], "PartNumber": len(parts) + 1})
+            buffer.clear()
+        
+        try:
+            async for chunk in chunks:
+                buffer.extend(chunk)
+                size += len(chunk)
+                if len(buffer) < MULTIPART_PART_SIZE:
+                    continue
+                if upload_id is None:
+                    upload = await call(
+                        self.s3_client.create_multipart_upload, ContentType=content_type, Metadata=metadata
+                    )
+                    upload_id = upload["UploadId"]
+                await flush()
+            
+            if upload_id is None:
+                await call(self.s3_client.put_object, Body=bytes(buffer), ContentType=content_type, Metadata=metadata)
+            else:
+                if buffer:
+                    await flush()
+                await call(
+                    self.s3_client.complete_multipart_upload, UploadId=upload_id, MultipartUpload={"Parts": parts}
+                )
+        
+        except Exception as e:
+            logger.error(f"Failed to stream upload to S3: {e}")
+            if upload_id is not None:
+                await call(self.s3_client.abort_multipart_upload, UploadId=upload_id)
+            raise
+        
+        return {
+            "bucket": self.bucket_name,
+            "key": key,
+            "url": f"https://{self.bucket_name}.s3.amazonaws.com/{key}",
+            "content_type": content_type,
+            "size": size,
+            "parts": max(1, len(parts)),
+            "uploaded_at": datetime.utcnow().isoformat()
+        }
+    
     async def delete_s3_object(self, key: str) -> Dict[str, Any]:
         """Delete an S3 object (for rollback)."""
         try:
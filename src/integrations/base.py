@@ -1,10 +1,128 @@
 """Base integration class for all service integrations."""
 
+import asyncio
+import threading
 from abc import ABC, abstractmethod
 from typing import Dict, Any, Optional
+
+import httpx
 from sqlalchemy.orm import Session
 
+from ..config import settings
 from ..database.models import ServiceType
+from ..utils.http import ConnectionPoolStats, create_pooled_client
+from ..utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class _ServiceClient:
+    """A service's pooled client with its reuse counters."""
+    
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        stats: ConnectionPoolStats,
+        loop: Optional[asyncio.AbstractEventLoop]
+    ):
+        self.client = client
+        self.stats = stats
+        self.loop = loop
+        self.checkouts = 0
+
+
+class IntegrationClientRegistry:
+    """
+    Process-wide pooled httpx clients, one per service.
+    
+    Integrations are created per agent, but their requests share the
+    service's keep-alive (HTTP/2 where available) connection pool, so a
+    Slack command that looks up a channel, reads its history and resolves
+    users reuses one warm TLS connection instead of opening one per call.
+    """
+    
+    def __init__(self):
+        self._clients: Dict[ServiceType, _ServiceClient] = {}
+        self._lock = threading.Lock()
+        self.created = 0
+    
+    def get_client(self, service_type: ServiceType) -> httpx.AsyncClient:
+        """Get (or lazily create) the pooled client for ``service_type``."""
+        loop = self._current_loop()
+        with self._lock:
+            entry = self._clients.get(service_type)
+            # httpx pools are bound to the event loop that opened them; the CLI
+            # runs each command in a fresh loop, so rebuild clients whose loop closed.
+            if entry and entry.loop is not None and entry.loop is not loop and entry.loop.is_closed():
+                entry = None
+            elif entry and entry.loop is None:
+                entry.loop = loop
+            
+            if entry is None:
+                stats = ConnectionPoolStats()
+                client = create_pooled_client(
+                    max_connections=settings.integration_pool_max_connections,
+                    max_keepalive_connections=settings.integration_pool_max_keepalive,
+                    keepalive_expiry=settings.integration_pool_keepalive_expiry,
+                    timeout=self.timeout_for(service_type),
+                    http2=settings.integration_http2,
+                    stats=stats
+                )
+                entry = self._clients[service_type] = _ServiceClient(client, stats, loop)
+                self.created += 1
+                logger.info(f"Created pooled HTTP client for {service_type.value}")
+            
+            entry.checkouts += 1
+            return entry.client
+    
+    @staticmethod
+    def timeout_for(service_type: ServiceType) -> float:
+        return float(settings.integration_timeouts.get(service_type.value, settings.integration_request_timeout))
+    
+    def stats(self) -> Dict[str, Any]:
+        """Per-service request and connection reuse counters."""
+        with self._lock:
+            services = {
+                service_type.value: {
+                    "timeout": self.timeout_for(service_type),
+                    "checkouts": entry.checkouts,
+                    **entry.stats.to_dict()
+                }
+                for service_type, entry in self._clients.items()
+            }
+        return {"clients_created": self.created, "services": services}
+    
+    async def aclose(self):
+        """Close every pooled client; called on application shutdown."""
+        with self._lock:
+            entries = list(self._clients.values())
+            self._clients.clear()
+        for entry in entries:
+            try:
+                await entry.client.aclose()
+            except Exception as e:
+                logger.warning(f"Failed to close integration HTTP client: {e}")
+    
+    @staticmethod
+    def _current_loop() -> Optional[asyncio.AbstractEventLoop]:
+        try:
+            return asyncio.get_running_loop()
+        except RuntimeError:
+            return None
+
+
+# Global integration HTTP client registry
+integration_client_registry = IntegrationClientRegistry()
+
+
+async def close_integration_clients():
+    """Close all pooled integration HTTP clients."""
+    await integration_client_registry.aclose()
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """Network-level failures that an idempotent call can safely retry."""
+    return isinstance(error, (httpx.TransportError, asyncio.TimeoutError, ConnectionError))
 
 
 class BaseIntegration(ABC):
@@ -23,6 +141,11 @@ class BaseIntegration(ABC):
         self.user_id = user_id
         self.service_type = service_type
     
+    @property
+    def http(self) -> httpx.AsyncClient:
+        """The service's shared, pooled HTTP client; never close it."""
+        return integration_client_registry.get_client(self.service_type)
+    
     def log_api_call(self, method: str, endpoint: str, response_data: Dict[str, Any]):
         """Log API call for auditing purposes."""
         # This could be extended to log all API calls to the database
@@ -1,14 +1,14 @@
 """GitHub API integration with OAuth2 authentication."""
 
 from datetime import datetime
-from typing import Dict, List, Any
-import httpx
+from typing import Dict, List, Any, Set
 from sqlalchemy.orm import Session
 
 from ..database.models import ServiceType
 from ..auth.oauth2 import oauth2_manager
 from ..utils.logging import get_logger
 from .base import BaseIntegration
+from .registry import agent_function
 
 logger = get_logger(__name__)
 
@@ -20,6 +20,34 @@ class GitHubIntegration(BaseIntegration):
         super().__init__(db_session, user_id, ServiceType.GITHUB)
         self.base_url = "https://api.github.com"
     
+    @agent_function(
+        name="search_github_repos",
+        description="Search GitHub repositories",
+        parameters={
+            "type": "object",
+            "properties": {
+                "query": {
+                    "type": "string",
+                    "description": "Search query"
+                },
+                "sort": {
+                    "type": "string",
+                    "description": "Sort by: stars, forks, updated",
+                    "default": "stars"
+                },
+                "order": {
+                    "type": "string",
+                    "description": "Sort order: asc, desc",
+                    "default": "desc"
+                }
+            },
+            "required": ["query"]
+        },
+        service=ServiceType.GITHUB,
+        read_only=True,
+        idempotent=True,
+        keywords=("github", "repo", "repository", "code", "project", "library", "open source", "star", "fork")
+    )
     async def search_repositories(
         self,
         query: str,
@@ -46,40 +74,58 @@ class GitHubIntegration(BaseIntegration):
                 "per_page": 30
             }
             
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.base_url}/search/repositories",
-                    headers=headers,
-                    params=params
-                )
-                
-                if response.status_code != 200:
-                    raise Exception(f"GitHub API error: {response.status_code} - {response.text}")
-                
-                data = response.json()
-                
-                repositories = []
-                for repo in data.get("items", []):
-                    repositories.append({
-                        "name": repo["name"],
-                        "full_name": repo["full_name"],
-                        "description": repo.get("description", ""),
-                        "stars": repo["stargazers_count"],
-                        "forks": repo["forks_count"],
-                        "language": repo.get("language"),
-                        "url": repo["html_url"],
-                        "clone_url": repo["clone_url"],
-                        "created_at": repo["created_at"],
-                        "updated_at": repo["updated_at"]
-                    })
-                
-                return {
-                    "total_count": data["total_count"],
-                    "repositories": repositories,
-                    "query": query,
-                    "searched_at": datetime.utcnow().isoformat()
-                }
+            response = await self.http.get(
+                f"{self.base_url}/search/repositories",
+                headers=headers,
+                params=params
+            )
+            
+            if response.status_code != 200:
+                raise Exception(f"GitHub API error: {response.status_code} - {response.text}")
+            
+            data = response.json()
+            
+            repositories = []
+            for repo in data.get("items", []):
+                repositories.append({
+                    "name": repo["name"],
+                    "full_name": repo["full_name"],
+                    "description": repo.get("description", ""),
+                    "stars": repo["stargazers_count"],
+                    "forks": repo["forks_count"],
+                    "language": repo.get("language"),
+                    "url": repo["html_url"],
+                    "clone_url": repo["clone_url"],
+                    "created_at": repo["created_at"],
+                    "updated_at": repo["updated_at"]
+                })
+            
+            return {
+                "total_count": data["total_count"],
+                "repositories": repositories,
+                "query": query,
+                "searched_at": datetime.utcnow().isoformat()
+            }
                 
         except Exception as e:
             logger.error(f"Failed to search GitHub repositories: {e}")
-            raise 
\ No newline at end of file
+            raise 
+    
+    async def account_logins(self) -> Set[str]:
+        """Logins (lowercase) of the user and of every organization they belong to."""
+        token = await oauth2_manager.get_valid_token(
+            self.db, self.user_id, ServiceType.GITHUB
+        )
+        if not token:
+            raise Exception("No valid GitHub token found")
+        
+        headers = {
+            "Authorization": f"Bearer {token}",
+            "Accept": "application/vnd.github+json"
+        }
+        user = await self.http.get(f"{self.base_url}/user", headers=headers)
+        orgs = await self.http.get(f"{self.base_url}/user/orgs", headers=headers, params={"per_page": 100})
+        for response in (user, orgs):
+            if response.status_code != 200:
+                raise Exception(f"GitHub API error: {response.status_code} - {response.text}")
+        return {user.json()["login"].lower(), *(org["login"].lower() for org in orgs.json())}
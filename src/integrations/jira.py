@@ -2,14 +2,16 @@
 
 from datetime import datetime
 from typing import Dict, List, Any, Optional
+from urllib.parse import urlparse
 
-import httpx
 from sqlalchemy.orm import Session
 
 from ..database.models import ServiceType
 from ..auth.oauth2 import oauth2_manager
 from ..utils.logging import get_logger
 from .base import BaseIntegration
+from .registry import agent_function
+from .slack import SlackIntegration
 
 logger = get_logger(__name__)
 
@@ -22,6 +24,48 @@ class JiraIntegration(BaseIntegration):
         from ..config import settings
         self.base_url = f"{settings.jira_base_url}/rest/api/3"
     
+    @agent_function(
+        name="create_jira_ticket",
+        description="Create a new Jira ticket/issue",
+        parameters={
+            "type": "object",
+            "properties": {
+                "project_key": {
+                    "type": "string",
+                    "description": "Jira project key (e.g., 'PROJ')"
+                },
+                "summary": {
+                    "type": "string",
+                    "description": "Brief summary/title of the issue"
+                },
+                "description": {
+                    "type": "string",
+                    "description": "Detailed description of the issue"
+                },
+                "issue_type": {
+                    "type": "string",
+                    "description": "Type of issue (e.g., Bug, Task, Story)",
+                    "default": "Task"
+                },
+                "priority": {
+                    "type": "string",
+                    "description": "Priority level (Highest, High, Medium, Low, Lowest)",
+                    "default": "Medium"
+                },
+                "labels": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "Labels to add to the ticket"
+                }
+            },
+            "required": ["project_key", "summary", "description"]
+        },
+        service=ServiceType.JIRA,
+        rollback="delete_jira_ticket",
+        rollback_arguments=lambda arguments, result: {"ticket_key": result.get("key")},
+        consumes=("get_slack_messages", "search_github_repos", "analyze_text"),
+        keywords=("jira", "ticket", "issue", "bug", "task", "story", "epic", "backlog", "track", "file", "report")
+    )
     async def create_ticket(
         self,
         project_key: str,
@@ -67,34 +111,157 @@ class JiraIntegration(BaseIntegration):
             if labels:
                 payload["fields"]["labels"] = labels
             
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.base_url}/issue",
-                    headers=headers,
-                    json=payload
-                )
-                
-                if response.status_code not in [200, 201]:
-                    raise Exception(f"Jira API error: {response.status_code} - {response.text}")
-                
-                data = response.json()
-                
-                return {
-                    "key": data["key"],
-                    "id": data["id"],
-                    "self": data["self"],
-                    "summary": summary,
-                    "project_key": project_key,
-                    "issue_type": issue_type,
-                    "priority": priority,
-                    "labels": labels or [],
-                    "created_at": datetime.utcnow().isoformat()
-                }
+            response = await self.http.post(
+                f"{self.base_url}/issue",
+                headers=headers,
+                json=payload
+            )
+            
+            if response.status_code not in [200, 201]:
+                raise Exception(f"Jira API error: {response.status_code} - {response.text}")
+            
+            data = response.json()
+            
+            return {
+                "key": data["key"],
+                "id": data["id"],
+                "self": data["self"],
+                "summary": summary,
+                "project_key": project_key,
+                "issue_type": issue_type,
+                "priority": priority,
+                "labels": labels or [],
+                "created_at": datetime.utcnow().isoformat()
+            }
                 
         except Exception as e:
             logger.error(f"Failed to create Jira ticket: {e}")
             raise
     
+    @agent_function(
+        name="create_jira_tickets_from_slack",
+        description=(
+            "Scan a Slack channel's history (optionally a time window) and create one Jira ticket "
+            "per urgent message"
+        ),
+        parameters={
+            "type": "object",
+            "properties": {
+                "channel_name": {
+                    "type": "string",
+                    "description": "Name of the Slack channel (with or without #)"
+                },
+                "project_key": {
+                    "type": "string",
+                    "description": "Jira project key (e.g., 'PROJ')"
+                },
+                "oldest": {
+                    "type": "string",
+                    "description": "Only messages after this time (ISO 8601 or epoch seconds)"
+                },
+                "latest": {
+                    "type": "string",
+                    "description": "Only messages before this time (ISO 8601 or epoch seconds)"
+                },
+                "urgent_only": {
+                    "type": "boolean",
+                    "description": "Only messages with urgency keywords",
+                    "default": True
+                },
+                "max_tickets": {
+                    "type": "integer",
+                    "description": "Stop after creating this many tickets",
+                    "default": 10
+                },
+                "issue_type": {
+                    "type": "string",
+                    "description": "Type of issue (e.g., Bug, Task, Story)",
+                    "default": "Bug"
+                },
+                "priority": {
+                    "type": "string",
+                    "description": "Priority level (Highest, High, Medium, Low, Lowest)",
+                    "default": "High"
+                },
+                "labels": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "Labels to add to the tickets"
+                }
+            },
+            "required": ["channel_name", "project_key"]
+        },
+        service=ServiceType.JIRA,
+        rollback="delete_jira_tickets",
+        rollback_arguments=lambda arguments, result: {
+            "ticket_keys": [ticket["key"] for ticket in result.get("tickets", [])]
+        },
+        keywords=("jira", "ticket", "issue", "slack", "channel", "messages", "urgent", "incident", "retro", "triage")
+    )
+    async def create_tickets_from_slack(
+        self,
+        channel_name: str,
+        project_key: str,
+        oldest: Optional[str] = None,
+        latest: Optional[str] = None,
+        urgent_only: bool = True,
+        max_tickets: int = 10,
+        issue_type: str = "Bug",
+        priority: str = "High",
+        labels: List[str] = None
+    ) -> Dict[str, Any]:
+        """Stream a channel's history and file a ticket per (urgent) message, newest first."""
+        channel_name = channel_name.lstrip('#')
+        slack = SlackIntegration(self.db, self.user_id)
+        tickets = []
+        scanned = 0
+        error = None
+        try:
+            async for message in slack.iter_messages(channel_name, oldest=oldest, latest=latest):
+                if len(tickets) >= max_tickets:
+                    break
+                scanned += 1
+                if not message["text"] or (urgent_only and not message["has_urgency_keywords"]):
+                    continue
+                first_line = message["text"].strip().splitlines()[0]
+                ticket = await self.create_ticket(
+                    project_key=project_key,
+                    summary=f"[#{channel_name}] {first_line[:200]}",
+                    description=(
+                        f"Reported in #{channel_name} by {message['user_name']} at {message['timestamp']}:\n\n"
+                        f"{message['text']}"
+                    ),
+                    issue_type=issue_type,
+                    priority=priority,
+                    labels=labels
+                )
+                tickets.append({"key": ticket["key"], "message_ts": message["ts"], "summary": ticket["summary"]})
+        except Exception as e:
+            # Tickets created so far are still reported, so they can be rolled back
+            logger.error(f"Failed to create Jira tickets from #{channel_name} after {len(tickets)} ticket(s): {e}")
+            if not tickets:
+                raise
+            error = str(e)
+        
+        return {
+            "channel": channel_name,
+            "project_key": project_key,
+            "messages_scanned": scanned,
+            "ticket_count": len(tickets),
+            "tickets": tickets,
+            "error": error,
+            "created_at": datetime.utcnow().isoformat()
+        }
+    
+    async def delete_jira_tickets(self, ticket_keys: List[str]) -> Dict[str, Any]:
+        """Delete several Jira tickets (for rollback)."""
+        results = [await self.delete_jira_ticket(ticket_key) for ticket_key in ticket_keys]
+        return {
+            "deleted": True,
+            "ticket_keys": [result["ticket_key"] for result in results],
+            "deleted_at": datetime.utcnow().isoformat()
+        }
+    
     async def delete_jira_ticket(self, ticket_key: str) -> Dict[str, Any]:
         """Delete a Jira ticket (for rollback)."""
         try:
@@ -109,21 +276,29 @@ class JiraIntegration(BaseIntegration):
                 "Content-Type": "application/json"
             }
             
-            async with httpx.AsyncClient() as client:
-                response = await client.delete(
-                    f"{self.base_url}/issue/{ticket_key}",
-                    headers=headers
-                )
-                
-                if response.status_code != 204:
-                    raise Exception(f"Failed to delete ticket: {response.status_code}")
-                
-                return {
-                    "deleted": True,
-                    "ticket_key": ticket_key,
-                    "deleted_at": datetime.utcnow().isoformat()
-                }
+            response = await self.http.delete(
+                f"{self.base_url}/issue/{ticket_key}",
+                headers=headers
+            )
+            
+            if response.status_code != 204:
+                raise Exception(f"Failed to delete ticket: {response.status_code}")
+            
+            return {
+                "deleted": True,
+                "ticket_key": ticket_key,
+                "deleted_at": datetime.utcnow().isoformat()
+            }
                 
         except Exception as e:
             logger.error(f"Failed to delete Jira ticket: {e}")
-            raise 
\ No newline at end of file
+            raise 
+    
+    async def site(self) -> str:
+        """Host of the Jira site, once the user has connected Jira."""
+        token = await oauth2_manager.get_valid_token(
+            self.db, self.user_id, ServiceType.JIRA
+        )
+        if not token:
+            raise Exception("No valid Jira token found")
+        return urlparse(self.base_url).netloc
@@ -0,0 +1,216 @@
+"""Declarative registry of the functions the agent can call."""
+
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple
+
+from ..database.models import ServiceType
+from ..utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+_JSON_TYPES: Dict[str, Tuple[type, ...]] = {
+    "string": (str,),
+    "integer": (int,),
+    "number": (int, float),
+    "boolean": (bool,),
+    "array": (list,),
+    "object": (dict,),
+}
+
+RollbackArguments = Callable[[Dict[str, Any], Any], Dict[str, Any]]
+
+
+class ArgumentValidator:
+    """
+    Validator compiled once from a function's JSON schema.
+    
+    Checks required arguments and top-level types (plus array item types),
+    applies schema defaults and drops arguments the schema doesn't declare,
+    so the result can be passed straight to the handler as keyword
+    arguments.
+    """
+    
+    def __init__(self, function_name: str, schema: Dict[str, Any]):
+        self.function_name = function_name
+        properties = schema.get("properties", {})
+        self.required: FrozenSet[str] = frozenset(schema.get("required", []))
+        self.fields: List[Tuple[str, Tuple[type, ...], Optional[Tuple[type, ...]], bool, Any]] = []
+        for name, spec in properties.items():
+            items = spec.get("items", {}).get("type") if spec.get("type") == "array" else None
+            self.fields.append((
+                name,
+                _JSON_TYPES.get(spec.get("type"), (object,)),
+                _JSON_TYPES.get(items) if items else None,
+                "default" in spec,
+                spec.get("default")
+            ))
+        self.known = frozenset(properties)
+    
+    def __call__(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        if not isinstance(arguments, dict):
+            raise ValueError(f"Invalid arguments for {self.function_name}: expected an object")
+        
+        missing = self.required.difference(arguments)
+        if missing:
+            raise ValueError(f"Invalid arguments for {self.function_name}: missing {', '.join(sorted(missing))}")
+        
+        validated = {}
+        for name, types, item_types, has_default, default in self.fields:
+            if name not in arguments or arguments[name] is None:
+                if has_default:
+                    validated[name] = default
+                continue
+            value = arguments[name]
+            # bool is an int subclass; don't let true/false pass as numbers
+            if not isinstance(value, types) or (isinstance(value, bool) and bool not in types):
+                if types == (int,) and isinstance(value, str) and value.strip().lstrip("-").isdigit():
+                    value = int(value)
+                else:
+                    raise ValueError(
+                        f"Invalid arguments for {self.function_name}: {name} must be {types[0].__name__}"
+                    )
+            if item_types and any(not isinstance(item, item_types) for item in value):
+                raise ValueError(
+                    f"Invalid arguments for {self.function_name}: {name} items must be {item_types[0].__name__}"
+                )
+            validated[name] = value
+        
+        unknown = set(arguments).difference(self.known)
+        if unknown:
+            logger.warning(f"Ignoring undeclared arguments for {self.function_name}: {', '.join(sorted(unknown))}")
+        return validated
+
+
+@dataclass
+class RegisteredFunction:
+    """A callable tool and everything the agent needs to know about it."""
+    name: str
+    description: str
+    parameters: Dict[str, Any]
+    method_name: str
+    service: Optional[ServiceType] = None  # None: handled by the agent itself
+    rollback: Optional[str] = None
+    rollback_arguments: Optional[RollbackArguments] = None
+    read_only: bool = False
+    idempotent: bool = False
+    consumes: FrozenSet[str] = frozenset()
+    keywords: Tuple[str, ...] = ()
+    core: bool = False
+    validator: ArgumentValidator = field(init=False, repr=False)
+    
+    def __post_init__(self):
+        self.validator = ArgumentValidator(self.name, self.parameters)
+    
+    @property
+    def definition(self) -> Dict[str, Any]:
+        """OpenAI function definition."""
+        return {"name": self.name, "description": self.description, "parameters": self.parameters}
+    
+    def validate(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        return self.validator(arguments)
+
+
+class FunctionRegistry:
+    """
+    Name-indexed registry of agent functions.
+    
+    Entries are registered at import time by the ``@agent_function``
+    decorator. ``definitions()`` is built once and returns the same list
+    until the registry changes, so the LLM layer can reuse its serialized
+    form; ``version`` is bumped on every change so dependent caches can
+    invalidate themselves.
+    """
+    
+    def __init__(self):
+        self._functions: Dict[str, RegisteredFunction] = {}
+        self._lock = threading.Lock()
+        self.version = 0
+        self._definitions: Optional[List[Dict[str, Any]]] = None
+    
+    def register(self, function: RegisteredFunction):
+        with self._lock:
+            if function.name in self._functions:
+                logger.warning(f"Replacing registered function {function.name}")
+            self._functions[function.name] = function
+            self.version += 1
+            self._definitions = None
+    
+    def get(self, name: str) -> Optional[RegisteredFunction]:
+        return self._functions.get(name)
+    
+    def names(self) -> List[str]:
+        return list(self._functions)
+    
+    def consumes(self, name: str) -> FrozenSet[str]:
+        function = self._functions.get(name)
+        return function.consumes if function else frozenset()
+    
+    def definitions(self) -> List[Dict[str, Any]]:
+        """Function definitions for every registered function (shared list, do not mutate)."""
+        definitions = self._definitions
+        if definitions is None:
+            with self._lock:
+                definitions = self._definitions = [function.definition for function in self._functions.values()]
+        return definitions
+
+
+function_registry = FunctionRegistry()
+
+
+def agent_function(
+    name: str,
+    description: str,
+    parameters: Dict[str, Any],
+    service: Optional[ServiceType] = None,
+    rollback: Optional[str] = None,
+    rollback_arguments: Optional[RollbackArguments] = None,
+    read_only: bool = False,
+    idempotent: bool = False,
+    consumes: Tuple[str, ...] = (),
+    keywords: Tuple[str, ...] = (),
+    core: bool = False
+):
+    """
+    Register an integration (or agent) method as a callable function.
+    
+    Args:
+        name: Function name exposed to the model
+        description: Description exposed to the model
+        parameters: JSON schema of the arguments; property names must match
+            the method's keyword arguments
+        service: Integration the method belongs to, or None for agent methods
+        rollback: Name of the method on the same integration that undoes a call
+        rollback_arguments: Builds the rollback kwargs from (arguments, result)
+        read_only: The call has no side effects; such functions cannot declare
+            a rollback, and cached plans made of them replay at the normal
+            confidence
+        idempotent: Repeating the call with the same arguments is harmless;
+            such calls are retried after network errors
+        consumes: Functions whose output this one typically acts on; used to
+            infer execution order when calls carry no explicit references
+        keywords: Words and aliases users say when they need this function;
+            used to pick the functions sent with a command
+        core: Always send this function, whatever the command
+    """
+    if read_only and rollback:
+        raise ValueError(f"Read-only function {name} has nothing to roll back")
+    
+    def decorator(method):
+        function_registry.register(RegisteredFunction(
+            name=name,
+            description=description,
+            parameters=parameters,
+            method_name=method.__name__,
+            service=service,
+            rollback=rollback,
+            rollback_arguments=rollback_arguments,
+            read_only=read_only,
+            idempotent=idempotent,
+            consumes=frozenset(consumes),
+            keywords=tuple(keywords),
+            core=core
+        ))
+        return method
+    return decorator
+
@@ -1,19 +1,44 @@
 """Slack API integration with OAuth2 authentication."""
 
-from datetime import datetime
-from typing import Dict, List, Any, Optional
+from collections import deque
+from datetime import datetime, timezone
+from typing import Dict, List, Any, AsyncIterator, Optional, Tuple, Union
 import re
+import time
 
-import httpx
 from sqlalchemy.orm import Session
 
-from ..database.models import ServiceType
+from ..config import settings
+from ..database.models import ServiceType, SlackReadWatermark
 from ..auth.oauth2 import oauth2_manager
 from ..utils.logging import get_logger
 from .base import BaseIntegration
+from .registry import agent_function
+from .slack_directory import get_slack_directory, slack_api_get, slack_api_pages
 
 logger = get_logger(__name__)
 
+# conversations.history returns at most 999 messages per call
+HISTORY_PAGE_MAX = 999
+
+
+def slack_ts(value: Optional[Union[str, int, float]]) -> Optional[str]:
+    """
+    Normalize a time bound to a Slack timestamp string.
+    
+    Accepts Slack timestamps, epoch seconds and ISO 8601 datetimes (naive
+    ones are taken as UTC).
+    """
+    if value is None or value == "":
+        return None
+    try:
+        return f"{float(value):.6f}"
+    except ValueError:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return f"{parsed.timestamp():.6f}"
+
 
 class SlackIntegration(BaseIntegration):
     """Slack API integration for automation workflows."""
@@ -22,30 +47,76 @@ class SlackIntegration(BaseIntegration):
         super().__init__(db_session, user_id, ServiceType.SLACK)
         self.base_url = "https://slack.com/api"
     
+    @agent_function(
+        name="get_slack_messages",
+        description="Get messages from a Slack channel",
+        parameters={
+            "type": "object",
+            "properties": {
+                "channel_name": {
+                    "type": "string",
+                    "description": "Name of the Slack channel (with or without #)"
+                },
+                "limit": {
+                    "type": "integer",
+                    "description": "Number of messages to retrieve (default: 50)",
+                    "default": 50
+                },
+                "unread_only": {
+                    "type": "boolean",
+                    "description": "Only get messages newer than the channel's read marker",
+                    "default": False
+                },
+                "oldest": {
+                    "type": "string",
+                    "description": "Only messages after this time (Slack ts, epoch seconds or ISO 8601)"
+                },
+                "latest": {
+                    "type": "string",
+                    "description": "Only messages before this time (Slack ts, epoch seconds or ISO 8601)"
+                }
+            },
+            "required": ["channel_name"]
+        },
+        service=ServiceType.SLACK,
+        read_only=True,
+        idempotent=True,
+        keywords=("slack", "channel", "message", "chat", "thread", "conversation", "unread", "team", "posted")
+    )
     async def get_messages(
         self, 
         channel_name: str, 
         limit: int = 50, 
-        unread_only: bool = False
+        unread_only: bool = False,
+        oldest: Optional[str] = None,
+        latest: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Get messages from a Slack channel.
         
+        The time window is applied by Slack, so only matching messages are
+        transferred. With ``unread_only`` the window starts at the later of
+        the channel's ``last_read`` marker and this user's watermark, and
+        the *oldest* ``limit`` unread messages are returned; the watermark
+        then advances to the newest of them, so repeated calls page forward
+        through the backlog (``has_more`` says whether any is left) without
+        skipping messages. Channels with no read marker start
+        ``slack_unread_default_window_hours`` back, and a backlog longer than
+        ``slack_unread_max_pages`` history pages is read from its newest
+        pages only.
+        
         Args:
             channel_name: Name of the channel (with or without #)
             limit: Number of messages to retrieve
-            unread_only: Only get unread messages
+            unread_only: Only get messages newer than the read marker
+            oldest: Only messages after this time (Slack ts, epoch seconds or ISO 8601)
+            latest: Only messages before this time (same formats)
             
         Returns:
             Dictionary containing messages and metadata
         """
         try:
-            # Get valid access token
-            token = await oauth2_manager.get_valid_token(
-                self.db, self.user_id, ServiceType.SLACK
-            )
-            if not token:
-                raise Exception("No valid Slack token found. Please authenticate first.")
+            token = await self._get_token()
             
             # Clean channel name
             channel_name = channel_name.lstrip('#')
@@ -55,61 +126,80 @@ class SlackIntegration(BaseIntegration):
             if not channel_id:
                 raise Exception(f"Channel '{channel_name}' not found")
             
-            # Get messages
-            headers = {
-                "Authorization": f"Bearer {token}",
-                "Content-Type": "application/json"
-            }
+            oldest = slack_ts(oldest)
+            latest = slack_ts(latest)
+            if unread_only:
+                read_marker = await self._read_marker(token, channel_id)
+                if read_marker and (not oldest or float(read_marker) > float(oldest)):
+                    oldest = read_marker
+                elif not read_marker and not oldest:
+                    oldest = slack_ts(time.time() - settings.slack_unread_default_window_hours * 3600)
             
-            params = {
-                "channel": channel_id,
-                "limit": min(limit, 1000),  # Slack API limit
-                "include_all_metadata": True
-            }
+            if unread_only:
+                messages, has_more = await self._oldest_messages(token, channel_id, oldest, latest, limit)
+                if messages:
+                    self._advance_watermark(channel_id, max((msg["ts"] for msg in messages), key=float))
+            else:
+                messages = []
+                has_more = False
+                async for data in self._history_pages(token, channel_id, oldest, latest, page_size=limit):
+                    page = data.get("messages", [])
+                    taken = page[:limit - len(messages)]
+                    messages.extend(taken)
+                    if len(messages) >= limit:
+                        has_more = data.get("has_more", False) or len(page) > len(taken)
+                        break
             
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.base_url}/conversations.history",
-                    headers=headers,
-                    params=params
-                )
-                
-                if response.status_code != 200:
-                    raise Exception(f"Slack API error: {response.status_code} - {response.text}")
-                
-                data = response.json()
-                
-                if not data.get("ok"):
-                    raise Exception(f"Slack API error: {data.get('error')}")
-                
-                messages = data.get("messages", [])
-                
-                # Filter for unread messages if requested
-                if unread_only:
-                    # This would require additional API calls to get user's read status
-                    # For now, we'll return recent messages (last hour)
-                    one_hour_ago = datetime.utcnow().timestamp() - 3600
-                    messages = [
-                        msg for msg in messages 
-                        if float(msg.get("ts", 0)) > one_hour_ago
-                    ]
-                
-                # Enrich messages with user information
-                enriched_messages = await self._enrich_messages(token, messages)
-                
-                return {
-                    "channel": channel_name,
-                    "channel_id": channel_id,
-                    "message_count": len(enriched_messages),
-                    "messages": enriched_messages,
-                    "has_more": data.get("has_more", False),
-                    "retrieved_at": datetime.utcnow().isoformat()
-                }
+            # Enrich messages with user information
+            enriched_messages = await self._enrich_messages(token, messages)
+            
+            return {
+                "channel": channel_name,
+                "channel_id": channel_id,
+                "message_count": len(enriched_messages),
+                "messages": enriched_messages,
+                "has_more": has_more,
+                "oldest": oldest,
+                "latest": latest,
+                "retrieved_at": datetime.utcnow().isoformat()
+            }
                 
         except Exception as e:
             logger.error(f"Failed to get Slack messages: {e}")
             raise
     
+    async def iter_messages(
+        self,
+        channel_name: str,
+        oldest: Optional[str] = None,
+        latest: Optional[str] = None,
+        page_size: int = 200
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream a channel's history, newest first, one page at a time.
+        
+        Pages are fetched lazily as the consumer iterates and enriched one
+        at a time, so memory stays at one page whatever the channel size.
+        
+        Args:
+            channel_name: Name of the channel (with or without #)
+            oldest: Only messages after this time (Slack ts, epoch seconds or ISO 8601)
+            latest: Only messages before this time (same formats)
+            page_size: Messages per conversations.history call
+            
+        Yields:
+            Enriched messages, in the format of ``get_messages``
+        """
+        token = await self._get_token()
+        channel_name = channel_name.lstrip('#')
+        channel_id = await self._get_channel_id(token, channel_name)
+        if not channel_id:
+            raise Exception(f"Channel '{channel_name}' not found")
+        
+        async for data in self._history_pages(token, channel_id, slack_ts(oldest), slack_ts(latest), page_size):
+            for message in await self._enrich_messages(token, data.get("messages", [])):
+                yield message
+    
     async def send_message(
         self, 
         channel_name: str, 
@@ -150,24 +240,23 @@ class SlackIntegration(BaseIntegration):
             if thread_ts:
                 payload["thread_ts"] = thread_ts
             
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.base_url}/chat.postMessage",
-                    headers=headers,
-                    json=payload
-                )
-                
-                data = response.json()
-                
-                if not data.get("ok"):
-                    raise Exception(f"Failed to send message: {data.get('error')}")
-                
-                return {
-                    "message_ts": data.get("ts"),
-                    "channel": channel_name,
-                    "text": text,
-                    "sent_at": datetime.utcnow().isoformat()
-                }
+            response = await self.http.post(
+                f"{self.base_url}/chat.postMessage",
+                headers=headers,
+                json=payload
+            )
+            
+            data = response.json()
+            
+            if not data.get("ok"):
+                raise Exception(f"Failed to send message: {data.get('error')}")
+            
+            return {
+                "message_ts": data.get("ts"),
+                "channel": channel_name,
+                "text": text,
+                "sent_at": datetime.utcnow().isoformat()
+            }
                 
         except Exception as e:
             logger.error(f"Failed to send Slack message: {e}")
@@ -204,24 +293,23 @@ class SlackIntegration(BaseIntegration):
                 "ts": message_ts
             }
             
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.base_url}/chat.delete",
-                    headers=headers,
-                    json=payload
-                )
-                
-                data = response.json()
-                
-                if not data.get("ok"):
-                    raise Exception(f"Failed to delete message: {data.get('error')}")
-                
-                return {
-                    "deleted": True,
-                    "message_ts": message_ts,
-                    "channel": channel_name,
-                    "deleted_at": datetime.utcnow().isoformat()
-                }
+            response = await self.http.post(
+                f"{self.base_url}/chat.delete",
+                headers=headers,
+                json=payload
+            )
+            
+            data = response.json()
+            
+            if not data.get("ok"):
+                raise Exception(f"Failed to delete message: {data.get('error')}")
+            
+            return {
+                "deleted": True,
+                "message_ts": message_ts,
+                "channel": channel_name,
+                "deleted_at": datetime.utcnow().isoformat()
+            }
                 
         except Exception as e:
             logger.error(f"Failed to delete Slack message: {e}")
@@ -236,75 +324,107 @@ class SlackIntegration(BaseIntegration):
             if not token:
                 raise Exception("No valid Slack token found")
             
-            headers = {
-                "Authorization": f"Bearer {token}",
-                "Content-Type": "application/json"
-            }
-            
-            params = {
-                "exclude_archived": True,
-                "types": "public_channel,private_channel"
-            }
-            
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.base_url}/conversations.list",
-                    headers=headers,
-                    params=params
-                )
-                
-                data = response.json()
-                
-                if not data.get("ok"):
-                    raise Exception(f"Failed to get channels: {data.get('error')}")
-                
-                channels = data.get("channels", [])
-                
-                return [
-                    {
-                        "id": channel["id"],
-                        "name": channel["name"],
-                        "is_private": channel.get("is_private", False),
-                        "member_count": channel.get("num_members", 0),
-                        "purpose": channel.get("purpose", {}).get("value", ""),
-                        "topic": channel.get("topic", {}).get("value", "")
-                    }
-                    for channel in channels
-                ]
+            return await get_slack_directory().channels(self, token)
                 
         except Exception as e:
             logger.error(f"Failed to get Slack channels: {e}")
             raise
     
     async def _get_channel_id(self, token: str, channel_name: str) -> Optional[str]:
-        """Get channel ID by name."""
-        headers = {
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json"
-        }
-        
+        """Get channel ID by name from the workspace's cached channel directory."""
+        return await get_slack_directory().channel_id(self, token, channel_name)
+    
+    async def workspace_id(self) -> str:
+        """Team id of the workspace this user's Slack token belongs to."""
+        token = await self._get_token()
+        return (await get_slack_directory().workspace(self, token)).team_id
+    
+    async def _get_token(self) -> str:
+        token = await oauth2_manager.get_valid_token(
+            self.db, self.user_id, ServiceType.SLACK
+        )
+        if not token:
+            raise Exception("No valid Slack token found. Please authenticate first.")
+        return token
+    
+    def _history_pages(
+        self,
+        token: str,
+        channel_id: str,
+        oldest: Optional[str] = None,
+        latest: Optional[str] = None,
+        page_size: int = 200
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Raw conversations.history pages, following cursors until the window is exhausted."""
         params = {
-            "exclude_archived": True,
-            "types": "public_channel,private_channel"
+            "channel": channel_id,
+            "limit": max(1, min(page_size, HISTORY_PAGE_MAX)),
+            "include_all_metadata": True
         }
+        if oldest:
+            params["oldest"] = oldest
+        if latest:
+            params["latest"] = latest
+        return slack_api_pages(self, token, "conversations.history", params)
+    
+    async def _oldest_messages(
+        self,
+        token: str,
+        channel_id: str,
+        oldest: Optional[str],
+        latest: Optional[str],
+        limit: int
+    ) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        The ``limit`` oldest messages of a window (newest first), and whether there are more.
         
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.base_url}/conversations.list",
-                headers=headers,
-                params=params
-            )
-            
-            data = response.json()
-            
-            if not data.get("ok"):
-                return None
-            
-            for channel in data.get("channels", []):
-                if channel["name"] == channel_name:
-                    return channel["id"]
-            
-            return None
+        History only pages from the newest message back, so the window is
+        read back to its start and the oldest ``limit`` messages kept. At
+        most ``slack_unread_max_pages`` pages are read; past that, messages
+        older than the last page are skipped.
+        """
+        kept: deque = deque(maxlen=limit)
+        seen = 0
+        pages = 0
+        async for data in self._history_pages(token, channel_id, oldest, latest, page_size=max(limit, 200)):
+            page = data.get("messages", [])
+            kept.extend(page)
+            seen += len(page)
+            pages += 1
+            if pages >= settings.slack_unread_max_pages and data.get("has_more"):
+                logger.warning(f"Unread backlog of {channel_id} exceeds {pages} history pages; skipping older messages")
+                return list(kept), True
+        return list(kept), seen > len(kept)
+    
+    async def _read_marker(self, token: str, channel_id: str) -> Optional[str]:
+        """Later of the channel's ``last_read`` and this user's watermark, if any."""
+        data = await slack_api_get(self, token, "conversations.info", {"channel": channel_id})
+        markers = [data.get("channel", {}).get("last_read")]
+        watermark = self.db.query(SlackReadWatermark).filter(
+            SlackReadWatermark.user_id == self.user_id,
+            SlackReadWatermark.channel_id == channel_id
+        ).first()
+        if watermark:
+            markers.append(watermark.last_ts)
+        # Channels never read report last_read "0000000000.000000"
+        markers = [marker for marker in markers if marker and float(marker) > 0]
+        return max(markers, key=float) if markers else None
+    
+    def _advance_watermark(self, channel_id: str, ts: str):
+        try:
+            watermark = self.db.query(SlackReadWatermark).filter(
+                SlackReadWatermark.user_id == self.user_id,
+                SlackReadWatermark.channel_id == channel_id
+            ).first()
+            if watermark is None:
+                self.db.add(SlackReadWatermark(user_id=self.user_id, channel_id=channel_id, last_ts=ts))
+            elif float(ts) > float(watermark.last_ts):
+                watermark.last_ts = ts
+            self.db.commit()
+        except Exception as e:
+            # The messages were fetched; the next call just re-reads them
+            self.db.rollback()
+            logger.warning(f"Failed to update Slack read watermark for {channel_id}: {e}")
     
     async def _enrich_messages(self, token: str, messages: List[Dict]) -> List[Dict[str, Any]]:
         """Enrich messages with user information."""
@@ -346,40 +466,8 @@ class SlackIntegration(BaseIntegration):
         return enriched
     
     async def _get_users_info(self, token: str, user_ids: List[str]) -> Dict[str, Dict]:
-        """Get user information for multiple users."""
-        user_info = {}
-        
-        headers = {
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json"
-        }
-        
-        # Slack API allows up to 50 users per request
-        for i in range(0, len(user_ids), 50):
-            batch = user_ids[i:i+50]
-            
-            params = {
-                "users": ",".join(batch)
-            }
-            
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.base_url}/users.info",
-                    headers=headers,
-                    params=params
-                )
-                
-                data = response.json()
-                
-                if data.get("ok") and "user" in data:
-                    user = data["user"]
-                    user_info[user["id"]] = {
-                        "real_name": user.get("real_name", ""),
-                        "display_name": user.get("profile", {}).get("display_name", ""),
-                        "email": user.get("profile", {}).get("email", "")
-                    }
-        
-        return user_info
+        """Get user information for multiple users from the workspace's cached user directory."""
+        return await get_slack_directory().users(self, token, user_ids)
     
     def _check_urgency_keywords(self, text: str) -> bool:
         """Check if message contains urgency keywords."""
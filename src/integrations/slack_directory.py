@@ -0,0 +1,504 @@
+"""Per-workspace Slack directory: channel and user lookups without an API call each time."""
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Any, AsyncIterator, Awaitable, Callable, Hashable, Optional, Tuple, TYPE_CHECKING
+
+from ..config import settings
+from ..utils.logging import get_logger
+
+if TYPE_CHECKING:
+    from .slack import SlackIntegration
+
+logger = get_logger(__name__)
+
+# Events that change the channel list; group_* are their private-channel twins
+CHANNEL_EVENTS = {
+    "channel_created", "channel_rename", "channel_archive", "channel_unarchive", "channel_deleted",
+    "group_rename", "group_archive", "group_unarchive", "group_deleted"
+}
+USER_EVENTS = {"user_change", "team_join"}
+
+# Load key of the workspace-wide user list; channel loads are keyed by app user id
+USERS_LOAD = "users"
+
+
+def _channel_record(channel: Dict[str, Any], is_private: Optional[bool] = None) -> Dict[str, Any]:
+    return {
+        "id": channel["id"],
+        "name": channel["name"],
+        "is_private": channel.get("is_private", False) if is_private is None else is_private,
+        "member_count": channel.get("num_members", 0),
+        "purpose": channel.get("purpose", {}).get("value", ""),
+        "topic": channel.get("topic", {}).get("value", "")
+    }
+
+
+def _user_record(user: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "real_name": user.get("real_name", ""),
+        "display_name": user.get("profile", {}).get("display_name", ""),
+        "email": user.get("profile", {}).get("email", "")
+    }
+
+
+async def slack_api_get(
+    integration: "SlackIntegration",
+    token: str,
+    method: str,
+    params: Dict[str, Any],
+    max_attempts: int = 3
+) -> Dict[str, Any]:
+    """
+    Call a Slack Web API read method on the integration's pooled client.
+    
+    Rate-limited calls (HTTP 429) are retried after ``Retry-After``.
+    
+    Returns:
+        The decoded response of an ``ok`` call
+    """
+    headers = {
+        "Authorization": f"Bearer {token}",
+        "Content-Type": "application/json"
+    }
+    for attempt in range(max_attempts):
+        response = await integration.http.get(f"{integration.base_url}/{method}", headers=headers, params=params)
+        if response.status_code == 429 and attempt + 1 < max_attempts:
+            await asyncio.sleep(integration.handle_rate_limit(response.headers) or 1)
+            continue
+        if response.status_code != 200:
+            raise Exception(f"Slack API error: {response.status_code} - {response.text}")
+        data = response.json()
+        if not data.get("ok"):
+            raise Exception(f"Slack API error: {data.get('error')}")
+        return data
+    raise Exception(f"Slack API rate limit exceeded for {method}")
+
+
+async def slack_api_pages(
+    integration: "SlackIntegration",
+    token: str,
+    method: str,
+    params: Dict[str, Any]
+) -> AsyncIterator[Dict[str, Any]]:
+    """Yield every page of a cursor-paginated Slack list method."""
+    cursor = None
+    while True:
+        data = await slack_api_get(integration, token, method, {**params, "cursor": cursor} if cursor else params)
+        yield data
+        cursor = data.get("response_metadata", {}).get("next_cursor")
+        if not cursor:
+            return
+
+
+class WorkspaceDirectory:
+    """
+    Channels and users of one Slack workspace.
+    
+    Public channels are shared by every user of the workspace. Private
+    channels are kept per user, as only members can see them, and a
+    user's own full load is what makes their entry fresh. User profiles
+    are kept in LRU order, stamped with when they were fetched.
+    """
+    
+    def __init__(self, team_id: str):
+        self.team_id = team_id
+        self.public: Dict[str, Dict[str, Any]] = {}
+        self.private: Dict[int, Dict[str, Dict[str, Any]]] = {}
+        self.loaded_at: Dict[Hashable, float] = {}
+        self.loads: Dict[Hashable, asyncio.Task] = {}
+        self.users: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self.user_fetches: Dict[str, asyncio.Task] = {}
+    
+    def put_user(
+        self,
+        user_id: str,
+        profile: Dict[str, Any],
+        max_entries: int,
+        fetched_at: Optional[float] = None
+    ) -> int:
+        """Store a profile; returns how many least recently used profiles were dropped."""
+        self.users[user_id] = (profile, fetched_at if fetched_at is not None else time.monotonic())
+        self.users.move_to_end(user_id)
+        evicted = 0
+        while len(self.users) > max_entries:
+            self.users.popitem(last=False)
+            evicted += 1
+        return evicted
+    
+    def lookup(self, user_id: int, name: str) -> Optional[Dict[str, Any]]:
+        return self.private.get(user_id, {}).get(name) or self.public.get(name)
+    
+    def channels(self, user_id: int) -> List[Dict[str, Any]]:
+        return list(self.public.values()) + list(self.private.get(user_id, {}).values())
+    
+    def replace(self, user_id: int, channels: List[Dict[str, Any]]):
+        self.public = {channel["name"]: channel for channel in channels if not channel["is_private"]}
+        self.private[user_id] = {channel["name"]: channel for channel in channels if channel["is_private"]}
+        self.loaded_at[user_id] = time.monotonic()
+    
+    def upsert(self, channel: Dict[str, Any]):
+        """Add a channel or rename it in place, wherever it is known."""
+        maps = [self.public] if not channel["is_private"] else [
+            channels for channels in self.private.values()
+            if any(known["id"] == channel["id"] for known in channels.values())
+        ]
+        for channels in maps:
+            previous = next((known for known in channels.values() if known["id"] == channel["id"]), None)
+            if previous is not None:
+                del channels[previous["name"]]
+                channel = {**previous, "name": channel["name"]}
+            channels[channel["name"]] = channel
+    
+    def remove(self, channel_id: str):
+        for channels in [self.public, *self.private.values()]:
+            for name in [name for name, channel in channels.items() if channel["id"] == channel_id]:
+                del channels[name]
+
+
+class SlackDirectory:
+    """
+    Process-wide cache of Slack directories, one per workspace.
+    
+    Channels: a user's first lookup loads every page of
+    ``conversations.list`` (the old lookup read only the first page, so
+    channels past it were "not found"); after that, name lookups are
+    dictionary hits. An unknown name triggers a reload at most every
+    ``miss_reload_interval`` seconds.
+    
+    Users: the first lookup in a workspace loads every page of
+    ``users.list``; profiles not in it (or older than ``user_ttl``) are
+    fetched with ``users.info``, ``user_fetch_concurrency`` at a time.
+    At most ``user_max_entries`` profiles are kept per workspace.
+    
+    Each token's workspace is found once with ``auth.test`` and remembered
+    for the ``token_max_entries`` most recently used tokens, as refreshed
+    OAuth tokens keep arriving.
+    
+    Loads older than ``refresh_after`` seconds are served while a
+    background task repeats them, and repeated before answering once
+    older than their TTL. Channel and user webhook events update the
+    directory in place.
+    """
+    
+    def __init__(
+        self,
+        ttl: Optional[float] = None,
+        refresh_after: Optional[float] = None,
+        miss_reload_interval: Optional[float] = None,
+        user_ttl: Optional[float] = None,
+        user_max_entries: Optional[int] = None,
+        user_fetch_concurrency: Optional[int] = None,
+        token_max_entries: Optional[int] = None
+    ):
+        self.ttl = ttl if ttl is not None else settings.slack_channel_ttl_seconds
+        self.refresh_after = (
+            refresh_after if refresh_after is not None else settings.slack_directory_refresh_after_seconds
+        )
+        self.miss_reload_interval = (
+            miss_reload_interval if miss_reload_interval is not None else settings.slack_directory_miss_reload_seconds
+        )
+        self.user_ttl = user_ttl if user_ttl is not None else settings.slack_user_ttl_seconds
+        self.user_max_entries = user_max_entries if user_max_entries is not None else settings.slack_user_max_entries
+        self.user_fetch_concurrency = (
+            user_fetch_concurrency if user_fetch_concurrency is not None else settings.slack_user_fetch_concurrency
+        )
+        self.token_max_entries = (
+            token_max_entries if token_max_entries is not None else settings.slack_token_max_entries
+        )
+        self._workspaces: Dict[str, WorkspaceDirectory] = {}
+        self._team_ids: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        
+        self.channel_lookups = 0
+        self.channel_hits = 0
+        self.channel_loads = 0
+        self.channel_pages = 0
+        self.user_lookups = 0
+        self.user_hits = 0
+        self.user_loads = 0
+        self.user_pages = 0
+        self.user_fetches = 0
+        self.user_evictions = 0
+        self.background_refreshes = 0
+        self.events_applied = 0
+    
+    async def channel_id(self, integration: "SlackIntegration", token: str, name: str) -> Optional[str]:
+        """
+        Resolve a channel name (without ``#``) to its id.
+        
+        Args:
+            integration: Slack integration of the user asking
+            token: The user's Slack token
+            name: Channel name
+        
+        Returns:
+            Channel id, or None if the user cannot see such a channel
+        """
+        self.channel_lookups += 1
+        workspace = await self._fresh_channels(integration, token)
+        channel = workspace.lookup(integration.user_id, name)
+        if channel is not None:
+            self.channel_hits += 1
+        elif time.monotonic() - workspace.loaded_at.get(integration.user_id, 0.0) >= self.miss_reload_interval:
+            # Possibly created since the last load without an event reaching us
+            await self._load(workspace, integration.user_id, lambda: self._load_channels(workspace, integration, token))
+            channel = workspace.lookup(integration.user_id, name)
+        return channel["id"] if channel else None
+    
+    async def channels(self, integration: "SlackIntegration", token: str) -> List[Dict[str, Any]]:
+        """All channels the user can see, public and private."""
+        workspace = await self._fresh_channels(integration, token)
+        return workspace.channels(integration.user_id)
+    
+    async def users(
+        self,
+        integration: "SlackIntegration",
+        token: str,
+        user_ids: List[str]
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Profiles of Slack users, by id.
+        
+        Args:
+            integration: Slack integration of the user asking
+            token: The user's Slack token
+            user_ids: Slack user ids; duplicates are fine
+        
+        Returns:
+            ``{user_id: {"real_name", "display_name", "email"}}`` for every
+            id that could be resolved
+        """
+        workspace = await self.workspace(integration, token)
+        await self._refresh(
+            workspace, USERS_LOAD, self.user_ttl, lambda: self._load_users(workspace, integration, token)
+        )
+        
+        now = time.monotonic()
+        profiles = {}
+        missing = []
+        for user_id in set(user_ids):
+            self.user_lookups += 1
+            entry = workspace.users.get(user_id)
+            if entry is not None and now - entry[1] < self.user_ttl:
+                workspace.users.move_to_end(user_id)
+                profiles[user_id] = entry[0]
+                self.user_hits += 1
+            else:
+                missing.append(user_id)
+        
+        if missing:
+            semaphore = asyncio.Semaphore(self.user_fetch_concurrency)
+            results = await asyncio.gather(
+                *(self._fetch_user(workspace, integration, token, user_id, semaphore) for user_id in missing),
+                return_exceptions=True
+            )
+            for user_id, result in zip(missing, results):
+                if isinstance(result, Exception):
+                    logger.warning(f"Failed to fetch Slack user {user_id}: {result}")
+                else:
+                    profiles[user_id] = result
+        return profiles
+    
+    def apply_event(self, team_id: Optional[str], event: Dict[str, Any]) -> bool:
+        """
+        Update a workspace's directory from a Slack Events API event.
+        
+        Returns:
+            True if the event was a channel or user event of a known workspace
+        """
+        event_type = event.get("type")
+        workspace = self._workspaces.get(team_id) if team_id else None
+        if workspace is None or event_type not in CHANNEL_EVENTS | USER_EVENTS:
+            return False
+        
+        if event_type in USER_EVENTS:
+            user = event.get("user") or {}
+            if "id" not in user:
+                return False
+            self.user_evictions += workspace.put_user(user["id"], _user_record(user), self.user_max_entries)
+            self.events_applied += 1
+            logger.debug(f"Applied Slack {event_type} for {user['id']} in {team_id}")
+            return True
+        
+        channel = event.get("channel")
+        channel_id = channel.get("id") if isinstance(channel, dict) else channel
+        is_private = event_type.startswith("group_")
+        if event_type in ("channel_created", "channel_rename", "group_rename"):
+            workspace.upsert(_channel_record(channel, is_private=is_private))
+        elif event_type in ("channel_archive", "channel_deleted", "group_archive", "group_deleted"):
+            workspace.remove(channel_id)
+        else:
+            # Unarchived channels come back with the next reload
+            for key in workspace.loaded_at:
+                if key != USERS_LOAD:
+                    workspace.loaded_at[key] = 0.0
+        self.events_applied += 1
+        logger.debug(f"Applied Slack {event_type} for {channel_id} in {team_id}")
+        return True
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workspaces": len(self._workspaces),
+            "tokens": len(self._team_ids),
+            "channels": sum(len(workspace.public) for workspace in self._workspaces.values()),
+            "channel_lookups": self.channel_lookups,
+            "channel_hits": self.channel_hits,
+            "channel_hit_rate": round(self.channel_hits / self.channel_lookups, 4) if self.channel_lookups else 0.0,
+            "channel_loads": self.channel_loads,
+            "channel_pages": self.channel_pages,
+            "users": sum(len(workspace.users) for workspace in self._workspaces.values()),
+            "user_lookups": self.user_lookups,
+            "user_hits": self.user_hits,
+            "user_hit_rate": round(self.user_hits / self.user_lookups, 4) if self.user_lookups else 0.0,
+            "user_loads": self.user_loads,
+            "user_pages": self.user_pages,
+            "user_fetches": self.user_fetches,
+            "user_evictions": self.user_evictions,
+            "background_refreshes": self.background_refreshes,
+            "events_applied": self.events_applied
+        }
+    
+    def clear(self):
+        with self._lock:
+            self._workspaces.clear()
+            self._team_ids.clear()
+    
+    async def workspace(self, integration: "SlackIntegration", token: str) -> WorkspaceDirectory:
+        """The directory of the token's workspace (found once per token with ``auth.test``)."""
+        with self._lock:
+            team_id = self._team_ids.get(token)
+            if team_id is not None:
+                self._team_ids.move_to_end(token)
+        if team_id is None:
+            data = await slack_api_get(integration, token, "auth.test", {})
+            team_id = data["team_id"]
+            with self._lock:
+                self._team_ids[token] = team_id
+                while len(self._team_ids) > self.token_max_entries:
+                    self._team_ids.popitem(last=False)
+        with self._lock:
+            workspace = self._workspaces.get(team_id)
+            if workspace is None:
+                workspace = self._workspaces[team_id] = WorkspaceDirectory(team_id)
+            return workspace
+    
+    async def _fresh_channels(self, integration: "SlackIntegration", token: str) -> WorkspaceDirectory:
+        workspace = await self.workspace(integration, token)
+        await self._refresh(
+            workspace, integration.user_id, self.ttl, lambda: self._load_channels(workspace, integration, token)
+        )
+        return workspace
+    
+    async def _refresh(
+        self,
+        workspace: WorkspaceDirectory,
+        key: Hashable,
+        ttl: float,
+        load: Callable[[], Awaitable[None]]
+    ):
+        loaded_at = workspace.loaded_at.get(key)
+        age = time.monotonic() - loaded_at if loaded_at is not None else None
+        if age is None or age >= ttl:
+            await self._load(workspace, key, load)
+        elif age >= self.refresh_after and not self._loading(workspace, key):
+            self.background_refreshes += 1
+            self._start_load(workspace, key, load)
+    
+    async def _load(self, workspace: WorkspaceDirectory, key: Hashable, load: Callable[[], Awaitable[None]]):
+        # Concurrent lookups share a single load
+        task = self._loading(workspace, key) or self._start_load(workspace, key, load)
+        await asyncio.shield(task)
+    
+    def _loading(self, workspace: WorkspaceDirectory, key: Hashable) -> Optional[asyncio.Task]:
+        task = workspace.loads.get(key)
+        return task if task is not None and not task.done() else None
+    
+    def _start_load(
+        self,
+        workspace: WorkspaceDirectory,
+        key: Hashable,
+        load: Callable[[], Awaitable[None]]
+    ) -> asyncio.Task:
+        task = asyncio.ensure_future(load())
+        workspace.loads[key] = task
+        task.add_done_callback(self._log_load_failure)
+        return task
+    
+    @staticmethod
+    def _log_load_failure(task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Slack directory load failed: {task.exception()}")
+    
+    async def _load_channels(self, workspace: WorkspaceDirectory, integration: "SlackIntegration", token: str):
+        started = time.perf_counter()
+        channels = []
+        params = {"exclude_archived": True, "types": "public_channel,private_channel", "limit": 1000}
+        async for data in slack_api_pages(integration, token, "conversations.list", params):
+            self.channel_pages += 1
+            channels.extend(_channel_record(channel) for channel in data.get("channels", []))
+        workspace.replace(integration.user_id, channels)
+        self.channel_loads += 1
+        logger.info(
+            f"Loaded {len(channels)} Slack channels of {workspace.team_id} "
+            f"in {(time.perf_counter() - started) * 1000:.0f}ms"
+        )
+    
+    async def _load_users(self, workspace: WorkspaceDirectory, integration: "SlackIntegration", token: str):
+        started = time.perf_counter()
+        loaded = 0
+        async for data in slack_api_pages(integration, token, "users.list", {"limit": 1000}):
+            self.user_pages += 1
+            now = time.monotonic()
+            for user in data.get("members", []):
+                if user.get("deleted"):
+                    continue
+                self.user_evictions += workspace.put_user(user["id"], _user_record(user), self.user_max_entries, now)
+                loaded += 1
+        workspace.loaded_at[USERS_LOAD] = time.monotonic()
+        self.user_loads += 1
+        logger.info(
+            f"Loaded {loaded} Slack users of {workspace.team_id} "
+            f"in {(time.perf_counter() - started) * 1000:.0f}ms"
+        )
+    
+    async def _fetch_user(
+        self,
+        workspace: WorkspaceDirectory,
+        integration: "SlackIntegration",
+        token: str,
+        user_id: str,
+        semaphore: asyncio.Semaphore
+    ) -> Dict[str, Any]:
+        # Concurrent misses for one id share a single users.info call
+        task = workspace.user_fetches.get(user_id)
+        if task is None or task.done():
+            async def fetch():
+                async with semaphore:
+                    self.user_fetches += 1
+                    data = await slack_api_get(integration, token, "users.info", {"user": user_id})
+                profile = _user_record(data["user"])
+                self.user_evictions += workspace.put_user(user_id, profile, self.user_max_entries)
+                return profile
+            task = workspace.user_fetches[user_id] = asyncio.ensure_future(fetch())
+            
+            def forget(done: asyncio.Task):
+                if workspace.user_fetches.get(user_id) is done:
+                    del workspace.user_fetches[user_id]
+            task.add_done_callback(forget)
+        return await asyncio.shield(task)
+
+
+_slack_directory: Optional[SlackDirectory] = None
+_slack_directory_lock = threading.Lock()
+
+
+def get_slack_directory() -> SlackDirectory:
+    """Get the process-wide Slack directory, creating it from settings."""
+    global _slack_directory
+    with _slack_directory_lock:
+        if _slack_directory is None:
+            _slack_directory = SlackDirectory()
+        return _slack_directory
@@ -0,0 +1,103 @@
+"""Authentication of incoming service webhooks."""
+
+import hashlib
+import hmac
+import time
+from typing import Any, Dict, Mapping, Optional
+from urllib.parse import urlparse
+
+from ..config import settings
+from ..database.models import ServiceType
+from ..utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+def verify_slack_signature(
+    secret: Optional[str],
+    timestamp: Optional[str],
+    signature: Optional[str],
+    body: bytes,
+    now: Optional[float] = None
+) -> bool:
+    """
+    Check Slack's ``v0=`` request signature.
+    
+    The signature is an HMAC-SHA256 of ``v0:<timestamp>:<body>`` with the
+    app's signing secret. Requests older (or newer) than
+    ``webhook_max_age_seconds`` are rejected so a captured request cannot
+    be replayed later. Without a secret nothing verifies.
+    """
+    if not secret or not timestamp or not signature:
+        return False
+    try:
+        age = abs((now if now is not None else time.time()) - int(timestamp))
+    except ValueError:
+        return False
+    if age > settings.webhook_max_age_seconds:
+        return False
+    base = b"v0:" + timestamp.encode() + b":" + body
+    expected = "v0=" + hmac.new(secret.encode(), base, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+
+def verify_github_signature(secret: Optional[str], signature: Optional[str], body: bytes) -> bool:
+    """Check GitHub's ``X-Hub-Signature-256`` (``sha256=`` HMAC of the body)."""
+    if not secret or not signature:
+        return False
+    expected = "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+
+def verify_shared_secret(secret: Optional[str], provided: Optional[str]) -> bool:
+    """Constant-time comparison of a webhook's shared secret (Jira)."""
+    if not secret or not provided:
+        return False
+    return hmac.compare_digest(secret.encode(), provided.encode())
+
+
+def webhook_account(service: str, payload: Dict[str, Any]) -> Optional[str]:
+    """
+    The workspace, account or site a webhook came from.
+    
+    Slack: the team id of the event envelope. GitHub: the organization,
+    else the repository owner (lowercase login). Jira: the host of the
+    site the issue lives on.
+    """
+    if service == "slack":
+        return payload.get("team_id")
+    if service == "github":
+        login = (payload.get("organization") or {}).get("login") or (
+            (payload.get("repository") or {}).get("owner") or {}
+        ).get("login")
+        return login.lower() if login else None
+    if service == "jira":
+        resource = payload.get("issue") or payload.get("project") or payload.get("user") or {}
+        return urlparse(resource.get("self", "")).netloc or None
+    return None
+
+
+async def owner_in_scope(
+    integrations: Mapping[ServiceType, Any],
+    service: str,
+    account: Optional[str]
+) -> bool:
+    """
+    Whether a webhook's account is one the user's own connection reaches.
+    
+    A trigger runs with its owner's tokens, so events from other Slack
+    workspaces, GitHub accounts or Jira sites must not fire it. Lookup
+    failures (no connection, API errors) count as out of scope.
+    """
+    if not account:
+        return False
+    try:
+        if service == "slack":
+            return await integrations[ServiceType.SLACK].workspace_id() == account
+        if service == "github":
+            return account in await integrations[ServiceType.GITHUB].account_logins()
+        if service == "jira":
+            return await integrations[ServiceType.JIRA].site() == account
+    except Exception as e:
+        logger.warning(f"Could not check the {service} account of webhook owner: {e}")
+    return False
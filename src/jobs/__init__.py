@@ -0,0 +1,9 @@
+"""Durable background jobs: the queue table and the executors that run it."""
+
+from .queue import JobQueue, get_job_queue, job_to_dict
+from .executor import JobExecutor, JOB_KIND_COMMAND, JOB_KIND_WORKFLOW
+
+__all__ = [
+    "JobQueue", "get_job_queue", "job_to_dict",
+    "JobExecutor", "JOB_KIND_COMMAND", "JOB_KIND_WORKFLOW",
+]
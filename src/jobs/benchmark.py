@@ -0,0 +1,185 @@
+"""
+Local multi-process benchmark of the job workers.
+
+Runs the same batch of synthetic jobs with 1, 2, 4, ... worker processes
+against a scratch database and reports throughput per process count.
+Jobs sleep instead of calling the LLM, which is what real jobs mostly do
+while they wait on providers and integrations, so throughput should grow
+linearly with the number of executors until the database becomes the
+bottleneck. Use PostgreSQL to measure ``SKIP LOCKED`` claims; SQLite
+serializes writers and flattens out early.
+
+    python -m src.jobs.benchmark --processes 1,2,4 --jobs 400
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import signal
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Any
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from ..core.agent import AgentResponse
+from ..database.models import Base, Job, JobStatus, User, WorkerNode
+from .executor import JobExecutor
+from .queue import JobQueue
+from .worker import Worker
+
+BENCHMARK_KIND = "benchmark"
+BENCHMARK_USERS = 50
+
+
+def _session_factory(database_url: str):
+    engine = create_engine(
+        database_url,
+        connect_args={"check_same_thread": False, "timeout": 30} if "sqlite" in database_url else {}
+    )
+    factory = sessionmaker(bind=engine)
+    
+    @contextmanager
+    def session_scope():
+        session = factory()
+        try:
+            yield session
+        finally:
+            session.close()
+    return engine, session_scope
+
+
+class BenchmarkExecutor(JobExecutor):
+    """Executor whose jobs sleep for ``payload["seconds"]``."""
+    
+    async def run_job(self, job: Job) -> AgentResponse:
+        await asyncio.sleep(job.payload["seconds"])
+        return AgentResponse(success=True, message="ok")
+
+
+def _benchmark_queue(database_url: str) -> JobQueue:
+    _, session_scope = _session_factory(database_url)
+    return JobQueue(session_factory=session_scope, max_per_user=1000, retry_backoff_seconds=0)
+
+
+def _run_benchmark_worker(database_url: str, concurrency: int):
+    queue = _benchmark_queue(database_url)
+    executor = BenchmarkExecutor(queue, concurrency=concurrency, poll_interval=0.05)
+    asyncio.run(Worker(queue, executor=executor, heartbeat_interval=1.0, drain_timeout=5).run())
+
+
+def _reset(session_scope):
+    with session_scope() as session:
+        session.query(Job).delete()
+        session.query(WorkerNode).delete()
+        for user_id in range(1, BENCHMARK_USERS + 1):
+            session.merge(User(
+                id=user_id,
+                username=f"benchmark{user_id}",
+                email=f"benchmark{user_id}@example.com",
+                hashed_password="-"
+            ))
+        session.commit()
+
+
+def _enqueue(session_scope, jobs: int, job_seconds: float):
+    # One transaction, so every worker sees the whole batch at once
+    now = datetime.utcnow()
+    with session_scope() as session:
+        session.add_all([
+            Job(
+                user_id=index % BENCHMARK_USERS + 1,
+                kind=BENCHMARK_KIND,
+                payload={"seconds": job_seconds},
+                status=JobStatus.QUEUED,
+                attempts=0,
+                max_attempts=1,
+                available_at=now,
+                created_at=now
+            )
+            for index in range(jobs)
+        ])
+        session.commit()
+
+
+def _count(session_scope, model, *criteria) -> int:
+    with session_scope() as session:
+        return session.query(model).filter(*criteria).count()
+
+
+def run_benchmark(
+    database_url: str,
+    process_counts: List[int],
+    jobs: int,
+    job_seconds: float,
+    concurrency: int
+) -> List[Dict[str, Any]]:
+    """Run the benchmark once per process count; returns one row per run."""
+    engine, session_scope = _session_factory(database_url)
+    Base.metadata.create_all(engine)
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for processes in process_counts:
+        _reset(session_scope)
+        children = [
+            context.Process(target=_run_benchmark_worker, args=(database_url, concurrency))
+            for _ in range(processes)
+        ]
+        for child in children:
+            child.start()
+        # Process start-up is not part of the measurement
+        while _count(session_scope, WorkerNode) < processes:
+            time.sleep(0.05)
+        
+        _enqueue(session_scope, jobs, job_seconds)
+        started = time.perf_counter()
+        while _count(session_scope, Job, Job.status.in_((JobStatus.QUEUED, JobStatus.RUNNING))):
+            time.sleep(0.02)
+        elapsed = time.perf_counter() - started
+        for child in children:
+            os.kill(child.pid, signal.SIGTERM)
+        for child in children:
+            child.join()
+        
+        throughput = jobs / elapsed
+        baseline = results[0]["jobs_per_second"] / results[0]["processes"] if results else throughput / processes
+        results.append({
+            "processes": processes,
+            "executors": processes * concurrency,
+            "seconds": round(elapsed, 2),
+            "jobs_per_second": round(throughput, 1),
+            "efficiency": round(throughput / (baseline * processes), 2)
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark job worker scaling")
+    parser.add_argument("--database-url", default="sqlite:///./worker_benchmark.sqlite")
+    parser.add_argument("--processes", default="1,2,4", help="Comma-separated worker process counts")
+    parser.add_argument("--concurrency", type=int, default=4, help="Executors per process")
+    parser.add_argument("--jobs", type=int, default=400)
+    parser.add_argument("--job-seconds", type=float, default=0.05, help="Simulated time per job")
+    args = parser.parse_args()
+    
+    results = run_benchmark(
+        args.database_url,
+        [int(count) for count in args.processes.split(",")],
+        args.jobs,
+        args.job_seconds,
+        args.concurrency
+    )
+    ideal = args.concurrency / args.job_seconds
+    print(f"{'processes':>9} {'executors':>9} {'seconds':>8} {'jobs/s':>8} {'ideal':>8} {'efficiency':>10}")
+    for row in results:
+        print(
+            f"{row['processes']:>9} {row['executors']:>9} {row['seconds']:>8} {row['jobs_per_second']:>8} "
+            f"{ideal * row['processes']:>8.1f} {row['efficiency']:>10}"
+        )
+
+
+if __name__ == "__main__":
+    main()
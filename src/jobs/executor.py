@@ -0,0 +1,198 @@
+"""Asyncio executors that claim jobs from the queue and run them."""
+
+import asyncio
+import random
+import time
+from typing import Dict, List, Any, Optional
+
+from ..config import settings
+from ..core.agent_pool import AgentPool, get_agent_pool
+from ..core.concurrency import PRIORITY_BACKGROUND
+from ..database.connection import get_session
+from ..database.models import Job
+from ..utils.logging import get_logger
+from ..workflows import WorkflowDefinition, WorkflowRunner, compile_workflow, get_workflow_registry
+from .queue import JobQueue, default_worker_id, get_job_queue
+
+logger = get_logger(__name__)
+
+JOB_KIND_COMMAND = "command"
+JOB_KIND_WORKFLOW = "workflow"
+
+
+class JobExecutor:
+    """
+    ``concurrency`` asyncio loops sharing one worker id.
+    
+    Each loop claims one job at a time, runs it on a pooled agent at
+    background LLM priority and heartbeats the lease while it runs. Idle
+    loops poll every ``poll_interval`` seconds (with jitter, so many
+    workers do not poll in lockstep) and reclaim expired leases.
+    
+    Jobs are retried only when running them raised an infrastructure error;
+    a command the agent reports as failed has already been logged with its
+    calls and is not repeated.
+    """
+    
+    def __init__(
+        self,
+        queue: Optional[JobQueue] = None,
+        concurrency: Optional[int] = None,
+        worker_id: Optional[str] = None,
+        poll_interval: Optional[float] = None,
+        agent_pool: Optional[AgentPool] = None
+    ):
+        self.queue = queue or get_job_queue()
+        self.concurrency = concurrency if concurrency is not None else settings.job_executor_concurrency
+        self.worker_id = worker_id or default_worker_id()
+        self.poll_interval = poll_interval if poll_interval is not None else settings.job_poll_interval_seconds
+        self.agent_pool = agent_pool or get_agent_pool()
+        self._tasks: List[asyncio.Task] = []
+        self._running: Dict[int, asyncio.Task] = {}
+        self._stopping = asyncio.Event()
+        
+        self.jobs_run = 0
+        self.jobs_failed = 0
+        self.busy_seconds = 0.0
+        self.started_at: Optional[float] = None
+    
+    def start(self):
+        """Start the executor loops on the running event loop."""
+        self.started_at = time.monotonic()
+        self._tasks = [asyncio.create_task(self._loop(index)) for index in range(self.concurrency)]
+        logger.info(f"Job executor {self.worker_id} started with {self.concurrency} loop(s)")
+    
+    async def stop(self, drain: bool = True, timeout: Optional[float] = None):
+        """
+        Stop claiming jobs.
+        
+        Args:
+            drain: Let running jobs finish (up to ``timeout`` seconds) instead
+                of cancelling them; cancelled jobs are reclaimed once their
+                lease expires
+            timeout: Seconds to wait for running jobs when draining
+        """
+        self._stopping.set()
+        if drain and self._running:
+            logger.info(f"Draining {len(self._running)} running job(s)")
+            await asyncio.wait(list(self._running.values()), timeout=timeout)
+        for task in list(self._running.values()):
+            task.cancel()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        logger.info(f"Job executor {self.worker_id} stopped")
+    
+    @property
+    def in_flight(self) -> int:
+        return len(self._running)
+    
+    def stats(self) -> Dict[str, Any]:
+        uptime = time.monotonic() - self.started_at if self.started_at else 0.0
+        return {
+            "worker_id": self.worker_id,
+            "concurrency": self.concurrency,
+            "in_flight": self.in_flight,
+            "jobs_run": self.jobs_run,
+            "jobs_failed": self.jobs_failed,
+            "utilization": round(self.busy_seconds / (uptime * self.concurrency), 4) if uptime else 0.0
+        }
+    
+    async def _loop(self, index: int):
+        # Stagger start-up so loops of many workers spread their polls
+        await asyncio.sleep(random.uniform(0, self.poll_interval))
+        while not self._stopping.is_set():
+            try:
+                jobs = self.queue.claim(self.worker_id, limit=1)
+                if not jobs:
+                    self.queue.reclaim_expired()
+                    await self._idle()
+                    continue
+                job = jobs[0]
+                task = asyncio.create_task(self._execute(job))
+                self._running[job.id] = task
+                try:
+                    await task
+                finally:
+                    self._running.pop(job.id, None)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job executor loop {index} error: {e}")
+                await self._idle()
+    
+    async def _idle(self):
+        try:
+            await asyncio.wait_for(
+                self._stopping.wait(), timeout=self.poll_interval * random.uniform(0.5, 1.5)
+            )
+        except asyncio.TimeoutError:
+            pass
+    
+    async def _execute(self, job: Job):
+        started = time.monotonic()
+        heartbeat = asyncio.create_task(self._heartbeat(job.id))
+        logger.info(f"Running job {job.id} ({job.kind}, attempt {job.attempts}/{job.max_attempts})")
+        try:
+            response = await self.run_job(job)
+        except ValueError as e:
+            # Malformed job (unknown kind or workflow): retrying cannot help
+            self.jobs_failed += 1
+            self.queue.fail(job.id, self.worker_id, str(e), retry=False)
+            return
+        except Exception as e:
+            self.jobs_failed += 1
+            self.queue.fail(job.id, self.worker_id, str(e), retry=True)
+            return
+        finally:
+            heartbeat.cancel()
+            self.jobs_run += 1
+            self.busy_seconds += time.monotonic() - started
+        
+        result = {
+            "success": response.success,
+            "message": response.message,
+            "data": response.data,
+            "rollback_available": response.rollback_available
+        }
+        if response.success:
+            self.queue.complete(job.id, self.worker_id, result, action_id=response.action_id)
+        else:
+            self.jobs_failed += 1
+            self.queue.fail(
+                job.id, self.worker_id, response.message, retry=False, result=result, action_id=response.action_id
+            )
+    
+    async def run_job(self, job: Job):
+        """Run a claimed job on a pooled agent; returns the AgentResponse."""
+        with get_session() as session, self.agent_pool.lease(job.user_id, session) as agent:
+            agent.llm_priority = PRIORITY_BACKGROUND
+            if job.kind == JOB_KIND_COMMAND:
+                return await agent.execute_command(job.payload["command"])
+            if job.kind == JOB_KIND_WORKFLOW:
+                workflow = self._workflow(job)
+                if workflow is None:
+                    raise ValueError(f"Unknown workflow: {job.payload['workflow']}")
+                return await WorkflowRunner(agent).run(workflow, job.payload.get("inputs") or {})
+            raise ValueError(f"Unknown job kind: {job.kind}")
+    
+    @staticmethod
+    def _workflow(job: Job) -> Optional[WorkflowDefinition]:
+        """The job's workflow, compiled from its payload when it carries the definition."""
+        document = job.payload.get("definition")
+        if document is None:
+            return get_workflow_registry().get(job.payload["workflow"])
+        # Raises WorkflowValidationError (a ValueError) when the functions it calls are gone
+        return compile_workflow(document, source=f"job:{job.id}")
+    
+    async def _heartbeat(self, job_id: int):
+        interval = max(1.0, self.queue.visibility_timeout / 3)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if not self.queue.heartbeat(job_id, self.worker_id):
+                    logger.warning(f"Lost the lease on job {job_id}; another worker may run it")
+                    return
+            except Exception as e:
+                logger.error(f"Heartbeat for job {job_id} failed: {e}")
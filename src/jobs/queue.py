@@ -0,0 +1,436 @@
+"""Durable job queue on the jobs table."""
+
+import os
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, ContextManager, Dict, List, Any, Optional
+
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..database.models import Job, JobStatus
+from ..utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+TERMINAL_STATUSES = (JobStatus.SUCCEEDED, JobStatus.FAILED, JobStatus.CANCELLED)
+
+SessionFactory = Callable[[], ContextManager[Session]]
+
+
+def default_worker_id() -> str:
+    """Identifies a worker process in job leases: host, pid and a random suffix."""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+class JobQueue:
+    """
+    Jobs stored in the database, claimed by any number of workers.
+    
+    A claim takes queued jobs whose ``available_at`` has passed and leases
+    them to the worker until ``locked_until`` (the visibility timeout);
+    running workers extend the lease with ``heartbeat``. A job whose lease
+    expires, because its worker died or hung, goes back to the queue
+    (``reclaim_expired``) until it has used ``max_attempts`` claims.
+    Delivery is therefore at least once: a reclaimed command may already
+    have executed some of its calls.
+    
+    On PostgreSQL claims use ``SELECT ... FOR UPDATE SKIP LOCKED`` so
+    concurrent workers never wait on each other's rows. Other databases
+    (SQLite in development) fall back to a compare-and-set ``UPDATE ...
+    WHERE status = 'queued'`` per candidate, which is also safe, only
+    slower under contention.
+    
+    Users are limited to ``max_per_user`` running jobs: claims skip users at
+    the cap. Separate workers claiming at the same instant can exceed it
+    briefly; it is a fairness control, not a hard guarantee.
+    """
+    
+    def __init__(
+        self,
+        session_factory: Optional[SessionFactory] = None,
+        visibility_timeout: Optional[float] = None,
+        max_attempts: Optional[int] = None,
+        retry_backoff_seconds: Optional[float] = None,
+        max_per_user: Optional[int] = None
+    ):
+        if session_factory is None:
+            from ..database.connection import get_session
+            session_factory = get_session
+        self.session_factory = session_factory
+        self.visibility_timeout = (
+            visibility_timeout if visibility_timeout is not None else settings.job_visibility_timeout_seconds
+        )
+        self.max_attempts = max_attempts if max_attempts is not None else settings.job_max_attempts
+        self.retry_backoff_seconds = (
+            retry_backoff_seconds if retry_backoff_seconds is not None else settings.job_retry_backoff_seconds
+        )
+        self.max_per_user = max_per_user if max_per_user is not None else settings.job_max_concurrent_per_user
+        self._lock = threading.Lock()
+        
+        self.enqueued = 0
+        self.claimed = 0
+        self.claim_conflicts = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.retried = 0
+        self.reclaimed = 0
+    
+    def enqueue(
+        self,
+        user_id: int,
+        kind: str,
+        payload: Dict[str, Any],
+        max_attempts: Optional[int] = None
+    ) -> Job:
+        """Add a job; returns the stored row (detached from its session)."""
+        now = datetime.utcnow()
+        with self.session_factory() as session:
+            job = Job(
+                user_id=user_id,
+                kind=kind,
+                payload=payload,
+                status=JobStatus.QUEUED,
+                attempts=0,
+                max_attempts=max_attempts or self.max_attempts,
+                available_at=now,
+                created_at=now
+            )
+            session.add(job)
+            session.commit()
+            session.refresh(job)
+            session.expunge(job)
+        self._count("enqueued")
+        logger.info(f"Enqueued {kind} job {job.id} for user {user_id}")
+        return job
+    
+    def claim(self, worker_id: str, limit: int = 1) -> List[Job]:
+        """
+        Lease up to ``limit`` runnable jobs to a worker.
+        
+        Returns:
+            Claimed jobs (detached), with ``attempts`` already incremented
+        """
+        now = datetime.utcnow()
+        with self.session_factory() as session:
+            saturated = [
+                user_id for user_id, running in session.query(Job.user_id, func.count(Job.id)).filter(
+                    Job.status == JobStatus.RUNNING,
+                    Job.locked_until > now
+                ).group_by(Job.user_id).all()
+                if running >= self.max_per_user
+            ]
+            query = session.query(Job).filter(
+                Job.status == JobStatus.QUEUED,
+                Job.available_at <= now
+            )
+            if saturated:
+                query = query.filter(Job.user_id.notin_(saturated))
+            # Oversample so per-user caps within this batch still leave enough jobs
+            query = query.order_by(Job.id).limit(limit * 4)
+            
+            if session.bind.dialect.name == "postgresql":
+                candidates = query.with_for_update(skip_locked=True).all()
+                claimed = self._take(candidates, limit, session)
+                for job in claimed:
+                    self._lease(job, worker_id, now)
+                session.commit()
+            else:
+                claimed = []
+                for job in self._take(query.all(), limit, session):
+                    leased = session.execute(
+                        update(Job).where(Job.id == job.id, Job.status == JobStatus.QUEUED).values(
+                            status=JobStatus.RUNNING,
+                            attempts=Job.attempts + 1,
+                            locked_by=worker_id,
+                            locked_until=now + timedelta(seconds=self.visibility_timeout),
+                            started_at=now
+                        )
+                    )
+                    session.commit()
+                    if leased.rowcount == 1:
+                        claimed.append(job)
+                    else:
+                        self._count("claim_conflicts")
+            # Commits expired the rows; load the leased state before detaching
+            for job in claimed:
+                session.refresh(job)
+                session.expunge(job)
+        if claimed:
+            self._count("claimed", len(claimed))
+        return claimed
+    
+    def heartbeat(self, job_id: int, worker_id: str) -> bool:
+        """
+        Extend a job's lease.
+        
+        Returns:
+            False when the worker no longer holds the lease (it was reclaimed)
+        """
+        with self.session_factory() as session:
+            extended = session.execute(
+                update(Job).where(
+                    Job.id == job_id,
+                    Job.locked_by == worker_id,
+                    Job.status == JobStatus.RUNNING
+                ).values(locked_until=datetime.utcnow() + timedelta(seconds=self.visibility_timeout))
+            )
+            session.commit()
+            return extended.rowcount == 1
+    
+    def complete(self, job_id: int, worker_id: str, result: Dict[str, Any], action_id: Optional[int] = None) -> bool:
+        """Mark a leased job succeeded."""
+        return self._finish(job_id, worker_id, JobStatus.SUCCEEDED, result=result, action_id=action_id)
+    
+    def fail(
+        self,
+        job_id: int,
+        worker_id: str,
+        error: str,
+        retry: bool = True,
+        result: Optional[Dict[str, Any]] = None,
+        action_id: Optional[int] = None
+    ) -> bool:
+        """
+        Record a failed attempt.
+        
+        With ``retry`` the job goes back to the queue after an exponential
+        backoff, unless it has used all its attempts.
+        """
+        with self.session_factory() as session:
+            job = session.query(Job).filter(
+                Job.id == job_id,
+                Job.locked_by == worker_id,
+                Job.status == JobStatus.RUNNING
+            ).first()
+            if job is None:
+                return False
+            job.error_message = error
+            job.result = result
+            job.automation_action_id = action_id or job.automation_action_id
+            job.locked_by = None
+            job.locked_until = None
+            if retry and job.attempts < job.max_attempts:
+                job.status = JobStatus.QUEUED
+                job.available_at = datetime.utcnow() + timedelta(seconds=self._backoff(job.attempts))
+                session.commit()
+                self._count("retried")
+                logger.warning(f"Job {job_id} attempt {job.attempts} failed, retrying: {error}")
+                return True
+            job.status = JobStatus.FAILED
+            job.completed_at = datetime.utcnow()
+            session.commit()
+        self._count("failed")
+        logger.error(f"Job {job_id} failed: {error}")
+        return True
+    
+    def reclaim_expired(self) -> int:
+        """
+        Requeue running jobs whose lease expired; jobs out of attempts fail.
+        
+        Returns:
+            Number of jobs reclaimed
+        """
+        now = datetime.utcnow()
+        with self.session_factory() as session:
+            expired = session.query(Job).filter(
+                Job.status == JobStatus.RUNNING,
+                Job.locked_until < now
+            ).all()
+            for job in expired:
+                logger.warning(f"Job {job.id} lease held by {job.locked_by} expired, reclaiming")
+                job.error_message = f"Lease expired (worker {job.locked_by})"
+                job.locked_by = None
+                job.locked_until = None
+                if job.attempts < job.max_attempts:
+                    job.status = JobStatus.QUEUED
+                    job.available_at = now + timedelta(seconds=self._backoff(job.attempts))
+                else:
+                    job.status = JobStatus.FAILED
+                    job.completed_at = now
+            session.commit()
+        if expired:
+            self._count("reclaimed", len(expired))
+        return len(expired)
+    
+    def requeue_worker_jobs(self, worker_ids: List[str]) -> int:
+        """
+        Requeue the running jobs of workers known to be dead, without
+        waiting for their leases to expire.
+        
+        Returns:
+            Number of jobs requeued or, when out of attempts, failed
+        """
+        if not worker_ids:
+            return 0
+        now = datetime.utcnow()
+        with self.session_factory() as session:
+            orphaned = session.query(Job).filter(
+                Job.status == JobStatus.RUNNING,
+                Job.locked_by.in_(worker_ids)
+            ).all()
+            for job in orphaned:
+                logger.warning(f"Job {job.id} orphaned by dead worker {job.locked_by}, reclaiming")
+                job.error_message = f"Worker {job.locked_by} died"
+                job.locked_by = None
+                job.locked_until = None
+                if job.attempts < job.max_attempts:
+                    job.status = JobStatus.QUEUED
+                    job.available_at = now
+                else:
+                    job.status = JobStatus.FAILED
+                    job.completed_at = now
+            session.commit()
+        if orphaned:
+            self._count("reclaimed", len(orphaned))
+        return len(orphaned)
+    
+    def cancel(self, job_id: int, user_id: int) -> bool:
+        """Cancel a job that has not started yet."""
+        with self.session_factory() as session:
+            cancelled = session.execute(
+                update(Job).where(
+                    Job.id == job_id,
+                    Job.user_id == user_id,
+                    Job.status == JobStatus.QUEUED
+                ).values(status=JobStatus.CANCELLED, completed_at=datetime.utcnow())
+            )
+            session.commit()
+            return cancelled.rowcount == 1
+    
+    def get(self, job_id: int, user_id: Optional[int] = None) -> Optional[Job]:
+        with self.session_factory() as session:
+            query = session.query(Job).filter(Job.id == job_id)
+            if user_id is not None:
+                query = query.filter(Job.user_id == user_id)
+            job = query.first()
+            if job is not None:
+                session.expunge(job)
+            return job
+    
+    def list(self, user_id: int, limit: int = 50) -> List[Job]:
+        with self.session_factory() as session:
+            jobs = session.query(Job).filter(Job.user_id == user_id).order_by(Job.id.desc()).limit(limit).all()
+            for job in jobs:
+                session.expunge(job)
+            return jobs
+    
+    def depth(self) -> Dict[str, int]:
+        """Jobs per status."""
+        with self.session_factory() as session:
+            return {
+                status.value: count
+                for status, count in session.query(Job.status, func.count(Job.id)).group_by(Job.status).all()
+            }
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enqueued": self.enqueued,
+                "claimed": self.claimed,
+                "claim_conflicts": self.claim_conflicts,
+                "succeeded": self.succeeded,
+                "failed": self.failed,
+                "retried": self.retried,
+                "reclaimed": self.reclaimed,
+                "visibility_timeout_seconds": self.visibility_timeout,
+                "max_per_user": self.max_per_user
+            }
+    
+    def _take(self, candidates: List[Job], limit: int, session: Session) -> List[Job]:
+        """Candidates in order, at most ``limit``, without putting a user over the cap."""
+        if not candidates:
+            return []
+        now = datetime.utcnow()
+        users = {job.user_id for job in candidates}
+        running = dict(session.query(Job.user_id, func.count(Job.id)).filter(
+            Job.status == JobStatus.RUNNING,
+            Job.locked_until > now,
+            Job.user_id.in_(users)
+        ).group_by(Job.user_id).all())
+        taken = []
+        for job in candidates:
+            if running.get(job.user_id, 0) >= self.max_per_user:
+                continue
+            running[job.user_id] = running.get(job.user_id, 0) + 1
+            taken.append(job)
+            if len(taken) == limit:
+                break
+        return taken
+    
+    def _lease(self, job: Job, worker_id: str, now: datetime):
+        job.status = JobStatus.RUNNING
+        job.attempts += 1
+        job.locked_by = worker_id
+        job.locked_until = now + timedelta(seconds=self.visibility_timeout)
+        job.started_at = now
+    
+    def _finish(
+        self,
+        job_id: int,
+        worker_id: str,
+        status: JobStatus,
+        result: Optional[Dict[str, Any]] = None,
+        action_id: Optional[int] = None
+    ) -> bool:
+        with self.session_factory() as session:
+            finished = session.execute(
+                update(Job).where(
+                    Job.id == job_id,
+                    Job.locked_by == worker_id,
+                    Job.status == JobStatus.RUNNING
+                ).values(
+                    status=status,
+                    result=result,
+                    automation_action_id=action_id,
+                    locked_by=None,
+                    locked_until=None,
+                    completed_at=datetime.utcnow()
+                )
+            )
+            session.commit()
+        if finished.rowcount != 1:
+            logger.warning(f"Job {job_id} finished by {worker_id} after losing its lease; result discarded")
+            return False
+        self._count("succeeded" if status == JobStatus.SUCCEEDED else "failed")
+        return True
+    
+    def _backoff(self, attempts: int) -> float:
+        return self.retry_backoff_seconds * (2 ** max(0, attempts - 1))
+    
+    def _count(self, counter: str, amount: int = 1):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+
+def job_to_dict(job: Job) -> Dict[str, Any]:
+    """API representation of a job."""
+    return {
+        "job_id": job.id,
+        "kind": job.kind,
+        "status": job.status.value if job.status else None,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "action_id": job.automation_action_id,
+        "result": job.result,
+        "error": job.error_message,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "completed_at": job.completed_at
+    }
+
+
+_job_queue: Optional[JobQueue] = None
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """Get the process-wide job queue, creating it from settings."""
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is None:
+            _job_queue = JobQueue()
+        return _job_queue
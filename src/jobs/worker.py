@@ -0,0 +1,228 @@
+"""Job worker processes: heartbeats, dead-worker recovery and graceful shutdown."""
+
+import asyncio
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional
+
+from ..config import settings
+from ..core.llm_client import close_llm_clients
+from ..database.models import WorkerNode
+from ..integrations.base import close_integration_clients
+from ..utils.logging import get_logger
+from .executor import JobExecutor
+from .queue import JobQueue, SessionFactory, default_worker_id, get_job_queue
+
+logger = get_logger(__name__)
+
+WORKER_RUNNING = "running"
+WORKER_DRAINING = "draining"
+WORKER_STOPPED = "stopped"
+WORKER_DEAD = "dead"
+
+
+class WorkerRegistry:
+    """Worker rows in the database, used to spot workers that stopped heartbeating."""
+    
+    def __init__(self, session_factory: SessionFactory, dead_after: Optional[float] = None):
+        self.session_factory = session_factory
+        self.dead_after = dead_after if dead_after is not None else settings.worker_dead_after_seconds
+    
+    def register(self, worker_id: str, concurrency: int):
+        now = datetime.utcnow()
+        with self.session_factory() as session:
+            session.merge(WorkerNode(
+                id=worker_id,
+                hostname=socket.gethostname(),
+                pid=os.getpid(),
+                concurrency=concurrency,
+                status=WORKER_RUNNING,
+                in_flight=0,
+                jobs_run=0,
+                jobs_failed=0,
+                started_at=now,
+                last_heartbeat=now
+            ))
+            session.commit()
+    
+    def heartbeat(self, worker_id: str, status: str, stats: Dict[str, Any]):
+        with self.session_factory() as session:
+            node = session.get(WorkerNode, worker_id)
+            if node is None:
+                return
+            node.status = status
+            node.last_heartbeat = datetime.utcnow()
+            node.in_flight = stats["in_flight"]
+            node.jobs_run = stats["jobs_run"]
+            node.jobs_failed = stats["jobs_failed"]
+            session.commit()
+    
+    def deregister(self, worker_id: str, stats: Dict[str, Any]):
+        self.heartbeat(worker_id, WORKER_STOPPED, stats)
+        with self.session_factory() as session:
+            node = session.get(WorkerNode, worker_id)
+            if node is not None:
+                node.stopped_at = datetime.utcnow()
+                session.commit()
+    
+    def mark_dead(self) -> List[str]:
+        """
+        Flag live workers whose last heartbeat is older than ``dead_after``.
+        
+        Returns:
+            Ids of the workers newly found dead
+        """
+        cutoff = datetime.utcnow() - timedelta(seconds=self.dead_after)
+        with self.session_factory() as session:
+            stale = session.query(WorkerNode).filter(
+                WorkerNode.status.in_((WORKER_RUNNING, WORKER_DRAINING)),
+                WorkerNode.last_heartbeat < cutoff
+            ).all()
+            for node in stale:
+                node.status = WORKER_DEAD
+                node.stopped_at = datetime.utcnow()
+            session.commit()
+            return [node.id for node in stale]
+    
+    def live_workers(self) -> List[Dict[str, Any]]:
+        with self.session_factory() as session:
+            return [
+                {
+                    "worker_id": node.id,
+                    "hostname": node.hostname,
+                    "pid": node.pid,
+                    "concurrency": node.concurrency,
+                    "status": node.status,
+                    "in_flight": node.in_flight,
+                    "jobs_run": node.jobs_run,
+                    "last_heartbeat": node.last_heartbeat
+                }
+                for node in session.query(WorkerNode).filter(
+                    WorkerNode.status.in_((WORKER_RUNNING, WORKER_DRAINING))
+                ).order_by(WorkerNode.started_at).all()
+            ]
+
+
+class Worker:
+    """
+    One worker process: a ``JobExecutor`` plus its heartbeat.
+    
+    Every ``heartbeat_interval`` the worker records its progress and looks
+    for workers that stopped heartbeating; their running jobs are requeued
+    right away instead of after their leases expire. ``stop`` stops
+    claiming, lets running jobs finish for up to ``drain_timeout`` seconds
+    and marks the worker stopped; jobs still running then are cancelled
+    and reclaimed by the other workers.
+    """
+    
+    def __init__(
+        self,
+        queue: Optional[JobQueue] = None,
+        concurrency: Optional[int] = None,
+        executor: Optional[JobExecutor] = None,
+        heartbeat_interval: Optional[float] = None,
+        drain_timeout: Optional[float] = None
+    ):
+        self.queue = queue or get_job_queue()
+        self.executor = executor or JobExecutor(self.queue, concurrency=concurrency, worker_id=default_worker_id())
+        self.worker_id = self.executor.worker_id
+        self.registry = WorkerRegistry(self.queue.session_factory)
+        self.heartbeat_interval = (
+            heartbeat_interval if heartbeat_interval is not None else settings.worker_heartbeat_seconds
+        )
+        self.drain_timeout = drain_timeout if drain_timeout is not None else settings.worker_drain_timeout_seconds
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._stopped = asyncio.Event()
+        self._status = WORKER_RUNNING
+    
+    async def start(self):
+        self.registry.register(self.worker_id, self.executor.concurrency)
+        self.executor.start()
+        self._heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+        logger.info(f"Worker {self.worker_id} started")
+    
+    async def stop(self):
+        """Drain running jobs and deregister."""
+        if self._status != WORKER_RUNNING:
+            return
+        self._status = WORKER_DRAINING
+        logger.info(f"Worker {self.worker_id} draining ({self.executor.in_flight} job(s) running)")
+        self.registry.heartbeat(self.worker_id, WORKER_DRAINING, self.executor.stats())
+        await self.executor.stop(drain=True, timeout=self.drain_timeout)
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+        self.registry.deregister(self.worker_id, self.executor.stats())
+        self._status = WORKER_STOPPED
+        self._stopped.set()
+        logger.info(f"Worker {self.worker_id} stopped after {self.executor.jobs_run} job(s)")
+    
+    async def run(self):
+        """Run until SIGTERM or SIGINT, then drain."""
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, lambda: asyncio.ensure_future(self.stop()))
+        await self.start()
+        await self._stopped.wait()
+        await close_llm_clients()
+        await close_integration_clients()
+    
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                self.registry.heartbeat(self.worker_id, self._status, self.executor.stats())
+                dead = self.registry.mark_dead()
+                if dead:
+                    logger.warning(f"Workers stopped heartbeating: {', '.join(dead)}")
+                    self.queue.requeue_worker_jobs(dead)
+            except Exception as e:
+                logger.error(f"Worker heartbeat failed: {e}")
+
+
+def run_worker_process(concurrency: Optional[int] = None):
+    """Entry point of one worker process."""
+    asyncio.run(Worker(concurrency=concurrency).run())
+
+
+def supervise(processes: int, concurrency: Optional[int] = None, target=run_worker_process, args: tuple = ()):
+    """
+    Run ``processes`` worker processes and restart any that crash.
+    
+    SIGTERM and SIGINT are forwarded to the children, which drain before
+    exiting; the supervisor returns once all of them have.
+    """
+    context = multiprocessing.get_context("spawn")
+    stopping = False
+    children: List[multiprocessing.Process] = []
+    
+    def spawn() -> multiprocessing.Process:
+        child = context.Process(target=target, args=args or (concurrency,), daemon=False)
+        child.start()
+        logger.info(f"Started worker process {child.pid}")
+        return child
+    
+    def forward(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for child in children:
+            if child.is_alive():
+                os.kill(child.pid, signal.SIGTERM)
+    
+    signal.signal(signal.SIGTERM, forward)
+    signal.signal(signal.SIGINT, forward)
+    children.extend(spawn() for _ in range(processes))
+    
+    while children:
+        for child in list(children):
+            child.join(timeout=0.5)
+            if child.is_alive():
+                continue
+            children.remove(child)
+            if not stopping and child.exitcode != 0:
+                logger.error(f"Worker process {child.pid} exited with {child.exitcode}, restarting")
+                time.sleep(1)
+                children.append(spawn())
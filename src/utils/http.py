@@ -0,0 +1,105 @@
+"""Shared HTTP transport helpers for pooled, long-lived httpx clients."""
+
+from typing import Any, Dict, Optional
+
+import httpx
+
+
+class ConnectionPoolStats:
+    """
+    Connection reuse counters for a pooled httpx client.
+    
+    New connections are detected through httpcore's ``trace`` request
+    extension, so every request that does not open a TCP connection was
+    served from the keep-alive pool.
+    """
+    
+    def __init__(self):
+        self.requests = 0
+        self.new_connections = 0
+        self.http2_responses = 0
+        self.errors = 0
+    
+    async def on_request(self, request: httpx.Request):
+        """httpx request hook: count the request and attach the tracer."""
+        self.requests += 1
+        request.extensions["trace"] = self._trace
+    
+    async def on_response(self, response: httpx.Response):
+        """httpx response hook: record negotiated protocol and failures."""
+        if response.http_version == "HTTP/2":
+            self.http2_responses += 1
+        if response.status_code >= 500:
+            self.errors += 1
+    
+    async def _trace(self, event_name: str, info: Dict[str, Any]):
+        if event_name == "connection.connect_tcp.complete":
+            self.new_connections += 1
+    
+    @property
+    def reuse_ratio(self) -> float:
+        """Fraction of requests that reused an existing pooled connection."""
+        if not self.requests:
+            return 0.0
+        return max(0.0, 1.0 - self.new_connections / self.requests)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "new_connections": self.new_connections,
+            "reused_requests": max(0, self.requests - self.new_connections),
+            "reuse_ratio": round(self.reuse_ratio, 4),
+            "http2_responses": self.http2_responses,
+            "server_errors": self.errors,
+        }
+
+
+def create_pooled_client(
+    max_connections: int,
+    max_keepalive_connections: int,
+    keepalive_expiry: float,
+    timeout: float,
+    http2: bool = True,
+    stats: Optional[ConnectionPoolStats] = None,
+    **kwargs
+) -> httpx.AsyncClient:
+    """
+    Build a keep-alive pooled ``httpx.AsyncClient``.
+    
+    HTTP/2 is only enabled when the optional ``h2`` package is importable,
+    otherwise the client silently falls back to HTTP/1.1 keep-alive.
+    
+    Args:
+        max_connections: Hard cap on open connections
+        max_keepalive_connections: Idle connections kept in the pool
+        keepalive_expiry: Seconds an idle connection is kept open
+        timeout: Default request timeout in seconds
+        http2: Negotiate HTTP/2 where the server supports it
+        stats: Optional stats collector wired in via event hooks
+        **kwargs: Extra ``httpx.AsyncClient`` arguments
+    
+    Returns:
+        Configured async client
+    """
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            http2 = False
+    
+    event_hooks = kwargs.pop("event_hooks", {"request": [], "response": []})
+    if stats is not None:
+        event_hooks.setdefault("request", []).append(stats.on_request)
+        event_hooks.setdefault("response", []).append(stats.on_response)
+    
+    return httpx.AsyncClient(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        ),
+        timeout=httpx.Timeout(timeout),
+        event_hooks=event_hooks,
+        **kwargs
+    )
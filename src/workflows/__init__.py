@@ -0,0 +1,12 @@
+"""Declarative workflows: compiled call graphs that run without the LLM."""
+
+from .definition import (
+    WorkflowDefinition, WorkflowValidationError, compile_workflow, load_workflow, parse_workflow
+)
+from .registry import WorkflowRegistry, get_workflow_registry
+from .runner import WorkflowRunner
+
+__all__ = [
+    "WorkflowDefinition", "WorkflowValidationError", "compile_workflow", "load_workflow", "parse_workflow",
+    "WorkflowRegistry", "get_workflow_registry", "WorkflowRunner",
+]
@@ -0,0 +1,596 @@
+"""Declarative workflow definitions, validated and compiled at load time."""
+
+import json
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Set, Tuple
+
+from ..integrations.registry import ArgumentValidator, function_registry
+
+# "{{ steps.messages.result.messages | length }}"
+TEMPLATE_PATTERN = re.compile(r"\{\{\s*([A-Za-z_]\w*(?:\.[\w-]+)*)\s*((?:\|\s*\w+\s*)*)\}\}")
+STEP_ID_PATTERN = re.compile(r"^[A-Za-z_][\w-]{0,39}$")
+CONDITION_OPERATORS = ("not in", "contains", "==", "!=", ">=", "<=", ">", "<", "in")
+WEBHOOK_SERVICES = ("slack", "github", "jira")
+INPUT_TYPES = ("string", "integer", "number", "boolean", "array", "object")
+
+FILTERS = {
+    "length": lambda value: len(value) if value is not None else 0,
+    "json": lambda value: json.dumps(value, default=str),
+    "join": lambda value: "\n".join(str(item) for item in value) if isinstance(value, list) else str(value),
+    "first": lambda value: value[0] if value else None,
+    "last": lambda value: value[-1] if value else None,
+    "lower": lambda value: str(value).lower(),
+    "upper": lambda value: str(value).upper(),
+}
+
+
+class WorkflowValidationError(ValueError):
+    """A workflow definition is malformed; ``errors`` lists every problem found."""
+    
+    def __init__(self, name: str, errors: List[str]):
+        self.name = name
+        self.errors = errors
+        super().__init__(f"Invalid workflow {name}: " + "; ".join(errors))
+
+
+class WorkflowRuntimeError(RuntimeError):
+    """A template or condition could not be evaluated while running."""
+
+
+class Template:
+    """
+    A value with ``{{ path | filter }}`` placeholders, parsed once.
+    
+    A string that is exactly one placeholder renders to the referenced value
+    itself (lists stay lists); placeholders inside longer strings are
+    rendered as text. Dicts and lists are templated recursively.
+    """
+    
+    def __init__(self, value: Any):
+        self.value = value
+        self.references: List[Tuple[str, ...]] = []
+        self._compiled = self._compile(value)
+    
+    def _compile(self, value: Any) -> Any:
+        if isinstance(value, str):
+            matches = list(TEMPLATE_PATTERN.finditer(value))
+            if not matches:
+                return ("literal", value)
+            parts = []
+            for match in matches:
+                path = tuple(match.group(1).split("."))
+                filters = [name.strip() for name in match.group(2).split("|") if name.strip()]
+                self.references.append(path)
+                parts.append((match.start(), match.end(), path, filters))
+            if len(parts) == 1 and parts[0][0] == 0 and parts[0][1] == len(value):
+                return ("value", parts[0][2], parts[0][3])
+            return ("text", value, parts)
+        if isinstance(value, dict):
+            return ("dict", {key: self._compile(item) for key, item in value.items()})
+        if isinstance(value, list):
+            return ("list", [self._compile(item) for item in value])
+        return ("literal", value)
+    
+    @property
+    def filters(self) -> Set[str]:
+        found: Set[str] = set()
+        
+        def walk(node):
+            kind = node[0]
+            if kind == "value":
+                found.update(node[2])
+            elif kind == "text":
+                for part in node[2]:
+                    found.update(part[3])
+            elif kind == "dict":
+                for item in node[1].values():
+                    walk(item)
+            elif kind == "list":
+                for item in node[1]:
+                    walk(item)
+        walk(self._compiled)
+        return found
+    
+    def render(self, context: Dict[str, Any]) -> Any:
+        return self._render(self._compiled, context)
+    
+    def _render(self, node, context: Dict[str, Any]) -> Any:
+        kind = node[0]
+        if kind == "literal":
+            return node[1]
+        if kind == "value":
+            return _apply_filters(_lookup(context, node[1]), node[2])
+        if kind == "text":
+            text, parts = node[1], node[2]
+            pieces, last = [], 0
+            for start, end, path, filters in parts:
+                value = _apply_filters(_lookup(context, path), filters)
+                pieces.append(text[last:start])
+                pieces.append(value if isinstance(value, str) else json.dumps(value, default=str))
+                last = end
+            pieces.append(text[last:])
+            return "".join(pieces)
+        if kind == "dict":
+            return {key: self._render(item, context) for key, item in node[1].items()}
+        return [self._render(item, context) for item in node[1]]
+
+
+class Condition:
+    """
+    ``"<operand> <operator> <operand>"`` or a single operand tested for
+    truthiness. Operands are templates or JSON/bare-word literals.
+    """
+    
+    def __init__(self, expression: str):
+        self.expression = expression
+        masked = TEMPLATE_PATTERN.sub(lambda match: "\0" * len(match.group(0)), expression)
+        self.operator = None
+        for operator in CONDITION_OPERATORS:
+            match = re.search(rf"\s{re.escape(operator)}\s", masked)
+            if match:
+                self.operator = operator
+                self.left = Template(_literal(expression[:match.start()].strip()))
+                self.right = Template(_literal(expression[match.end():].strip()))
+                break
+        if self.operator is None:
+            if re.match(r"^\s*(?:==|!=|>=|<=|>|<|in\b|contains\b)|(?:==|!=|>=|<=|>|<|\bin|\bcontains)\s*$", masked):
+                raise ValueError(f"Malformed condition: {expression!r}")
+            self.left = Template(_literal(expression.strip()))
+            self.right = None
+        if self.left.value in ("", None) or (self.right is not None and self.right.value == ""):
+            raise ValueError(f"Malformed condition: {expression!r}")
+    
+    @property
+    def references(self) -> List[Tuple[str, ...]]:
+        return self.left.references + (self.right.references if self.right else [])
+    
+    def evaluate(self, context: Dict[str, Any]) -> bool:
+        left = self.left.render(context)
+        if self.operator is None:
+            return bool(left)
+        right = self.right.render(context)
+        operator = self.operator
+        if operator in ("==", "!="):
+            equal = _normalize_scalar(left) == _normalize_scalar(right)
+            return equal if operator == "==" else not equal
+        if operator in ("in", "not in"):
+            found = _contains(right, left)
+            return found if operator == "in" else not found
+        if operator == "contains":
+            return _contains(left, right)
+        try:
+            left, right = float(left), float(right)
+        except (TypeError, ValueError):
+            return False
+        return {">": left > right, "<": left < right, ">=": left >= right, "<=": left <= right}[operator]
+
+
+@dataclass
+class WorkflowInput:
+    name: str
+    type: str = "string"
+    required: bool = False
+    default: Any = None
+    description: str = ""
+
+
+@dataclass
+class WorkflowStep:
+    """One function call of a workflow, optionally conditional or looped."""
+    id: str
+    call: str
+    args: Template
+    when: List[Condition] = field(default_factory=list)
+    for_each: Optional[Template] = None
+    loop_var: str = "item"
+    where: List[Condition] = field(default_factory=list)
+    parallel: int = 1
+    needs: List[str] = field(default_factory=list)  # Every step this one waits for
+
+
+@dataclass
+class WorkflowTrigger:
+    """Run a workflow when a matching webhook arrives."""
+    webhook: str
+    run_as: int
+    event: Optional[str] = None
+    when: List[Condition] = field(default_factory=list)
+    inputs: Optional[Template] = None
+    
+    def matches(self, service: str, event: Optional[str], context: Dict[str, Any]) -> bool:
+        if service != self.webhook or (self.event is not None and event != self.event):
+            return False
+        try:
+            return all(condition.evaluate(context) for condition in self.when)
+        except WorkflowRuntimeError:
+            return False
+    
+    def render_inputs(self, trigger: Dict[str, Any]) -> Dict[str, Any]:
+        """Workflow inputs mapped from the webhook payload."""
+        return self.inputs.render({"trigger": trigger}) if self.inputs is not None else {}
+
+
+@dataclass
+class WorkflowDefinition:
+    name: str
+    steps: List[WorkflowStep]
+    inputs: Dict[str, WorkflowInput] = field(default_factory=dict)
+    triggers: List[WorkflowTrigger] = field(default_factory=list)
+    description: str = ""
+    rollback_on_failure: bool = False
+    source: Optional[str] = None
+    owner_id: Optional[int] = None  # User who registered it; None for the workflows directory
+    document: Dict[str, Any] = field(default_factory=dict, repr=False)  # As compiled, for job payloads
+    input_validator: Optional[ArgumentValidator] = field(default=None, repr=False)
+    
+    def validate_inputs(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """Check run inputs against the declared inputs and apply defaults."""
+        return self.input_validator(inputs or {})
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "description": self.description,
+            "inputs": {
+                name: {"type": spec.type, "required": spec.required, "default": spec.default}
+                for name, spec in self.inputs.items()
+            },
+            "steps": [
+                {"id": step.id, "call": step.call, "needs": step.needs, "loop": step.for_each is not None}
+                for step in self.steps
+            ],
+            "triggers": [{"webhook": trigger.webhook, "event": trigger.event} for trigger in self.triggers],
+            "rollback_on_failure": self.rollback_on_failure,
+            "source": self.source,
+            "owner_id": self.owner_id
+        }
+
+
+def parse_workflow(text: str, format: str = "json", source: Optional[str] = None) -> WorkflowDefinition:
+    """
+    Parse and validate a workflow from YAML or JSON text.
+    
+    Raises:
+        WorkflowValidationError: The text is not a valid workflow
+    """
+    name = source or "<workflow>"
+    if format in ("yaml", "yml"):
+        try:
+            import yaml  # Optional dependency
+        except ImportError:
+            raise WorkflowValidationError(name, ["PyYAML is required to load YAML workflows"])
+        try:
+            data = yaml.safe_load(text)
+        except yaml.YAMLError as e:
+            raise WorkflowValidationError(name, [f"YAML parse error: {e}"])
+    else:
+        try:
+            data = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise WorkflowValidationError(name, [f"JSON parse error: {e}"])
+    return compile_workflow(data, source=source)
+
+
+def load_workflow(path: str) -> WorkflowDefinition:
+    """Load and validate a workflow file (``.yaml``, ``.yml`` or ``.json``)."""
+    file_path = Path(path)
+    suffix = file_path.suffix.lstrip(".").lower()
+    return parse_workflow(file_path.read_text(), "yaml" if suffix in ("yaml", "yml") else "json", str(file_path))
+
+
+def compile_workflow(
+    data: Any,
+    source: Optional[str] = None,
+    owner_id: Optional[int] = None,
+    run_as: Optional[int] = None
+) -> WorkflowDefinition:
+    """
+    Validate a workflow document and compile its templates and conditions.
+    
+    Every problem is collected before raising, so an author sees them all
+    at once: unknown functions or arguments, missing required arguments,
+    references to undeclared inputs or to steps that do not run earlier,
+    malformed conditions and unknown filters.
+    
+    Args:
+        data: The workflow document
+        source: Where the document came from, for messages
+        owner_id: User registering the workflow
+        run_as: When set, the only user triggers may run as (and the
+            default for triggers that omit ``run_as``)
+    """
+    errors: List[str] = []
+    if not isinstance(data, dict):
+        raise WorkflowValidationError(source or "<workflow>", ["Workflow must be a mapping"])
+    name = data.get("name")
+    if not isinstance(name, str) or not STEP_ID_PATTERN.match(name):
+        errors.append("name must be an identifier of at most 40 characters")
+        name = str(name or source or "<workflow>")
+    
+    inputs = _compile_inputs(data.get("inputs") or {}, errors)
+    
+    raw_steps = data.get("steps")
+    if not isinstance(raw_steps, list) or not raw_steps:
+        errors.append("steps must be a non-empty list")
+        raw_steps = []
+    
+    steps: List[WorkflowStep] = []
+    seen: Set[str] = set()
+    for position, raw in enumerate(raw_steps):
+        step = _compile_step(raw, position, inputs, seen, errors)
+        if step is not None:
+            steps.append(step)
+            seen.add(step.id)
+    
+    triggers = [
+        trigger for trigger in (
+            _compile_trigger(raw, index, inputs, run_as, errors)
+            for index, raw in enumerate(data.get("triggers") or [])
+        ) if trigger is not None
+    ]
+    
+    if errors:
+        raise WorkflowValidationError(name, errors)
+    
+    return WorkflowDefinition(
+        name=name,
+        steps=steps,
+        inputs=inputs,
+        triggers=triggers,
+        description=str(data.get("description", "")),
+        rollback_on_failure=bool(data.get("rollback_on_failure", False)),
+        source=source,
+        owner_id=owner_id,
+        document=data,
+        input_validator=ArgumentValidator(f"workflow {name}", {
+            "properties": {
+                spec.name: {"type": spec.type, **({"default": spec.default} if spec.default is not None else {})}
+                for spec in inputs.values()
+            },
+            "required": [spec.name for spec in inputs.values() if spec.required]
+        })
+    )
+
+
+def _compile_inputs(raw: Any, errors: List[str]) -> Dict[str, WorkflowInput]:
+    if not isinstance(raw, dict):
+        errors.append("inputs must be a mapping of name to type or spec")
+        return {}
+    inputs = {}
+    for name, spec in raw.items():
+        if isinstance(spec, str):
+            spec = {"type": spec}
+        if not isinstance(spec, dict):
+            errors.append(f"input {name}: spec must be a type name or mapping")
+            continue
+        input_type = spec.get("type", "string")
+        if input_type not in INPUT_TYPES:
+            errors.append(f"input {name}: unknown type {input_type}")
+        inputs[name] = WorkflowInput(
+            name=name,
+            type=input_type,
+            required=bool(spec.get("required", "default" not in spec)),
+            default=spec.get("default"),
+            description=str(spec.get("description", ""))
+        )
+    return inputs
+
+
+def _compile_step(
+    raw: Any,
+    position: int,
+    inputs: Dict[str, WorkflowInput],
+    earlier: Set[str],
+    errors: List[str]
+) -> Optional[WorkflowStep]:
+    label = f"step {position + 1}"
+    if not isinstance(raw, dict):
+        errors.append(f"{label}: must be a mapping")
+        return None
+    step_id = raw.get("id", f"step_{position + 1}")
+    if not isinstance(step_id, str) or not STEP_ID_PATTERN.match(step_id):
+        errors.append(f"{label}: id must be an identifier of at most 40 characters")
+        return None
+    label = f"step {step_id}"
+    if step_id in earlier:
+        errors.append(f"{label}: duplicate id")
+    
+    call = raw.get("call")
+    registered = function_registry.get(call) if isinstance(call, str) else None
+    if registered is None:
+        errors.append(f"{label}: unknown function {call!r}")
+    
+    args = raw.get("args") or {}
+    if not isinstance(args, dict):
+        errors.append(f"{label}: args must be a mapping")
+        args = {}
+    if registered is not None:
+        properties = registered.parameters.get("properties", {})
+        for unknown in sorted(set(args) - set(properties)):
+            errors.append(f"{label}: {call} has no argument {unknown}")
+        for missing in sorted(set(registered.parameters.get("required", [])) - set(args)):
+            errors.append(f"{label}: missing required argument {missing}")
+    
+    loop_var = raw.get("as", "item")
+    if not isinstance(loop_var, str) or not loop_var.isidentifier() or loop_var in ("inputs", "steps", "trigger"):
+        errors.append(f"{label}: as must be an identifier other than inputs, steps or trigger")
+        loop_var = "item"
+    for_each = Template(raw["for_each"]) if raw.get("for_each") is not None else None
+    if for_each is not None and not (isinstance(for_each.value, list) or for_each.references):
+        errors.append(f"{label}: for_each must be a list or a template")
+    
+    when = _compile_conditions(raw.get("when"), label, errors)
+    where = _compile_conditions(raw.get("where"), label, errors)
+    if where and for_each is None:
+        errors.append(f"{label}: where only applies to for_each steps")
+    
+    needs = raw.get("needs") or []
+    if isinstance(needs, str):
+        needs = [needs]
+    for need in needs:
+        if need not in earlier:
+            errors.append(f"{label}: needs {need!r}, which is not an earlier step")
+    
+    parallel = raw.get("parallel", 1)
+    if not isinstance(parallel, int) or isinstance(parallel, bool) or parallel < 1:
+        errors.append(f"{label}: parallel must be a positive integer")
+        parallel = 1
+    
+    args_template = Template(args)
+    local = {loop_var} if for_each is not None else set()
+    referenced: Set[str] = set(needs)
+    for template, scope in (
+        [(args_template, local), (for_each, set())]
+        + [(condition.left, set()) for condition in when]
+        + [(condition.right, set()) for condition in when if condition.right]
+        + [(condition.left, local) for condition in where]
+        + [(condition.right, local) for condition in where if condition.right]
+    ):
+        if template is None:
+            continue
+        _check_references(template, label, inputs, earlier, scope, referenced, errors)
+    
+    return WorkflowStep(
+        id=step_id,
+        call=call,
+        args=args_template,
+        when=when,
+        for_each=for_each,
+        loop_var=loop_var,
+        where=where,
+        parallel=parallel,
+        needs=sorted(referenced)
+    )
+
+
+def _compile_trigger(
+    raw: Any,
+    index: int,
+    inputs: Dict[str, WorkflowInput],
+    allowed_run_as: Optional[int],
+    errors: List[str]
+) -> Optional[WorkflowTrigger]:
+    label = f"trigger {index + 1}"
+    if not isinstance(raw, dict):
+        errors.append(f"{label}: must be a mapping")
+        return None
+    webhook = raw.get("webhook")
+    if webhook not in WEBHOOK_SERVICES:
+        errors.append(f"{label}: webhook must be one of {', '.join(WEBHOOK_SERVICES)}")
+    run_as = raw.get("run_as", allowed_run_as)
+    if not isinstance(run_as, int) or isinstance(run_as, bool):
+        errors.append(f"{label}: run_as must be the id of the user the workflow runs as")
+    elif allowed_run_as is not None and run_as != allowed_run_as:
+        errors.append(f"{label}: run_as must be your own user id ({allowed_run_as})")
+    when = _compile_conditions(raw.get("when"), label, errors)
+    trigger_inputs = Template(raw.get("inputs") or {})
+    for unknown in sorted(set(trigger_inputs.value) - set(inputs)) if isinstance(trigger_inputs.value, dict) else []:
+        errors.append(f"{label}: undeclared input {unknown}")
+    for template in [trigger_inputs] + [condition.left for condition in when] + [
+        condition.right for condition in when if condition.right
+    ]:
+        for path in template.references:
+            if path[0] != "trigger":
+                errors.append(f"{label}: templates may only reference trigger, not {'.'.join(path)}")
+    return WorkflowTrigger(
+        webhook=webhook,
+        run_as=run_as,
+        event=raw.get("event"),
+        when=when,
+        inputs=trigger_inputs
+    )
+
+
+def _compile_conditions(raw: Any, label: str, errors: List[str]) -> List[Condition]:
+    if raw is None:
+        return []
+    expressions = raw if isinstance(raw, list) else [raw]
+    conditions = []
+    for expression in expressions:
+        if isinstance(expression, bool):
+            expression = "true" if expression else "false"
+        if not isinstance(expression, str):
+            errors.append(f"{label}: conditions must be strings")
+            continue
+        try:
+            conditions.append(Condition(expression))
+        except ValueError as e:
+            errors.append(f"{label}: {e}")
+    return conditions
+
+
+def _check_references(
+    template: Template,
+    label: str,
+    inputs: Dict[str, WorkflowInput],
+    earlier: Set[str],
+    local: Set[str],
+    referenced: Set[str],
+    errors: List[str]
+):
+    for unknown in sorted(template.filters - set(FILTERS)):
+        errors.append(f"{label}: unknown filter {unknown}")
+    for path in template.references:
+        root = path[0]
+        if root in local or root == "trigger":
+            continue
+        if root == "inputs":
+            if len(path) < 2 or path[1] not in inputs:
+                errors.append(f"{label}: undeclared input {'.'.join(path[1:]) or '(none)'}")
+        elif root == "steps":
+            if len(path) < 2 or path[1] not in earlier:
+                errors.append(f"{label}: references {'.'.join(path)}, which is not an earlier step")
+            else:
+                referenced.add(path[1])
+        else:
+            errors.append(f"{label}: unknown template root {root}")
+
+
+def _lookup(context: Dict[str, Any], path: Tuple[str, ...]) -> Any:
+    current: Any = context
+    for part in path:
+        if isinstance(current, dict) and part in current:
+            current = current[part]
+        elif isinstance(current, list) and part.isdigit() and int(part) < len(current):
+            current = current[int(part)]
+        else:
+            raise WorkflowRuntimeError(f"{'.'.join(path)} is not available")
+    return current
+
+
+def _apply_filters(value: Any, filters: List[str]) -> Any:
+    for name in filters:
+        try:
+            value = FILTERS[name](value)
+        except (TypeError, IndexError, KeyError) as e:
+            raise WorkflowRuntimeError(f"Filter {name} failed: {e}")
+    return value
+
+
+def _literal(text: str) -> Any:
+    if TEMPLATE_PATTERN.search(text):
+        return text
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return text
+
+
+def _normalize_scalar(value: Any) -> Any:
+    if isinstance(value, str):
+        return value.strip().lower()
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        return float(value)
+    return value
+
+
+def _contains(container: Any, item: Any) -> bool:
+    if isinstance(container, str):
+        return str(item).lower() in container.lower()
+    if isinstance(container, (list, tuple, set, dict)):
+        return _normalize_scalar(item) in {_normalize_scalar(value) for value in container if not isinstance(value, (dict, list))}
+    return False
@@ -0,0 +1,136 @@
+"""Registered workflows, loaded from the workflows directory or added at runtime."""
+
+import threading
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Tuple
+
+from ..config import settings
+from ..utils.logging import get_logger
+from .definition import (
+    WorkflowDefinition, WorkflowTrigger, WorkflowValidationError, compile_workflow, load_workflow
+)
+
+logger = get_logger(__name__)
+
+WORKFLOW_SUFFIXES = (".yaml", ".yml", ".json")
+
+
+class WorkflowRegistry:
+    """Workflows by name, with lookup of the ones a webhook triggers."""
+    
+    def __init__(self):
+        self._workflows: Dict[str, WorkflowDefinition] = {}
+        self._lock = threading.Lock()
+        self.load_errors: Dict[str, List[str]] = {}
+    
+    def register(self, definition: WorkflowDefinition, replace: bool = True, force: bool = False):
+        """
+        Add a compiled workflow, replacing any workflow with the same name.
+        
+        Raises:
+            PermissionError: The existing workflow belongs to someone else
+                and ``force`` is not set
+        """
+        with self._lock:
+            existing = self._workflows.get(definition.name)
+            if existing is not None and not replace:
+                raise ValueError(f"Workflow {definition.name} is already registered")
+            if existing is not None and not force and existing.owner_id != definition.owner_id:
+                raise PermissionError(f"Workflow {definition.name} belongs to another user")
+            self._workflows[definition.name] = definition
+        logger.info(f"Registered workflow {definition.name} ({len(definition.steps)} steps)")
+    
+    def register_data(
+        self,
+        data: Dict[str, Any],
+        source: Optional[str] = None,
+        owner_id: Optional[int] = None,
+        admin: bool = False
+    ) -> WorkflowDefinition:
+        """
+        Validate, compile and register a workflow document for ``owner_id``.
+        
+        Unless ``admin`` is set, triggers may only run as the owner and a
+        workflow registered by another user (or loaded from the workflows
+        directory) cannot be replaced.
+        """
+        definition = compile_workflow(
+            data, source=source, owner_id=owner_id, run_as=None if admin else owner_id
+        )
+        self.register(definition, force=admin)
+        return definition
+    
+    def load_directory(self, path: str) -> int:
+        """
+        Load every workflow file in a directory.
+        
+        Invalid files are logged and skipped so one bad definition does not
+        keep the others from loading; their errors stay in ``load_errors``.
+        
+        Returns:
+            Number of workflows loaded
+        """
+        directory = Path(path)
+        if not directory.is_dir():
+            logger.warning(f"Workflows directory {path} does not exist")
+            return 0
+        loaded = 0
+        for file_path in sorted(directory.iterdir()):
+            if file_path.suffix.lower() not in WORKFLOW_SUFFIXES:
+                continue
+            try:
+                self.register(load_workflow(str(file_path)), force=True)
+                self.load_errors.pop(str(file_path), None)
+                loaded += 1
+            except WorkflowValidationError as e:
+                self.load_errors[str(file_path)] = e.errors
+                logger.error(f"Skipping workflow file {file_path}: {e}")
+        return loaded
+    
+    def unregister(self, name: str) -> bool:
+        with self._lock:
+            return self._workflows.pop(name, None) is not None
+    
+    def get(self, name: str) -> Optional[WorkflowDefinition]:
+        return self._workflows.get(name)
+    
+    def names(self) -> List[str]:
+        return sorted(self._workflows)
+    
+    def for_webhook(
+        self,
+        service: str,
+        event: Optional[str],
+        payload: Dict[str, Any]
+    ) -> List[Tuple[WorkflowDefinition, WorkflowTrigger, Dict[str, Any]]]:
+        """
+        Workflows triggered by a webhook.
+        
+        Returns:
+            (workflow, matching trigger, trigger context) for each match
+        """
+        context = {"trigger": {"service": service, "event": event, "payload": payload}}
+        with self._lock:
+            workflows = list(self._workflows.values())
+        return [
+            (definition, trigger, context["trigger"])
+            for definition in workflows
+            for trigger in definition.triggers
+            if trigger.matches(service, event, context)
+        ]
+
+
+_registry: Optional[WorkflowRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_workflow_registry() -> WorkflowRegistry:
+    """Get the process-wide workflow registry, loading ``workflows_dir`` on first use."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = WorkflowRegistry()
+            if settings.workflows_dir:
+                count = _registry.load_directory(settings.workflows_dir)
+                logger.info(f"Loaded {count} workflow(s) from {settings.workflows_dir}")
+        return _registry
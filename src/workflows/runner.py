@@ -0,0 +1,204 @@
+"""Run compiled workflows through the agent's integrations, without the LLM."""
+
+import asyncio
+import time
+from dataclasses import replace
+from typing import Dict, List, Any, Optional
+
+from ..config import settings
+from ..core.agent import AgentResponse, AutomationAgent
+from ..core.execution_graph import (
+    ExecutionGraph, GraphNode, STATUS_SUCCESS, STATUS_FAILED, STATUS_SKIPPED
+)
+from ..utils.logging import get_logger
+from .definition import WorkflowDefinition, WorkflowRuntimeError, WorkflowStep
+
+logger = get_logger(__name__)
+
+ACTION_TYPE = "workflow"
+
+
+class WorkflowRunner:
+    """
+    Executes a workflow definition as one automation action.
+    
+    Steps become nodes of an ``ExecutionGraph`` with the dependencies found
+    at load time, so independent steps run concurrently exactly as the
+    agent's planned calls do. Every call goes through the agent's
+    ``_execute_function_call`` and is logged as a ``FunctionCall`` with
+    its rollback; ``for_each`` iterations are logged per item
+    (``wf.<step>[<index>]``). Steps whose ``when`` is false, and steps
+    that depend on them, are recorded as cancelled and reported as
+    skipped.
+    """
+    
+    def __init__(self, agent: AutomationAgent):
+        self.agent = agent
+    
+    async def run(
+        self,
+        definition: WorkflowDefinition,
+        inputs: Optional[Dict[str, Any]] = None,
+        trigger: Optional[Dict[str, Any]] = None
+    ) -> AgentResponse:
+        """
+        Run a workflow.
+        
+        Args:
+            definition: Compiled workflow
+            inputs: Values for the workflow's declared inputs
+            trigger: Webhook context (service, event, payload) when triggered
+        
+        Returns:
+            AgentResponse for the workflow's automation action
+        """
+        try:
+            inputs = definition.validate_inputs(inputs or {})
+        except ValueError as e:
+            return AgentResponse(success=False, message=str(e))
+        
+        agent = self.agent
+        action = agent._start_action(
+            f"workflow {definition.name}",
+            action_type=ACTION_TYPE,
+            input_data={"workflow": definition.name, "inputs": inputs, "trigger": trigger}
+        )
+        logger.info(f"Running workflow {definition.name} (action {action.id})")
+        
+        started = time.perf_counter()
+        context: Dict[str, Any] = {"inputs": inputs, "trigger": trigger or {}, "steps": {}}
+        results: List[Dict[str, Any]] = []
+        steps = {step.id: step for step in definition.steps}
+        
+        async def execute(node: GraphNode, arguments: Dict[str, Any]) -> Dict[str, Any]:
+            step = steps[node.node_id]
+            outcome = await self._run_step(step, node, graph, context, action.id, results)
+            context["steps"][step.id] = {"status": outcome["status"], "result": outcome.get("result")}
+            return outcome
+        
+        def skip(node: GraphNode, reason: str, status: str) -> Dict[str, Any]:
+            context["steps"][node.node_id] = {"status": status, "result": None}
+            result = agent._record_skipped_call(node, graph, action.id, reason, status)
+            results.append(result)
+            return result
+        
+        graph = ExecutionGraph(execute, skip, id_prefix="wf.")
+        try:
+            for step in definition.steps:
+                graph.add(
+                    {"name": step.call, "arguments": step.args.value},
+                    depends_on=step.needs,
+                    node_id=step.id
+                )
+            await asyncio.gather(*(node.task for node in graph.nodes))
+        except BaseException:
+            graph.cancel()
+            raise
+        
+        statuses = {node.node_id: node.status for node in graph.nodes}
+        data = {
+            "workflow": definition.name,
+            "steps": statuses,
+            "function_results": results,
+            "execution_graph": graph.to_dict()["nodes"],
+            "duration_ms": int((time.perf_counter() - started) * 1000)
+        }
+        failed = [step_id for step_id, status in statuses.items() if status not in (STATUS_SUCCESS, STATUS_SKIPPED)]
+        if not failed:
+            response = agent._complete_action(action, data)
+            response.message = f"Workflow {definition.name} completed"
+            return response
+        
+        action.output_data = data
+        error = WorkflowRuntimeError(f"step(s) {', '.join(failed)} did not succeed")
+        response = agent._fail_action(action, error)
+        response.message = f"Workflow {definition.name} failed: {error}"
+        response.data = data
+        if definition.rollback_on_failure and response.rollback_available:
+            logger.info(f"Rolling back workflow {definition.name} (action {action.id}) after failure")
+            rollback = await agent.rollback_action(action.id, reason=f"Workflow step(s) {', '.join(failed)} failed")
+            data["rollback"] = {"success": rollback.success, "message": rollback.message, **(rollback.data or {})}
+            response.rollback_available = False
+        return response
+    
+    async def _run_step(
+        self,
+        step: WorkflowStep,
+        node: GraphNode,
+        graph: ExecutionGraph,
+        context: Dict[str, Any],
+        action_id: int,
+        results: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        agent = self.agent
+        try:
+            if not all(condition.evaluate(context) for condition in step.when):
+                result = agent._record_skipped_call(
+                    node, graph, action_id, "Condition not met: " + " and ".join(c.expression for c in step.when),
+                    STATUS_SKIPPED
+                )
+                results.append(result)
+                return result
+            if step.for_each is None:
+                result = await self._call(step, step.args.render(context), node, graph, action_id)
+                results.append(result)
+                return result
+            items = step.for_each.render(context)
+        except WorkflowRuntimeError as e:
+            result = agent._record_skipped_call(node, graph, action_id, str(e), STATUS_FAILED)
+            results.append(result)
+            return result
+        
+        if not isinstance(items, list):
+            result = agent._record_skipped_call(
+                node, graph, action_id, f"for_each produced {type(items).__name__}, not a list", STATUS_FAILED
+            )
+            results.append(result)
+            return result
+        if len(items) > settings.workflow_max_loop_items:
+            logger.warning(
+                f"Workflow step {step.id}: {len(items)} items, "
+                f"only the first {settings.workflow_max_loop_items} are processed"
+            )
+            items = items[:settings.workflow_max_loop_items]
+        
+        semaphore = asyncio.Semaphore(step.parallel)
+        
+        async def iterate(index: int, item: Any) -> Optional[Dict[str, Any]]:
+            scope = {**context, step.loop_var: item}
+            iteration = replace(node, node_id=f"{node.node_id}[{index}]")
+            try:
+                if not all(condition.evaluate(scope) for condition in step.where):
+                    return None
+                arguments = step.args.render(scope)
+            except WorkflowRuntimeError as e:
+                return agent._record_skipped_call(iteration, graph, action_id, str(e), STATUS_FAILED)
+            async with semaphore:
+                return await self._call(step, arguments, iteration, graph, action_id)
+        
+        outcomes = [
+            outcome for outcome in await asyncio.gather(*(iterate(index, item) for index, item in enumerate(items)))
+            if outcome is not None
+        ]
+        results.extend(outcomes)
+        succeeded = all(outcome["status"] == STATUS_SUCCESS for outcome in outcomes)
+        return {
+            "function": step.call,
+            "status": STATUS_SUCCESS if succeeded else STATUS_FAILED,
+            "result": [outcome.get("result") for outcome in outcomes],
+            "iterations": len(outcomes),
+            **({} if succeeded else {"error": f"{sum(o['status'] != STATUS_SUCCESS for o in outcomes)} iteration(s) failed"})
+        }
+    
+    async def _call(
+        self,
+        step: WorkflowStep,
+        arguments: Dict[str, Any],
+        node: GraphNode,
+        graph: ExecutionGraph,
+        action_id: int
+    ) -> Dict[str, Any]:
+        async with self.agent._service_semaphore(step.call):
+            return await self.agent._execute_function_call(
+                {"name": step.call, "arguments": arguments}, action_id, node, graph
+            )
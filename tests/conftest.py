@@ -0,0 +1,110 @@
+"""Shared test configuration: settings from a test environment and an in-memory database."""
+
+import os
+import sys
+import types
+
+# Settings are read when src.config is first imported
+TEST_ENVIRONMENT = {
+    "LLM_API_KEY": "test-llm-key",
+    "DATABASE_URL": "sqlite://",
+    "DATABASE_USER": "test",
+    "DATABASE_PASSWORD": "test",
+    "SECRET_KEY": "test-secret-key-that-is-at-least-32-characters",
+    "SLACK_CLIENT_ID": "test",
+    "SLACK_CLIENT_SECRET": "test",
+    "JIRA_CLIENT_ID": "test",
+    "JIRA_CLIENT_SECRET": "test",
+    "JIRA_BASE_URL": "https://example.atlassian.net",
+    "AWS_ACCESS_KEY_ID": "test",
+    "AWS_SECRET_ACCESS_KEY": "test",
+    "AWS_S3_BUCKET": "test-bucket",
+    "GITHUB_CLIENT_ID": "test",
+    "GITHUB_CLIENT_SECRET": "test",
+}
+for name, value in TEST_ENVIRONMENT.items():
+    os.environ.setdefault(name, value)
+
+
+class FakeOAuth2Manager:
+    """Hands out a fixed token instead of talking to the OAuth providers."""
+    
+    token = "test-token"
+    
+    async def get_valid_token(self, db, user_id, service_type):
+        return self.token
+
+
+# Integrations only need oauth2_manager; the real src.auth also pulls in the
+# API's user management, which the tests do not exercise.
+_auth = types.ModuleType("src.auth")
+_auth.__path__ = []
+_oauth2 = types.ModuleType("src.auth.oauth2")
+_oauth2.oauth2_manager = FakeOAuth2Manager()
+_auth.oauth2 = _oauth2
+sys.modules.setdefault("src.auth", _auth)
+sys.modules.setdefault("src.auth.oauth2", _oauth2)
+
+import httpx
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src.database.models import Base, User
+
+
+@pytest.fixture
+def session_factory():
+    """Context-manager session factory over a fresh in-memory database with one user (id 1)."""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine)
+    with factory() as session:
+        session.add(User(id=1, username="alice", email="alice@example.com", hashed_password="-"))
+        session.add(User(id=2, username="bob", email="bob@example.com", hashed_password="-"))
+        session.commit()
+    yield factory
+    engine.dispose()
+
+
+@pytest.fixture
+def db(session_factory):
+    with session_factory() as session:
+        yield session
+
+
+class FakeSlackAPI:
+    """
+    Slack Web API served from ``handlers`` (method name -> callable taking
+    the query params and returning the JSON body) over httpx's mock transport.
+    """
+    
+    def __init__(self):
+        self.handlers = {}
+        self.calls = []
+        self.client = httpx.AsyncClient(transport=httpx.MockTransport(self._handle))
+    
+    def _handle(self, request):
+        method = request.url.path.rsplit("/", 1)[-1]
+        params = dict(request.url.params)
+        self.calls.append((method, params))
+        if method not in self.handlers:
+            return httpx.Response(200, json={"ok": False, "error": "unknown_method"})
+        return httpx.Response(200, json={"ok": True, **self.handlers[method](params)})
+    
+    def count(self, method):
+        return sum(1 for called, _ in self.calls if called == method)
+
+
+@pytest.fixture
+def slack_api(monkeypatch):
+    """Route every integration's pooled HTTP client to a fresh FakeSlackAPI."""
+    from src.integrations.base import integration_client_registry
+    from src.integrations.slack_directory import get_slack_directory
+    
+    api = FakeSlackAPI()
+    monkeypatch.setattr(integration_client_registry, "get_client", lambda service_type: api.client)
+    get_slack_directory().clear()
+    yield api
+    get_slack_directory().clear()
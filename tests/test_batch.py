@@ -0,0 +1,79 @@
+import asyncio
+from contextlib import contextmanager, nullcontext
+
+from src.core.agent import AgentResponse
+from src.core.batch import BatchRunner
+
+
+class FakeAgent:
+    def __init__(self, pool):
+        self.pool = pool
+        self.llm_priority = None
+    
+    async def execute_command(self, command):
+        self.pool.running += 1
+        self.pool.peak = max(self.pool.peak, self.pool.running)
+        try:
+            await asyncio.sleep(0.01 if command != "slow" else 0.05)
+            if command == "explode":
+                raise RuntimeError("integration unavailable")
+            return AgentResponse(
+                success=command != "fail",
+                message=f"ran {command}",
+                data={"function_results": [{"function": "get_slack_messages"}]},
+                action_id=1,
+                rollback_available=True
+            )
+        finally:
+            self.pool.running -= 1
+
+
+class FakeAgentPool:
+    def __init__(self):
+        self.running = 0
+        self.peak = 0
+        self.leases = []
+    
+    @contextmanager
+    def lease(self, user_id, session):
+        self.leases.append(user_id)
+        yield FakeAgent(self)
+
+
+async def collect(runner, commands):
+    return [event async for event in runner.run(7, commands)]
+
+
+async def test_batches_run_with_bounded_concurrency(monkeypatch):
+    monkeypatch.setattr("src.core.batch.get_session", nullcontext)
+    pool = FakeAgentPool()
+    
+    events = await collect(BatchRunner(pool, concurrency=2), [f"command {index}" for index in range(6)])
+    
+    assert pool.peak == 2
+    assert pool.leases == [7] * 6
+    assert sorted(event["index"] for event in events[:-1]) == list(range(6))
+    assert events[-1]["type"] == "summary"
+    assert events[-1]["succeeded"] == 6
+
+
+async def test_items_stream_in_completion_order(monkeypatch):
+    monkeypatch.setattr("src.core.batch.get_session", nullcontext)
+    
+    events = await collect(BatchRunner(FakeAgentPool(), concurrency=2), ["slow", "fast"])
+    
+    assert [event["command"] for event in events[:-1]] == ["fast", "slow"]
+
+
+async def test_failures_do_not_stop_the_batch(monkeypatch):
+    monkeypatch.setattr("src.core.batch.get_session", nullcontext)
+    
+    events = await collect(BatchRunner(FakeAgentPool(), concurrency=3), ["ok", "fail", "explode", "ok"])
+    
+    items = {event["index"]: event for event in events[:-1]}
+    assert items[1]["error"] == "ran fail"
+    assert items[2]["error"] == "integration unavailable"
+    assert items[2]["actions_taken"] == []
+    assert items[0]["rollback_id"] == "1"
+    summary = events[-1]
+    assert (summary["succeeded"], summary["failed"], summary["failed_indexes"]) == (2, 2, [1, 2])
@@ -0,0 +1,59 @@
+from src.config import settings
+from src.core.agent import COMBINE_INSTRUCTION, AutomationAgent
+from src.core.classifier import get_local_classifier
+from src.core.llm_client import LLMResponse
+from src.database.models import ServiceType
+
+
+class FakeClient:
+    model = "gpt-3.5-turbo"
+    
+    def __init__(self):
+        self.calls = []
+    
+    async def chat_completion(self, messages, **kwargs):
+        self.calls.append(messages)
+        return LLMResponse(f"combined {len(self.calls)}")
+
+
+class FakeSlack:
+    def __init__(self, count):
+        self.count = count
+    
+    async def iter_messages(self, channel_name, oldest=None, latest=None):
+        for index in range(self.count):
+            yield {
+                "timestamp": f"2024-05-01T10:{index:02d}:00",
+                "user_name": "oncall",
+                "text": f"Critical outage {index}: the production database is down and checkout is failing!"
+            }
+
+
+def make_agent(messages):
+    agent = AutomationAgent.__new__(AutomationAgent)
+    agent.llm_client = FakeClient()
+    agent.llm_priority = 10
+    agent.integrations = {ServiceType.SLACK: FakeSlack(messages)}
+    return agent
+
+
+async def test_partials_are_combined_by_the_llm_not_the_classifier(monkeypatch):
+    monkeypatch.setattr(settings, "llm_context_window", 2600)
+    monkeypatch.setattr(settings, "llm_max_tokens", 2000)
+    monkeypatch.setattr(settings, "llm_analysis_max_chunks", 2)
+    monkeypatch.setattr(settings, "llm_batch_enabled", False)
+    monkeypatch.setattr(settings, "local_classifier_enabled", True)
+    agent = make_agent(60)
+    classified = get_local_classifier().stats()["requests"]
+    
+    result = await agent._analyze_slack_channel("#incidents", "urgency")
+    
+    assert result["chunks"] > 2
+    assert result["message_count"] == 60
+    # Raw chunks are classified locally; only the combining steps reach the LLM
+    assert get_local_classifier().stats()["requests"] - classified == result["chunks"]
+    assert agent.llm_client.calls
+    for messages in agent.llm_client.calls:
+        assert COMBINE_INSTRUCTION in messages[0]["content"]
+        assert messages[1]["content"].startswith("Part 1:\n")
+    assert result["result"] == f"combined {len(agent.llm_client.calls)}"
@@ -0,0 +1,40 @@
+import pytest
+
+from src.core.classifier import LexiconClassifier
+
+
+@pytest.fixture
+def classifier():
+    return LexiconClassifier(confidence_threshold=0.75)
+
+
+@pytest.mark.parametrize("analysis_type", ["urgency", "sentiment"])
+def test_text_without_lexicon_terms_is_escalated(classifier, analysis_type):
+    text = "The payment processor rejects every card since the deploy\nCustomers cannot check out"
+    
+    result = classifier.classify(text, analysis_type)
+    
+    assert result.matched_terms == []
+    assert result.confidence == 0.0
+    assert classifier.should_escalate(result)
+
+
+def test_clear_urgency_is_answered_locally(classifier):
+    result = classifier.classify("URGENT: production down, customers affected!!", "urgency")
+    
+    assert result.label == "urgent"
+    assert not classifier.should_escalate(result)
+
+
+def test_explicitly_calm_text_is_answered_locally(classifier):
+    result = classifier.classify("fyi, low priority, no rush on this one", "urgency")
+    
+    assert result.label == "not urgent"
+    assert not classifier.should_escalate(result)
+
+
+def test_clear_sentiment_is_answered_locally(classifier):
+    result = classifier.classify("Thanks, the new dashboard is amazing and really fast", "sentiment")
+    
+    assert result.label == "positive"
+    assert not classifier.should_escalate(result)
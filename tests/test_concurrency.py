@@ -0,0 +1,60 @@
+import random
+from types import SimpleNamespace
+
+import pytest
+
+from src.core import concurrency
+from src.core.concurrency import AdaptiveConcurrencyLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+    
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(concurrency, "time", SimpleNamespace(monotonic=clock.monotonic))
+    return clock
+
+
+async def run_requests(limiter, clock, latencies, outcome="success"):
+    for latency in latencies:
+        await limiter.acquire()
+        clock.now += latency
+        limiter.release(latency, outcome)
+
+
+async def test_mixed_healthy_latencies_do_not_shrink_the_limit(clock):
+    limiter = AdaptiveConcurrencyLimiter("mixed", initial_limit=8, max_limit=64)
+    rng = random.Random(7)
+    # Short classifications next to long completions, with no overload
+    latencies = [rng.choice((0.3, 0.5, 4.0, 6.0)) for _ in range(3000)]
+    
+    await run_requests(limiter, clock, latencies)
+    
+    assert limiter.limit >= 8
+    assert limiter.latency_decreases == 0
+
+
+async def test_latency_rise_shrinks_the_limit_but_not_below_the_floor(clock):
+    limiter = AdaptiveConcurrencyLimiter("overload", initial_limit=16, max_limit=16, latency_floor=6)
+    await run_requests(limiter, clock, [0.5] * 200)
+    
+    await run_requests(limiter, clock, [5.0] * 40)
+    
+    assert limiter.latency_decreases > 0
+    assert limiter.limit == 6
+
+
+async def test_rate_limits_can_take_the_limit_below_the_latency_floor(clock):
+    limiter = AdaptiveConcurrencyLimiter("throttled", initial_limit=8, min_limit=1, latency_floor=4)
+    for _ in range(5):
+        clock.now += 10
+        await run_requests(limiter, clock, [0.1], outcome="rate_limited")
+    
+    assert limiter.limit == 1
@@ -0,0 +1,156 @@
+import asyncio
+
+from src.config import settings
+from src.core.agent import AutomationAgent
+from src.core.execution_graph import STATUS_CANCELLED, ExecutionGraph, resolve_references
+from src.core.llm_client import LLMResponse, LLMStreamEvent
+from src.database.models import FunctionCall
+
+
+class ScriptedClient:
+    """Streams one scripted turn of function calls per completion."""
+    
+    model = "gpt-3.5-turbo"
+    
+    def __init__(self, turns):
+        self.turns = list(turns)
+    
+    async def stream_chat_completion(self, messages, **kwargs):
+        calls = self.turns.pop(0) if self.turns else []
+        for index, call in enumerate(calls):
+            yield LLMStreamEvent(LLMStreamEvent.FUNCTION_CALL, function_call={"id": f"tc_{index}", **call})
+        yield LLMStreamEvent(LLMStreamEvent.DONE, response=LLMResponse("" if calls else "Done."))
+
+
+def make_agent(db, turns, invoke):
+    agent = AutomationAgent.__new__(AutomationAgent)
+    agent.db = db
+    agent.user_id = 1
+    agent.llm_client = ScriptedClient(turns)
+    agent.llm_priority = 10
+    agent._llm_metrics = {}
+    agent._service_semaphores = {}
+    agent._invoke = invoke
+    return agent
+
+
+def fetch_then_analyze(channel):
+    return [
+        {"name": "get_slack_messages", "arguments": {"channel_name": channel}},
+        {"name": "analyze_text", "arguments": {"text": "{{call_1.messages}}"}}
+    ]
+
+
+async def run(agent):
+    return await agent._call_llm_with_functions("Summarize the channels", action_id=1)
+
+
+def loop_settings(monkeypatch):
+    monkeypatch.setattr(settings, "plan_cache_enabled", False)
+    monkeypatch.setattr(settings, "tool_selection_enabled", False)
+
+
+async def test_references_resolve_within_their_own_turn(monkeypatch, db):
+    loop_settings(monkeypatch)
+    analyzed = []
+    
+    async def invoke(registered, arguments):
+        if registered.name == "get_slack_messages":
+            return {"messages": f"messages from {arguments['channel_name']}"}
+        analyzed.append(arguments["text"])
+        return {"analysis": arguments["text"].upper()}
+    
+    agent = make_agent(db, [fetch_then_analyze("general"), fetch_then_analyze("random")], invoke)
+    result = await run(agent)
+    
+    assert analyzed == ["messages from general", "messages from random"]
+    assert result["stop_reason"] == "completed"
+    assert [r["result"] for r in result["function_results"] if r["function"] == "analyze_text"] == [
+        {"analysis": "MESSAGES FROM GENERAL"}, {"analysis": "MESSAGES FROM RANDOM"}
+    ]
+    assert [step["repeated_calls"] for step in agent._llm_metrics[1]["steps"]] == [0, 0, 0]
+
+
+async def test_repeating_a_successful_call_reuses_it_and_stops(monkeypatch, db):
+    loop_settings(monkeypatch)
+    invoked = []
+    
+    async def invoke(registered, arguments):
+        invoked.append(registered.name)
+        return {"messages": "hello"}
+    
+    call = {"name": "get_slack_messages", "arguments": {"channel_name": "general"}}
+    agent = make_agent(db, [[call], [call]], invoke)
+    result = await run(agent)
+    
+    assert invoked == ["get_slack_messages"]
+    assert result["stop_reason"] == "repeated_calls"
+    assert [r["status"] for r in result["function_results"]] == ["success", "success"]
+
+
+async def test_failed_call_is_retried_instead_of_counted_as_repeat(monkeypatch, db):
+    loop_settings(monkeypatch)
+    invoked = []
+    
+    async def invoke(registered, arguments):
+        invoked.append(registered.name)
+        if len(invoked) == 1:
+            raise Exception("Slack API error: ratelimited")
+        return {"messages": "hello"}
+    
+    call = {"name": "get_slack_messages", "arguments": {"channel_name": "general"}}
+    agent = make_agent(db, [[call], [call]], invoke)
+    result = await run(agent)
+    
+    assert invoked == ["get_slack_messages", "get_slack_messages"]
+    assert result["stop_reason"] == "completed"
+    assert [r["status"] for r in result["function_results"]] == ["failed", "success"]
+    assert db.query(FunctionCall).count() == 2
+
+
+async def test_graph_runs_dependents_after_their_references():
+    order = []
+    
+    async def executor(node, arguments):
+        order.append((node.node_id, arguments))
+        await asyncio.sleep(0)
+        return {"status": "success", "result": {"id": node.node_id}}
+    
+    def skipper(node, reason, status):
+        return {"status": status, "error": reason}
+    
+    graph = ExecutionGraph(executor, skipper, max_parallelism=4, infer_dependencies=False)
+    graph.add({"name": "first", "arguments": {}})
+    second = graph.add({"name": "second", "arguments": {"source": {"$ref": "call_1.id"}, "note": "after {{call_1.id}}"}})
+    await asyncio.gather(*(node.task for node in graph.nodes))
+    
+    assert second.depends_on == ["call_1"]
+    assert second.level == 1
+    assert order == [("call_1", {}), ("call_2", {"source": "call_1", "note": "after call_1"})]
+
+
+async def test_graph_cancels_nodes_downstream_of_a_failure():
+    executed = []
+    
+    async def executor(node, arguments):
+        executed.append(node.node_id)
+        return {"status": "failed", "error": "boom"}
+    
+    def skipper(node, reason, status):
+        return {"status": status, "error": reason}
+    
+    graph = ExecutionGraph(executor, skipper, max_parallelism=4, infer_dependencies=False)
+    graph.add({"name": "first", "arguments": {}})
+    second = graph.add({"name": "second", "arguments": {"text": "{{call_1}}"}})
+    await asyncio.gather(*(node.task for node in graph.nodes))
+    
+    assert executed == ["call_1"]
+    assert second.status == STATUS_CANCELLED
+    assert second.result["error"] == "Dependency failed: call_1"
+
+
+def test_resolve_references_renders_non_strings_as_json():
+    outputs = {"call_1": {"items": [{"name": "a"}], "count": 1}}
+    
+    assert resolve_references({"$ref": "call_1.items.0"}, outputs) == {"name": "a"}
+    assert resolve_references("n={{call_1.count}} {{ call_1.items }}", outputs) == 'n=1 [{"name": "a"}]'
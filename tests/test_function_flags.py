@@ -0,0 +1,93 @@
+import httpx
+import pytest
+
+from src.config import settings
+from src.core.agent import AutomationAgent
+from src.core.plan_cache import CommandTemplate, PlanCache
+from src.database.models import ServiceType
+from src.integrations.registry import FunctionRegistry, RegisteredFunction, agent_function
+
+PARAMETERS = {"type": "object", "properties": {"channel_name": {"type": "string"}}}
+
+
+class FlakyIntegration:
+    def __init__(self, failures, error):
+        self.failures = failures
+        self.error = error
+        self.calls = 0
+    
+    async def fetch(self, channel_name):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error
+        return {"channel": channel_name}
+
+
+class AgentStub:
+    def __init__(self, integration):
+        self.integrations = {ServiceType.SLACK: integration}
+
+
+def function(name="fetch", **flags):
+    return RegisteredFunction(
+        name=name, description=name, parameters=PARAMETERS, method_name="fetch", service=ServiceType.SLACK, **flags
+    )
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(settings, "integration_retry_attempts", 2)
+    monkeypatch.setattr(settings, "integration_retry_backoff_seconds", 0)
+
+
+async def test_idempotent_calls_are_retried_after_network_errors():
+    integration = FlakyIntegration(2, httpx.ConnectError("reset"))
+    
+    result = await AutomationAgent._invoke(AgentStub(integration), function(idempotent=True), {"channel_name": "ops"})
+    
+    assert result == {"channel": "ops"}
+    assert integration.calls == 3
+
+
+async def test_non_idempotent_calls_are_not_retried():
+    integration = FlakyIntegration(1, httpx.ConnectError("reset"))
+    
+    with pytest.raises(httpx.ConnectError):
+        await AutomationAgent._invoke(AgentStub(integration), function(), {"channel_name": "ops"})
+    assert integration.calls == 1
+
+
+async def test_application_errors_are_not_retried():
+    integration = FlakyIntegration(1, Exception("Channel 'ops' not found"))
+    
+    with pytest.raises(Exception, match="not found"):
+        await AutomationAgent._invoke(AgentStub(integration), function(idempotent=True), {"channel_name": "ops"})
+    assert integration.calls == 1
+
+
+def test_read_only_functions_cannot_declare_a_rollback():
+    with pytest.raises(ValueError):
+        agent_function(name="peek", description="", parameters=PARAMETERS, read_only=True, rollback="unpeek")
+
+
+def test_plans_with_side_effects_need_more_agreement_before_replay():
+    registry = FunctionRegistry()
+    registry.register(function("get_slack_messages", read_only=True))
+    registry.register(function("send_slack_message"))
+    cache = PlanCache(registry=registry, min_confidence=0.75, write_min_confidence=0.9)
+    read = CommandTemplate.from_command("show messages in #ops")
+    write = CommandTemplate.from_command("post hello in #ops")
+    
+    for _ in range(2):
+        cache.observe(1, "m", read, [{"name": "get_slack_messages", "arguments": {"channel_name": "ops"}}])
+        cache.observe(1, "m", write, [{"name": "send_slack_message", "arguments": {"channel_name": "ops"}}])
+    
+    assert cache.lookup(1, "m", "show messages in #ops")[1] is not None
+    assert cache.lookup(1, "m", "post hello in #ops")[1] is None
+    
+    for _ in range(6):
+        cache.observe(1, "m", write, [{"name": "send_slack_message", "arguments": {"channel_name": "ops"}}])
+    
+    assert cache.lookup(1, "m", "post hello in #deploys")[1] == [
+        {"name": "send_slack_message", "arguments": {"channel_name": "deploys"}}
+    ]
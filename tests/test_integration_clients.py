@@ -0,0 +1,45 @@
+import asyncio
+
+from src.config import settings
+from src.database.models import ServiceType
+from src.integrations.base import IntegrationClientRegistry
+
+
+async def test_clients_are_shared_per_service(monkeypatch):
+    monkeypatch.setattr(settings, "integration_http2", False)
+    registry = IntegrationClientRegistry()
+    
+    slack = registry.get_client(ServiceType.SLACK)
+    
+    assert registry.get_client(ServiceType.SLACK) is slack
+    assert registry.get_client(ServiceType.JIRA) is not slack
+    stats = registry.stats()
+    assert stats["clients_created"] == 2
+    assert stats["services"]["slack"]["checkouts"] == 2
+    await registry.aclose()
+
+
+def test_clients_are_rebuilt_after_their_loop_closes(monkeypatch):
+    monkeypatch.setattr(settings, "integration_http2", False)
+    registry = IntegrationClientRegistry()
+    
+    async def checkout():
+        return registry.get_client(ServiceType.SLACK)
+    
+    first = asyncio.run(checkout())
+    second = asyncio.run(checkout())
+    
+    assert second is not first
+    assert registry.created == 2
+    asyncio.run(registry.aclose())
+
+
+async def test_service_timeouts_override_the_default(monkeypatch):
+    monkeypatch.setattr(settings, "integration_http2", False)
+    monkeypatch.setattr(settings, "integration_timeouts", {"slack": 10})
+    monkeypatch.setattr(settings, "integration_request_timeout", 30)
+    registry = IntegrationClientRegistry()
+    
+    assert registry.get_client(ServiceType.SLACK).timeout.read == 10
+    assert registry.get_client(ServiceType.GITHUB).timeout.read == 30
+    await registry.aclose()
@@ -0,0 +1,93 @@
+from datetime import datetime, timedelta
+
+from src.database.models import Job, JobStatus
+from src.jobs.queue import JobQueue
+
+
+def make_queue(session_factory, **options):
+    options.setdefault("visibility_timeout", 60)
+    options.setdefault("max_attempts", 2)
+    options.setdefault("retry_backoff_seconds", 0)
+    options.setdefault("max_per_user", 5)
+    return JobQueue(session_factory, **options)
+
+
+def test_claim_leases_jobs_in_order(session_factory):
+    queue = make_queue(session_factory)
+    first = queue.enqueue(1, "command", {"command": "one"})
+    queue.enqueue(1, "command", {"command": "two"})
+    
+    claimed = queue.claim("worker-a")
+    
+    assert [job.id for job in claimed] == [first.id]
+    assert claimed[0].status == JobStatus.RUNNING
+    assert claimed[0].attempts == 1
+    assert claimed[0].locked_by == "worker-a"
+
+
+def test_losing_a_claim_race_does_not_double_lease(session_factory):
+    queue = make_queue(session_factory)
+    job = queue.enqueue(1, "command", {"command": "one"})
+    take = queue._take
+    stolen = []
+    
+    def racing_take(candidates, limit, session):
+        # Another worker claims the same row between our read and our update
+        queue._take = take
+        stolen.extend(queue.claim("worker-b"))
+        return take(candidates, limit, session)
+    
+    queue._take = racing_take
+    claimed = queue.claim("worker-a")
+    
+    assert [leased.id for leased in stolen] == [job.id]
+    assert claimed == []
+    assert queue.stats()["claim_conflicts"] == 1
+    assert queue.get(job.id).locked_by == "worker-b"
+
+
+def test_claims_skip_users_at_their_running_cap(session_factory):
+    queue = make_queue(session_factory, max_per_user=1)
+    queue.enqueue(1, "command", {"command": "one"})
+    queue.enqueue(1, "command", {"command": "two"})
+    other = queue.enqueue(2, "command", {"command": "three"})
+    
+    claimed = queue.claim("worker-a", limit=3)
+    
+    assert sorted(job.user_id for job in claimed) == [1, 2]
+    assert other.id in [job.id for job in claimed]
+
+
+def test_only_the_lease_holder_finishes_a_job(session_factory):
+    queue = make_queue(session_factory)
+    job = queue.enqueue(1, "command", {"command": "one"})
+    queue.claim("worker-a")
+    
+    assert not queue.complete(job.id, "worker-b", {"success": True})
+    assert queue.complete(job.id, "worker-a", {"success": True})
+    assert queue.get(job.id).status == JobStatus.SUCCEEDED
+
+
+def test_failed_jobs_retry_until_out_of_attempts(session_factory):
+    queue = make_queue(session_factory, max_attempts=2)
+    job = queue.enqueue(1, "command", {"command": "one"})
+    
+    queue.claim("worker-a")
+    queue.fail(job.id, "worker-a", "boom")
+    assert queue.get(job.id).status == JobStatus.QUEUED
+    
+    queue.claim("worker-a")
+    queue.fail(job.id, "worker-a", "boom")
+    assert queue.get(job.id).status == JobStatus.FAILED
+
+
+def test_expired_leases_are_reclaimed(session_factory):
+    queue = make_queue(session_factory)
+    job = queue.enqueue(1, "command", {"command": "one"})
+    queue.claim("worker-a")
+    with session_factory() as session:
+        session.query(Job).filter(Job.id == job.id).update({Job.locked_until: datetime.utcnow() - timedelta(seconds=1)})
+        session.commit()
+    
+    assert queue.reclaim_expired() == 1
+    assert [leased.id for leased in queue.claim("worker-b")] == [job.id]
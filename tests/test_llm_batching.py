@@ -0,0 +1,64 @@
+import asyncio
+import json
+
+from src.config import settings
+from src.core.llm_batching import ANALYSIS_TEMPERATURE, AnalysisBatcher, item_messages
+from src.core.llm_cache import LLMResponseCache, canonical_request_key
+from src.core.llm_client import LLMResponse
+
+PROMPT = "Summarize the text."
+
+
+class FakeClient:
+    model = "llama2"
+    
+    def __init__(self):
+        self.calls = []
+    
+    async def chat_completion(self, messages, **kwargs):
+        self.calls.append(messages)
+        if len(messages) == 1:
+            return LLMResponse(f"single:{messages[0]['content'].rsplit(': ', 1)[-1]}")
+        texts = json.loads(messages[1]["content"])
+        return LLMResponse(json.dumps({"results": [{"id": item["id"], "result": f"batched:{item['text']}"} for item in texts]}))
+
+
+def make_batcher():
+    return AnalysisBatcher(window_ms=5, max_items=16, max_tokens=6000, cache=LLMResponseCache(max_entries=100))
+
+
+async def test_batched_results_are_cached_per_item():
+    client = FakeClient()
+    batcher = make_batcher()
+    
+    first = await asyncio.gather(*(batcher.analyze(client, "summary", PROMPT, text) for text in ("a", "b", "c")))
+    again = await asyncio.gather(*(batcher.analyze(client, "summary", PROMPT, text) for text in ("c", "a")))
+    
+    assert first == ["batched:a", "batched:b", "batched:c"]
+    assert again == ["batched:c", "batched:a"]
+    assert len(client.calls) == 1
+    assert batcher.cache_hits == 2
+
+
+async def test_only_uncached_items_join_a_batch():
+    client = FakeClient()
+    batcher = make_batcher()
+    await batcher.analyze(client, "summary", PROMPT, "a")
+    
+    results = await asyncio.gather(*(batcher.analyze(client, "summary", PROMPT, text) for text in ("a", "b", "c")))
+    
+    assert results == ["single:a", "batched:b", "batched:c"]
+    batched_texts = [item["text"] for item in json.loads(client.calls[-1][1]["content"])]
+    assert batched_texts == ["b", "c"]
+
+
+async def test_entries_from_single_requests_are_shared():
+    client = FakeClient()
+    batcher = make_batcher()
+    key = canonical_request_key(
+        client.model, item_messages(PROMPT, "a"), None, ANALYSIS_TEMPERATURE, settings.llm_max_tokens
+    )
+    batcher.cache.set(key, LLMResponse("from an unbatched call"))
+    
+    assert await batcher.analyze(client, "summary", PROMPT, "a") == "from an unbatched call"
+    assert client.calls == []
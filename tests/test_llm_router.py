@@ -0,0 +1,55 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from src.core.concurrency import AdaptiveConcurrencyLimiter
+from src.core.llm_client import GenericOpenAIClient
+from src.core.llm_router import RoutedLLMClient
+
+
+class FakeCompletions:
+    def __init__(self, latency: float, content: str):
+        self.latency = latency
+        self.content = content
+        self.calls = 0
+    
+    async def create(self, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        message = SimpleNamespace(content=self.content, tool_calls=None, function_call=None)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+
+def make_provider(name: str, latency: float, limit: int = 1) -> GenericOpenAIClient:
+    client = GenericOpenAIClient(api_key="test", base_url=f"https://{name}.invalid/v1", model="m", provider=name)
+    client.client = SimpleNamespace(chat=SimpleNamespace(completions=FakeCompletions(latency, name)))
+    client.limiter = AdaptiveConcurrencyLimiter(name, initial_limit=limit, max_limit=limit)
+    return client
+
+
+async def test_queueing_for_a_limiter_slot_does_not_count_against_the_timeout():
+    primary = make_provider("primary", latency=0.15)
+    fallback = make_provider("fallback", latency=0.01)
+    router = RoutedLLMClient([primary, fallback], timeout=0.25, hedge_enabled=False)
+    
+    # With one slot, the third request waits ~0.3s before its 0.15s call starts
+    responses = await asyncio.gather(*(
+        router.chat_completion([{"role": "user", "content": "hi"}]) for _ in range(3)
+    ))
+    
+    assert [response.content for response in responses] == ["primary"] * 3
+    assert router.failovers == 0
+    assert router.health[id(primary)].failures == 0
+
+
+async def test_slow_upstream_call_times_out_and_fails_over():
+    primary = make_provider("primary", latency=0.5)
+    fallback = make_provider("fallback", latency=0.01)
+    router = RoutedLLMClient([primary, fallback], timeout=0.1, hedge_enabled=False)
+    
+    response = await router.chat_completion([{"role": "user", "content": "hi"}])
+    
+    assert response.content == "fallback"
+    assert router.failovers == 1
+    assert router.health[id(primary)].failures == 1
@@ -0,0 +1,82 @@
+from src.core.plan_cache import CommandTemplate, PlanCache
+from src.database.models import ServiceType
+from src.integrations.registry import FunctionRegistry, RegisteredFunction
+
+PARAMETERS = {"type": "object", "properties": {}}
+
+
+def make_cache():
+    registry = FunctionRegistry()
+    for name in ("get_slack_messages", "get_github_issues"):
+        registry.register(RegisteredFunction(
+            name=name, description=name, parameters=PARAMETERS, method_name=name, service=ServiceType.SLACK,
+            read_only=True
+        ))
+    return PlanCache(registry=registry, min_confidence=0.6, write_min_confidence=0.6)
+
+
+def learn(cache, command, calls):
+    template = CommandTemplate.from_command(command)
+    return [cache.observe(1, "m", template, calls) for _ in range(2)]
+
+
+def test_commands_are_templated_by_slot():
+    template = CommandTemplate.from_command("Show the last 20 messages in #ops-alerts")
+    
+    assert template.template == "show the last {number} messages in #{channel}"
+    assert template.slots == {"channel": "ops-alerts", "number": "20"}
+
+
+def test_plans_replay_with_new_slot_values():
+    cache = make_cache()
+    learn(cache, "show the last 20 messages in #ops", [
+        {"name": "get_slack_messages", "arguments": {"channel_name": "#ops", "limit": 20}}
+    ])
+    
+    _, calls = cache.lookup(1, "m", "show the last 5 messages in #deploys")
+    
+    assert calls == [{"name": "get_slack_messages", "arguments": {"channel_name": "#deploys", "limit": 5}}]
+
+
+def test_string_arguments_keep_their_type():
+    cache = make_cache()
+    learn(cache, "show issue 42 of repo 7", [
+        {"name": "get_github_issues", "arguments": {"issue": "42", "repo_id": 7}}
+    ])
+    
+    _, calls = cache.lookup(1, "m", "show issue 100 of repo 8")
+    
+    assert calls == [{"name": "get_github_issues", "arguments": {"issue": "100", "repo_id": 8}}]
+
+
+def test_integer_argument_from_an_ambiguous_slot_is_not_cached():
+    cache = make_cache()
+    
+    results = learn(cache, "show 5 messages from the last 5 days in #ops", [
+        {"name": "get_slack_messages", "arguments": {"channel_name": "ops", "limit": 5}}
+    ])
+    
+    assert results == ["uncacheable", "uncacheable"]
+    assert cache.lookup(1, "m", "show 10 messages from the last 3 days in #ops")[1] is None
+
+
+def test_integer_slot_that_no_longer_parses_is_a_miss():
+    cache = make_cache()
+    learn(cache, "show 'deploys' messages limited to '12'", [
+        {"name": "get_slack_messages", "arguments": {"channel_name": "deploys", "limit": 12}}
+    ])
+    
+    assert cache.lookup(1, "m", "show 'deploys' messages limited to 'ten'")[1] is None
+
+
+def test_registry_changes_drop_cached_plans():
+    cache = make_cache()
+    learn(cache, "show messages in #ops", [{"name": "get_slack_messages", "arguments": {"channel_name": "ops"}}])
+    
+    cache.registry.register(RegisteredFunction(
+        name="get_slack_messages", description="changed", parameters=PARAMETERS, method_name="get_slack_messages",
+        service=ServiceType.SLACK, read_only=True
+    ))
+    
+    assert cache.lookup(1, "m", "show messages in #ops")[1] is None
+    assert cache.stats()["invalidations"] == 1
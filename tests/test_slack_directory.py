@@ -0,0 +1,38 @@
+from src.integrations.slack import SlackIntegration
+from src.integrations.slack_directory import SlackDirectory
+
+
+def serve_workspace(slack_api):
+    pages = {
+        None: {"channels": [{"id": "C1", "name": "general"}], "response_metadata": {"next_cursor": "page2"}},
+        "page2": {"channels": [{"id": "C2", "name": "ops", "is_private": True}], "response_metadata": {}},
+    }
+    slack_api.handlers["auth.test"] = lambda params: {"team_id": "T1"}
+    slack_api.handlers["conversations.list"] = lambda params: pages[params.get("cursor")]
+
+
+async def test_channel_lookups_load_every_page_once(db, slack_api):
+    serve_workspace(slack_api)
+    directory = SlackDirectory(miss_reload_interval=3600)
+    slack = SlackIntegration(db, 1)
+    
+    assert await directory.channel_id(slack, "xoxp-1", "ops") == "C2"
+    assert await directory.channel_id(slack, "xoxp-1", "general") == "C1"
+    assert await directory.channel_id(slack, "xoxp-1", "missing") is None
+    
+    assert slack_api.count("conversations.list") == 2
+    assert slack_api.count("auth.test") == 1
+
+
+async def test_token_workspace_map_is_bounded(db, slack_api):
+    serve_workspace(slack_api)
+    directory = SlackDirectory(token_max_entries=2)
+    slack = SlackIntegration(db, 1)
+    
+    for token in ("xoxp-1", "xoxp-2", "xoxp-1", "xoxp-3"):
+        await directory.workspace(slack, token)
+    
+    assert list(directory._team_ids) == ["xoxp-1", "xoxp-3"]
+    assert directory.stats()["tokens"] == 2
+    await directory.workspace(slack, "xoxp-2")
+    assert slack_api.count("auth.test") == 4
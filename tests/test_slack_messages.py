@@ -0,0 +1,114 @@
+import time
+
+from src.config import settings
+from src.database.models import SlackReadWatermark
+from src.integrations.slack import SlackIntegration
+
+
+def serve_channel(slack_api, count, last_read="0000000000.000000", start=None):
+    # One message a second, ending a minute ago unless told where to start
+    start = start if start is not None else int(time.time()) - count - 60
+    history = [{"ts": f"{start + index}.000100", "text": f"message {index}"} for index in range(count)]
+    
+    def conversations_history(params):
+        # Newest first, after "oldest", paged by an offset cursor like Slack's
+        window = [
+            message for message in reversed(history)
+            if float(message["ts"]) > float(params.get("oldest") or 0)
+            and float(message["ts"]) < float(params.get("latest") or "inf")
+        ]
+        start = int(params.get("cursor") or 0)
+        end = start + int(params["limit"])
+        more = end < len(window)
+        return {
+            "messages": window[start:end],
+            "has_more": more,
+            "response_metadata": {"next_cursor": str(end) if more else ""}
+        }
+    
+    slack_api.handlers.update({
+        "auth.test": lambda params: {"team_id": "T1"},
+        "conversations.list": lambda params: {"channels": [{"id": "C1", "name": "ops"}]},
+        "conversations.info": lambda params: {"channel": {"id": "C1", "last_read": last_read}},
+        "conversations.history": conversations_history,
+    })
+    return history
+
+
+def texts(result):
+    return [message["text"] for message in result["messages"]]
+
+
+async def test_unread_pages_forward_without_skipping(db, slack_api):
+    serve_channel(slack_api, 5)
+    slack = SlackIntegration(db, 1)
+    
+    first = await slack.get_messages("#ops", limit=2, unread_only=True)
+    second = await slack.get_messages("#ops", limit=2, unread_only=True)
+    third = await slack.get_messages("#ops", limit=2, unread_only=True)
+    fourth = await slack.get_messages("#ops", limit=2, unread_only=True)
+    
+    assert (texts(first), first["has_more"]) == (["message 1", "message 0"], True)
+    assert (texts(second), second["has_more"]) == (["message 3", "message 2"], True)
+    assert (texts(third), third["has_more"]) == (["message 4"], False)
+    assert texts(fourth) == []
+
+
+async def test_watermark_only_moves_to_the_newest_returned_message(db, slack_api):
+    history = serve_channel(slack_api, 4)
+    slack = SlackIntegration(db, 1)
+    
+    await slack.get_messages("ops", limit=3, unread_only=True)
+    
+    watermark = db.query(SlackReadWatermark).filter_by(user_id=1, channel_id="C1").one()
+    assert watermark.last_ts == history[2]["ts"]
+
+
+async def test_unread_starts_at_the_later_of_last_read_and_watermark(db, slack_api):
+    history = serve_channel(slack_api, 6, last_read="1700000002.000100", start=1700000000)
+    db.add(SlackReadWatermark(user_id=1, channel_id="C1", last_ts=history[1]["ts"]))
+    db.commit()
+    slack = SlackIntegration(db, 1)
+    
+    result = await slack.get_messages("ops", limit=10, unread_only=True)
+    
+    assert texts(result) == ["message 5", "message 4", "message 3"]
+    assert result["oldest"] == "1700000002.000100"
+
+
+async def test_plain_reads_return_the_newest_and_leave_the_watermark(db, slack_api):
+    serve_channel(slack_api, 5)
+    slack = SlackIntegration(db, 1)
+    
+    result = await slack.get_messages("ops", limit=2)
+    
+    assert (texts(result), result["has_more"]) == (["message 4", "message 3"], True)
+    assert db.query(SlackReadWatermark).count() == 0
+
+
+async def test_unread_scan_stops_after_the_page_cap(db, slack_api, monkeypatch):
+    monkeypatch.setattr(settings, "slack_unread_max_pages", 2)
+    serve_channel(slack_api, 1000)
+    slack = SlackIntegration(db, 1)
+    
+    result = await slack.get_messages("ops", limit=10, unread_only=True)
+    
+    # Two pages of 200 reach back to message 600; anything older is skipped
+    assert slack_api.count("conversations.history") == 2
+    assert texts(result) == [f"message {index}" for index in range(609, 599, -1)]
+    assert result["has_more"] is True
+
+
+async def test_unread_without_a_read_marker_starts_at_the_default_window(db, slack_api, monkeypatch):
+    monkeypatch.setattr(settings, "slack_unread_default_window_hours", 1.0)
+    # Messages 0-4 are two hours old, 5-9 are a minute old
+    history = serve_channel(slack_api, 5, start=int(time.time()) - 7200)
+    history.extend(
+        {"ts": f"{int(time.time()) - 60 + index}.000100", "text": f"message {5 + index}"} for index in range(5)
+    )
+    slack = SlackIntegration(db, 1)
+    
+    result = await slack.get_messages("ops", limit=50, unread_only=True)
+    
+    assert texts(result) == [f"message {index}" for index in range(9, 4, -1)]
+    assert slack_api.count("conversations.history") == 1
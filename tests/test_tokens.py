@@ -0,0 +1,29 @@
+from src.core import tokens
+from src.core.tokens import count_tokens
+
+
+def test_count_cache_keeps_digests_not_texts():
+    text = "incident " * 50000
+    
+    first = count_tokens(text, "llama2")
+    
+    assert first > 0
+    assert count_tokens(text, "llama2") == first
+    assert not any(text in key for key in tokens._token_counts)
+    assert all(len(digest) == 16 for digest, _ in tokens._token_counts)
+
+
+def test_count_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(tokens, "_TOKEN_COUNTS_MAX", 10)
+    
+    for index in range(50):
+        count_tokens(f"message number {index}", "llama2")
+    
+    assert len(tokens._token_counts) == 10
+
+
+def test_counts_are_per_model():
+    text = "deploy the payments service to production"
+    
+    assert count_tokens(text, "llama2") == tokens._count_tokens(text, "llama2")
+    assert count_tokens(text, "qwen") == tokens._count_tokens(text, "qwen")
@@ -0,0 +1,54 @@
+import threading
+
+from src.core.tool_selection import ToolSelector
+from src.database.models import ServiceType
+from src.integrations.registry import FunctionRegistry, RegisteredFunction
+
+PARAMETERS = {"type": "object", "properties": {}}
+
+
+class RecordingEncoder:
+    """Stands in for a SentenceTransformer; remembers which threads ran it."""
+    
+    def __init__(self):
+        self.threads = set()
+    
+    def encode(self, texts, normalize_embeddings=True):
+        self.threads.add(threading.get_ident())
+        return [[1.0, 0.0] if "jira" in text.lower() else [0.0, 1.0] for text in texts]
+
+
+def make_registry():
+    registry = FunctionRegistry()
+    for name, keywords in [
+        ("send_slack_message", ("slack", "message")),
+        ("create_jira_ticket", ("jira", "ticket")),
+        ("list_s3_files", ("s3", "bucket")),
+        ("search_github_repos", ("github", "repository")),
+        ("get_slack_users", ("slack", "users")),
+    ]:
+        registry.register(RegisteredFunction(
+            name=name, description=name.replace("_", " "), parameters=PARAMETERS, method_name=name,
+            service=ServiceType.SLACK, keywords=keywords
+        ))
+    return registry
+
+
+async def test_embeddings_are_computed_off_the_event_loop():
+    selector = ToolSelector(make_registry(), top_k=1, embedding_model="fake-model", embedding_weight=0.5)
+    encoder = selector._encoder = RecordingEncoder()
+    
+    selection = await selector.select("open a jira ticket for the outage", "gpt-3.5-turbo")
+    
+    assert selection.selected == ["create_jira_ticket"]
+    assert encoder.threads
+    assert threading.get_ident() not in encoder.threads
+
+
+async def test_keyword_ranking_without_embeddings():
+    selector = ToolSelector(make_registry(), top_k=2, embedding_model="")
+    
+    selection = await selector.select("list the files in the s3 bucket", "gpt-3.5-turbo")
+    
+    assert selection.reason == "ranked"
+    assert selection.selected[0] == "list_s3_files"
@@ -0,0 +1,94 @@
+import hashlib
+import hmac
+
+from src.database.models import ServiceType
+from src.integrations.slack import SlackIntegration
+from src.integrations.webhooks import (
+    owner_in_scope, verify_github_signature, verify_shared_secret, verify_slack_signature, webhook_account
+)
+
+SECRET = "8f742231b10e8888abcd99yyyzzz85a5"
+BODY = b'{"type":"event_callback","team_id":"T1","event":{"type":"channel_rename"}}'
+
+
+def slack_signature(timestamp, body=BODY, secret=SECRET):
+    base = f"v0:{timestamp}:".encode() + body
+    return "v0=" + hmac.new(secret.encode(), base, hashlib.sha256).hexdigest()
+
+
+def test_slack_signature_accepts_signed_requests():
+    assert verify_slack_signature(SECRET, "1700000000", slack_signature("1700000000"), BODY, now=1700000010)
+
+
+def test_slack_signature_rejects_tampered_bodies_and_other_secrets():
+    signature = slack_signature("1700000000")
+    
+    assert not verify_slack_signature(SECRET, "1700000000", signature, BODY + b" ", now=1700000010)
+    assert not verify_slack_signature("another-secret", "1700000000", signature, BODY, now=1700000010)
+
+
+def test_slack_signature_rejects_replays():
+    assert not verify_slack_signature(SECRET, "1700000000", slack_signature("1700000000"), BODY, now=1700000301)
+
+
+def test_nothing_verifies_without_a_secret_or_headers():
+    assert not verify_slack_signature(None, "1700000000", slack_signature("1700000000"), BODY, now=1700000010)
+    assert not verify_slack_signature(SECRET, None, slack_signature("1700000000"), BODY, now=1700000010)
+    assert not verify_slack_signature(SECRET, "soon", "v0=00", BODY, now=1700000010)
+
+
+def test_github_signature():
+    body = b'{"action":"opened"}'
+    signature = "sha256=" + hmac.new(b"gh-secret", body, hashlib.sha256).hexdigest()
+    
+    assert verify_github_signature("gh-secret", signature, body)
+    assert not verify_github_signature("gh-secret", signature, body + b" ")
+    assert not verify_github_signature(None, signature, body)
+    assert not verify_github_signature("gh-secret", None, body)
+
+
+def test_jira_shared_secret():
+    assert verify_shared_secret("jira-secret", "jira-secret")
+    assert not verify_shared_secret("jira-secret", "guess")
+    assert not verify_shared_secret(None, None)
+
+
+def test_webhook_accounts():
+    assert webhook_account("slack", {"team_id": "T1", "event": {}}) == "T1"
+    assert webhook_account("github", {"organization": {"login": "Acme"}, "repository": {"owner": {"login": "x"}}}) == "acme"
+    assert webhook_account("github", {"repository": {"owner": {"login": "Alice"}}}) == "alice"
+    assert webhook_account("jira", {"issue": {"self": "https://acme.atlassian.net/rest/api/3/issue/1"}}) == "acme.atlassian.net"
+    assert webhook_account("jira", {}) is None
+
+
+class FakeSlack:
+    async def workspace_id(self):
+        return "T1"
+
+
+class FakeGitHub:
+    async def account_logins(self):
+        return {"alice", "acme"}
+
+
+class DisconnectedJira:
+    async def site(self):
+        raise Exception("No valid Jira token found")
+
+
+INTEGRATIONS = {ServiceType.SLACK: FakeSlack(), ServiceType.GITHUB: FakeGitHub(), ServiceType.JIRA: DisconnectedJira()}
+
+
+async def test_triggers_only_fire_for_the_owners_accounts():
+    assert await owner_in_scope(INTEGRATIONS, "slack", "T1")
+    assert not await owner_in_scope(INTEGRATIONS, "slack", "T2")
+    assert await owner_in_scope(INTEGRATIONS, "github", "acme")
+    assert not await owner_in_scope(INTEGRATIONS, "github", "mallory")
+    assert not await owner_in_scope(INTEGRATIONS, "jira", "acme.atlassian.net")
+    assert not await owner_in_scope(INTEGRATIONS, "slack", None)
+
+
+async def test_slack_owner_workspace_comes_from_the_token(db, slack_api):
+    slack_api.handlers["auth.test"] = lambda params: {"team_id": "T9"}
+    
+    assert await SlackIntegration(db, 1).workspace_id() == "T9"
@@ -0,0 +1,97 @@
+import pytest
+
+import src.integrations.slack  # noqa: F401 (registers the Slack functions)
+from src.database.models import Job
+from src.jobs.executor import JOB_KIND_WORKFLOW, JobExecutor
+from src.workflows import WorkflowRegistry, WorkflowValidationError, compile_workflow
+
+
+def document(name="digest", **trigger):
+    data = {
+        "name": name,
+        "inputs": {"channel": "string"},
+        "steps": [
+            {"id": "messages", "call": "get_slack_messages", "args": {"channel_name": "{{ inputs.channel }}"}}
+        ]
+    }
+    if trigger:
+        data["triggers"] = [{"webhook": "slack", "inputs": {"channel": "{{ trigger.payload.channel }}"}, **trigger}]
+    return data
+
+
+def test_validation_reports_every_problem():
+    with pytest.raises(WorkflowValidationError) as error:
+        compile_workflow({
+            "name": "broken",
+            "steps": [
+                {"id": "one", "call": "no_such_function"},
+                {"id": "two", "call": "get_slack_messages", "args": {"channel_name": "{{ steps.three.result }}"}},
+                {"id": "three", "call": "get_slack_messages", "args": {"channel": "ops"}},
+            ]
+        })
+    
+    assert error.value.errors == [
+        "step one: unknown function 'no_such_function'",
+        "step two: references steps.three.result, which is not an earlier step",
+        "step three: get_slack_messages has no argument channel",
+        "step three: missing required argument channel_name",
+    ]
+
+
+def test_triggers_run_as_the_registering_user():
+    registry = WorkflowRegistry()
+    
+    workflow = registry.register_data(document(event="message"), owner_id=2)
+    
+    assert workflow.owner_id == 2
+    assert workflow.triggers[0].run_as == 2
+
+
+def test_users_cannot_run_triggers_as_someone_else():
+    registry = WorkflowRegistry()
+    
+    with pytest.raises(WorkflowValidationError) as error:
+        registry.register_data(document(run_as=1), owner_id=2)
+    
+    assert error.value.errors == ["trigger 1: run_as must be your own user id (2)"]
+    assert registry.get("digest") is None
+
+
+def test_admins_may_choose_run_as():
+    workflow = WorkflowRegistry().register_data(document(run_as=1), owner_id=2, admin=True)
+    
+    assert workflow.triggers[0].run_as == 1
+
+
+def test_users_cannot_replace_other_users_workflows():
+    registry = WorkflowRegistry()
+    registry.register_data(document(), owner_id=1)
+    
+    with pytest.raises(PermissionError):
+        registry.register_data(document(), owner_id=2)
+    
+    assert registry.get("digest").owner_id == 1
+    assert registry.register_data(document(), owner_id=1).owner_id == 1
+
+
+def test_directory_workflows_are_not_replaceable_by_users():
+    registry = WorkflowRegistry()
+    registry.register(compile_workflow(document(), source="workflows/digest.json"), force=True)
+    
+    with pytest.raises(PermissionError):
+        registry.register_data(document(), owner_id=2)
+
+
+def test_workflow_jobs_carry_their_definition(monkeypatch):
+    # A dedicated worker has never seen the API's runtime registrations
+    monkeypatch.setattr("src.jobs.executor.get_workflow_registry", lambda: WorkflowRegistry())
+    registered = WorkflowRegistry().register_data(document(), owner_id=1)
+    job = Job(id=7, user_id=1, kind=JOB_KIND_WORKFLOW, payload={
+        "workflow": "digest", "definition": registered.document, "inputs": {"channel": "ops"}
+    })
+    
+    workflow = JobExecutor._workflow(job)
+    
+    assert workflow.name == "digest"
+    assert [step.call for step in workflow.steps] == ["get_slack_messages"]
+    assert JobExecutor._workflow(Job(id=8, user_id=1, kind=JOB_KIND_WORKFLOW, payload={"workflow": "digest"})) is None
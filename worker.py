@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+"""Main entry point for background job worker processes."""
+
+import argparse
+
+from src.config import settings
+from src.jobs.worker import supervise
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run automation job workers")
+    parser.add_argument(
+        "--processes", type=int, default=settings.worker_processes,
+        help="Worker processes on this node"
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=settings.job_executor_concurrency,
+        help="Jobs each process runs at once"
+    )
+    args = parser.parse_args()
+    supervise(args.processes, args.concurrency)
+
+
+if __name__ == "__main__":
+    main()